@@ -32,7 +32,7 @@ from pathlib import Path
 from snapcraft.cli import echo
 from tabulate import tabulate
 
-from snapcraft.file_utils import calculate_sha3_384, get_snap_tool_path
+from snapcraft.file_utils import get_snap_tool_path
 from snapcraft import storeapi, yaml_utils
 from snapcraft.internal import cache, deltas, repo
 from snapcraft.internal.errors import SnapDataExtractionError, ToolMissingError
@@ -732,7 +732,10 @@ def upload(snap_filename, release_channels=None) -> Tuple[str, int]:
         )
 
     snap_cache.cache(snap_filename=snap_filename)
-    snap_cache.prune(deb_arch=deb_arch, keep_hash=calculate_sha3_384(snap_filename))
+    snap_cache.prune(
+        deb_arch=deb_arch,
+        keep_hash=cache.get_file_digest(snap_filename, algorithm="sha3_384"),
+    )
 
     return snap_name, result["revision"]
 
@@ -777,10 +780,14 @@ def _upload_delta(
     except (DeltaGenerationError, DeltaGenerationTooBigError, ToolMissingError) as e:
         raise storeapi.errors.StoreDeltaApplicationError(str(e))
 
+    # Hash the three snaps at once, unless they were hashed before.
+    source_hash, target_hash, delta_hash = cache.get_file_digest_cache().get_many(
+        [source_snap, target_snap, delta_filename], algorithm="sha3_384"
+    )
     snap_hashes = {
-        "source_hash": calculate_sha3_384(source_snap),
-        "target_hash": calculate_sha3_384(target_snap),
-        "delta_hash": calculate_sha3_384(delta_filename),
+        "source_hash": source_hash,
+        "target_hash": target_hash,
+        "delta_hash": delta_hash,
     }
 
     try:
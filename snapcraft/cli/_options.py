@@ -147,6 +147,21 @@ _PROVIDER_OPTIONS: List[Dict[str, Any]] = [
         envvar="SNAPCRAFT_BIND_SSH",
         supported_providers=["lxd", "multipass"],
     ),
+    dict(
+        param_decls="--parallel-parts",
+        metavar="<count>",
+        type=click.IntRange(min=1),
+        help="Number of parts that do not depend on each other to pull and build concurrently.",
+        envvar="SNAPCRAFT_PARALLEL_PARTS",
+        supported_providers=["host", "lxd", "managed-host", "multipass"],
+    ),
+    dict(
+        param_decls="--explain",
+        is_flag=True,
+        help="Show why each step of each part runs or is skipped.",
+        envvar="SNAPCRAFT_EXPLAIN",
+        supported_providers=["host", "lxd", "managed-host", "multipass"],
+    ),
     dict(
         param_decls="--enable-developer-debug",
         is_flag=True,
@@ -28,6 +28,7 @@ from ._command_group import SnapcraftGroup
 from ._errors import exception_handler
 from ._options import add_provider_options
 from .assertions import assertionscli
+from .cache import cachecli
 from .containers import containerscli
 from .discovery import discoverycli
 from .extensions import extensioncli
@@ -43,6 +44,7 @@ logger = logging.getLogger(__name__)
 command_groups = [
     storecli,
     assertionscli,
+    cachecli,
     containerscli,
     discoverycli,
     helpcli,
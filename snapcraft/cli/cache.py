@@ -0,0 +1,110 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+
+import click
+import tabulate
+
+from snapcraft.internal import cache
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def _parse_size(ctx, param, value):
+    if value is None:
+        return None
+
+    match = re.fullmatch(r"(\d+)([KMGT]?)B?", value.strip().upper())
+    if match is None:
+        raise click.BadParameter("expected a size such as 500M or 10G.")
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2)]
+
+
+def _format_size(size: int) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = "TiB"
+
+    if unit == "B":
+        return "{} {}".format(size, unit)
+    return "{:.1f} {}".format(size, unit)
+
+
+@click.group()
+def cachecli(**kwargs):
+    pass
+
+
+@cachecli.command("cache")
+@click.option(
+    "--prune",
+    is_flag=True,
+    help="Remove the least recently used entries over the limits.",
+)
+@click.option(
+    "--max-size",
+    metavar="<size>",
+    callback=_parse_size,
+    envvar="SNAPCRAFT_CACHE_MAX_SIZE",
+    help="Size to prune the caches down to, such as 10G.",
+)
+@click.option(
+    "--max-age",
+    metavar="<days>",
+    type=click.IntRange(min=0),
+    envvar="SNAPCRAFT_CACHE_MAX_AGE",
+    help="Days after which unused entries are pruned.",
+)
+def cache_(prune, max_size, max_age, **kwargs):
+    """Show how much space snapcraft's caches use, and prune them.
+
+    The caches hold downloaded sources, stage-packages and per project
+    data. With --prune, entries unused for longer than --max-age are
+    removed, followed by the least recently used ones until the caches
+    fit in --max-size.
+    """
+    cache_manager = cache.CacheManager()
+
+    if prune:
+        if max_size is None and max_age is None:
+            raise click.UsageError("--prune requires --max-size or --max-age.")
+        pruned_entries = cache_manager.prune(
+            max_size=max_size,
+            max_age=None if max_age is None else max_age * 24 * 60 * 60,
+        )
+        click.echo(
+            "Pruned {} entries, freeing {}.".format(
+                len(pruned_entries), _format_size(sum(e.size for e in pruned_entries))
+            )
+        )
+
+    usage = cache_manager.get_usage()
+    rows = [
+        [namespace, count, _format_size(size)]
+        for namespace, (count, size) in usage.items()
+    ]
+    rows.append(
+        [
+            "total",
+            sum(count for count, size in usage.values()),
+            _format_size(sum(size for count, size in usage.values())),
+        ]
+    )
+    click.echo(tabulate.tabulate(rows, headers=["Cache", "Entries", "Size"]))
@@ -89,7 +89,13 @@ def _execute(  # noqa: C901
 
     if build_provider in ["host", "managed-host"]:
         project_config = project_loader.load_config(project)
-        lifecycle.execute(step, project_config, parts)
+        lifecycle.execute(
+            step,
+            project_config,
+            parts,
+            parallel_parts=kwargs.get("parallel_parts") or 1,
+            explain=kwargs.get("explain", False),
+        )
         if pack_project:
             _pack(
                 project.prime_dir,
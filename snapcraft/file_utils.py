@@ -14,8 +14,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
+import concurrent.futures
 import errno
 import hashlib
+import itertools
 import logging
 import os
 import pathlib
@@ -24,20 +27,52 @@ import shutil
 import stat
 import subprocess
 import sys
-from contextlib import contextmanager, suppress
-from typing import Callable, Generator, List, Optional, Pattern, Set
+import threading
+from contextlib import ExitStack, contextmanager, suppress
+from typing import IO, Callable, Dict, Generator, List, Optional, Pattern, Set, Tuple
 
 from snapcraft.internal import common, errors
 
 if sys.version_info < (3, 6):
     import sha3  # noqa
 
+if sys.platform == "linux":
+    import fcntl
+
 
 logger = logging.getLogger(__name__)
 
+# Hard-linking is mostly waiting on the filesystem, a few threads are enough
+# to keep it busy.
+_MAX_LINK_WORKERS = min(8, os.cpu_count() or 1)
+
+# The FICLONE ioctl from linux/fs.h, which reflinks a whole file.
+_FICLONE = 0x40049409 if sys.platform == "linux" else None
+
+# Errors from FICLONE or os.copy_file_range that mean trying the next way of
+# copying.
+_CLONE_UNSUPPORTED = (
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.ENOTTY,
+    errno.EBADF,
+    errno.EPERM,
+)
+
+
+# How much of a file is sniffed for NUL bytes to tell binary files apart.
+_BINARY_SNIFF_SIZE = 8192
+
 
 def replace_in_file(
-    directory: str, file_pattern: Pattern, search_pattern: Pattern, replacement: str
+    directory: str,
+    file_pattern: Pattern,
+    search_pattern: Pattern,
+    replacement: str,
+    *,
+    streaming: bool = False,
 ) -> None:
     """Searches and replaces patterns that match a file pattern.
 
@@ -47,6 +82,8 @@ def replace_in_file(
                            matching files.
     :param str replacement: The string to replace the matching search_pattern
                             with.
+    :param bool streaming: match search_pattern one line at a time instead
+                           of reading whole files into memory.
     """
 
     for root, directories, files in os.walk(directory):
@@ -56,37 +93,122 @@ def replace_in_file(
                 # Don't bother trying to rewrite a symlink. It's either invalid
                 # or the linked file will be rewritten on its own.
                 if not os.path.islink(file_path):
-                    search_and_replace_contents(file_path, search_pattern, replacement)
+                    search_and_replace_contents(
+                        file_path, search_pattern, replacement, streaming=streaming
+                    )
 
 
 def search_and_replace_contents(
-    file_path: str, search_pattern: Pattern, replacement: str
+    file_path: str,
+    search_pattern: Pattern,
+    replacement: str,
+    *,
+    streaming: bool = False,
 ) -> None:
     """Search file and replace any occurrence of pattern with replacement.
 
+    Binary files, those with a NUL byte near the start, are left alone.
+
     :param str file_path: Path of file to be searched.
     :param re.RegexObject search_pattern: Pattern for which to search.
     :param str replacement: The string to replace pattern.
+    :param bool streaming: match search_pattern one line at a time, so
+                           anchors like ^ apply to every line.
     """
     try:
-        with open(file_path, "r+") as f:
+        if _is_binary_file(file_path):
+            return
+
+        if streaming:
+            _search_and_replace_lines(file_path, search_pattern, replacement)
+            return
+
+        with open(file_path, "r") as f:
             try:
                 original = f.read()
             except UnicodeDecodeError:
                 # This was probably a binary file. Skip it.
                 return
 
-            replaced = search_pattern.sub(replacement, original)
-            if replaced != original:
-                f.seek(0)
-                f.truncate()
-                f.write(replaced)
+        replaced = search_pattern.sub(replacement, original)
+        if replaced == original:
+            return
+
+        with replacing_file(file_path) as f:
+            f.write(replaced)
     except PermissionError as e:
         logger.warning(
             "Unable to open {path} for writing: {error}".format(path=file_path, error=e)
         )
 
 
+def _is_binary_file(file_path: str) -> bool:
+    with open(file_path, "rb") as f:
+        return b"\0" in f.read(_BINARY_SNIFF_SIZE)
+
+
+def _search_and_replace_lines(
+    file_path: str, search_pattern: Pattern, replacement: str
+) -> None:
+    # Nothing is written until a line changes, and the lines before it are
+    # then copied over from a second reader.
+    try:
+        with ExitStack() as stack:
+            f = stack.enter_context(open(file_path, "r", newline=""))
+            partial_file = None
+            for line_number, line in enumerate(f):
+                replaced = search_pattern.sub(replacement, line)
+                if partial_file is None:
+                    if replaced == line:
+                        continue
+                    partial_file = stack.enter_context(replacing_file(file_path))
+                    with open(file_path, "r", newline="") as head:
+                        partial_file.writelines(itertools.islice(head, line_number))
+                partial_file.write(replaced)
+    except UnicodeDecodeError:
+        # This was probably a binary file. Skip it, dropping anything written.
+        return
+
+
+@contextmanager
+def replacing_file(
+    file_path: str,
+    *,
+    binary: bool = False,
+    copy_stat: bool = True,
+    check_writable: bool = True,
+) -> Generator[IO, None, None]:
+    """Open a new file to replace file_path with, moving it into place on exit.
+
+    The new file is written next to file_path instead of writing through
+    file_path, which may be hard-linked from other steps or caches. It is
+    removed again if anything fails before it is moved into place.
+
+    :param str file_path: path to the file to replace.
+    :param bool binary: open the new file in binary instead of text mode.
+    :param bool copy_stat: copy the mode and times of file_path over.
+    :param bool check_writable: refuse to replace a read-only file_path.
+    :raises PermissionError: if check_writable and file_path is read-only.
+    """
+    if check_writable and not os.access(file_path, os.W_OK):
+        raise PermissionError(errno.EACCES, os.strerror(errno.EACCES), file_path)
+
+    partial_path = "{}.snapcraft-partial".format(file_path)
+    try:
+        if binary:
+            partial_file = open(partial_path, "wb")
+        else:
+            partial_file = open(partial_path, "w", newline="")
+        with partial_file:
+            yield partial_file
+        if copy_stat:
+            shutil.copystat(file_path, partial_path)
+        os.replace(partial_path, file_path)
+    finally:
+        with suppress(FileNotFoundError):
+            os.unlink(partial_path)
+
+
 def link_or_copy(source: str, destination: str, follow_symlinks: bool = False) -> None:
     """Hard-link source and destination files. Copy if it fails to link.
 
@@ -141,15 +263,24 @@ def link(source: str, destination: str, *, follow_symlinks: bool = False) -> Non
         raise errors.SnapcraftCopyFileNotFoundError(source)
 
 
-def copy(source: str, destination: str, *, follow_symlinks: bool = False) -> None:
+def copy(
+    source: str,
+    destination: str,
+    *,
+    follow_symlinks: bool = False,
+    statistics: Optional["CopyStatistics"] = None
+) -> None:
     """Copy source and destination files.
 
     This function overwrites the destination if it already exists, and also
-    tries to copy ownership information.
+    tries to copy ownership information. File contents are cloned if the
+    filesystem supports it, see copy_file_contents.
 
     :param str source: The source to be copied to destination.
     :param str destination: Where to put the copy.
     :param bool follow_symlinks: Whether or not symlinks should be followed.
+    :param CopyStatistics statistics: Where to also record how the contents
+                                      were copied.
 
     :raises SnapcraftCopyFileNotFoundError: If source doesn't exist.
     """
@@ -159,7 +290,13 @@ def copy(source: str, destination: str, *, follow_symlinks: bool = False) -> Non
         os.unlink(destination)
 
     try:
-        shutil.copy2(source, destination, follow_symlinks=follow_symlinks)
+        if os.path.isdir(destination) or (
+            not follow_symlinks and os.path.islink(source)
+        ):
+            shutil.copy2(source, destination, follow_symlinks=follow_symlinks)
+        else:
+            copy_file_contents(source, destination, statistics=statistics)
+            shutil.copystat(source, destination, follow_symlinks=follow_symlinks)
     except FileNotFoundError:
         raise errors.SnapcraftCopyFileNotFoundError(source)
     uid = os.stat(source, follow_symlinks=follow_symlinks).st_uid
@@ -174,6 +311,94 @@ def copy(source: str, destination: str, *, follow_symlinks: bool = False) -> Non
         )
 
 
+class CopyStatistics:
+    """Count the files and bytes copied with each copy strategy.
+
+    The strategies are "reflink", where the filesystem shares the data with
+    the source, "copy_file_range", where the kernel copies it, and "copy".
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.files: Dict[str, int] = collections.Counter()
+        self.bytes: Dict[str, int] = collections.Counter()
+
+    def record(self, strategy: str, size: int) -> None:
+        with self._lock:
+            self.files[strategy] += 1
+            self.bytes[strategy] += size
+
+    def __str__(self) -> str:
+        if not self.files:
+            return "no files copied"
+
+        return ", ".join(
+            "{} files ({} bytes) with {}".format(
+                self.files[strategy], self.bytes[strategy], strategy
+            )
+            for strategy in sorted(self.files)
+        )
+
+
+# Totals for everything copied by this process.
+copy_statistics = CopyStatistics()
+
+
+def copy_file_contents(
+    source: str, destination: str, *, statistics: Optional[CopyStatistics] = None
+) -> None:
+    """Copy the contents of source to destination, cloning them if possible.
+
+    A reflink is tried first, which shares the data on copy-on-write
+    filesystems like btrfs and xfs. os.copy_file_range is next, which keeps
+    the data in the kernel, and a plain copy is the last resort.
+
+    :param str source: The file to copy.
+    :param str destination: Where to put the copy, it is overwritten.
+    :param CopyStatistics statistics: Where to also record how the contents
+                                      were copied.
+    """
+    source_stat = os.stat(source)
+    strategy = _copy_file_contents(source, destination, source_stat)
+
+    copy_statistics.record(strategy, source_stat.st_size)
+    if statistics is not None:
+        statistics.record(strategy, source_stat.st_size)
+
+
+def _copy_file_contents(
+    source: str, destination: str, source_stat: os.stat_result
+) -> str:
+    # Files that report no size, like those in /proc, are read the usual way.
+    if stat.S_ISREG(source_stat.st_mode) and source_stat.st_size > 0:
+        with open(source, "rb") as source_file, open(
+            destination, "wb"
+        ) as destination_file:
+            if _FICLONE is not None:
+                try:
+                    fcntl.ioctl(
+                        destination_file.fileno(), _FICLONE, source_file.fileno()
+                    )
+                    return "reflink"
+                except OSError as e:
+                    if e.errno not in _CLONE_UNSUPPORTED:
+                        raise
+
+            if hasattr(os, "copy_file_range"):
+                try:
+                    while os.copy_file_range(
+                        source_file.fileno(), destination_file.fileno(), 2 ** 30
+                    ):
+                        pass
+                    return "copy_file_range"
+                except OSError as e:
+                    if e.errno not in _CLONE_UNSUPPORTED:
+                        raise
+
+    shutil.copyfile(source, destination)
+    return "copy"
+
+
 def link_or_copy_tree(
     source_tree: str,
     destination_tree: str,
@@ -182,6 +407,13 @@ def link_or_copy_tree(
 ) -> None:
     """Copy a source tree into a destination, hard-linking if possible.
 
+    The source tree is listed once with os.scandir and all the destination
+    directories are created before any file is copied. With the default
+    copy_function, files are hard-linked a directory at a time from a small
+    thread pool, and copied right away if the trees are on different devices.
+    Directory permissions and times are applied last, so they are not
+    changed by the copying.
+
     :param str source_tree: Source directory to be copied.
     :param str destination_tree: Destination directory. If this directory
                                  already exists, the files in `source_tree`
@@ -205,47 +437,137 @@ def link_or_copy_tree(
             "{!r}".format(destination_tree, source_tree)
         )
 
-    create_similar_directory(source_tree, destination_tree)
+    directories, files_by_directory = _scan_tree(source_tree, destination_tree, ignore)
 
-    destination_basename = os.path.basename(destination_tree)
+    for source, destination, source_stat in directories:
+        _make_directory(destination)
+
+    if copy_function is link_or_copy:
+        # Hard-links across devices always fail, so don't even try.
+        same_device = os.stat(source_tree).st_dev == os.stat(destination_tree).st_dev
+        _link_or_copy_files(files_by_directory, try_link=same_device)
+    else:
+        for files in files_by_directory:
+            for source, destination, is_symlink in files:
+                copy_function(source, destination)
+
+    # Children first, so that adding to a directory does not change its
+    # times after they have been set.
+    for source, destination, source_stat in reversed(directories):
+        _copy_directory_metadata(source, destination, source_stat)
+
+
+# (source, destination, stat) for a directory.
+_TreeDirectory = Tuple[str, str, os.stat_result]
+# (source, destination, is_symlink) for anything else.
+_TreeFile = Tuple[str, str, bool]
+
+
+def _scan_tree(
+    source_tree: str,
+    destination_tree: str,
+    ignore: Optional[Callable[[str, List[str]], List[str]]],
+) -> Tuple[List[_TreeDirectory], List[List[_TreeFile]]]:
+    # Parents are always listed before their children.
+    directories: List[_TreeDirectory] = [
+        (source_tree, destination_tree, os.stat(source_tree, follow_symlinks=False))
+    ]
+    files_by_directory: List[List[_TreeFile]] = list()
+
+    # Don't recurse into destination tree if it's a subdirectory of the
+    # source tree.
+    destination_parent, destination_basename = os.path.split(
+        os.path.abspath(destination_tree)
+    )
+
+    pending = [(source_tree, destination_tree)]
+    while pending:
+        root, destination_root = pending.pop()
+        try:
+            with os.scandir(root) as scanned_entries:
+                entries = list(scanned_entries)
+        except OSError:
+            # Like os.walk, skip what cannot be listed.
+            continue
 
-    for root, directories, files in os.walk(source_tree, topdown=True):
         ignored: Set[str] = set()
         if ignore is not None:
-            ignored = set(ignore(root, directories + files))
-
-        # Don't recurse into destination tree if it's a subdirectory of the
-        # source tree.
-        if os.path.relpath(destination_tree, root) == destination_basename:
+            # os.walk lists symlinks to directories with the directories.
+            directory_names = [e.name for e in entries if _is_dir(e)]
+            file_names = [e.name for e in entries if not _is_dir(e)]
+            ignored = set(ignore(root, directory_names + file_names))
+        if os.path.abspath(root) == destination_parent:
             ignored.add(destination_basename)
 
-        if ignored:
-            # Prune our search appropriately given an ignore list, i.e. don't
-            # walk into directories that are ignored.
-            directories[:] = [d for d in directories if d not in ignored]
-
-        for directory in directories:
-            source = os.path.join(root, directory)
-            # os.walk doesn't by default follow symlinks (which is good), but
-            # it includes symlinks that are pointing to directories in the
-            # directories list. We want to treat it as a file, here.
-            if os.path.islink(source):
-                files.append(directory)
+        files: List[_TreeFile] = list()
+        for entry in entries:
+            if entry.name in ignored:
                 continue
 
-            destination = os.path.join(
-                destination_tree, os.path.relpath(source, source_tree)
-            )
+            source = os.path.join(root, entry.name)
+            destination = os.path.join(destination_root, entry.name)
+            # Symlinks to directories are treated as files.
+            if entry.is_dir(follow_symlinks=False):
+                directories.append(
+                    (source, destination, entry.stat(follow_symlinks=False))
+                )
+                pending.append((source, destination))
+            else:
+                files.append((source, destination, entry.is_symlink()))
 
-            create_similar_directory(source, destination)
+        if files:
+            files_by_directory.append(files)
+
+    return directories, files_by_directory
+
+
+def _is_dir(entry: os.DirEntry) -> bool:
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
 
-        for file_name in set(files) - ignored:
-            source = os.path.join(root, file_name)
-            destination = os.path.join(
-                destination_tree, os.path.relpath(source, source_tree)
-            )
 
-            copy_function(source, destination)
+def _link_or_copy_files(
+    files_by_directory: List[List[_TreeFile]], *, try_link: bool
+) -> None:
+    # Each worker takes whole directories, so that they do not contend for
+    # the same directory when adding entries to it.
+    max_workers = min(len(files_by_directory), _MAX_LINK_WORKERS)
+    if max_workers <= 1:
+        for files in files_by_directory:
+            _link_or_copy_directory_files(files, try_link=try_link)
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for future in [
+            pool.submit(_link_or_copy_directory_files, files, try_link=try_link)
+            for files in files_by_directory
+        ]:
+            future.result()
+
+
+def _link_or_copy_directory_files(files: List[_TreeFile], *, try_link: bool) -> None:
+    for source, destination, is_symlink in files:
+        if is_symlink or not try_link:
+            copy(source, destination)
+            continue
+
+        try:
+            os.link(source, destination, follow_symlinks=False)
+        except OSError:
+            # Takes care of existing destinations and what cannot be linked.
+            link_or_copy(source, destination)
+
+
+def _make_directory(destination: str) -> None:
+    try:
+        os.mkdir(destination)
+    except FileExistsError:
+        if not os.path.isdir(destination):
+            raise
+    except FileNotFoundError:
+        os.makedirs(destination, exist_ok=True)
 
 
 def create_similar_directory(source: str, destination: str) -> None:
@@ -257,18 +579,23 @@ def create_similar_directory(source: str, destination: str) -> None:
                            information will be copied.
     """
 
-    stat = os.stat(source, follow_symlinks=False)
-    uid = stat.st_uid
-    gid = stat.st_gid
+    source_stat = os.stat(source, follow_symlinks=False)
     os.makedirs(destination, exist_ok=True)
+    _copy_directory_metadata(source, destination, source_stat)
+
 
+def _copy_directory_metadata(
+    source: str, destination: str, source_stat: os.stat_result
+) -> None:
     # Windows does not have "os.chown" implementation and copystat
     # is unlikely to be useful, so just bail after creating directory.
     if sys.platform == "win32":
         return
 
     try:
-        os.chown(destination, uid, gid, follow_symlinks=False)
+        os.chown(
+            destination, source_stat.st_uid, source_stat.st_gid, follow_symlinks=False
+        )
     except PermissionError as exception:
         logger.debug("Unable to chown {}: {}".format(destination, exception))
 
@@ -16,5 +16,15 @@
 
 from ._apt import AptStagePackageCache  # noqa
 from ._cache import SnapcraftCache  # noqa
+from ._digest import (  # noqa
+    FileDigestCache,
+    get_file_digest,
+    get_file_digest_cache,
+    set_file_digest,
+)
+from ._elf import ElfAttributeCache  # noqa
 from ._file import FileCache  # noqa
+from ._git import GitMirrorCache  # noqa
+from ._manager import CacheEntry, CacheManager  # noqa
 from ._snap import SnapCache  # noqa
+from ._unpacked import UnpackedStagePackageCache  # noqa
@@ -34,7 +34,7 @@ class AptStagePackageCache(SnapcraftStagePackageCache):
         super().__init__()
         cache_base_dir = os.path.join(self.stage_package_cache_root, "apt")
 
-        # TODO: Clean old cache, LP: #1663051
+        # Caches for sources no longer used are pruned by `snapcraft cache`.
 
         self.base_dir = os.path.join(cache_base_dir, sources_digest)
         self.packages_dir = os.path.join(
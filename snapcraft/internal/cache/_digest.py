@@ -0,0 +1,190 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import atexit
+import concurrent.futures
+import os
+import threading
+from typing import Dict, List, Optional
+
+from snapcraft import file_utils
+from ._cache import SnapcraftCache
+from ._persistent import PersistentCache
+
+# hashlib releases the GIL while hashing the large blocks files are read in,
+# so a few threads hash that many files at once.
+_MAX_HASH_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class FileDigestCache(PersistentCache):
+    """Cache for the digests of files.
+
+    Digests are looked up by the algorithm and the device, inode, size and
+    mtime of a file, so a file is only read again once it is replaced or
+    modified. Digests for a project are kept apart from the ones shared by
+    everything else.
+    """
+
+    cache_version = 3
+
+    def __init__(self, *, project_name: Optional[str] = None) -> None:
+        super().__init__(relative_path=_get_relative_path(project_name))
+
+    def get(self, path: str, *, algorithm: str = "sha256") -> str:
+        """Get the digest of the file at path, hashing it if needed.
+
+        :param str path: path to the file.
+        :param str algorithm: algorithm to hash with, as understood by hashlib.
+        :returns: the hex digest.
+        :raises OSError: if the file cannot be read.
+        """
+        return self.get_many([path], algorithm=algorithm)[0]
+
+    def lookup(self, path: str, *, algorithm: str = "sha256") -> Optional[str]:
+        """Get the digest of the file at path only if known, without reading it.
+
+        :param str path: path to the file.
+        :param str algorithm: algorithm the digest was calculated with.
+        :returns: the hex digest or None.
+        :raises OSError: if the file cannot be stat'ed.
+        """
+        return self._get_entry(_get_stat_key(path, algorithm))
+
+    def get_many(self, paths: List[str], *, algorithm: str = "sha256") -> List[str]:
+        """Get the digests of the files at paths, hashing them in threads.
+
+        :param list paths: paths to the files.
+        :param str algorithm: algorithm to hash with, as understood by hashlib.
+        :returns: the hex digests, in the same order as paths.
+        :raises OSError: if one of the files cannot be read.
+        """
+        stat_keys = [_get_stat_key(path, algorithm) for path in paths]
+        digests = [self._get_entry(stat_key) for stat_key in stat_keys]
+        missing = {
+            stat_key: path
+            for stat_key, path, digest in zip(stat_keys, paths, digests)
+            if digest is None
+        }
+
+        if len(missing) > 1:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=_MAX_HASH_WORKERS
+            ) as executor:
+                hashed = executor.map(
+                    lambda path: file_utils.calculate_hash(path, algorithm=algorithm),
+                    missing.values(),
+                )
+                calculated = dict(zip(missing.keys(), hashed))
+        else:
+            calculated = {
+                stat_key: file_utils.calculate_hash(path, algorithm=algorithm)
+                for stat_key, path in missing.items()
+            }
+
+        for stat_key, digest in calculated.items():
+            self._set_entry(stat_key, digest)
+
+        return [
+            calculated[stat_key] if digest is None else digest
+            for stat_key, digest in zip(stat_keys, digests)
+        ]
+
+    def set(self, path: str, digest: str, *, algorithm: str = "sha256") -> None:
+        """Record the digest of the file at path, calculated as it was written.
+
+        :param str path: path to the file.
+        :param str digest: the hex digest of the file.
+        :param str algorithm: algorithm digest was calculated with.
+        :raises OSError: if the file cannot be stat'ed.
+        """
+        self._set_entry(_get_stat_key(path, algorithm), digest)
+
+
+# Caches shared by everything in this process, by path.
+_shared_caches: Dict[str, FileDigestCache] = dict()
+_shared_caches_lock = threading.Lock()
+
+
+def get_file_digest_cache(*, project_name: Optional[str] = None) -> FileDigestCache:
+    """Return the FileDigestCache shared by everything in this process.
+
+    Shared caches are saved when the process exits, if not saved before.
+
+    :param str project_name: name of the project to get the cache for, or None
+                             for the one shared by everything that is not
+                             project specific.
+    """
+    cache_path = os.path.join(
+        SnapcraftCache().cache_root, _get_relative_path(project_name)
+    )
+    with _shared_caches_lock:
+        if not _shared_caches:
+            atexit.register(_save_shared_caches)
+        if cache_path not in _shared_caches:
+            _shared_caches[cache_path] = FileDigestCache(project_name=project_name)
+        return _shared_caches[cache_path]
+
+
+def _save_shared_caches() -> None:
+    with _shared_caches_lock:
+        digest_caches = list(_shared_caches.values())
+    for digest_cache in digest_caches:
+        digest_cache.save()
+
+
+def _get_relative_path(project_name: Optional[str]) -> str:
+    if project_name is None:
+        return "file-digests.json"
+    return os.path.join("projects", project_name, "file-digests.json")
+
+
+def _get_stat_key(path: str, algorithm: str) -> str:
+    file_stat = os.stat(path)
+    return "{}:{}:{}:{}:{}".format(
+        algorithm,
+        file_stat.st_dev,
+        file_stat.st_ino,
+        file_stat.st_size,
+        file_stat.st_mtime_ns,
+    )
+
+
+def get_file_digest(path: str, *, algorithm: str) -> str:
+    """Get the digest of path, reusing the one from an earlier run if unchanged.
+
+    The digest is looked up in the shared cache for everything that is not
+    project specific.
+
+    :param str path: path to the file.
+    :param str algorithm: algorithm to hash with, as understood by hashlib.
+    :returns: the hex digest.
+    :raises OSError: if the file cannot be read.
+    """
+    return get_file_digest_cache().get(path, algorithm=algorithm)
+
+
+def set_file_digest(path: str, digest: str, *, algorithm: str) -> None:
+    """Record the digest of path, calculated while writing it.
+
+    get_file_digest then returns it without reading path, until path is
+    modified.
+
+    :param str path: path to the file.
+    :param str digest: the hex digest of the file.
+    :param str algorithm: algorithm digest was calculated with.
+    :raises OSError: if the file cannot be stat'ed.
+    """
+    get_file_digest_cache().set(path, digest, algorithm=algorithm)
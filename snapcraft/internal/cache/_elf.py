@@ -0,0 +1,92 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+from typing import Any, Dict, Optional
+
+from ._digest import get_file_digest_cache
+from ._persistent import PersistentCache
+
+
+class ElfAttributeCache(PersistentCache):
+    """Cache for the attributes extracted from ELF files.
+
+    Attributes are looked up by the sha256 of the contents of a file, which
+    the shared FileDigestCache of the project only calculates again once the file is
+    replaced or modified. Copies of a file already seen still hit.
+    """
+
+    cache_version = 2
+
+    def __init__(self, *, project_name: str) -> None:
+        super().__init__(
+            relative_path=os.path.join("projects", project_name, "elf-attributes.json")
+        )
+        self._digest_cache = get_file_digest_cache(project_name=project_name)
+
+    def get(self, path: str) -> Optional[Dict[str, Any]]:
+        """Get the attributes cached for the ELF file at path.
+
+        :param str path: path to the ELF file.
+        :returns: the attributes or None.
+        """
+        try:
+            digest = self._digest_cache.get(path)
+        except OSError:
+            return None
+
+        return self._get_entry(digest)
+
+    def lookup(self, path: str) -> Optional[Dict[str, Any]]:
+        """Get the attributes cached for the ELF file at path, without reading it.
+
+        Only files whose digest is known already are found.
+
+        :param str path: path to the ELF file.
+        :returns: the attributes or None.
+        """
+        try:
+            digest = self._digest_cache.lookup(path)
+        except OSError:
+            return None
+
+        if digest is None:
+            return None
+        return self._get_entry(digest)
+
+    def add(
+        self, path: str, attributes: Dict[str, Any], *, digest: Optional[str] = None
+    ) -> None:
+        """Cache attributes for the ELF file at path.
+
+        :param str path: path to the ELF file.
+        :param dict attributes: JSON serializable attributes to cache.
+        :param str digest: sha256 of the file, if calculated already.
+        """
+        try:
+            if digest is None:
+                digest = self._digest_cache.get(path)
+            else:
+                self._digest_cache.set(path, digest)
+        except OSError:
+            return
+
+        self._set_entry(digest, attributes)
+
+    def save(self) -> None:
+        """Write the cache, and the digests it used, out."""
+        super().save()
+        self._digest_cache.save()
@@ -13,19 +13,30 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import contextlib
 import logging
 import os
-import shutil
+import stat
+import time
 from typing import Optional
 
-from snapcraft.file_utils import calculate_hash
+from snapcraft.file_utils import calculate_hash, copy_file_contents
 from ._cache import SnapcraftCache
+from ._digest import get_file_digest
 
 logger = logging.getLogger(__name__)
 
+_WRITE_BITS = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
 
 class FileCache(SnapcraftCache):
-    """Generic file cache."""
+    """Generic file cache.
+
+    Files are hard-linked into the cache if possible, or else copied in
+    read-only, and renamed into place so a partially written entry is never
+    seen. Consumers are expected to hard-link or reflink out of the cache and
+    must replace what they get instead of writing through it.
+    """
 
     def __init__(self, *, namespace: str = "files") -> None:
         """Create a FileCache under namespace.
@@ -44,8 +55,8 @@ class FileCache(SnapcraftCache):
         :param str hash: hash for filename calculated with algorithm.
         :returns: path to cached file.
         """
-        # First we verify
-        calculated_hash = calculate_hash(filename, algorithm=algorithm)
+        # First we verify, which is cheap if filename was just verified.
+        calculated_hash = get_file_digest(filename, algorithm=algorithm)
         if calculated_hash != hash:
             logger.warning(
                 "Skipping caching of {!r} as the expected "
@@ -54,16 +65,14 @@ class FileCache(SnapcraftCache):
             )
             return None
         cached_file_path = os.path.join(self.file_cache, algorithm, hash)
-        os.makedirs(os.path.dirname(cached_file_path), exist_ok=True)
         try:
+            os.makedirs(os.path.dirname(cached_file_path), exist_ok=True)
             if not os.path.isfile(cached_file_path):
-                # this must not be hard-linked, as rebuilding a snap
-                # with changes should invalidate the cache, hence avoids
-                # using fileutils.link_or_copy.
-                shutil.copyfile(filename, cached_file_path)
+                _publish(filename, cached_file_path)
         except OSError:
             logger.warning("Unable to cache file {}.".format(cached_file_path))
             return None
+        _mark_used(cached_file_path)
         return cached_file_path
 
     def get(self, *, algorithm: str, hash: str):
@@ -75,8 +84,49 @@ class FileCache(SnapcraftCache):
         :returns: path to cached file.
         """
         cached_file_path = os.path.join(self.file_cache, algorithm, hash)
-        if os.path.exists(cached_file_path):
-            logger.debug("Cache hit for hash {!r}".format(hash))
-            return cached_file_path
-        else:
+        if not os.path.exists(cached_file_path):
+            return None
+
+        # Entries can be written through the files they are linked to, so
+        # make sure they are unchanged. A digest looked up by the stat of the
+        # entry would not prove that.
+        try:
+            calculated_hash = calculate_hash(cached_file_path, algorithm=algorithm)
+        except OSError:
+            return None
+        if calculated_hash != hash:
+            logger.warning(
+                "Removing modified cache entry {!r}.".format(cached_file_path)
+            )
+            with contextlib.suppress(OSError):
+                os.unlink(cached_file_path)
             return None
+
+        logger.debug("Cache hit for hash {!r}".format(hash))
+        _mark_used(cached_file_path)
+        return cached_file_path
+
+
+def _publish(filename: str, cached_file_path: str) -> None:
+    partial_path = "{}.{}.partial".format(cached_file_path, os.getpid())
+    try:
+        try:
+            # The link shares its mode with filename, which is left alone.
+            os.link(filename, partial_path)
+        except OSError:
+            # Likely on another filesystem, a reflink is the next best thing.
+            copy_file_contents(filename, partial_path)
+            mode = stat.S_IMODE(os.stat(partial_path).st_mode)
+            os.chmod(partial_path, mode & ~_WRITE_BITS)
+        os.rename(partial_path, cached_file_path)
+    finally:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(partial_path)
+
+
+def _mark_used(cached_file_path: str) -> None:
+    # The access time tracks use for pruning, the modification time is kept
+    # as it was.
+    with contextlib.suppress(OSError):
+        file_stat = os.stat(cached_file_path)
+        os.utime(cached_file_path, ns=(int(time.time() * 1e9), file_stat.st_mtime_ns))
@@ -0,0 +1,63 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import contextlib
+import hashlib
+import os
+import sys
+from typing import Iterator
+
+from ._cache import SnapcraftCache
+
+if sys.platform != "win32":
+    import fcntl
+
+
+class GitMirrorCache(SnapcraftCache):
+    """Cache of bare git mirrors, keyed by the url of the repository mirrored.
+
+    Mirrors are shared by every part and project cloning the same url. They
+    are to be updated and cloned from while locked, as parts may be pulled
+    concurrently.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.mirror_cache = os.path.join(self.cache_root, "git-mirrors")
+
+    def get_mirror_path(self, url: str) -> str:
+        """Get the path to the mirror for url, which may not exist yet.
+
+        :param str url: url of the repository mirrored.
+        :returns: path to the mirror.
+        """
+        return os.path.join(self._get_entry_path(url), "mirror.git")
+
+    @contextlib.contextmanager
+    def lock(self, url: str) -> Iterator[str]:
+        """Lock the mirror for url, across processes.
+
+        :param str url: url of the repository mirrored.
+        :returns: path to the mirror.
+        """
+        entry_path = self._get_entry_path(url)
+        os.makedirs(entry_path, exist_ok=True)
+        with open(os.path.join(entry_path, "lock"), "w") as lock_file:
+            if sys.platform != "win32":
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield self.get_mirror_path(url)
+
+    def _get_entry_path(self, url: str) -> str:
+        return os.path.join(self.mirror_cache, hashlib.sha256(url.encode()).hexdigest())
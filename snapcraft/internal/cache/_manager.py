@@ -0,0 +1,181 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import contextlib
+import logging
+import os
+import stat
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ._cache import SnapcraftCache
+from ._unpacked import _remove_entry
+
+logger = logging.getLogger(__name__)
+
+# Namespace to the glob-like levels below it that make up an entry.
+_NAMESPACE_ENTRY_LEVELS = collections.OrderedDict(
+    [
+        ("files", [("*", "*")]),
+        # Interrupted source prefetches, continued from next time.
+        ("prefetch", [("*", "*")]),
+        ("stage-packages", [("apt", "*"), ("unpacked", "*", "*")]),
+        ("projects", [("*",)]),
+        ("git-mirrors", [("*",)]),
+    ]
+)
+
+
+class CacheEntry:
+    """A single entry in one of the snapcraft caches."""
+
+    def __init__(
+        self, *, namespace: str, path: str, size: int, last_used: float
+    ) -> None:
+        self.namespace = namespace
+        self.path = path
+        self.size = size
+        self.last_used = last_used
+
+    def __repr__(self) -> str:
+        return "CacheEntry(namespace={!r}, path={!r}, size={!r})".format(
+            self.namespace, self.path, self.size
+        )
+
+
+class CacheManager(SnapcraftCache):
+    """Report and prune usage across the snapcraft caches.
+
+    An entry is a downloaded file, the apt cache for a set of sources, an
+    unpacked stage-package, everything cached for a project or a git mirror.
+    Entries are last used when they, or anything in them, were last read or
+    written.
+    """
+
+    def get_entries(self) -> List[CacheEntry]:
+        """Get every entry in the caches, least recently used first."""
+        entries = [
+            _get_entry(namespace, path)
+            for namespace in _NAMESPACE_ENTRY_LEVELS
+            for path in self._iter_entry_paths(namespace)
+        ]
+        return sorted(
+            (e for e in entries if e is not None), key=lambda e: e.last_used
+        )
+
+    def get_usage(self) -> Dict[str, Tuple[int, int]]:
+        """Get the number of entries and their size in bytes per namespace."""
+        usage = collections.OrderedDict(
+            (namespace, (0, 0)) for namespace in _NAMESPACE_ENTRY_LEVELS
+        )
+        for entry in self.get_entries():
+            count, size = usage[entry.namespace]
+            usage[entry.namespace] = (count + 1, size + entry.size)
+        return usage
+
+    def prune(
+        self, *, max_size: Optional[int] = None, max_age: Optional[float] = None
+    ) -> List[CacheEntry]:
+        """Prune entries unused for max_age and then until under max_size.
+
+        Least recently used entries are pruned first, whatever namespace they
+        are in.
+
+        :param int max_size: size in bytes the caches are pruned down to.
+        :param float max_age: seconds after which unused entries are pruned.
+        :returns: pruned entries list.
+        """
+        entries = self.get_entries()
+        total_size = sum(e.size for e in entries)
+        oldest = None if max_age is None else time.time() - max_age
+
+        pruned_entries_list = []
+        for entry in entries:
+            too_old = oldest is not None and entry.last_used < oldest
+            too_big = max_size is not None and total_size > max_size
+            if not (too_old or too_big):
+                # Entries are sorted, the rest are newer.
+                break
+            try:
+                if os.path.isdir(entry.path) and not os.path.islink(entry.path):
+                    _remove_entry(entry.path)
+                else:
+                    os.unlink(entry.path)
+            except OSError:
+                logger.warning("Unable to prune {}.".format(entry.path))
+                continue
+            total_size -= entry.size
+            pruned_entries_list.append(entry)
+
+        return pruned_entries_list
+
+    def _iter_entry_paths(self, namespace: str) -> Iterator[str]:
+        namespace_path = os.path.join(self.cache_root, namespace)
+        for levels in _NAMESPACE_ENTRY_LEVELS[namespace]:
+            paths = [namespace_path]
+            for level in levels:
+                paths = [
+                    os.path.join(path, name)
+                    for path in paths
+                    for name in _list_level(path, level)
+                ]
+            yield from paths
+
+
+def _list_level(path: str, level: str) -> List[str]:
+    if level != "*":
+        return [level] if os.path.isdir(os.path.join(path, level)) else []
+    try:
+        return sorted(os.listdir(path))
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def _get_entry(namespace: str, path: str) -> Optional[CacheEntry]:
+    try:
+        entry_stat = os.lstat(path)
+    except FileNotFoundError:
+        # Pruned by someone else.
+        return None
+
+    if not stat.S_ISDIR(entry_stat.st_mode):
+        return CacheEntry(
+            namespace=namespace,
+            path=path,
+            size=entry_stat.st_size,
+            last_used=max(entry_stat.st_atime, entry_stat.st_mtime),
+        )
+
+    # Listing directories updates their access time, so only the files in
+    # them count.
+    size = 0
+    last_used: Optional[float] = None
+    for root, directories, files in os.walk(path):
+        for name in files:
+            with contextlib.suppress(FileNotFoundError):
+                file_stat = os.lstat(os.path.join(root, name))
+                size += file_stat.st_size
+                last_used = max(
+                    last_used or 0, file_stat.st_atime, file_stat.st_mtime
+                )
+
+    return CacheEntry(
+        namespace=namespace,
+        path=path,
+        size=size,
+        last_used=entry_stat.st_mtime if last_used is None else last_used,
+    )
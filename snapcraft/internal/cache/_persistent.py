@@ -0,0 +1,138 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ._cache import SnapcraftCache
+
+logger = logging.getLogger(__name__)
+
+# Entries not used for this long, in seconds, are dropped when saving.
+_MAX_UNUSED_AGE = 30 * 24 * 60 * 60
+# When an entry was last used is only brought up to date once it is this
+# old, in seconds, so that runs only reading the cache do not write it out.
+_LAST_USED_RESOLUTION = 24 * 60 * 60
+
+
+class PersistentCache(SnapcraftCache):
+    """Base class for caches of small values kept in a JSON file.
+
+    Every entry records when it was last used, to within a day, and the ones
+    unused for a while are dropped when saving. Entries saved by others in the
+    meantime are merged in, and an instance can be shared between threads.
+    Nothing is written out until save is called.
+
+    Subclasses set cache_version, which is bumped whenever the format of the
+    keys or values changes.
+    """
+
+    cache_version = 1
+
+    def __init__(self, *, relative_path: str) -> None:
+        """Load the cache from relative_path in the cache root.
+
+        :param str relative_path: path to the JSON file, relative to cache_root.
+        """
+        super().__init__()
+        self.cache_path = os.path.join(self.cache_root, relative_path)
+        self._changed = False
+        self._lock = threading.Lock()
+        # Key to (value, last used).
+        self._entries: Dict[str, Tuple[Any, float]] = self._load()
+
+    def _get_entry(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            now = time.time()
+            if now - entry[1] >= _LAST_USED_RESOLUTION:
+                self._entries[key] = (entry[0], now)
+                self._changed = True
+            return entry[0]
+
+    def _set_entry(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._changed = True
+
+    def save(self) -> None:
+        """Write the cache out, dropping entries unused for a while."""
+        with self._lock:
+            if not self._changed:
+                return
+
+            entries = self._load()
+            for key, entry in self._entries.items():
+                if key not in entries or entries[key][1] < entry[1]:
+                    entries[key] = entry
+            oldest = time.time() - _MAX_UNUSED_AGE
+            entries = {
+                key: entry for key, entry in entries.items() if entry[1] >= oldest
+            }
+
+            # Failing to save only costs recalculating the entries next time.
+            partial_path = None
+            try:
+                cache_dir = os.path.dirname(self.cache_path)
+                os.makedirs(cache_dir, exist_ok=True)
+                # Other processes may save the same cache at the same time.
+                fd, partial_path = tempfile.mkstemp(
+                    prefix=".{}.".format(os.path.basename(self.cache_path)),
+                    dir=cache_dir,
+                )
+                with open(fd, "w") as cache_file:
+                    json.dump(
+                        dict(version=self.cache_version, entries=entries), cache_file
+                    )
+                os.replace(partial_path, self.cache_path)
+                partial_path = None
+            except OSError as error:
+                logger.warning("Unable to save {!r}: {}".format(self.cache_path, error))
+                return
+            finally:
+                if partial_path is not None:
+                    with contextlib.suppress(OSError):
+                        os.unlink(partial_path)
+
+            self._entries = entries
+            self._changed = False
+
+    def _load(self) -> Dict[str, Tuple[Any, float]]:
+        try:
+            with open(self.cache_path) as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError):
+            return dict()
+
+        if not isinstance(data, dict) or data.get("version") != self.cache_version:
+            return dict()
+
+        try:
+            return {
+                key: (value, float(last_used))
+                for key, (value, last_used) in data["entries"].items()
+            }
+        except (AttributeError, KeyError, TypeError, ValueError):
+            logger.debug("Ignoring malformed cache {!r}.".format(self.cache_path))
+            return dict()
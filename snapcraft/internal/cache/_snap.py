@@ -22,6 +22,7 @@ import tempfile
 from pathlib import Path
 
 from ._cache import SnapcraftProjectCache
+from ._digest import get_file_digest
 from snapcraft import file_utils, yaml_utils
 
 logger = logging.getLogger(__name__)
@@ -65,7 +66,7 @@ class SnapCache(SnapcraftProjectCache):
             return "all"
 
     def _get_snap_cache_path(self, snap_filename):
-        snap_hash = file_utils.calculate_sha3_384(snap_filename)
+        snap_hash = get_file_digest(snap_filename, algorithm="sha3_384")
         arch = self._get_snap_deb_arch(snap_filename)
         os.makedirs(os.path.join(self.snap_cache_root, arch), exist_ok=True)
         return os.path.join(self.snap_cache_root, arch, snap_hash)
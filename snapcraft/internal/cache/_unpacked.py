@@ -0,0 +1,271 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import contextlib
+import json
+import logging
+import os
+import shutil
+import stat
+import tempfile
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from ._cache import SnapcraftStagePackageCache
+
+logger = logging.getLogger(__name__)
+
+# Default upper bound, in bytes, for the unpacked trees kept around.
+_DEFAULT_MAX_SIZE = 4 * 1024 ** 3
+_MANIFEST_NAME = "manifest.json"
+# Bumped whenever what the manifest records changes.
+_MANIFEST_VERSION = 2
+_TREE_NAME = "root"
+_WRITE_BITS = stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+
+
+class UnpackedStagePackageCache(SnapcraftStagePackageCache):
+    """Cache for unpacked and normalized stage-packages.
+
+    Each entry is the tree a single package unpacks to, keyed by
+    `<package-name>=<version>` and architecture, and checked against the
+    digest of the package it came from. Files in the trees are made
+    read-only and, as root can still write through the links to them,
+    checked against their recorded inode, size and mtime on reuse. Consumers
+    hard-link from these trees, giving the files they have to copy instead
+    the mode they were unpacked with, see get_file_modes.
+
+    Entries are evicted least recently used first, once their combined size
+    goes over max_size.
+    """
+
+    def __init__(self, *, max_size: int = _DEFAULT_MAX_SIZE) -> None:
+        """Create a new UnpackedStagePackageCache.
+
+        :param int max_size: size in bytes over which entries get pruned.
+        """
+        super().__init__()
+        self.unpacked_cache_root = os.path.join(
+            self.stage_package_cache_root, "unpacked"
+        )
+        self._max_size = max_size
+        # Entries handed out by this instance, which must survive a prune.
+        self._used: Set[str] = set()
+
+    def _get_entry_path(self, *, package: str, arch: str) -> str:
+        return os.path.join(self.unpacked_cache_root, arch, package)
+
+    def get(self, *, package: str, arch: str, digest: str) -> Optional[str]:
+        """Get the unpacked tree for package built for arch.
+
+        :param str package: the `<package-name>=<version>` to look up.
+        :param str arch: the architecture of the package.
+        :param str digest: sha256 of the package the tree is expected to
+                           come from.
+        :returns: path to the cached tree or None.
+        """
+        entry_path = self._get_entry_path(package=package, arch=arch)
+        manifest_path = os.path.join(entry_path, _MANIFEST_NAME)
+        try:
+            with open(manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            return None
+
+        if (
+            manifest.get("version") != _MANIFEST_VERSION
+            or manifest.get("sha256") != digest
+        ):
+            logger.debug("Cache entry for {!r} is stale".format(package))
+            return None
+
+        tree_path = os.path.join(entry_path, _TREE_NAME)
+        if not _is_tree_unchanged(tree_path, manifest["files"]):
+            logger.warning("Removing modified cache entry {!r}.".format(entry_path))
+            with contextlib.suppress(OSError):
+                _remove_entry(entry_path)
+            return None
+
+        # Track use through the manifest's mtime, used to prune.
+        with contextlib.suppress(OSError):
+            os.utime(manifest_path)
+        self._used.add(entry_path)
+
+        logger.debug("Cache hit for unpacked package {!r}".format(package))
+        return tree_path
+
+    def get_file_modes(self, tree_path: str) -> Dict[str, int]:
+        """Get the modes the files in tree_path were unpacked with.
+
+        :param str tree_path: path to a tree returned by get or add.
+        :returns: the mode of each file by its path relative to tree_path.
+        """
+        with open(
+            os.path.join(os.path.dirname(tree_path), _MANIFEST_NAME)
+        ) as manifest_file:
+            files = json.load(manifest_file)["files"]
+        return {path: mode for path, (mode, stat_key) in files.items()}
+
+    def add(
+        self, *, package: str, arch: str, digest: str, unpack: Callable[[str], None]
+    ) -> str:
+        """Unpack package into the cache, replacing any stale entry.
+
+        :param str package: the `<package-name>=<version>` being added.
+        :param str arch: the architecture of the package.
+        :param str digest: sha256 of the package being unpacked.
+        :param unpack: called with the directory to unpack package into.
+        :returns: path to the cached tree.
+        """
+        entry_path = self._get_entry_path(package=package, arch=arch)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+        # Unpack next to the entry and move it into place once complete, so
+        # that nothing ever sees a partially unpacked tree.
+        temp_path = tempfile.mkdtemp(
+            prefix=".{}.".format(package), dir=os.path.dirname(entry_path)
+        )
+        try:
+            tree_path = os.path.join(temp_path, _TREE_NAME)
+            os.mkdir(tree_path)
+            unpack(tree_path)
+
+            manifest = dict(
+                version=_MANIFEST_VERSION,
+                package=package,
+                arch=arch,
+                sha256=digest,
+                size=_get_tree_size(tree_path),
+                files=_seal_tree(tree_path),
+            )
+            with open(os.path.join(temp_path, _MANIFEST_NAME), "w") as manifest_file:
+                json.dump(manifest, manifest_file)
+
+            if os.path.exists(entry_path):
+                _remove_entry(entry_path)
+            try:
+                os.rename(temp_path, entry_path)
+            except OSError:
+                # Added concurrently by someone else, use theirs.
+                if self.get(package=package, arch=arch, digest=digest) is None:
+                    raise
+        finally:
+            if os.path.exists(temp_path):
+                _remove_entry(temp_path)
+
+        self._used.add(entry_path)
+        return os.path.join(entry_path, _TREE_NAME)
+
+    def prune(self) -> List[str]:
+        """Prune least recently used entries until under max_size.
+
+        Entries handed out by this instance are never pruned.
+
+        :returns: pruned entry paths list.
+        """
+        entries: List[Tuple[float, int, str]] = []
+        total_size = 0
+        with contextlib.suppress(FileNotFoundError):
+            for arch in os.listdir(self.unpacked_cache_root):
+                arch_path = os.path.join(self.unpacked_cache_root, arch)
+                for package in os.listdir(arch_path):
+                    entry_path = os.path.join(arch_path, package)
+                    manifest_path = os.path.join(entry_path, _MANIFEST_NAME)
+                    try:
+                        with open(manifest_path) as manifest_file:
+                            size = json.load(manifest_file)["size"]
+                        last_used = os.stat(manifest_path).st_mtime
+                    except (OSError, ValueError, KeyError):
+                        # Incomplete or from another process still unpacking.
+                        continue
+                    total_size += size
+                    entries.append((last_used, size, entry_path))
+
+        pruned_entries_list = []
+        for last_used, size, entry_path in sorted(entries):
+            if total_size <= self._max_size:
+                break
+            if entry_path in self._used:
+                continue
+            try:
+                _remove_entry(entry_path)
+            except OSError:
+                logger.warning("Unable to prune {}.".format(entry_path))
+                continue
+            total_size -= size
+            pruned_entries_list.append(entry_path)
+
+        return pruned_entries_list
+
+
+def _get_tree_size(tree_path: str) -> int:
+    size = 0
+    for root, directories, files in os.walk(tree_path):
+        for file_name in files:
+            size += os.lstat(os.path.join(root, file_name)).st_size
+    return size
+
+
+def _seal_tree(tree_path: str) -> Dict[str, Tuple[int, str]]:
+    """Make the files in tree_path read-only.
+
+    :returns: the mode of each file as unpacked and its stat key once sealed,
+              by its path relative to tree_path.
+    """
+    files: Dict[str, Tuple[int, str]] = dict()
+    # Hard links in the tree share their mode, keep the one first seen.
+    modes: Dict[int, int] = dict()
+    for root, directories, file_names in os.walk(tree_path):
+        for file_name in file_names:
+            path = os.path.join(root, file_name)
+            file_stat = os.lstat(path)
+            if not stat.S_ISREG(file_stat.st_mode):
+                continue
+            mode = modes.setdefault(file_stat.st_ino, stat.S_IMODE(file_stat.st_mode))
+            os.chmod(path, mode & ~_WRITE_BITS)
+            files[os.path.relpath(path, tree_path)] = (mode, _get_stat_key(path))
+    return files
+
+
+def _is_tree_unchanged(tree_path: str, files: Dict[str, List]) -> bool:
+    # Writing through a link to a file, even as root, updates its mtime and
+    # making it writable first shows in its mode, so the files are not read.
+    for relative_path, (mode, stat_key) in files.items():
+        try:
+            if _get_stat_key(os.path.join(tree_path, relative_path)) != stat_key:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def _get_stat_key(path: str) -> str:
+    file_stat = os.lstat(path)
+    return "{}:{:o}:{}:{}".format(
+        file_stat.st_ino,
+        stat.S_IMODE(file_stat.st_mode),
+        file_stat.st_size,
+        file_stat.st_mtime_ns,
+    )
+
+
+def _remove_entry(entry_path: str) -> None:
+    def _make_writable_and_retry(function, path, excinfo):
+        # Packages can ship read-only directories.
+        parent_path = os.path.dirname(path)
+        os.chmod(parent_path, os.stat(parent_path).st_mode | stat.S_IWUSR)
+        function(path)
+
+    shutil.rmtree(entry_path, onerror=_make_writable_and_retry)
@@ -0,0 +1,301 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Resumable downloads over HTTP.
+
+Downloads are written to a .partial file next to the destination, which
+is only renamed once complete. When the server advertises support for
+byte ranges a failed download continues from where it stopped, and large
+downloads can be fetched over several connections at once.
+"""
+
+import contextlib
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+from typing import Any, Dict, Generator, Optional
+
+import requests
+
+from snapcraft.internal.indicators import CombinedDownloadProgress
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 1024 * 1024
+# Each connection of a parallel download fetches at least this much.
+_MIN_RANGE_SIZE = 8 * 1024 * 1024
+_RETRIES = 5
+
+# Errors after which the download is attempted again.
+_TRANSIENT_ERRORS = (
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+
+def download(
+    url: str,
+    destination: str,
+    *,
+    session: Any = requests,
+    algorithm: Optional[str] = None,
+    resume: bool = False,
+    connections: int = 1,
+    message: Optional[str] = None,
+    progress: Optional[CombinedDownloadProgress] = None
+) -> Optional[str]:
+    """Download url to destination.
+
+    A leftover .partial file from an earlier call is only continued from if
+    resume is set, as nothing tells if url changed since. Callers verifying
+    the digest of the download can set it.
+
+    :param str url: the url to download.
+    :param str destination: path to download to.
+    :param session: what to send requests through, anything with a requests
+                    like get method taking headers and stream.
+    :param str algorithm: algorithm to calculate the digest of the download
+                          with, as understood by hashlib.
+    :param bool resume: continue from a leftover .partial file.
+    :param int connections: connections to fetch large downloads over.
+    :param str message: message for the progress bar.
+    :param CombinedDownloadProgress progress: progress shared with other
+                                              downloads to update, instead
+                                              of showing one of its own.
+    :returns: the hex digest of the download if algorithm is set.
+    :raises requests.exceptions.RequestException: if the download failed.
+    """
+    partial_path = "{}.partial".format(destination)
+    if not resume:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(partial_path)
+
+    download = _Download(
+        url, partial_path, session=session, message=message, progress=progress
+    )
+    for retries_left in reversed(range(_RETRIES)):
+        try:
+            digest = download.run(algorithm=algorithm, connections=connections)
+            break
+        except _TRANSIENT_ERRORS as e:
+            if not retries_left:
+                raise
+            logger.debug(
+                "Error while downloading {!r}: {!r}. "
+                "Retries left to download: {!r}.".format(url, e, retries_left)
+            )
+            # Whatever made it to disk is continued from, if possible.
+            connections = 1
+            sleep(1)
+
+    os.replace(partial_path, destination)
+    return digest
+
+
+class _Download:
+    def __init__(
+        self,
+        url: str,
+        partial_path: str,
+        *,
+        session: Any,
+        message: Optional[str],
+        progress: Optional[CombinedDownloadProgress]
+    ) -> None:
+        self._url = url
+        self._partial_path = partial_path
+        self._session = session
+        self._message = message
+        self._progress = progress
+        # Sent as If-Range, so a changed url is downloaded from the start.
+        self._validator: Optional[str] = None
+
+    def run(self, *, algorithm: Optional[str], connections: int) -> Optional[str]:
+        try:
+            offset = os.path.getsize(self._partial_path)
+        except FileNotFoundError:
+            offset = 0
+
+        headers = self._get_range_headers(offset, None)
+        response = self._session.get(self._url, headers=headers, stream=True)
+        with contextlib.closing(response):
+            if (
+                offset
+                and response.status_code
+                == requests.codes.requested_range_not_satisfiable
+            ):
+                # Nothing is left to download past what is there, start over
+                # as the download may have changed.
+                os.unlink(self._partial_path)
+                return self.run(algorithm=algorithm, connections=connections)
+            response.raise_for_status()
+            self._validator = response.headers.get(
+                "ETag", response.headers.get("Last-Modified")
+            )
+            if response.status_code != requests.codes.partial_content:
+                offset = 0
+
+            length = _get_content_length(response)
+            if (
+                offset == 0
+                and connections > 1
+                and _accepts_ranges(response)
+                and length >= connections * _MIN_RANGE_SIZE
+            ):
+                response.close()
+                return self._run_in_parallel(length, algorithm, connections)
+
+            return self._run_sequentially(response, offset, length, algorithm)
+
+    def _run_sequentially(
+        self,
+        response: requests.Response,
+        offset: int,
+        length: int,
+        algorithm: Optional[str],
+    ) -> Optional[str]:
+        hasher = _get_hasher(algorithm)
+        mode = "r+b" if offset else "wb"
+        with open(self._partial_path, mode) as partial_file:
+            # What was downloaded before still needs to be hashed.
+            if hasher is not None and offset:
+                _update_hasher(hasher, partial_file, offset)
+            partial_file.seek(offset)
+            partial_file.truncate()
+
+            total_length = offset + length if length else 0
+            with self._get_progress(total_length) as progress:
+                progress.update(offset)
+                for buf in response.iter_content(_CHUNK_SIZE):
+                    partial_file.write(buf)
+                    if hasher is not None:
+                        hasher.update(buf)
+                    progress.update(len(buf))
+
+        return hasher.hexdigest() if hasher is not None else None
+
+    def _run_in_parallel(
+        self, length: int, algorithm: Optional[str], connections: int
+    ) -> Optional[str]:
+        range_size = -(-length // connections)
+        ranges = [
+            (start, min(start + range_size, length) - 1)
+            for start in range(0, length, range_size)
+        ]
+        with open(self._partial_path, "wb") as partial_file:
+            partial_file.truncate(length)
+
+        fd = os.open(self._partial_path, os.O_WRONLY)
+        try:
+            with self._get_progress(length) as progress, ThreadPoolExecutor(
+                max_workers=connections
+            ) as executor:
+                futures = [
+                    executor.submit(self._fetch_range, fd, start, end, progress)
+                    for start, end in ranges
+                ]
+                for future in futures:
+                    future.result()
+        except BaseException:
+            # Only a contiguous prefix can be continued from.
+            os.unlink(self._partial_path)
+            raise
+        finally:
+            os.close(fd)
+
+        hasher = _get_hasher(algorithm)
+        if hasher is None:
+            return None
+        with open(self._partial_path, "rb") as partial_file:
+            _update_hasher(hasher, partial_file, length)
+        return hasher.hexdigest()
+
+    def _fetch_range(
+        self, fd: int, start: int, end: int, progress: CombinedDownloadProgress
+    ) -> None:
+        headers = self._get_range_headers(start, end)
+        response = self._session.get(self._url, headers=headers, stream=True)
+        with contextlib.closing(response):
+            response.raise_for_status()
+            if response.status_code != requests.codes.partial_content:
+                raise requests.exceptions.ConnectionError(
+                    "Range {}-{} of {!r} was not served".format(start, end, self._url)
+                )
+            position = start
+            for buf in response.iter_content(_CHUNK_SIZE):
+                os.pwrite(fd, buf, position)
+                position += len(buf)
+                progress.update(len(buf))
+            if position != end + 1:
+                raise requests.exceptions.ChunkedEncodingError(
+                    "Range {}-{} of {!r} ended early".format(start, end, self._url)
+                )
+
+    def _get_range_headers(self, start: int, end: Optional[int]) -> Dict[str, str]:
+        if start == 0 and end is None:
+            return dict()
+        headers = {"Range": "bytes={}-{}".format(start, "" if end is None else end)}
+        if self._validator is not None:
+            headers["If-Range"] = self._validator
+        return headers
+
+    @contextlib.contextmanager
+    def _get_progress(
+        self, total_length: int
+    ) -> Generator[CombinedDownloadProgress, None, None]:
+        # A shared progress is started and finished by its owner.
+        if self._progress is not None:
+            yield self._progress
+            return
+        with CombinedDownloadProgress(total_length, self._get_message()) as progress:
+            yield progress
+
+    def _get_message(self) -> str:
+        if self._message:
+            return self._message
+        destination = self._partial_path[: -len(".partial")]
+        return "Downloading {!r}".format(os.path.basename(destination))
+
+
+def _accepts_ranges(response: requests.Response) -> bool:
+    return response.headers.get("Accept-Ranges", "").lower() == "bytes"
+
+
+def _get_content_length(response: requests.Response) -> int:
+    # Encoded bodies are longer once decoded than advertised.
+    if response.headers.get("Content-Encoding"):
+        return 0
+    return int(response.headers.get("Content-Length", "0"))
+
+
+def _get_hasher(algorithm: Optional[str]):
+    if algorithm is None:
+        return None
+    # This will raise an AttributeError if algorithm is unsupported.
+    return getattr(hashlib, algorithm)()
+
+
+def _update_hasher(hasher, f, length: int) -> None:
+    f.seek(0)
+    while length > 0:
+        buf = f.read(min(_CHUNK_SIZE, length))
+        if not buf:
+            break
+        hasher.update(buf)
+        length -= len(buf)
@@ -13,15 +13,34 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import collections
+import concurrent.futures
 import contextlib
+import functools
 import glob
+import hashlib
+import json
 import logging
 import os
 import re
 import shutil
+import struct
 import subprocess
 import tempfile
-from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple, Union
+from typing import (
+    Any,
+    BinaryIO,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import elftools.common.exceptions
 import elftools.elf.elffile
@@ -29,78 +48,11 @@ from elftools.construct import ConstructError
 from pkg_resources import parse_version
 
 from snapcraft import file_utils
-from snapcraft.internal import common, errors, repo
+from snapcraft.internal import cache, common, errors, repo
 
 logger = logging.getLogger(__name__)
 
 
-def _ldd_resolve(soname: str, soname_path: str) -> Tuple[str, str]:
-    logger.debug(f"_ldd_resolve: {soname!r} {soname_path!r}")
-
-    # If found, resolve the path components.  We can safely determine that
-    # ldd found the match if it returns an absolute path.  For additional
-    # safety, check that it exists.  See example ldd output in ldd() below.
-    # If not found, ldd should use a string like "not found", but we do not
-    # really care what that string is with this approach as it has to start
-    # with "/" and point to a valid file.
-    if soname_path.startswith("/") and os.path.exists(soname_path):
-        abs_path = os.path.abspath(soname_path)
-        return soname, abs_path
-
-    # Not found, use the soname.
-    return soname, soname
-
-
-def ldd(path: str, ld_library_paths: List[str]) -> Dict[str, str]:
-    """Return a set of resolved library mappings using specified library paths.
-
-    Returns a dictionary of mappings of soname -> soname_path.
-    If library is not resolved, the soname itself is the soname_path.
-    """
-
-    libraries: Dict[str, str] = dict()
-
-    env = os.environ.copy()
-    env["LD_LIBRARY_PATH"] = ":".join(ld_library_paths)
-    logger.debug(f"invoking ldd with ld library paths: {ld_library_paths!r}")
-
-    try:
-        # ldd output sample:
-        # linux-vdso.so.1 =>  (0x00007ffdc13ec000)   <== ubuntu 16.04 ldd
-        # linux-vdso.so.1 (0x00007ffdc13ec000)       <== newer ldd
-        # /lib64/ld-linux-x86-64.so.2 (0x00007fb3c5298000)
-        # libm.so.6 => /lib/x86_64-linux-gnu/libm.so.6 (0x00007fb3bef03000)
-        # libmissing.so.2 => not found
-        ldd_lines = (
-            subprocess.check_output(["ldd", path], env=env).decode().splitlines()
-        )
-        logger.debug(f"ldd output:\n{ldd_lines}")
-    except subprocess.CalledProcessError:
-        logger.warning("Unable to determine library dependencies for {!r}".format(path))
-        return libraries
-
-    for line in ldd_lines:
-        # First match against libraries that are found.
-        match = re.match(r"\t(.*) => (.*) \(0x", line)
-
-        if not match:
-            # Now find those not found, or not providing the address...
-            match = re.match(r"\t(.*) => (.*)", line)
-
-        # Ignore ld-linux, linux-vdso, etc. that don't match these regex.
-        # As Ubuntu 16.04's ldd provides an empty string for the found
-        # path (in group 2) on linux-vdso, check for this and ignore it.
-        # See example output above for reference.
-        if not match or match.group(2) == "":
-            continue
-
-        soname, soname_path = _ldd_resolve(match.group(1), match.group(2))
-        libraries[soname] = soname_path
-
-    logger.debug(f"ldd results: {libraries!r}")
-    return libraries
-
-
 class NeededLibrary:
     """Represents an ELF library version."""
 
@@ -115,6 +67,28 @@ class NeededLibrary:
 ElfArchitectureTuple = Tuple[str, str, str]
 SonameCacheDict = Dict[Tuple[ElfArchitectureTuple, str], str]
 
+# From the ldconfig manpage, paths can be colon-, space-, tab-, newline-,
+# or comma-separated.
+_LD_CONF_DELIMITERS = re.compile(r"[:\s,]")
+# The dynamic linkers needed by libraries, which have no interpreter to go by,
+# e.g. ld-linux-x86-64.so.2, ld-linux-armhf.so.3, ld64.so.2 or ld.so.1.
+_DYNAMIC_LINKER_PATTERN = re.compile(r"^(ld-linux[-\w]*|ld64|ld)\.so\.\d+$")
+_ORIGIN_PATTERN = re.compile(r"\$(ORIGIN\b|\{ORIGIN\})")
+
+# The parts of the ELF header needed to find the program headers, that is
+# e_phoff, e_phentsize and e_phnum, by EI_CLASS.
+_ELF_HEADER_FORMATS = {1: "16x12xI10xHH", 2: "16x16xQ14xHH"}
+_PT_DYNAMIC = 2
+_PT_GNU_STACK = 0x6474E551
+# Offset of p_flags into a program header, by EI_CLASS.
+_P_FLAGS_OFFSETS = {1: 24, 2: 4}
+# e_phnum is in the section headers past this.
+_PN_XNUM = 0xFFFF
+# Below this, scanning in worker processes costs more than it saves.
+_PARALLEL_SCAN_MIN_FILES = 32
+# Bumped whenever what ElfFile caches about a file changes.
+_ELF_ATTRIBUTES_VERSION = 1
+
 
 # Old pyelftools uses byte strings for section names.  Some data is
 # also returned as bytes, which is handled below.
@@ -128,6 +102,142 @@ else:
     _GNU_VERSION_R = b".gnu.version_r"
 
 
+class SonameIndex:
+    """An index of the file names found under root.
+
+    Looking a soname up in the index replaces walking the whole of root,
+    directories are only listed again when their mtime changes.
+    """
+
+    def __init__(self, root: str, *, cache_path: Optional[str] = None) -> None:
+        """Create an index for root.
+
+        :param str root: the directory to index.
+        :param str cache_path: file to persist the index to between runs.
+        """
+        self.root = root
+        self._cache_path = cache_path
+        # Relative directory to (mtime, file names, subdirectory names).
+        self._directories: Dict[str, Tuple[int, List[str], List[str]]] = dict()
+        self._paths: Dict[str, List[str]] = dict()
+        self._load()
+
+    def get_paths(self, file_name: str) -> List[str]:
+        """Return the paths to file_name, in the order os.walk finds them."""
+        return self._paths.get(file_name, [])
+
+    def refresh(self) -> None:
+        """Bring the index up to date with what is now under root."""
+        directories: Dict[str, Tuple[int, List[str], List[str]]] = dict()
+        paths: Dict[str, List[str]] = dict()
+        changed = False
+
+        pending = [""]
+        while pending:
+            relative_directory = pending.pop()
+            if relative_directory:
+                directory = os.path.join(self.root, relative_directory)
+            else:
+                directory = self.root
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+
+            entry = self._directories.get(relative_directory)
+            if entry is None or entry[0] != mtime:
+                entry = _list_directory(directory, mtime)
+                changed = True
+            directories[relative_directory] = entry
+
+            for file_name in entry[1]:
+                paths.setdefault(file_name, []).append(
+                    os.path.join(directory, file_name)
+                )
+            # Visit subdirectories depth first and in listing order, as
+            # os.walk does.
+            pending.extend(
+                os.path.join(relative_directory, d) for d in reversed(entry[2])
+            )
+
+        changed = changed or directories.keys() != self._directories.keys()
+        self._directories = directories
+        self._paths = paths
+        if changed:
+            self._save()
+
+    def _load(self) -> None:
+        if self._cache_path is None:
+            return
+
+        try:
+            with open(self._cache_path) as cache_file:
+                directories = json.load(cache_file)["directories"]
+        except (OSError, ValueError, KeyError):
+            return
+
+        self._directories = {
+            relative_directory: (entry[0], entry[1], entry[2])
+            for relative_directory, entry in directories.items()
+        }
+
+    def _save(self) -> None:
+        if self._cache_path is None:
+            return
+
+        # Failing to save only costs listing root again on the next run.
+        partial_path = None
+        try:
+            os.makedirs(os.path.dirname(self._cache_path), exist_ok=True)
+            # Parts sharing a root may save their index at the same time.
+            fd, partial_path = tempfile.mkstemp(
+                prefix=".soname-index.", dir=os.path.dirname(self._cache_path)
+            )
+            with open(fd, "w") as cache_file:
+                json.dump(
+                    dict(root=self.root, directories=self._directories), cache_file
+                )
+            os.replace(partial_path, self._cache_path)
+            partial_path = None
+        except OSError as error:
+            logger.debug("Unable to save soname index: {}".format(error))
+        finally:
+            if partial_path is not None:
+                with contextlib.suppress(OSError):
+                    os.unlink(partial_path)
+
+
+def _list_directory(directory: str, mtime: int) -> Tuple[int, List[str], List[str]]:
+    file_names: List[str] = list()
+    subdirectories: List[str] = list()
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                # Like os.walk, symlinks to directories are neither listed
+                # as files nor followed.
+                if not is_dir:
+                    file_names.append(entry.name)
+                elif not entry.is_symlink():
+                    subdirectories.append(entry.name)
+    except OSError:
+        pass
+
+    return mtime, file_names, subdirectories
+
+
+def _get_soname_index_cache_path(root: str) -> str:
+    # Base snaps are read-only, so their index is keyed on the revision
+    # root resolves to.
+    root_hash = hashlib.sha1(os.path.realpath(root).encode()).hexdigest()
+    return os.path.join(
+        cache.SnapcraftCache().cache_root, "soname-index", "{}.json".format(root_hash)
+    )
+
+
 class SonameCache:
     """A cache for sonames."""
 
@@ -157,12 +267,42 @@ class SonameCache:
     def __init__(self):
         """Initialize a cache for sonames"""
         self._soname_paths = dict()  # type: SonameCacheDict
+        self._soname_indexes: Dict[str, SonameIndex] = dict()
+        # Roots whose index has been refreshed since the last reset.
+        self._refreshed_roots: Set[str] = set()
+
+    def get_soname_index(self, root: str, *, persist: bool = False) -> SonameIndex:
+        """Return the index of the files under root, refreshed once per reset.
+
+        :param str root: the search path to index.
+        :param bool persist: keep the index on disk for later runs, meant for
+                             read-only roots such as the base snap.
+        """
+        soname_index = self._soname_indexes.get(root)
+        if soname_index is None:
+            cache_path = _get_soname_index_cache_path(root) if persist else None
+            soname_index = SonameIndex(root, cache_path=cache_path)
+            self._soname_indexes[root] = soname_index
+
+        if root not in self._refreshed_roots:
+            soname_index.refresh()
+            self._refreshed_roots.add(root)
+        return soname_index
 
     def reset_except_root(self, root):
-        """Reset the cache values that aren't contained within root."""
+        """Reset the cache values that root may now take precedence over.
+
+        Values found within root are kept, as are the ones found elsewhere
+        as long as no file by that soname has shown up in root since.
+        """
+        self._refreshed_roots.clear()
+        root_index = self.get_soname_index(root)
+
         new_soname_paths = dict()  # type: SonameCacheDict
         for key, value in self._soname_paths.items():
-            if value is not None and value.startswith(root):
+            if value is None:
+                continue
+            if value.startswith(root) or not root_index.get_paths(key[1]):
                 new_soname_paths[key] = value
 
         self._soname_paths = new_soname_paths
@@ -180,6 +320,7 @@ class Library:
         core_base_path: Optional[str],
         arch: ElfArchitectureTuple,
         soname_cache: SonameCache,
+        attribute_cache: Optional[cache.ElfAttributeCache] = None,
     ) -> None:
 
         self.soname = soname
@@ -188,6 +329,7 @@ class Library:
         self.core_base_path = core_base_path
         self.arch = arch
         self.soname_cache = soname_cache
+        self.attribute_cache = attribute_cache
 
         # Resolve path, if possible.
         self.path = self._crawl_for_path()
@@ -214,7 +356,7 @@ class Library:
             return False
 
         try:
-            elf_file = ElfFile(path=resolved_path)
+            elf_file = ElfFile(path=resolved_path, attribute_cache=self.attribute_cache)
         except errors.CorruptedElfFileError as error:
             # Log if the ELF file seems corrupted.
             logger.warning(error.get_brief())
@@ -241,11 +383,10 @@ class Library:
             return self.soname_path
 
         for path in valid_search_paths:
-            for root, directories, files in os.walk(path):
-                if self.soname not in files:
-                    continue
-
-                file_path = os.path.join(root, self.soname.strip("/"))
+            soname_index = self.soname_cache.get_soname_index(
+                path, persist=path == self.core_base_path
+            )
+            for file_path in soname_index.get_paths(self.soname):
                 if self._is_valid_elf(file_path):
                     self._update_soname_cache(file_path)
                     return file_path
@@ -276,10 +417,21 @@ class ElfFile:
         with open(path, "rb") as bin_file:
             return bin_file.read(4) == b"\x7fELF"
 
-    def __init__(self, *, path: str) -> None:
+    def __init__(
+        self,
+        *,
+        path: str,
+        attribute_cache: Optional[cache.ElfAttributeCache] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> None:
         """Initialize an ElfFile instance.
 
         :param str path: path to an elf_file within a snapcraft project.
+        :param ElfAttributeCache attribute_cache: cache to look the attributes
+                                                  up in, before extracting
+                                                  them from the file.
+        :param dict attributes: attributes looked up already, used instead of
+                                looking them up in attribute_cache.
         """
         self.path = path
         self.dependencies = set()  # type: Set[Library]
@@ -288,6 +440,8 @@ class ElfFile:
         self.interp: str = ""
         self.soname: str = ""
         self.needed: Dict[str, NeededLibrary] = dict()
+        self.rpath: List[str] = list()
+        self.runpath: List[str] = list()
         self.execstack_set: bool = False
         self.is_dynamic: bool = True
         self.build_id: str = ""
@@ -296,6 +450,11 @@ class ElfFile:
         # String of elf enum type, e.g. "ET_DYN", "ET_EXEC", etc.
         self.elf_type: str = "ET_NONE"
 
+        if attributes is None and attribute_cache is not None:
+            attributes = attribute_cache.get(path)
+        if attributes is not None and self._set_attributes(attributes):
+            return
+
         try:
             logger.debug(f"Extracting ELF attributes: {path}")
             self._extract_attributes()
@@ -303,6 +462,53 @@ class ElfFile:
             logger.debug(f"Extracting ELF attributes exception: {str(exception)}")
             raise errors.CorruptedElfFileError(path, exception)
 
+        if attribute_cache is not None:
+            attribute_cache.add(path, self.get_attributes())
+
+    def get_attributes(self) -> Dict[str, Any]:
+        """Return the attributes extracted from the file, serializable as JSON."""
+        return dict(
+            version=_ELF_ATTRIBUTES_VERSION,
+            arch=self.arch,
+            interp=self.interp,
+            soname=self.soname,
+            needed={name: sorted(lib.versions) for name, lib in self.needed.items()},
+            rpath=self.rpath,
+            runpath=self.runpath,
+            execstack_set=self.execstack_set,
+            is_dynamic=self.is_dynamic,
+            build_id=self.build_id,
+            has_debug_info=self.has_debug_info,
+            elf_type=self.elf_type,
+        )
+
+    def _set_attributes(self, attributes: Dict[str, Any]) -> bool:
+        if attributes.get("version") != _ELF_ATTRIBUTES_VERSION:
+            return False
+
+        try:
+            arch = attributes["arch"]
+            self.arch = (arch[0], arch[1], arch[2]) if arch is not None else None
+            self.interp = attributes["interp"]
+            self.soname = attributes["soname"]
+            self.needed = dict()
+            for name, versions in attributes["needed"].items():
+                self.needed[name] = NeededLibrary(name=name)
+                for version in versions:
+                    self.needed[name].add_version(version)
+            self.rpath = list(attributes["rpath"])
+            self.runpath = list(attributes["runpath"])
+            self.execstack_set = attributes["execstack_set"]
+            self.is_dynamic = attributes["is_dynamic"]
+            self.build_id = attributes["build_id"]
+            self.has_debug_info = attributes["has_debug_info"]
+            self.elf_type = attributes["elf_type"]
+        except (KeyError, IndexError, TypeError, AttributeError):
+            logger.debug(f"Ignoring malformed cached ELF attributes: {self.path}")
+            return False
+
+        return True
+
     def _extract_attributes(self) -> None:  # noqa: C901
         with open(self.path, "rb") as fp:
             elf = elftools.elf.elffile.ELFFile(fp)
@@ -333,6 +539,10 @@ class ElfFile:
                         self.needed[needed] = NeededLibrary(name=needed)
                     elif tag.entry.d_tag == "DT_SONAME":
                         self.soname = _ensure_str(tag.soname)
+                    elif tag.entry.d_tag == "DT_RPATH":
+                        self.rpath = _ensure_str(tag.rpath).split(":")
+                    elif tag.entry.d_tag == "DT_RUNPATH":
+                        self.runpath = _ensure_str(tag.runpath).split(":")
 
             for segment in elf.iter_segments():
                 if segment["p_type"] == "PT_GNU_STACK":
@@ -377,6 +587,36 @@ class ElfFile:
 
             self.elf_type = elf.header["e_type"]
 
+    def clear_execstack(self) -> bool:
+        """Clear the executable flag of the stack segment, in place.
+
+        :returns: False if the program headers could not be made sense of.
+        """
+        with open(self.path, "r+b") as elf_file:
+            program_headers = _ProgramHeaders.read(elf_file)
+            if program_headers is None:
+                return False
+
+            p_flags_format = program_headers.byte_order + "I"
+            p_flags_offset = _P_FLAGS_OFFSETS[program_headers.elf_class]
+            if program_headers.entry_size < p_flags_offset + 4:
+                return False
+
+            for offset, p_type in program_headers.iter_types():
+                if p_type != _PT_GNU_STACK:
+                    continue
+                offset += p_flags_offset
+                p_flags = struct.unpack_from(
+                    p_flags_format, program_headers.data, offset
+                )[0]
+                if p_flags & elftools.elf.constants.P_FLAGS.PF_X:
+                    p_flags &= ~elftools.elf.constants.P_FLAGS.PF_X
+                    elf_file.seek(program_headers.offset + offset)
+                    elf_file.write(struct.pack(p_flags_format, p_flags))
+
+        self.execstack_set = False
+        return True
+
     def is_linker_compatible(self, *, linker_version: str) -> bool:
         """Determines if linker will work given the required glibc version."""
         version_required = self.get_required_glibc()
@@ -413,6 +653,7 @@ class ElfFile:
         content_dirs: Set[str],
         arch_triplet: str,
         soname_cache: SonameCache = None,
+        library_resolver: "LibraryResolver" = None,
     ) -> Set[str]:
         """Load the set of libraries that are needed to satisfy elf's runtime.
 
@@ -424,11 +665,21 @@ class ElfFile:
                                    dependencies.
         :param SonameCache soname_cache: a cache of previously search
                                          dependencies.
+        :param LibraryResolver library_resolver: a resolver for the same
+                                                 search paths, shared with
+                                                 other ELF files.
         :returns: a set of string with paths to the library dependencies of
                   elf.
         """
         if soname_cache is None:
             soname_cache = SonameCache()
+        if library_resolver is None:
+            library_resolver = LibraryResolver(
+                root_path=root_path,
+                core_base_path=core_base_path,
+                content_dirs=content_dirs,
+                arch_triplet=arch_triplet,
+            )
 
         logger.debug("Getting dependencies for {!r}".format(self.path))
 
@@ -436,15 +687,11 @@ class ElfFile:
         if core_base_path is not None:
             search_paths.append(core_base_path)
 
-        ld_library_paths: List[str] = list()
-        for path in search_paths:
-            ld_library_paths.extend(common.get_library_paths(path, arch_triplet))
+        if self.arch is None:
+            raise RuntimeError("failed to parse architecture")
 
-        libraries = ldd(self.path, ld_library_paths)
+        libraries = library_resolver.resolve(self)
         for soname, soname_path in libraries.items():
-            if self.arch is None:
-                raise RuntimeError("failed to parse architecture")
-
             self.dependencies.add(
                 Library(
                     soname=soname,
@@ -453,6 +700,7 @@ class ElfFile:
                     core_base_path=core_base_path,
                     arch=self.arch,
                     soname_cache=soname_cache,
+                    attribute_cache=library_resolver.attribute_cache,
                 )
             )
 
@@ -464,6 +712,198 @@ class ElfFile:
         return dependencies
 
 
+class LibraryResolver:
+    """Resolve the libraries ELF files load, without running any of them.
+
+    Libraries are looked up the way the dynamic linker would: through the
+    DT_RPATH of an ELF file and of the ones that loaded it, the library
+    directories of the search paths, its DT_RUNPATH and lastly the
+    directories of the host's ld.so.conf and the default ones.
+
+    Directory listings and parsed libraries are kept for the lifetime of the
+    resolver, share one across the ELF files of a part.
+    """
+
+    def __init__(
+        self,
+        *,
+        root_path: str,
+        core_base_path: Optional[str],
+        content_dirs: Set[str],
+        arch_triplet: str,
+        attribute_cache: Optional[cache.ElfAttributeCache] = None,
+    ) -> None:
+        """Create a LibraryResolver.
+
+        :param str root_path: the root path to search for dependencies.
+        :param str core_base_path: the core base path to search for
+                                   dependencies.
+        :param content_dirs: content directories to search for dependencies.
+        :param str arch_triplet: the architecture triplet of the libraries.
+        :param ElfAttributeCache attribute_cache: cache for the attributes of
+                                                  the libraries found.
+        """
+        self.attribute_cache = attribute_cache
+
+        search_paths = [root_path, *content_dirs]
+        if core_base_path is not None:
+            search_paths.append(core_base_path)
+
+        self._library_paths: List[str] = list()
+        for path in search_paths:
+            self._library_paths.extend(common.get_library_paths(path, arch_triplet))
+        self._host_library_paths = _get_host_library_paths(arch_triplet)
+
+        # The soname index, the entries of every directory searched so far.
+        self._directory_entries: Dict[str, FrozenSet[str]] = dict()
+        self._elf_files: Dict[str, Optional[ElfFile]] = dict()
+
+    def resolve(self, elf_file: ElfFile) -> Dict[str, str]:
+        """Return the libraries loaded for elf_file, including indirect ones.
+
+        Returns a dictionary of mappings of soname -> soname_path.
+        If library is not resolved, the soname itself is the soname_path.
+        """
+        logger.debug(f"Resolving libraries for {elf_file.path!r}")
+
+        libraries: Dict[str, str] = dict()
+        # Libraries already loaded are matched by their DT_SONAME as well.
+        loaded_sonames: Set[str] = set()
+        # Breadth first, like the dynamic linker, each entry holding the ELF
+        # file to load the dependencies of followed by the ELF files that
+        # caused it to be loaded.
+        pending: Deque[List[ElfFile]] = collections.deque([[elf_file]])
+        while pending:
+            loaders = pending.popleft()
+            for soname in loaders[0].needed:
+                if soname in libraries or soname in loaded_sonames:
+                    continue
+                if _is_dynamic_linker(soname, elf_file):
+                    continue
+
+                library = self._find_library(soname, loaders)
+                if library is None:
+                    libraries[soname] = soname
+                else:
+                    libraries[soname] = library.path
+                    loaded_sonames.add(library.soname)
+                    pending.append([library, *loaders])
+
+        logger.debug(f"Resolved libraries: {libraries!r}")
+        return libraries
+
+    def _find_library(self, soname: str, loaders: List[ElfFile]) -> Optional[ElfFile]:
+        if "/" in soname:
+            return self._get_library(os.path.abspath(soname), loaders[-1].arch)
+
+        for directory in self._get_library_directories(loaders):
+            if soname not in self._get_directory_entries(directory):
+                continue
+
+            library_path = os.path.abspath(os.path.join(directory, soname))
+            library = self._get_library(library_path, loaders[-1].arch)
+            if library is not None:
+                return library
+
+        return None
+
+    def _get_library_directories(self, loaders: List[ElfFile]) -> List[str]:
+        directories: List[str] = list()
+
+        # DT_RPATH is only used when there is no DT_RUNPATH, going up the
+        # chain of ELF files that loaded this one.
+        if not loaders[0].runpath:
+            for loader in loaders:
+                if not loader.runpath:
+                    directories.extend(_expand_origin(loader.rpath, loader.path))
+
+        directories.extend(self._library_paths)
+        directories.extend(_expand_origin(loaders[0].runpath, loaders[0].path))
+        directories.extend(self._host_library_paths)
+
+        return directories
+
+    def _get_directory_entries(self, directory: str) -> FrozenSet[str]:
+        with contextlib.suppress(KeyError):
+            return self._directory_entries[directory]
+
+        try:
+            entries = frozenset(os.listdir(directory))
+        except OSError:
+            entries = frozenset()
+        self._directory_entries[directory] = entries
+        return entries
+
+    def _get_library(
+        self, path: str, arch: Optional[ElfArchitectureTuple]
+    ) -> Optional[ElfFile]:
+        if path not in self._elf_files:
+            library: Optional[ElfFile] = None
+            if ElfFile.is_elf(path):
+                try:
+                    library = ElfFile(path=path, attribute_cache=self.attribute_cache)
+                except elftools.common.exceptions.ELFError:
+                    pass
+                except errors.CorruptedElfFileError as error:
+                    logger.warning(error.get_brief())
+            self._elf_files[path] = library
+
+        library = self._elf_files[path]
+        # Like the dynamic linker, skip libraries for other architectures.
+        if library is None or library.arch != arch:
+            return None
+        return library
+
+
+def _is_dynamic_linker(soname: str, elf_file: ElfFile) -> bool:
+    # The dynamic linker is loaded as the interpreter and not as a library.
+    if elf_file.interp and soname == os.path.basename(elf_file.interp):
+        return True
+    return _DYNAMIC_LINKER_PATTERN.match(soname) is not None
+
+
+def _expand_origin(paths: List[str], path: str) -> List[str]:
+    origin = os.path.dirname(os.path.abspath(path))
+    return [_ORIGIN_PATTERN.sub(origin, p) for p in paths if p]
+
+
+@functools.lru_cache(maxsize=None)
+def _get_host_library_paths(arch_triplet: str) -> Tuple[str, ...]:
+    paths = _read_ld_so_conf("/etc/ld.so.conf")
+    # The directories the dynamic linker always falls back to.
+    paths.extend(
+        [
+            os.path.join("/lib", arch_triplet),
+            os.path.join("/usr/lib", arch_triplet),
+            "/lib",
+            "/usr/lib",
+            "/lib64",
+            "/usr/lib64",
+        ]
+    )
+    return tuple(dict.fromkeys(os.path.normpath(p) for p in paths))
+
+
+def _read_ld_so_conf(ld_conf_file: str) -> List[str]:
+    paths: List[str] = list()
+    try:
+        ld_conf_lines = _read_ld_conf_lines(ld_conf_file)
+    except OSError:
+        return paths
+
+    for line in ld_conf_lines:
+        directive, _, value = line.partition(" ")
+        if directive == "include":
+            for pattern in value.split():
+                pattern = os.path.join(os.path.dirname(ld_conf_file), pattern)
+                for include_file in sorted(glob.glob(pattern)):
+                    paths.extend(_read_ld_so_conf(include_file))
+        elif directive != "hwcap":
+            paths.extend(p for p in _LD_CONF_DELIMITERS.split(line) if p)
+
+    return paths
+
+
 class Patcher:
     """Patcher holds the necessary logic to patch elf files."""
 
@@ -489,7 +929,12 @@ class Patcher:
 
         self._strip_cmd = file_utils.get_snap_tool_path("strip")
 
-    def patch(self, *, elf_file: ElfFile) -> None:
+    def patch(
+        self,
+        *,
+        elf_file: ElfFile,
+        patchelf_args_list: Optional[List[List[str]]] = None,
+    ) -> None:
         """Patch elf_file with the Patcher instance configuration.
 
         If the ELF is executable, patch it to use the configured linker.
@@ -497,66 +942,84 @@ class Patcher:
 
         :param ElfFile elf: a data object representing an elf file and its
                             relevant attributes.
+        :param patchelf_args_list: what get_patchelf_args returned for
+                                   elf_file, if already known.
         :raises snapcraft.internal.errors.PatcherError:
             raised when the elf_file cannot be patched.
         """
-        patchelf_args = []
-        if elf_file.interp:
-            patchelf_args.extend(["--set-interpreter", self._dynamic_linker])
-        if elf_file.dependencies:
-            rpath = self._get_rpath(elf_file)
-            # Due to https://github.com/NixOS/patchelf/issues/94 we need
-            # to first clear the current rpath
-            self._run_patchelf(
-                patchelf_args=["--remove-rpath"], elf_file_path=elf_file.path
-            )
-            # Parameters:
-            # --force-rpath: use RPATH instead of RUNPATH.
-            # --shrink-rpath: will remove unneeded entries, with the
-            #                 side effect of preferring host libraries
-            #                 so we simply do not use it.
-            # --set-rpath: set the RPATH to the colon separated argument.
-            patchelf_args.extend(["--force-rpath", "--set-rpath", rpath])
+        if patchelf_args_list is None:
+            patchelf_args_list = self.get_patchelf_args(elf_file=elf_file)
 
         # no patchelf_args means there is nothing to do.
-        if not patchelf_args:
+        if not patchelf_args_list:
             return
 
-        self._run_patchelf(patchelf_args=patchelf_args, elf_file_path=elf_file.path)
+        self._run_patchelf(
+            patchelf_args_list=patchelf_args_list, elf_file_path=elf_file.path
+        )
+
+    def get_patchelf_args(self, *, elf_file: ElfFile) -> List[List[str]]:
+        """Return the arguments for each patchelf run elf_file requires.
+
+        Nothing is returned when the interpreter and rpath of elf_file are
+        already the ones it would be patched to use.
 
-    def _run_patchelf(self, *, patchelf_args: List[str], elf_file_path: str) -> None:
+        :param ElfFile elf: a data object representing an elf file and its
+                            relevant attributes.
+        """
+        patchelf_args_list: List[List[str]] = list()
+        patchelf_args: List[str] = list()
+        if elf_file.interp and elf_file.interp != self._dynamic_linker:
+            patchelf_args.extend(["--set-interpreter", self._dynamic_linker])
+        if elf_file.dependencies:
+            rpath = self._get_rpath(elf_file)
+            if elf_file.runpath or ":".join(elf_file.rpath) != rpath:
+                # Due to https://github.com/NixOS/patchelf/issues/94 we need
+                # to first clear the current rpath
+                patchelf_args_list.append(["--remove-rpath"])
+                # Parameters:
+                # --force-rpath: use RPATH instead of RUNPATH.
+                # --shrink-rpath: will remove unneeded entries, with the
+                #                 side effect of preferring host libraries
+                #                 so we simply do not use it.
+                # --set-rpath: set the RPATH to the colon separated argument.
+                patchelf_args.extend(["--force-rpath", "--set-rpath", rpath])
+
+        if patchelf_args:
+            patchelf_args_list.append(patchelf_args)
+        return patchelf_args_list
+
+    def _run_patchelf(
+        self, *, patchelf_args_list: List[List[str]], elf_file_path: str
+    ) -> None:
         # Run patchelf on a copy of the primed file and replace it
         # after it is successful. This allows us to break the potential
         # hard link created when migrating the file across the steps of
         # the part.
-        with tempfile.NamedTemporaryFile() as temp_file:
-            shutil.copy2(elf_file_path, temp_file.name)
-
-            cmd = [self._patchelf_cmd] + patchelf_args + [temp_file.name]
-            try:
-                subprocess.check_call(cmd)
-            # There is no need to catch FileNotFoundError as patchelf should be
-            # bundled with snapcraft which means its lack of existence is a
-            # "packager" error.
-            except subprocess.CalledProcessError as call_error:
-                raise errors.PatcherGenericError(
-                    elf_file=elf_file_path, process_exception=call_error
-                )
-
-            # We unlink to break the potential hard link
-            os.unlink(elf_file_path)
-            shutil.copy2(temp_file.name, elf_file_path)
-
-    def _get_existing_rpath(self, elf_file_path):
-        output = subprocess.check_output(
-            [self._patchelf_cmd, "--print-rpath", elf_file_path]
-        )
-        return output.decode().strip().split(":")
+        # The copy is writable even where the primed file is not.
+        with file_utils.replacing_file(
+            elf_file_path, binary=True, check_writable=False
+        ) as partial_file:
+            with open(elf_file_path, "rb") as elf_file:
+                shutil.copyfileobj(elf_file, partial_file)
+            partial_file.flush()
+            for patchelf_args in patchelf_args_list:
+                cmd = [self._patchelf_cmd] + patchelf_args + [partial_file.name]
+                try:
+                    subprocess.check_call(cmd)
+                # There is no need to catch FileNotFoundError as patchelf
+                # should be bundled with snapcraft which means its lack of
+                # existence is a "packager" error.
+                except subprocess.CalledProcessError as call_error:
+                    raise errors.PatcherGenericError(
+                        elf_file=elf_file_path, process_exception=call_error
+                    )
 
     def _get_rpath(self, elf_file) -> str:
         origin_rpaths = list()  # type: List[str]
         base_rpaths = set()  # type: Set[str]
-        existing_rpaths = self._get_existing_rpath(elf_file.path)
+        # What patchelf --print-rpath would show.
+        existing_rpaths = elf_file.rpath or elf_file.runpath
 
         for dependency in elf_file.dependencies:
             if dependency.path:
@@ -614,34 +1077,49 @@ def determine_ld_library_path(root: str) -> List[str]:
 
 
 def _extract_ld_library_paths(ld_conf_file: str) -> List[str]:
-    # From the ldconfig manpage, paths can be colon-, space-, tab-, newline-,
-    # or comma-separated.
-    path_delimiters = re.compile(r"[:\s,]")
+    paths = []
+    for line in _read_ld_conf_lines(ld_conf_file):
+        paths.extend(_LD_CONF_DELIMITERS.split(line))
+
+    return paths
+
+
+def _read_ld_conf_lines(ld_conf_file: str) -> List[str]:
     comments = re.compile(r"#.*$")
 
-    paths = []
+    lines = []
     with open(ld_conf_file, "r") as f:
         for line in f:
             # Remove comments from line
             line = comments.sub("", line).strip()
 
             if line:
-                paths.extend(path_delimiters.split(line))
+                lines.append(line)
 
-    return paths
+    return lines
 
 
 _libraries = None
 
 
-def get_elf_files(root: str, file_list: Sequence[str]) -> FrozenSet[ElfFile]:
+def get_elf_files(
+    root: str,
+    file_list: Sequence[str],
+    *,
+    max_workers: int = 1,
+    attribute_cache: Optional[cache.ElfAttributeCache] = None,
+) -> FrozenSet[ElfFile]:
     """Return a frozenset of elf files from file_list prepended with root.
 
     :param str root: the root directory from where the file_list is generated.
     :param file_list: a list of file in root.
+    :param int max_workers: number of processes to parse ELF files with.
+    :param ElfAttributeCache attribute_cache: cache for the attributes of the
+                                              ELF files found.
     :returns: a frozentset of ElfFile objects.
     """
-    elf_files = set()  # type: Set[ElfFile]
+    elf_paths: List[str] = list()
+    results: List[Tuple[Optional[ElfFile], Optional[str]]] = list()
 
     for part_file in file_list:
         # Filter out object (*.o) files-- we only care about binaries.
@@ -654,27 +1132,160 @@ def get_elf_files(root: str, file_list: Sequence[str]) -> FrozenSet[ElfFile]:
             logger.debug("Skipped link {!r} while finding dependencies".format(path))
             continue
 
-        # Ignore if file does not have ELF header.
-        if not ElfFile.is_elf(path):
+        # Ignore if file does not have ELF header or cannot have dynamic
+        # symbols.
+        if not _is_dynamically_linked(path):
             continue
 
-        try:
-            elf_file = ElfFile(path=path)
-        except elftools.common.exceptions.ELFError:
-            # Ignore invalid ELF files.
-            continue
-        except errors.CorruptedElfFileError as exception:
-            # Log if the ELF file seems corrupted
-            logger.warning(exception.get_brief())
-            continue
+        # Only what is not cached yet is worth handing to workers, files are
+        # not read here to find out.
+        attributes = None
+        if attribute_cache is not None:
+            attributes = attribute_cache.lookup(path)
+        if attributes is not None:
+            elf_file, warning, _ = _load_elf_file(
+                path, attribute_cache=attribute_cache, attributes=attributes
+            )
+            results.append((elf_file, warning))
+        else:
+            elf_paths.append(path)
 
+    # The workers also calculate the digests to cache the attributes by.
+    load_elf_file = functools.partial(
+        _load_elf_file, calculate_digest=attribute_cache is not None
+    )
+    if max_workers > 1 and len(elf_paths) >= _PARALLEL_SCAN_MIN_FILES:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as pool:
+            chunksize = max(1, len(elf_paths) // (max_workers * 4))
+            loaded = list(pool.map(load_elf_file, elf_paths, chunksize=chunksize))
+    else:
+        loaded = [load_elf_file(path) for path in elf_paths]
+
+    for elf_file, warning, digest in loaded:
+        if elf_file is not None and attribute_cache is not None:
+            attribute_cache.add(elf_file.path, elf_file.get_attributes(), digest=digest)
+        results.append((elf_file, warning))
+
+    elf_files = set()  # type: Set[ElfFile]
+    for elf_file, warning in results:
+        if warning is not None:
+            # Log if the ELF file seems corrupted
+            logger.warning(warning)
         # If ELF has dynamic symbols, add it.
-        if elf_file.needed:
+        elif elf_file is not None and elf_file.needed:
             elf_files.add(elf_file)
 
     return frozenset(elf_files)
 
 
+def _load_elf_file(
+    path: str,
+    *,
+    attribute_cache: Optional[cache.ElfAttributeCache] = None,
+    attributes: Optional[Dict[str, Any]] = None,
+    calculate_digest: bool = False,
+) -> Tuple[Optional[ElfFile], Optional[str], Optional[str]]:
+    # Runs in worker processes, so warnings are handed back to be logged.
+    try:
+        elf_file = ElfFile(
+            path=path, attribute_cache=attribute_cache, attributes=attributes
+        )
+    except elftools.common.exceptions.ELFError:
+        # Ignore invalid ELF files.
+        return None, None, None
+    except errors.CorruptedElfFileError as exception:
+        return None, exception.get_brief(), None
+
+    if not calculate_digest:
+        return elf_file, None, None
+    try:
+        digest = file_utils.calculate_hash(path, algorithm="sha256")
+    except OSError:
+        digest = None
+    return elf_file, None, digest
+
+
+def _is_dynamically_linked(path: str) -> bool:
+    """Return True if path is an ELF file that may have dynamic symbols.
+
+    Only the ELF and program headers are read, files with no dynamic segment
+    need not be parsed any further. Headers that cannot be made sense of are
+    left for ElfFile to report on.
+    """
+    if not ElfFile.is_elf(path):
+        return False
+
+    with open(path, "rb") as elf_file:
+        program_headers = _ProgramHeaders.read(elf_file)
+
+    if program_headers is None:
+        return True
+    return any(p_type == _PT_DYNAMIC for _, p_type in program_headers.iter_types())
+
+
+class _ProgramHeaders:
+    """The raw program headers of an ELF file."""
+
+    def __init__(
+        self,
+        *,
+        byte_order: str,
+        elf_class: int,
+        offset: int,
+        entry_size: int,
+        data: bytes,
+    ) -> None:
+        self.byte_order = byte_order
+        self.elf_class = elf_class
+        self.offset = offset
+        self.entry_size = entry_size
+        self.data = data
+
+    @classmethod
+    def read(cls, elf_file: BinaryIO) -> Optional["_ProgramHeaders"]:
+        """Read the program headers of elf_file, None if they make no sense."""
+        elf_file.seek(0)
+        e_ident = elf_file.read(16)
+        if len(e_ident) < 16:
+            return None
+        header_format = _ELF_HEADER_FORMATS.get(e_ident[4])
+        byte_order = {1: "<", 2: ">"}.get(e_ident[5])
+        if header_format is None or byte_order is None:
+            return None
+
+        header_format = byte_order + header_format
+        elf_file.seek(0)
+        header = elf_file.read(struct.calcsize(header_format))
+        if len(header) < struct.calcsize(header_format):
+            return None
+        e_phoff, e_phentsize, e_phnum = struct.unpack(header_format, header)
+        if e_phnum == _PN_XNUM or (e_phnum and e_phentsize < 4):
+            return None
+
+        # Relocatable objects and the like have none, they are never loaded
+        # on their own.
+        data = b""
+        if e_phnum:
+            elf_file.seek(e_phoff)
+            data = elf_file.read(e_phentsize * e_phnum)
+            if len(data) < e_phentsize * e_phnum:
+                return None
+
+        return cls(
+            byte_order=byte_order,
+            elf_class=e_ident[4],
+            offset=e_phoff,
+            entry_size=e_phentsize,
+            data=data,
+        )
+
+    def iter_types(self) -> Iterator[Tuple[int, int]]:
+        """Yield the offset into data and p_type of every program header."""
+        p_type_format = self.byte_order + "I"
+        for offset in range(0, len(self.data), self.entry_size):
+            yield offset, struct.unpack_from(p_type_format, self.data, offset)[0]
+
+
 def _get_dynamic_linker(library_list: List[str]) -> str:
     """Return the dynamic linker from library_list."""
     regex = re.compile(r"(?P<dynamic_linker>ld-[\d.]+.so)$")
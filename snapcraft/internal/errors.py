@@ -101,6 +101,21 @@ class MissingStateCleanError(SnapcraftException):
         return CLEAN_RESOLUTION
 
 
+class UnsupportedStateFormatError(SnapcraftException):
+    def __init__(self, *, path: str, version: int) -> None:
+        self.path = path
+        self.version = version
+
+    def get_brief(self) -> str:
+        return (
+            f"The state in {self.path!r} is in version {self.version} of the "
+            "state format, which is not supported by this version of snapcraft."
+        )
+
+    def get_resolution(self) -> str:
+        return CLEAN_RESOLUTION
+
+
 class StepOutdatedError(SnapcraftException):
     def __init__(
         self,
@@ -261,6 +276,37 @@ class SnapcraftPartConflictError(SnapcraftError):
         )
 
 
+class SnapcraftPartConflictsError(SnapcraftError):
+
+    fmt = (
+        "Failed to stage: "
+        "The following parts have files in common, but with different "
+        "contents:\n"
+        "{conflicts}\n\n"
+        "Snapcraft offers some capabilities to solve this by use of the "
+        "following keywords:\n"
+        "    - `filesets`\n"
+        "    - `stage`\n"
+        "    - `snap`\n"
+        "    - `organize`\n\n"
+        "To learn more about these part keywords, run "
+        "`snapcraft help plugins`."
+    )
+
+    def __init__(self, *, conflicts):
+        # conflicts is a list of (other_part_name, part_name, conflict_files).
+        formatted_conflicts = []
+        for other_part_name, part_name, conflict_files in conflicts:
+            formatted_conflicts.append(
+                "Parts {!r} and {!r}:\n{}".format(
+                    other_part_name,
+                    part_name,
+                    "\n".join(sorted("    {}".format(i) for i in conflict_files)),
+                )
+            )
+        super().__init__(conflicts="\n".join(formatted_conflicts))
+
+
 class SnapcraftOrganizeError(SnapcraftError):
 
     fmt = "Failed to organize part {part_name!r}: {message}"
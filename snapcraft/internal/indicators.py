@@ -14,12 +14,14 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import os
+import threading
+from typing import Optional, TextIO
 
 from urllib.request import urlretrieve
 from progressbar import AnimatedMarker, Bar, Percentage, ProgressBar, UnknownLength
 
 
-def _init_progress_bar(total_length, destination, message=None):
+def _init_progress_bar(total_length, destination, message=None, fd=None):
     if not message:
         message = "Downloading {!r}".format(os.path.basename(destination))
 
@@ -38,7 +40,14 @@ def _init_progress_bar(total_length, destination, message=None):
         widgets = [message, AnimatedMarker()]
         maxval = UnknownLength
 
-    return ProgressBar(widgets=widgets, maxval=maxval)
+    if fd is None:
+        return ProgressBar(widgets=widgets, maxval=maxval)
+    return ProgressBar(widgets=widgets, maxval=maxval, fd=fd)
+
+
+# Large enough to not spend the download in Python, small enough for the
+# progress to move along on slow links.
+_CHUNK_SIZE = 64 * 1024
 
 
 def download_requests_stream(request_stream, destination, message=None, total_read=0):
@@ -63,7 +72,7 @@ def download_requests_stream(request_stream, destination, message=None, total_re
     else:
         mode = "wb"
     with open(destination, mode) as destination_file:
-        for buf in request_stream.iter_content(1024):
+        for buf in request_stream.iter_content(_CHUNK_SIZE):
             destination_file.write(buf)
             if not is_dumb_terminal():
                 total_read += len(buf)
@@ -71,6 +80,36 @@ def download_requests_stream(request_stream, destination, message=None, total_re
     progress_bar.finish()
 
 
+class CombinedDownloadProgress:
+    """A single progress bar for several downloads running concurrently."""
+
+    def __init__(
+        self, total_length: int, message: str, *, fd: Optional[TextIO] = None
+    ) -> None:
+        self._total_read = 0
+        self._lock = threading.Lock()
+        self._progress_bar = _init_progress_bar(total_length, "", message, fd)
+
+    def __enter__(self) -> "CombinedDownloadProgress":
+        self._progress_bar.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._progress_bar.finish()
+
+    def update(self, length: int) -> None:
+        """Add length bytes read by any of the downloads."""
+        if is_dumb_terminal():
+            return
+        with self._lock:
+            self._total_read += length
+            total_read = self._total_read
+            # Lengths are only known for the downloads that advertised them.
+            if self._progress_bar.maxval is not UnknownLength:
+                total_read = min(total_read, self._progress_bar.maxval)
+            self._progress_bar.update(total_read)
+
+
 class UrllibDownloader(object):
     """This is a facility to download an uri with nice progress bars."""
 
@@ -15,7 +15,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
-from typing import Optional, List, Sequence, Set
+import pathlib
+import threading
+from typing import Optional, List, Sequence, Set, Tuple
+
+import tabulate
 
 from snapcraft import config, plugins, storeapi
 from snapcraft.internal import (
@@ -24,6 +28,7 @@ from snapcraft.internal import (
     pluginhandler,
     project_loader,
     repo,
+    sources,
     states,
     steps,
 )
@@ -31,6 +36,7 @@ from snapcraft.internal.pluginhandler._part_environment import (
     get_snapcraft_part_directory_environment,
 )
 from snapcraft.internal.meta._snap_packaging import create_snap_packaging
+from ._scheduler import PartScheduler
 from ._status_cache import StatusCache
 
 
@@ -90,6 +96,9 @@ def execute(
     step: steps.Step,
     project_config: "project_loader._config.Config",
     part_names: Sequence[str] = None,
+    *,
+    parallel_parts: int = 1,
+    explain: bool = False,
 ):
     """Execute until step in the lifecycle for part_names or all parts.
 
@@ -105,6 +114,11 @@ def execute(
     :param project_config: Fully loaded project (old logic moving either to
                            Project or the PluginHandler).
     :param list part_names: A list of parts to execute the lifecycle on.
+    :param int parallel_parts: The maximum number of parts to pull and build
+                               concurrently, parts that do not depend on each
+                               other are run side by side if greater than 1.
+    :param bool explain: Log what was decided for each step of each part,
+                         why, and the time spent determining its status.
     :raises RuntimeError: If a prerequesite of the part needs to be staged
                           and such part is not in the list of parts to iterate
                           over.
@@ -133,8 +147,11 @@ def execute(
         )
     global_state.save(filepath=project_config.project._get_global_state_file_path())
 
-    executor = _Executor(project_config)
+    executor = _Executor(project_config, parallel_parts=parallel_parts)
     executor.run(step, part_names)
+    executor.mark_primed_sonames()
+    if explain:
+        logger.info(executor.get_explanation())
     if not executor.steps_were_run:
         logger.warning(
             "The requested action has already been taken. Consider\n"
@@ -162,13 +179,26 @@ def _replace_in_part(part):
 
 
 class _Executor:
-    def __init__(self, project_config):
+    def __init__(self, project_config, *, parallel_parts: int = 1):
         self.config = project_config
         self.project = project_config.project
         self.parts_config = project_config.parts
         self.steps_were_run = False
 
         self._cache = StatusCache(project_config)
+        self._parallel_parts = parallel_parts
+        # Serializes work touching the shared stage and prime areas when parts
+        # are scheduled in parallel, including bringing dependencies up to
+        # their prerequisite step so two parts sharing a dependency do not
+        # both try to build and stage it.
+        self._shared_area_lock = threading.RLock()
+        # What was decided for each part and step, and why.
+        self._decisions: List[
+            Tuple[pluginhandler.PluginHandler, steps.Step, str, str]
+        ] = []
+        # Libraries in prime, kept track of from the first part primed on.
+        self._primed_libraries: Optional[pluginhandler.PrimedLibraries] = None
+        self._primed_parts: List[pluginhandler.PluginHandler] = []
 
     def run(self, step: steps.Step, part_names=None):
         if part_names:
@@ -183,15 +213,130 @@ class _Executor:
 
         with config.CLIConfig() as cli_config:
             for current_step in step.previous_steps() + [step]:
+                if current_step == steps.PULL:
+                    self._prefetch_sources(parts)
                 if current_step == steps.STAGE:
                     # XXX check only for collisions on the parts that have
                     # already been built --elopio - 20170713
                     pluginhandler.check_for_collisions(self.config.all_parts)
-                for part in parts:
-                    self._handle_step(part_names, part, step, current_step, cli_config)
+                if self._should_schedule_in_parallel(current_step, parts):
+                    self._handle_step_in_parallel(
+                        part_names, parts, step, current_step, cli_config
+                    )
+                else:
+                    for part in parts:
+                        self._handle_step(
+                            part_names, part, step, current_step, cli_config
+                        )
 
         self._create_meta(step, processed_part_names)
 
+    def _prefetch_sources(self, parts) -> None:
+        # Download the remote sources of the parts yet to be pulled together,
+        # pulling them then finds them in the file cache.
+        sources.prefetch(
+            [
+                p.source_handler
+                for p in parts
+                if p.source_handler and not self._cache.has_step_run(p, steps.PULL)
+            ]
+        )
+
+    def mark_primed_sonames(self) -> None:
+        """Record the libraries primed in the state of the parts primed.
+
+        Only done once all parts are primed, so that the next run finds the
+        same libraries primed by then if nothing changed.
+        """
+        if self._primed_libraries is None:
+            return
+
+        primed_sonames = self._primed_libraries.get_digest()
+        for part in self._primed_parts:
+            part.mark_primed_sonames(primed_sonames)
+
+    def get_explanation(self) -> str:
+        """Get a table of the decisions taken for each part and step.
+
+        The time is what was spent determining the status of the part, from
+        loading its state to checking its dependencies, over the whole run.
+        """
+        rows = [
+            [
+                part.name,
+                step.name,
+                action,
+                reason,
+                "{:.1f}".format(self._cache.get_cost(part) * 1000),
+            ]
+            for part, step, action, reason in self._decisions
+        ]
+        return tabulate.tabulate(
+            rows, headers=["Part", "Step", "Action", "Reason", "Status time (ms)"]
+        )
+
+    def _decide(
+        self,
+        part: pluginhandler.PluginHandler,
+        step: steps.Step,
+        action: str,
+        reason: str,
+    ) -> None:
+        self._decisions.append((part, step, action, reason))
+
+    def _should_schedule_in_parallel(
+        self, step: steps.Step, parts: Sequence[pluginhandler.PluginHandler]
+    ) -> bool:
+        # Only pull and build are confined to the part's own directories,
+        # stage and prime write to the shared areas and always run serially.
+        # Runs triggered for dependencies from within a worker are serial too.
+        return (
+            self._parallel_parts > 1
+            and step in (steps.PULL, steps.BUILD)
+            and len(parts) > 1
+            and threading.current_thread() is threading.main_thread()
+        )
+
+    def _is_concurrent_part(self, part: pluginhandler.PluginHandler) -> bool:
+        # PluginV1 parts run with the process wide environment in common.env,
+        # so they (and anything depending on them) can only run on their own.
+        dependencies = self.parts_config.get_dependencies(part.name, recursive=True)
+        return all(
+            not isinstance(p.plugin, plugins.v1.PluginV1) for p in dependencies | {part}
+        )
+
+    def _handle_step_in_parallel(
+        self,
+        requested_part_names: Sequence[str],
+        parts: Sequence[pluginhandler.PluginHandler],
+        requested_step: steps.Step,
+        current_step: steps.Step,
+        cli_config,
+    ) -> None:
+        def handle_part(part: pluginhandler.PluginHandler) -> None:
+            # Keep the output of parts pulling or building side by side apart.
+            if self._is_concurrent_part(part):
+                run_dir = pathlib.Path(part.part_dir, "run")
+                part.pull_log_path = run_dir / "pull.log"
+                part.build_log_path = run_dir / "build.log"
+            try:
+                self._handle_step(
+                    requested_part_names, part, requested_step, current_step, cli_config
+                )
+            finally:
+                part.pull_log_path = None
+                part.build_log_path = None
+
+        scheduler = PartScheduler(
+            parts=parts,
+            get_dependencies=lambda n: self.parts_config.get_dependencies(
+                n, recursive=True
+            ),
+            is_concurrent=self._is_concurrent_part,
+            max_workers=self._parallel_parts,
+        )
+        scheduler.run(handle_part)
+
     def _handle_step(
         self,
         requested_part_names: Sequence[str],
@@ -202,6 +347,7 @@ class _Executor:
     ) -> None:
         # If this step hasn't yet run, all we need to do is run it
         if not self._cache.has_step_run(part, current_step):
+            self._decide(part, current_step, "run", "has not run")
             getattr(self, "_run_{}".format(current_step.name))(part)
             return
 
@@ -220,6 +366,7 @@ class _Executor:
             and current_step == requested_step
             and part.name in requested_part_names
         ):
+            self._decide(part, current_step, "re-run", "explicitly requested")
             getattr(self, "_re{}".format(current_step.name))(part)
             return
 
@@ -227,6 +374,7 @@ class _Executor:
         #    need to clean and run it again.
         dirty_report = self._cache.get_dirty_report(part, current_step)
         if dirty_report:
+            self._decide(part, current_step, "clean", dirty_report.get_summary())
             self._handle_dirty(part, current_step, dirty_report, cli_config)
             return
 
@@ -234,11 +382,13 @@ class _Executor:
         #    need to update it (without cleaning if possible).
         outdated_report = self._cache.get_outdated_report(part, current_step)
         if outdated_report:
+            self._decide(part, current_step, "update", outdated_report.get_summary())
             self._handle_outdated(part, current_step, outdated_report, cli_config)
             return
 
         # 4. The step has already run, and is up-to-date, no need to run it
         #    again.
+        self._decide(part, current_step, "skip", "up to date")
         notify_part_progress(
             part, "Skipping {}".format(current_step.name), "(already ran)"
         )
@@ -289,22 +439,31 @@ class _Executor:
         # Filter dependencies down to only those that need to run the
         # prerequisite step
         prerequisite_step = steps.get_dependency_prerequisite_step(step)
-        dependencies = {
-            p
-            for p in all_dependencies
-            if self._cache.should_step_run(p, prerequisite_step)
-        }
-
-        if dependencies:
-            dependency_names = {p.name for p in dependencies}
-            # Dependencies need to go all the way to the prerequisite step to
-            # be able to share the common assets that make them a dependency
-            logger.info(
-                "{!r} has dependencies that need to be {}d: {}".format(
-                    part.name, prerequisite_step.name, " ".join(dependency_names)
+        with self._shared_area_lock:
+            dependencies = {
+                p
+                for p in all_dependencies
+                if self._cache.should_step_run(p, prerequisite_step)
+            }
+
+            if dependencies:
+                dependency_names = {p.name for p in dependencies}
+                # Dependencies need to go all the way to the prerequisite step
+                # to be able to share the common assets that make them a
+                # dependency
+                logger.info(
+                    "{!r} has dependencies that need to be {}d: {}".format(
+                        part.name, prerequisite_step.name, " ".join(dependency_names)
+                    )
                 )
-            )
-            self.run(prerequisite_step, dependency_names)
+                self.run(prerequisite_step, dependency_names)
+
+        if step == steps.PRIME:
+            if self._primed_libraries is None:
+                self._primed_libraries = pluginhandler.PrimedLibraries(
+                    self.project.prime_dir
+                )
+            part.primed_libraries = self._primed_libraries
 
         # Run the preparation function for this step (if implemented)
         preparation_function = getattr(part, "prepare_{}".format(step.name), None)
@@ -332,13 +491,17 @@ class _Executor:
         self._cache.clear_step(part, step)
         self._cache.add_step_run(part, step)
         self.steps_were_run = True
+        if step == steps.PRIME:
+            self._primed_parts.append(part)
 
     def _rerun_step(self, *, step: steps.Step, part, progress, hint=""):
-        staged_state = self.config.get_project_state(steps.STAGE)
-        primed_state = self.config.get_project_state(steps.PRIME)
+        with self._shared_area_lock:
+            staged_state = self.config.get_project_state(steps.STAGE)
+            primed_state = self.config.get_project_state(steps.PRIME)
 
-        # First clean the step, then run it again
-        part.clean(staged_state, primed_state, step)
+            # First clean the step, then run it again. Primed files are kept to
+            # only update those that changed once stage runs again.
+            part.clean(staged_state, primed_state, step, keep_primed=step < steps.PRIME)
 
         # Uncache this and later steps since we just cleaned them: their status
         # has changed
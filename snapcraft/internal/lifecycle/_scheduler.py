@@ -0,0 +1,121 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import concurrent.futures
+from typing import Callable, Dict, List, Sequence, Set
+
+from snapcraft.internal import pluginhandler
+
+_Parts = Sequence[pluginhandler.PluginHandler]
+
+
+class PartScheduler:
+    """Run a callable over a set of parts, honouring their `after` ordering.
+
+    A part is only dispatched once every part it depends upon (that is also
+    being scheduled) has completed. Parts flagged as concurrent can run
+    alongside each other, up to max_workers at a time; every other part runs
+    on its own, with nothing else in flight.
+    """
+
+    def __init__(
+        self,
+        *,
+        parts: _Parts,
+        get_dependencies: Callable[[str], Set[pluginhandler.PluginHandler]],
+        is_concurrent: Callable[[pluginhandler.PluginHandler], bool],
+        max_workers: int,
+    ) -> None:
+        """Create a new PartScheduler.
+
+        :param parts: parts to schedule, in the order they would run serially.
+        :param get_dependencies: returns all the parts a given part name
+                                 depends upon.
+        :param is_concurrent: whether a part can run alongside other parts.
+        :param int max_workers: maximum number of parts to run at once.
+        """
+        self._parts = list(parts)
+        self._is_concurrent = is_concurrent
+        self._max_workers = max(1, max_workers)
+
+        part_names = {p.name for p in self._parts}
+        self._dependencies: Dict[str, Set[str]] = {
+            p.name: {d.name for d in get_dependencies(p.name)} & part_names
+            for p in self._parts
+        }
+
+    def run(self, func: Callable[[pluginhandler.PluginHandler], None]) -> None:
+        """Call func for every part, returning once all calls have finished.
+
+        The first exception raised by func is re-raised once the parts that
+        were already running have finished; no new parts are dispatched after
+        a failure.
+        """
+        pending: List[pluginhandler.PluginHandler] = list(self._parts)
+        completed: Set[str] = set()
+        running: Dict[concurrent.futures.Future, pluginhandler.PluginHandler] = {}
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._max_workers, thread_name_prefix="snapcraft-part"
+        ) as executor:
+            while pending or running:
+                for part in self._get_dispatchable(pending, running, completed):
+                    pending.remove(part)
+                    running[executor.submit(func, part)] = part
+
+                # Should not happen - developer safety check.
+                if not running:
+                    raise RuntimeError(
+                        "Unable to schedule parts: {}".format(
+                            ", ".join(p.name for p in pending)
+                        )
+                    )
+
+                finished, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in finished:
+                    part = running.pop(future)
+                    # Raises if func failed, leaving the executor to wait
+                    # for whatever is still running.
+                    future.result()
+                    completed.add(part.name)
+
+    def _get_dispatchable(
+        self,
+        pending: _Parts,
+        running: Dict[concurrent.futures.Future, pluginhandler.PluginHandler],
+        completed: Set[str],
+    ) -> List[pluginhandler.PluginHandler]:
+        dispatchable: List[pluginhandler.PluginHandler] = []
+        in_flight = list(running.values())
+
+        for part in pending:
+            if len(in_flight) >= self._max_workers:
+                break
+            if not self._dependencies[part.name] <= completed:
+                continue
+
+            if not self._is_concurrent(part):
+                # Exclusive parts wait until nothing else is running.
+                if not in_flight:
+                    dispatchable.append(part)
+                break
+            elif all(self._is_concurrent(p) for p in in_flight):
+                dispatchable.append(part)
+                in_flight.append(part)
+
+        return dispatchable
@@ -16,7 +16,9 @@
 
 import collections
 import contextlib
-from typing import Any, Dict, List, Optional, Set
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set
 
 from snapcraft.internal import errors, pluginhandler, steps
 import snapcraft.internal.project_loader._config as _config
@@ -26,7 +28,13 @@ _OutdatedReport = Dict[str, Dict[steps.Step, Optional[pluginhandler.OutdatedRepo
 
 
 class StatusCache:
-    """The StatusCache is a lazy caching interface for the status of parts."""
+    """The StatusCache is a lazy caching interface for the status of parts.
+
+    The state directory of each part is read once into an index of step
+    timestamps, which dependency checks use instead of going back to disk.
+    Whether a step should run is remembered as well, so working out the
+    staleness of every dependency visits each part and step once.
+    """
 
     def __init__(self, config: _config.Config) -> None:
         """Create a new StatusCache.
@@ -37,6 +45,11 @@ class StatusCache:
         self._steps_run: Dict[str, Set[steps.Step]] = dict()
         self._outdated_reports: _OutdatedReport = collections.defaultdict(dict)
         self._dirty_reports: _DirtyReport = collections.defaultdict(dict)
+        self._step_timestamps: Dict[str, Dict[steps.Step, float]] = dict()
+        self._should_run: Dict[str, Dict[steps.Step, bool]] = collections.defaultdict(
+            dict
+        )
+        self._costs: Dict[str, float] = collections.defaultdict(float)
 
     def should_step_run(
         self, part: pluginhandler.PluginHandler, step: steps.Step
@@ -55,6 +68,13 @@ class StatusCache:
             4. Either (1), (2), or (3) apply to any earlier steps in the part's
                lifecycle
         """
+        if step not in self._should_run[part.name]:
+            self._should_run[part.name][step] = self._get_should_step_run(part, step)
+        return self._should_run[part.name][step]
+
+    def _get_should_step_run(
+        self, part: pluginhandler.PluginHandler, step: steps.Step
+    ) -> bool:
         if (
             not self.has_step_run(part, step)
             or self.get_outdated_report(part, step) is not None
@@ -76,6 +96,7 @@ class StatusCache:
         """
         self._ensure_steps_run(part)
         self._steps_run[part.name].add(step)
+        _del_key(self._should_run, part.name)
 
     def has_step_run(self, part: pluginhandler.PluginHandler, step: steps.Step) -> bool:
         """Determine if a given step of a given part has already run.
@@ -112,14 +133,43 @@ class StatusCache:
         self._ensure_dirty_report(part, step)
         return self._dirty_reports[part.name][step]
 
+    def step_timestamp(
+        self, part: pluginhandler.PluginHandler, step: steps.Step
+    ) -> float:
+        """Obtain the time the given step of the given part last ran.
+
+        :param pluginhandler.PluginHandler part: Part in question.
+        :param steps.Step step: Step in question.
+        :return: Modification time of the step's state file.
+        :rtype: float
+        :raises errors.StepHasNotRunError: If the step has not run.
+        """
+        self._ensure_step_timestamps(part)
+        try:
+            return self._step_timestamps[part.name][step]
+        except KeyError as e:
+            raise errors.StepHasNotRunError(part.name, step) from e
+
+    def get_cost(self, part: pluginhandler.PluginHandler) -> float:
+        """Obtain the time spent determining the status of the given part.
+
+        :param pluginhandler.PluginHandler part: Part in question.
+        :return: Time in seconds spent loading the part's state and reports.
+        :rtype: float
+        """
+        return self._costs[part.name]
+
     def clear_step(self, part: pluginhandler.PluginHandler, step: steps.Step) -> None:
         """Clear the given step of the given part from the cache.
 
         :param pluginhandler.PluginHandler part: Part in question.
         :param steps.Step step: Step in question.
 
-        This function does nothing if the step wasn't cached.
+        This function does nothing if the step wasn't cached. The step
+        timestamps of the part are read again the next time they are needed.
         """
+        _del_key(self._step_timestamps, part.name)
+        _del_key(self._should_run, part.name)
         if part.name in self._steps_run:
             _remove_key(self._steps_run[part.name], step)
             if not self._steps_run[part.name]:
@@ -133,13 +183,22 @@ class StatusCache:
 
     def _ensure_steps_run(self, part: pluginhandler.PluginHandler) -> None:
         if part.name not in self._steps_run:
-            self._steps_run[part.name] = _get_steps_run(part)
+            with self._timed(part):
+                self._steps_run[part.name] = _get_steps_run(part)
+
+    def _ensure_step_timestamps(self, part: pluginhandler.PluginHandler) -> None:
+        if part.name not in self._step_timestamps:
+            with self._timed(part):
+                self._step_timestamps[part.name] = _get_step_timestamps(part)
 
     def _ensure_outdated_report(
         self, part: pluginhandler.PluginHandler, step: steps.Step
     ) -> None:
         if step not in self._outdated_reports[part.name]:
-            self._outdated_reports[part.name][step] = part.get_outdated_report(step)
+            with self._timed(part):
+                self._outdated_reports[part.name][step] = part.get_outdated_report(
+                    step
+                )
 
     def _ensure_dirty_report(
         self, part: pluginhandler.PluginHandler, step: steps.Step
@@ -150,7 +209,8 @@ class StatusCache:
 
         # Get the dirty report from the PluginHandler. If it's dirty, we can
         # stop here
-        self._dirty_reports[part.name][step] = part.get_dirty_report(step)
+        with self._timed(part):
+            self._dirty_reports[part.name][step] = part.get_dirty_report(step)
 
         # The dirty report from the PluginHandler only takes into account
         # properties specific to that part. If it's not dirty because of those,
@@ -161,13 +221,13 @@ class StatusCache:
 
         changed_dependencies: List[pluginhandler.Dependency] = []
         with contextlib.suppress(errors.StepHasNotRunError):
-            timestamp = part.step_timestamp(step)
+            timestamp = self.step_timestamp(part, step)
             for dependency in dependencies:
                 # Make sure the prerequisite step of this dependency has not
                 # run more recently than (or should run _before_) this step.
                 try:
-                    prerequisite_timestamp = dependency.step_timestamp(
-                        prerequisite_step
+                    prerequisite_timestamp = self.step_timestamp(
+                        dependency, prerequisite_step
                     )
                 except errors.StepHasNotRunError:
                     dependency_changed = True
@@ -188,6 +248,14 @@ class StatusCache:
                     changed_dependencies=changed_dependencies
                 )
 
+    @contextlib.contextmanager
+    def _timed(self, part: pluginhandler.PluginHandler) -> Iterator[None]:
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._costs[part.name] += time.monotonic() - start
+
 
 def _get_steps_run(part: pluginhandler.PluginHandler) -> Set[steps.Step]:
     steps_run = set()  # type: Set[steps.Step]
@@ -198,6 +266,21 @@ def _get_steps_run(part: pluginhandler.PluginHandler) -> Set[steps.Step]:
     return steps_run
 
 
+def _get_step_timestamps(part: pluginhandler.PluginHandler) -> Dict[steps.Step, float]:
+    step_names = {step.name: step for step in steps.STEPS}
+    timestamps: Dict[steps.Step, float] = dict()
+    try:
+        with os.scandir(part.part_state_dir) as entries:
+            for entry in entries:
+                if entry.name in step_names:
+                    with contextlib.suppress(FileNotFoundError):
+                        timestamps[step_names[entry.name]] = entry.stat().st_mtime
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+
+    return timestamps
+
+
 def _del_key(c: Dict[Any, Any], key: Any) -> None:
     with contextlib.suppress(KeyError):
         del c[key]
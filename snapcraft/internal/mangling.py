@@ -14,48 +14,84 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import logging
+import os
 import re
-import subprocess
+import shutil
 from typing import FrozenSet
 
 from snapcraft import file_utils
 from snapcraft.internal import elf
 
-
 logger = logging.getLogger(__name__)
 
 
+_ARGLESS_SHEBANG_PATTERN = re.compile(r"\A#!.*(python\S*)$")
+_SHEBANG_PATTERN_WITH_ARGS = re.compile(r"\A#!.*(python\S*)[ \t\f\v]+(\S+)$")
+
+
 def rewrite_python_shebangs(root_dir):
     """Recursively change #!/usr/bin/pythonX shebangs to #!/usr/bin/env pythonX
 
+    Only the first line of each file is read, and files that do not start
+    with #! are skipped after their first two bytes.
+
     :param str root_dir: Directory that will be crawled for shebangs.
     """
 
-    file_pattern = re.compile(r"")
-    argless_shebang_pattern = re.compile(r"\A#!.*(python\S*)$", re.MULTILINE)
-    shebang_pattern_with_args = re.compile(
-        r"\A#!.*(python\S*)[ \t\f\v]+(\S+)$", re.MULTILINE
-    )
+    for root, directories, files in os.walk(root_dir):
+        for file_name in files:
+            file_path = os.path.join(root, file_name)
+            # Don't bother trying to rewrite a symlink. It's either invalid
+            # or the linked file will be rewritten on its own.
+            if not os.path.islink(file_path):
+                _rewrite_python_shebang(file_path)
 
-    file_utils.replace_in_file(
-        root_dir, file_pattern, argless_shebang_pattern, r"#!/usr/bin/env \1"
-    )
 
-    # The above rewrite will barf if the shebang includes any args to python.
-    # For example, if the shebang was `#!/usr/bin/python3 -Es`, just replacing
-    # that with `#!/usr/bin/env python3 -Es` isn't going to work as `env`
-    # doesn't support arguments like that.
+def rewrite_python_shebang(shebang: str) -> str:
+    """Return shebang changed to use env if it is a hard-coded python one.
+
+    :param str shebang: the first line of a file, starting with #!.
+    :returns: the shebang to use instead, shebang itself if unchanged.
+    """
+    new_shebang = _ARGLESS_SHEBANG_PATTERN.sub(r"#!/usr/bin/env \1", shebang)
+    # The above rewrite will barf if the shebang includes any args to
+    # python. For example, if the shebang was `#!/usr/bin/python3 -Es`,
+    # just replacing that with `#!/usr/bin/env python3 -Es` isn't going
+    # to work as `env` doesn't support arguments like that.
     #
-    # The solution is to replace the shebang with one pointing to /bin/sh, and
-    # then exec the original shebang with included arguments. This requires
-    # some quoting hacks to ensure the file can be interpreted by both sh as
-    # well as python, but it's better than shipping our own `env`.
-    file_utils.replace_in_file(
-        root_dir,
-        file_pattern,
-        shebang_pattern_with_args,
-        r"""#!/bin/sh\n''''exec \1 \2 -- "$0" "$@" # '''""",
-    )
+    # The solution is to replace the shebang with one pointing to
+    # /bin/sh, and then exec the original shebang with included
+    # arguments. This requires some quoting hacks to ensure the file
+    # can be interpreted by both sh as well as python, but it's better
+    # than shipping our own `env`.
+    if new_shebang == shebang:
+        new_shebang = _SHEBANG_PATTERN_WITH_ARGS.sub(
+            r"""#!/bin/sh\n''''exec \1 \2 -- "$0" "$@" # '''""", shebang
+        )
+    return new_shebang
+
+
+def _rewrite_python_shebang(file_path: str) -> None:
+    try:
+        with open(file_path, "rb") as f:
+            if f.read(2) != b"#!":
+                return
+            try:
+                shebang = (b"#!" + f.readline()).decode()
+            except UnicodeDecodeError:
+                return
+
+            new_shebang = rewrite_python_shebang(shebang)
+            if new_shebang == shebang:
+                return
+
+            with file_utils.replacing_file(file_path, binary=True) as partial_file:
+                partial_file.write(new_shebang.encode())
+                shutil.copyfileobj(f, partial_file)
+    except PermissionError as e:
+        logger.warning(
+            "Unable to open {path} for writing: {error}".format(path=file_path, error=e)
+        )
 
 
 def clear_execstack(*, elf_files: FrozenSet[elf.ElfFile]) -> None:
@@ -64,7 +100,6 @@ def clear_execstack(*, elf_files: FrozenSet[elf.ElfFile]) -> None:
     param elf.ElfFile elf_files: the full list of elf files to analyze
                                  and clear the execstack if present.
     """
-    execstack_path = file_utils.get_snap_tool_path("execstack")
     elf_files_with_execstack = [e for e in elf_files if e.execstack_set]
 
     if elf_files_with_execstack:
@@ -78,7 +113,21 @@ def clear_execstack(*, elf_files: FrozenSet[elf.ElfFile]) -> None:
         )
 
     for elf_file in elf_files_with_execstack:
+        # The flag is cleared in place, break any hard link shared with the
+        # part's install directory or the stage-packages cache first.
         try:
-            subprocess.check_call([execstack_path, "--clear-execstack", elf_file.path])
-        except subprocess.CalledProcessError:
+            _unshare_file(elf_file.path)
+            cleared = elf_file.clear_execstack()
+        except OSError:
+            cleared = False
+        if not cleared:
             logger.warning("Failed to clear execstack for {!r}".format(elf_file.path))
+
+
+def _unshare_file(path: str) -> None:
+    if os.stat(path).st_nlink < 2:
+        return
+
+    with file_utils.replacing_file(path, binary=True) as partial_file:
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, partial_file)
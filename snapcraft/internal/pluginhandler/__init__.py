@@ -17,23 +17,36 @@
 import collections
 import contextlib
 import copy
-import filecmp
+import functools
 import io
+import itertools
 import logging
 import os
 import pathlib
 import shutil
+import stat
 import subprocess
 import sys
 from glob import iglob
-from typing import cast, Dict, List, Optional, Set, Sequence, TYPE_CHECKING
+from typing import cast, Dict, List, Optional, Set, Tuple, TYPE_CHECKING
 
 import snapcraft.extractors
-from snapcraft import file_utils, plugins, yaml_utils
-from snapcraft.internal import common, elf, errors, repo, sources, states, steps, xattrs
+from snapcraft import file_utils, plugins
+from snapcraft.internal import (
+    cache,
+    common,
+    elf,
+    errors,
+    repo,
+    sources,
+    states,
+    steps,
+    xattrs,
+)
 from snapcraft.internal.mangling import clear_execstack
 
 from ._build_attributes import BuildAttributes
+from ._collisions import check_for_collisions  # noqa: F401
 from ._dependencies import MissingDependencyResolver
 from ._metadata_extraction import extract_metadata
 from ._part_environment import get_snapcraft_part_environment
@@ -41,7 +54,9 @@ from ._plugin_loader import load_plugin  # noqa: F401
 from ._runner import Runner
 from ._patchelf import PartPatcher
 from ._dirty_report import Dependency, DirtyReport  # noqa
+from ._fileset import get_migratable_filesets
 from ._outdated_report import OutdatedReport
+from ._primed_libraries import PrimedLibraries
 
 
 if TYPE_CHECKING:
@@ -101,6 +116,12 @@ class PluginHandler:
         self._build_state: Optional[states.BuildState] = None
         self._stage_state: Optional[states.StageState] = None
         self._prime_state: Optional[states.PrimeState] = None
+        # Set while priming over files kept from a previous run, see
+        # _keep_primed.
+        self._previous_prime_state: Optional[states.PrimeState] = None
+        self._previous_prime_state_file = os.path.join(
+            self.part_dir, "previous_prime_state"
+        )
 
         self._project = project
         self.deps: List[str] = list()
@@ -158,6 +179,16 @@ class PluginHandler:
 
         self._current_step: Optional[steps.Step] = None
 
+        # When set, the output of the pull and build steps is written here
+        # instead of going to the terminal, used when parts are pulled and
+        # built side by side.
+        self.pull_log_path: Optional[pathlib.Path] = None
+        self.build_log_path: Optional[pathlib.Path] = None
+
+        # When set, kept up to date with the libraries this part primes and
+        # used to tell if those its files resolved against changed.
+        self.primed_libraries: Optional[PrimedLibraries] = None
+
     def get_pull_state(self) -> states.PullState:
         if not self._pull_state:
             self._pull_state = cast(states.PullState, self.get_state(steps.PULL))
@@ -408,8 +439,9 @@ class PluginHandler:
         if not state:
             state = {}
 
-        with open(states.get_step_state_file(self.part_state_dir, step), "w") as f:
-            f.write(yaml_utils.dump(state))
+        states.write_state_file(
+            states.get_step_state_file(self.part_state_dir, step), state
+        )
 
     def mark_cleaned(self, step):
         state_file = states.get_step_state_file(self.part_state_dir, step)
@@ -494,12 +526,30 @@ class PluginHandler:
         self.mark_pull_done()
 
     def _do_pull(self):
-        if self.source_handler:
+        if self.source_handler and self.pull_log_path is not None:
+            self._pull_source_to_log(self.pull_log_path)
+        elif self.source_handler:
             self.source_handler.pull()
 
         if isinstance(self.plugin, plugins.v1.PluginV1):
             self.plugin.pull()
 
+    def _pull_source_to_log(self, pull_log_path: pathlib.Path) -> None:
+        pull_log_path.parent.mkdir(parents=True, exist_ok=True)
+        with pull_log_path.open("w") as pull_log:
+            self.source_handler.log_file = pull_log
+            try:
+                self.source_handler.pull()
+            except sources.errors.SnapcraftSourceError:
+                logger.error(
+                    "Pull output for {!r} was saved to {!r}".format(
+                        self.name, str(pull_log_path)
+                    )
+                )
+                raise
+            finally:
+                self.source_handler.log_file = None
+
     def mark_pull_done(self):
         # Send an empty pull_properties for state. This makes it easy
         # to keep using what we have or to back out of not doing any
@@ -584,8 +634,20 @@ class PluginHandler:
                 shutil.rmtree(self.part_build_dir)
 
             # No hard-links being used here in case the build process modifies
-            # these files.
-            shutil.copytree(self.part_source_dir, self.part_build_dir, symlinks=True)
+            # these files, reflinks are used instead where supported.
+            copy_statistics = file_utils.CopyStatistics()
+            file_utils.link_or_copy_tree(
+                self.part_source_dir,
+                self.part_build_dir,
+                copy_function=functools.partial(
+                    file_utils.copy, statistics=copy_statistics
+                ),
+            )
+            logger.debug(
+                "Copied the source of {!r} to its build directory: {}".format(
+                    self.name, copy_statistics
+                )
+            )
 
         self._do_build()
 
@@ -597,14 +659,23 @@ class PluginHandler:
             # Use the local source to update. It's important to use
             # file_utils.copy instead of link_or_copy, as the build process
             # may modify these files
+            copy_statistics = file_utils.CopyStatistics()
             source = sources.Local(
-                self.part_source_dir, self.part_build_dir, copy_function=file_utils.copy
+                self.part_source_dir,
+                self.part_build_dir,
+                copy_function=functools.partial(
+                    file_utils.copy, statistics=copy_statistics
+                ),
             )
             if not source.check(
                 states.get_step_state_file(self.part_state_dir, steps.BUILD)
             ):
                 return
             source.update()
+            logger.debug(
+                "Copied the updated source of {!r} to its build directory: "
+                "{}".format(self.name, copy_statistics)
+            )
 
         self._do_build(update=True)
 
@@ -673,10 +744,27 @@ class PluginHandler:
         build_script_path.chmod(0o755)
 
         try:
-            subprocess.run(
-                [build_script_path], check=True, cwd=self.part_build_work_dir
-            )
+            if self.build_log_path is None:
+                subprocess.run(
+                    [build_script_path], check=True, cwd=self.part_build_work_dir
+                )
+            else:
+                self.build_log_path.parent.mkdir(parents=True, exist_ok=True)
+                with self.build_log_path.open("w") as build_log:
+                    subprocess.run(
+                        [build_script_path],
+                        check=True,
+                        cwd=self.part_build_work_dir,
+                        stdout=build_log,
+                        stderr=subprocess.STDOUT,
+                    )
         except subprocess.CalledProcessError as process_error:
+            if self.build_log_path is not None:
+                logger.error(
+                    "Build output for {!r} was saved to {!r}".format(
+                        self.name, str(self.build_log_path)
+                    )
+                )
             raise errors.SnapcraftPluginBuildError(
                 part_name=self.name
             ) from process_error
@@ -893,7 +981,29 @@ class PluginHandler:
         self.mark_cleaned(steps.STAGE)
 
     def prime(self, force=False) -> None:
-        self._do_runner_step(steps.PRIME)
+        # Files primed before the earlier steps ran again are only updated
+        # where they changed, which is up to the builtin prime. A custom
+        # override-prime could rely on anything in prime, so those and states
+        # from older versions are cleaned out instead.
+        previous_state = self._get_previous_prime_state()
+        if previous_state is not None and not (
+            self._part_properties.get("override-prime") == "snapcraftctl prime"
+            and hasattr(previous_state, "stage_file_stats")
+        ):
+            _clean_migrated_files(
+                previous_state.files,
+                previous_state.directories,
+                self._project.prime_dir,
+            )
+            previous_state = None
+
+        self._previous_prime_state = previous_state
+        try:
+            self._do_runner_step(steps.PRIME)
+        finally:
+            self._previous_prime_state = None
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._previous_prime_state_file)
 
         # Only mark this step done if _do_prime() didn't run, in which case
         # we have no files, directories, or dependency paths to track.
@@ -911,26 +1021,122 @@ class PluginHandler:
 
     def _do_prime(self) -> None:
         snap_files, snap_dirs = self.migratable_fileset_for(steps.PRIME)
+        stage_file_stats = _get_file_stats(snap_files, self._project.stage_dir)
+
+        previous_state = self._previous_prime_state
+        if previous_state is None:
+            changed_files = snap_files
+            previous_elf_dependencies = None
+        else:
+            changed_files = {
+                f
+                for f in snap_files
+                if previous_state.stage_file_stats.get(f) != stage_file_stats.get(f)
+            }
+            logger.debug(
+                "Updating {} of {} primed files".format(
+                    len(changed_files), len(snap_files)
+                )
+            )
+            _clean_migrated_files(
+                previous_state.files - snap_files,
+                previous_state.directories - snap_dirs,
+                self._project.prime_dir,
+            )
+            # _migrate_files leaves symlinks that are already there alone.
+            for snap_file in changed_files:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(self._project.prime_dir, snap_file))
+            previous_elf_dependencies = previous_state.elf_dependencies
+
         _migrate_files(
-            snap_files, snap_dirs, self._project.stage_dir, self._project.prime_dir
+            changed_files, snap_dirs, self._project.stage_dir, self._project.prime_dir
         )
+        if self.primed_libraries is not None:
+            self.primed_libraries.add(snap_files)
 
         if (
             self._project._snap_meta.type in ("app", None)
             and self._project._snap_meta.base is not None
         ):
-            dependency_paths = self._handle_elf(snap_files)
+            # Libraries primed by other parts can change how the files that
+            # did not change resolve, see mark_primed_sonames.
+            if previous_state is not None and (
+                self.primed_libraries is None
+                or getattr(previous_state, "primed_sonames", None)
+                != self.primed_libraries.get_digest()
+            ):
+                previous_elf_dependencies = None
+            dependency_paths, elf_dependencies = self._handle_elf(
+                snap_files,
+                changed_files=changed_files,
+                previous_elf_dependencies=previous_elf_dependencies,
+            )
         else:
             dependency_paths = set()
+            elf_dependencies = dict()
 
         primed_stage_packages = self._get_primed_stage_packages(snap_files)
         self.mark_prime_done(
-            snap_files, snap_dirs, dependency_paths, primed_stage_packages
+            snap_files,
+            snap_dirs,
+            dependency_paths,
+            primed_stage_packages,
+            stage_file_stats=stage_file_stats,
+            elf_dependencies=elf_dependencies,
+        )
+
+    def _handle_elf(
+        self,
+        snap_files: Set[str],
+        *,
+        changed_files: Optional[Set[str]] = None,
+        previous_elf_dependencies: Optional[Dict[str, List[str]]] = None,
+    ) -> Tuple[Set[str], Dict[str, List[str]]]:
+        # Parsed ELF attributes are kept around for unchanged files in later
+        # runs.
+        attribute_cache: Optional[cache.ElfAttributeCache] = None
+        if self._project._snap_meta.name:
+            attribute_cache = cache.ElfAttributeCache(
+                project_name=self._project._snap_meta.name
+            )
+
+        # When updating, the dependencies of the files that did not change
+        # are taken from the previous run.
+        unchanged_elf_dependencies: Dict[str, List[str]] = dict()
+        if changed_files is not None and previous_elf_dependencies is not None:
+            unchanged_elf_dependencies = {
+                f: d
+                for f, d in previous_elf_dependencies.items()
+                if f in snap_files and f not in changed_files
+            }
+
+        elf_files = elf.get_elf_files(
+            self._project.prime_dir,
+            changed_files if unchanged_elf_dependencies else snap_files,
+            max_workers=self._project.parallel_build_count,
+            attribute_cache=attribute_cache,
         )
 
-    def _handle_elf(self, snap_files: Sequence[str]) -> Set[str]:
-        elf_files = elf.get_elf_files(self._project.prime_dir, snap_files)
-        all_dependencies: Set[str] = set()
+        # Unless a library changed or went away, which could change how
+        # those files resolve.
+        if unchanged_elf_dependencies and (
+            any(elf_file.soname for elf_file in elf_files)
+            or not all(
+                os.path.exists(d)
+                for d in itertools.chain.from_iterable(
+                    unchanged_elf_dependencies.values()
+                )
+            )
+        ):
+            elf_files |= elf.get_elf_files(
+                self._project.prime_dir,
+                set(unchanged_elf_dependencies),
+                max_workers=self._project.parallel_build_count,
+                attribute_cache=attribute_cache,
+            )
+            unchanged_elf_dependencies = dict()
+
         if self._project._snap_meta.base is not None:
             core_path = common.get_installed_snap_path(self._project._snap_meta.base)
         else:
@@ -942,16 +1148,30 @@ class PluginHandler:
         # Determine content directories.
         content_dirs = self._project._get_provider_content_dirs()
 
+        library_resolver = elf.LibraryResolver(
+            root_path=self._project.prime_dir,
+            core_base_path=core_path,
+            content_dirs=content_dirs,
+            arch_triplet=self._project.arch_triplet,
+            attribute_cache=attribute_cache,
+        )
+        elf_dependencies = dict(unchanged_elf_dependencies)
         for elf_file in elf_files:
-            all_dependencies.update(
-                elf_file.load_dependencies(
-                    root_path=self._project.prime_dir,
-                    core_base_path=core_path,
-                    content_dirs=content_dirs,
-                    arch_triplet=self._project.arch_triplet,
-                    soname_cache=self._soname_cache,
-                )
+            dependencies = elf_file.load_dependencies(
+                root_path=self._project.prime_dir,
+                core_base_path=core_path,
+                content_dirs=content_dirs,
+                arch_triplet=self._project.arch_triplet,
+                soname_cache=self._soname_cache,
+                library_resolver=library_resolver,
             )
+            elf_dependencies[
+                os.path.relpath(elf_file.path, self._project.prime_dir)
+            ] = sorted(dependencies)
+        all_dependencies = set(itertools.chain.from_iterable(elf_dependencies.values()))
+
+        if attribute_cache is not None:
+            attribute_cache.save()
 
         # Split the necessary dependencies into their corresponding location.
         search_paths = [self._project.prime_dir, core_path, *content_dirs]
@@ -1011,10 +1231,17 @@ class PluginHandler:
             )
             part_patcher.patch()
 
-        return self._calculate_dependency_paths(split_dependencies)
+        return self._calculate_dependency_paths(split_dependencies), elf_dependencies
 
     def mark_prime_done(
-        self, snap_files, snap_dirs, dependency_paths, primed_stage_packages
+        self,
+        snap_files,
+        snap_dirs,
+        dependency_paths,
+        primed_stage_packages,
+        *,
+        stage_file_stats=None,
+        elf_dependencies=None,
     ):
         self.mark_done(
             steps.PRIME,
@@ -1026,10 +1253,59 @@ class PluginHandler:
                 self._project,
                 self._scriptlet_metadata[steps.PRIME],
                 primed_stage_packages,
+                stage_file_stats,
+                elf_dependencies,
             ),
         )
 
+    def mark_primed_sonames(self, primed_sonames: str) -> None:
+        """Record the digest of the libraries primed once all parts are primed.
+
+        The next prime only reuses the dependencies resolved for this part's
+        files if the libraries primed by then have the same digest.
+
+        :param str primed_sonames: digest from PrimedLibraries.get_digest.
+        """
+        state = self.get_state(steps.PRIME)
+        if state is None:
+            return
+        state.primed_sonames = primed_sonames
+        self.mark_done(steps.PRIME, state)
+        self._prime_state = None
+
+    def _keep_primed(self, project_primed_state):
+        if self.is_clean(steps.PRIME):
+            return
+
+        # Set aside what clean_prime would have removed, for prime to only
+        # update what changed.
+        state = cast(states.PrimeState, self.get_state(steps.PRIME))
+        try:
+            for other_name, other_state in project_primed_state.items():
+                if other_state and (other_name != self.name):
+                    state.files -= other_state.files
+                    state.directories -= other_state.directories
+        except AttributeError:
+            raise errors.MissingStateCleanError(steps.PRIME)
+        states.write_state_file(self._previous_prime_state_file, state)
+
+        self.mark_cleaned(steps.PRIME)
+
+    def _get_previous_prime_state(self) -> Optional[states.PrimeState]:
+        try:
+            return states.read_state_file(self._previous_prime_state_file)
+        except FileNotFoundError:
+            return None
+
     def clean_prime(self, project_primed_state, hint=""):
+        # Files kept by _keep_primed that were not primed over yet.
+        previous_state = self._get_previous_prime_state()
+        if previous_state is not None:
+            self._clean_shared_area(
+                self._project.prime_dir, previous_state, project_primed_state
+            )
+            os.remove(self._previous_prime_state_file)
+
         if self.is_clean(steps.PRIME):
             return
 
@@ -1092,7 +1368,20 @@ class PluginHandler:
     def env(self, root):
         return self.plugin.env(root)
 
-    def clean(self, project_staged_state=None, project_primed_state=None, step=None):
+    def clean(
+        self,
+        project_staged_state=None,
+        project_primed_state=None,
+        step=None,
+        *,
+        keep_primed=False,
+    ):
+        """Clean step and the steps after it, or everything if step is None.
+
+        :param bool keep_primed: leave the primed files in place, for prime to
+                                 only update what changed once the earlier
+                                 steps run again.
+        """
         if not project_staged_state:
             project_staged_state = {}
 
@@ -1100,7 +1389,9 @@ class PluginHandler:
             project_primed_state = {}
 
         try:
-            self._clean_steps(project_staged_state, project_primed_state, step)
+            self._clean_steps(
+                project_staged_state, project_primed_state, step, keep_primed
+            )
         except errors.MissingStateCleanError:
             # If one of the step cleaning rules is missing state, it must be
             # running on the output of an old Snapcraft. In that case, if we
@@ -1119,14 +1410,18 @@ class PluginHandler:
         if os.path.exists(self.part_dir) and not os.listdir(self.part_dir):
             os.rmdir(self.part_dir)
 
-    def _clean_steps(self, project_staged_state, project_primed_state, step=None):
+    def _clean_steps(
+        self, project_staged_state, project_primed_state, step=None, keep_primed=False
+    ):
         if step:
             if step not in steps.STEPS:
                 raise RuntimeError(
                     "{!r} is not a valid step for part {!r}".format(step, self.name)
                 )
 
-        if not step or step <= steps.PRIME:
+        if (not step or step <= steps.PRIME) and keep_primed:
+            self._keep_primed(project_primed_state)
+        elif not step or step <= steps.PRIME:
             self.clean_prime(project_primed_state)
 
         if not step or step <= steps.STAGE:
@@ -1204,47 +1499,7 @@ def _expand_part_properties(part_properties, part_schema):
 def _migratable_filesets(fileset, srcdir):
     includes, excludes = _get_file_list(fileset)
 
-    include_files = _generate_include_set(srcdir, includes)
-    exclude_files, exclude_dirs = _generate_exclude_set(srcdir, excludes)
-
-    # Chop files, including whole trees if any dirs are mentioned.
-    snap_files = include_files - exclude_files
-    for exclude_dir in exclude_dirs:
-        snap_files = set([x for x in snap_files if not x.startswith(exclude_dir + "/")])
-
-    # Separate dirs from files.
-    snap_dirs = set(
-        [
-            x
-            for x in snap_files
-            if os.path.isdir(os.path.join(srcdir, x))
-            and not os.path.islink(os.path.join(srcdir, x))
-        ]
-    )
-
-    # Remove snap_dirs from snap_files.
-    snap_files = snap_files - snap_dirs
-
-    # Include (resolved) parent directories for each selected file.
-    for snap_file in snap_files:
-        snap_file = file_utils.get_resolved_relative_path(snap_file, srcdir)
-        dirname = os.path.dirname(snap_file)
-        while dirname:
-            snap_dirs.add(dirname)
-            dirname = os.path.dirname(dirname)
-
-    # Resolve parent paths for dirs and files.
-    resolved_snap_dirs = set()
-    for snap_dir in snap_dirs:
-        snap_dir = file_utils.get_resolved_relative_path(snap_dir, srcdir)
-        resolved_snap_dirs.add(snap_dir)
-
-    resolved_snap_files = set()
-    for snap_file in snap_files:
-        snap_file = file_utils.get_resolved_relative_path(snap_file, srcdir)
-        resolved_snap_files.add(snap_file)
-
-    return resolved_snap_files, resolved_snap_dirs
+    return get_migratable_filesets(includes, excludes, srcdir)
 
 
 def _migrate_files(
@@ -1260,7 +1515,7 @@ def _migrate_files(
         src = os.path.join(srcdir, snap_dir)
         dst = os.path.join(dstdir, snap_dir)
 
-        snapcraft.file_utils.create_similar_directory(src, dst)
+        _migrate_directory(src, dst)
 
     for snap_file in sorted(snap_files):
         src = os.path.join(srcdir, snap_file)
@@ -1269,12 +1524,24 @@ def _migrate_files(
         if missing_ok and not os.path.exists(src):
             continue
 
-        # If the file is already here and it's a symlink, leave it alone.
-        if os.path.islink(dst):
-            continue
+        try:
+            dst_stat: Optional[os.stat_result] = os.lstat(dst)
+        except FileNotFoundError:
+            dst_stat = None
 
-        # Otherwise, remove and re-link it.
-        if os.path.exists(dst):
+        if dst_stat is not None:
+            # If the file is already here and it's a symlink, leave it alone.
+            if stat.S_ISLNK(dst_stat.st_mode):
+                continue
+
+            # Same if it's a hard-link to the source, re-linking would not
+            # change a thing.
+            if not src.endswith(".pc") and _is_same_inode(
+                src, dst_stat, follow_symlinks=follow_symlinks
+            ):
+                continue
+
+            # Otherwise, remove and re-link it.
             os.remove(dst)
 
         if src.endswith(".pc"):
@@ -1285,6 +1552,51 @@ def _migrate_files(
         fixup_func(dst)
 
 
+def _migrate_directory(src: str, dst: str) -> None:
+    try:
+        dst_stat = os.lstat(dst)
+    except FileNotFoundError:
+        dst_stat = None
+
+    if dst_stat is None or not stat.S_ISDIR(dst_stat.st_mode):
+        snapcraft.file_utils.create_similar_directory(src, dst)
+        return
+
+    # The directory is already there, only fix what differs. Its times are
+    # left alone, they change anyway as entries are migrated into it.
+    src_stat = os.stat(src, follow_symlinks=False)
+    if (src_stat.st_uid, src_stat.st_gid) != (dst_stat.st_uid, dst_stat.st_gid):
+        try:
+            os.chown(dst, src_stat.st_uid, src_stat.st_gid, follow_symlinks=False)
+        except PermissionError as exception:
+            logger.debug("Unable to chown {}: {}".format(dst, exception))
+    if stat.S_IMODE(src_stat.st_mode) != stat.S_IMODE(dst_stat.st_mode):
+        os.chmod(dst, stat.S_IMODE(src_stat.st_mode))
+
+
+def _is_same_inode(
+    src: str, dst_stat: os.stat_result, *, follow_symlinks: bool
+) -> bool:
+    try:
+        src_stat = os.stat(src, follow_symlinks=follow_symlinks)
+    except OSError:
+        return False
+
+    return (src_stat.st_dev, src_stat.st_ino) == (dst_stat.st_dev, dst_stat.st_ino)
+
+
+def _get_file_stats(snap_files: Set[str], directory: str) -> Dict[str, str]:
+    file_stats: Dict[str, str] = dict()
+    for snap_file in snap_files:
+        try:
+            file_stat = os.lstat(os.path.join(directory, snap_file))
+        except FileNotFoundError:
+            continue
+        # Not keyed on the inode, rebuilding the part replaces every file.
+        file_stats[snap_file] = "{}:{}".format(file_stat.st_size, file_stat.st_mtime_ns)
+    return file_stats
+
+
 def _organize_filesets(part_name, fileset, base_dir, overwrite):
     for key in sorted(fileset, key=lambda x: ["*" in x, x]):
         src = os.path.join(base_dir, key)
@@ -1383,141 +1695,12 @@ def _get_file_list(stage_set):
     return includes, excludes
 
 
-def _generate_include_set(directory, includes):
-    include_files = set()
-    for include in includes:
-        if "*" in include:
-            pattern = os.path.join(directory, include)
-            matches = iglob(pattern, recursive=True)
-            include_files |= set(matches)
-        else:
-            include_files |= set([os.path.join(directory, include)])
-
-    include_dirs = [x for x in include_files if os.path.isdir(x)]
-    include_files = set([os.path.relpath(x, directory) for x in include_files])
-
-    # Expand includeFiles, so that an exclude like '*/*.so' will still match
-    # files from an include like 'lib'
-    for include_dir in include_dirs:
-        for root, dirs, files in os.walk(include_dir):
-            include_files |= set(
-                [os.path.relpath(os.path.join(root, d), directory) for d in dirs]
-            )
-            include_files |= set(
-                [os.path.relpath(os.path.join(root, f), directory) for f in files]
-            )
-
-    return include_files
-
-
-def _generate_exclude_set(directory, excludes):
-    exclude_files = set()
-
-    for exclude in excludes:
-        pattern = os.path.join(directory, exclude)
-        matches = iglob(pattern, recursive=True)
-        exclude_files |= set(matches)
-
-    exclude_dirs = [
-        os.path.relpath(x, directory) for x in exclude_files if os.path.isdir(x)
-    ]
-    exclude_files = set([os.path.relpath(x, directory) for x in exclude_files])
-
-    return exclude_files, exclude_dirs
-
-
 def _validate_relative_paths(files):
     for d in files:
         if os.path.isabs(d):
             raise errors.PluginError('path "{}" must be relative'.format(d))
 
 
-def _file_collides(file_this, file_other):
-    if not file_this.endswith(".pc"):
-        return not filecmp.cmp(file_this, file_other, shallow=False)
-
-    pc_file_1 = open(file_this)
-    pc_file_2 = open(file_other)
-
-    try:
-        for lines in zip(pc_file_1, pc_file_2):
-            for line in zip(lines[0].split("\n"), lines[1].split("\n")):
-                if line[0].startswith("prefix="):
-                    continue
-                if line[0] != line[1]:
-                    return True
-    except Exception as e:
-        raise e from e
-    finally:
-        pc_file_1.close()
-        pc_file_2.close()
-    return False
-
-
-def check_for_collisions(parts):
-    """Raises a SnapcraftPartConflictError if conflicts are found."""
-    parts_files = {}
-    for part in parts:
-        # Gather our own files up
-        part_files, part_directories = part.migratable_fileset_for(steps.STAGE)
-        part_contents = part_files | part_directories
-
-        # Scan previous parts for collisions
-        for other_part_name in parts_files:
-            common = part_contents & parts_files[other_part_name]["files"]
-            conflict_files = []
-            for f in common:
-                this = os.path.join(part.part_install_dir, f)
-                other = os.path.join(parts_files[other_part_name]["installdir"], f)
-
-                if _paths_collide(this, other):
-                    conflict_files.append(f)
-
-            if conflict_files:
-                raise errors.SnapcraftPartConflictError(
-                    other_part_name=other_part_name,
-                    part_name=part.name,
-                    conflict_files=conflict_files,
-                )
-
-        # And add our files to the list
-        parts_files[part.name] = {
-            "files": part_contents,
-            "installdir": part.part_install_dir,
-        }
-
-
-def _paths_collide(path1: str, path2: str) -> bool:
-    if not (os.path.lexists(path1) and os.path.lexists(path2)):
-        return False
-
-    path1_is_dir = os.path.isdir(path1)
-    path2_is_dir = os.path.isdir(path2)
-    path1_is_link = os.path.islink(path1)
-    path2_is_link = os.path.islink(path2)
-
-    # Paths collide if they're both symlinks, but pointing to different places
-    if path1_is_link and path2_is_link:
-        return os.readlink(path1) != os.readlink(path2)
-
-    # Paths collide if one is a symlink, but not the other
-    elif path1_is_link or path2_is_link:
-        return True
-
-    # Paths collide if one is a directory, but not the other
-    elif path1_is_dir != path2_is_dir:
-        return True
-
-    # Paths collide if neither path is a directory, and the files have
-    # different contents
-    elif not (path1_is_dir and path2_is_dir) and _file_collides(path1, path2):
-        return True
-
-    # Otherwise, paths do not conflict
-    else:
-        return False
-
-
 def _get_includes(fileset):
     return [x for x in fileset if x[0] != "-"]
 
@@ -0,0 +1,204 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import filecmp
+import os
+import stat
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from snapcraft import file_utils
+from snapcraft.internal import cache, errors, steps
+
+if TYPE_CHECKING:
+    from . import PluginHandler  # noqa: F401
+
+
+class _Variant:
+    """One version of a path, and the parts that stage it."""
+
+    def __init__(self, path: str, path_stat: os.stat_result, part_name: str) -> None:
+        self.path = path
+        self.stat = path_stat
+        self.part_names = [part_name]
+
+
+class _CollisionIndex:
+    """Index every path staged by the parts added, reporting conflicts.
+
+    Each path maps to its distinct versions, so a part is only compared
+    against what other parts stage differently and not against every one of
+    them. File contents are compared by size first and by digest next, and
+    files that are hard links to the same inode are never read.
+    """
+
+    def __init__(self, digest_cache: Optional[cache.FileDigestCache]) -> None:
+        self._digest_cache = digest_cache
+        self._digests: Dict[str, str] = dict()
+        self._paths: Dict[str, List[_Variant]] = dict()
+        # (other_part_name, part_name) to the paths they conflict on.
+        self.conflicts: Dict[Tuple[str, str], List[str]] = collections.OrderedDict()
+
+    def add(self, part_name: str, installdir: str, relpaths: List[str]) -> None:
+        for relpath in relpaths:
+            path = os.path.join(installdir, relpath)
+            try:
+                path_stat = os.lstat(path)
+            except FileNotFoundError:
+                # Parts that have not been built yet cannot collide.
+                continue
+
+            variants = self._paths.setdefault(relpath, [])
+            matched_variant = None
+            for variant in variants:
+                if self._paths_collide(path, path_stat, variant.path, variant.stat):
+                    for other_part_name in variant.part_names:
+                        self.conflicts.setdefault(
+                            (other_part_name, part_name), []
+                        ).append(relpath)
+                elif matched_variant is None:
+                    matched_variant = variant
+
+            if matched_variant is None:
+                variants.append(_Variant(path, path_stat, part_name))
+            else:
+                matched_variant.part_names.append(part_name)
+
+    def _paths_collide(
+        self,
+        path1: str,
+        path1_stat: os.stat_result,
+        path2: str,
+        path2_stat: os.stat_result,
+    ) -> bool:
+        path1_is_link = stat.S_ISLNK(path1_stat.st_mode)
+        path2_is_link = stat.S_ISLNK(path2_stat.st_mode)
+
+        # Paths collide if they're both symlinks, but pointing to different places
+        if path1_is_link and path2_is_link:
+            return os.readlink(path1) != os.readlink(path2)
+
+        # Paths collide if one is a symlink, but not the other
+        if path1_is_link or path2_is_link:
+            return True
+
+        # Paths collide if one is a directory, but not the other
+        path1_is_dir = stat.S_ISDIR(path1_stat.st_mode)
+        path2_is_dir = stat.S_ISDIR(path2_stat.st_mode)
+        if path1_is_dir != path2_is_dir:
+            return True
+        if path1_is_dir and path2_is_dir:
+            return False
+
+        # Hard links to the same file have the same contents.
+        if (path1_stat.st_dev, path1_stat.st_ino) == (
+            path2_stat.st_dev,
+            path2_stat.st_ino,
+        ):
+            return False
+
+        if path1.endswith(".pc") or not (
+            stat.S_ISREG(path1_stat.st_mode) and stat.S_ISREG(path2_stat.st_mode)
+        ):
+            return _file_collides(path1, path2)
+
+        if path1_stat.st_size != path2_stat.st_size:
+            return True
+
+        return self._get_digest(path1) != self._get_digest(path2)
+
+    def _get_digest(self, path: str) -> str:
+        if path not in self._digests:
+            if self._digest_cache is not None:
+                self._digests[path] = self._digest_cache.get(path)
+            else:
+                self._digests[path] = file_utils.calculate_hash(
+                    path, algorithm="sha256"
+                )
+        return self._digests[path]
+
+
+def _file_collides(file_this, file_other):
+    if not file_this.endswith(".pc"):
+        return not filecmp.cmp(file_this, file_other, shallow=False)
+
+    pc_file_1 = open(file_this)
+    pc_file_2 = open(file_other)
+
+    try:
+        for lines in zip(pc_file_1, pc_file_2):
+            for line in zip(lines[0].split("\n"), lines[1].split("\n")):
+                if line[0].startswith("prefix="):
+                    continue
+                if line[0] != line[1]:
+                    return True
+    except Exception as e:
+        raise e from e
+    finally:
+        pc_file_1.close()
+        pc_file_2.close()
+    return False
+
+
+def check_for_collisions(parts: List["PluginHandler"]) -> None:
+    """Raises a SnapcraftPartConflictError if conflicts are found.
+
+    If more than one pair of parts conflict, all of them are reported
+    together in a SnapcraftPartConflictsError.
+    """
+    # Digests of unchanged files are kept around for later runs.
+    digest_cache: Optional[cache.FileDigestCache] = None
+    if parts and parts[0]._project._snap_meta.name:
+        digest_cache = cache.get_file_digest_cache(
+            project_name=parts[0]._project._snap_meta.name
+        )
+
+    index = _CollisionIndex(digest_cache)
+    try:
+        for part in parts:
+            part_files, part_directories = part.migratable_fileset_for(steps.STAGE)
+            index.add(
+                part.name,
+                part.part_install_dir,
+                sorted(part_files | part_directories),
+            )
+    finally:
+        if digest_cache is not None:
+            digest_cache.save()
+
+    if not index.conflicts:
+        return
+
+    # Report in the order the parts would have been staged in.
+    part_order = {part.name: i for i, part in enumerate(parts)}
+    conflicts = sorted(
+        index.conflicts.items(),
+        key=lambda c: (part_order[c[0][1]], part_order[c[0][0]]),
+    )
+    if len(conflicts) == 1:
+        (other_part_name, part_name), conflict_files = conflicts[0]
+        raise errors.SnapcraftPartConflictError(
+            other_part_name=other_part_name,
+            part_name=part_name,
+            conflict_files=conflict_files,
+        )
+
+    raise errors.SnapcraftPartConflictsError(
+        conflicts=[
+            (other_part_name, part_name, conflict_files)
+            for (other_part_name, part_name), conflict_files in conflicts
+        ]
+    )
@@ -0,0 +1,245 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import fnmatch
+import functools
+import os
+import re
+from typing import Dict, Iterator, List, Pattern, Set, Tuple
+
+# Name to whether it is a directory (following symlinks) and a symlink.
+_Listing = Dict[str, Tuple[bool, bool]]
+
+_MAGIC_CHARACTERS = re.compile("[*?[]")
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(pattern: str) -> Pattern:
+    return re.compile(fnmatch.translate(pattern))
+
+
+def _has_magic(pattern: str) -> bool:
+    return _MAGIC_CHARACTERS.search(pattern) is not None
+
+
+class FilesetMatcher:
+    """Match include and exclude filesets against a directory.
+
+    Patterns follow the semantics of glob with recursive set, and directories
+    matched by an include are expanded as os.walk would. Every directory is
+    listed with os.scandir at most once, however many patterns go through
+    it, and symlinks in parent directories are resolved once per directory.
+    """
+
+    def __init__(self, srcdir: str) -> None:
+        self._srcdir = srcdir
+        self._abs_srcdir = os.path.abspath(srcdir)
+        self._listings: Dict[str, _Listing] = dict()
+        self._resolved_dirs: Dict[str, str] = dict()
+
+    def _list(self, relpath: str) -> _Listing:
+        if relpath in self._listings:
+            return self._listings[relpath]
+
+        listing: _Listing = dict()
+        try:
+            with os.scandir(os.path.join(self._srcdir, relpath)) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    listing[entry.name] = (is_dir, entry.is_symlink())
+        except OSError:
+            pass
+
+        self._listings[relpath] = listing
+        return listing
+
+    def _get_entry(self, relpath: str) -> Tuple[bool, bool]:
+        dirname, name = os.path.split(relpath)
+        listing = self._list(dirname)
+        if name in listing:
+            return listing[name]
+
+        # Things like "." or "..", which are never listed.
+        path = os.path.join(self._srcdir, relpath)
+        return os.path.isdir(path), os.path.islink(path)
+
+    def is_dir(self, relpath: str) -> bool:
+        """Return whether relpath is a directory, following symlinks."""
+        return self._get_entry(relpath)[0]
+
+    def is_real_dir(self, relpath: str) -> bool:
+        """Return whether relpath is a directory and not a symlink to one."""
+        is_dir, is_symlink = self._get_entry(relpath)
+        return is_dir and not is_symlink
+
+    def glob(self, pattern: str) -> Iterator[str]:
+        """Yield the paths in srcdir matching pattern, relative to it.
+
+        Like glob.iglob(os.path.join(srcdir, pattern), recursive=True).
+        """
+        dirname, basename = os.path.split(pattern)
+        if not _has_magic(pattern):
+            path = os.path.join(self._srcdir, pattern)
+            if (basename and os.path.lexists(path)) or (
+                not basename and os.path.isdir(path)
+            ):
+                yield pattern
+            return
+
+        if dirname and _has_magic(dirname):
+            dirs: Iterator[str] = self._glob_dirs(dirname)
+        else:
+            dirs = iter([dirname])
+
+        for directory in dirs:
+            for name in self._glob_in_dir(directory, basename, dironly=False):
+                yield os.path.join(directory, name)
+
+    def _glob_dirs(self, pattern: str) -> Iterator[str]:
+        dirname, basename = os.path.split(pattern)
+        if dirname and _has_magic(dirname):
+            dirs: Iterator[str] = self._glob_dirs(dirname)
+        else:
+            dirs = iter([dirname])
+
+        for directory in dirs:
+            for name in self._glob_in_dir(directory, basename, dironly=True):
+                yield os.path.join(directory, name)
+
+    def _glob_in_dir(
+        self, directory: str, basename: str, *, dironly: bool
+    ) -> List[str]:
+        if basename == "**":
+            return [""] + list(self._list_recursively(directory, dironly=dironly))
+
+        listing = self._list(directory)
+        if not _has_magic(basename):
+            if basename:
+                path = os.path.join(self._srcdir, directory, basename)
+                if basename in listing or os.path.lexists(path):
+                    return [basename]
+                return []
+            return [basename] if self.is_dir(directory) else []
+
+        names = [n for n, (is_dir, _) in listing.items() if is_dir or not dironly]
+        if not basename.startswith("."):
+            names = [n for n in names if not n.startswith(".")]
+        regex = _compile(basename)
+        return [n for n in names if regex.match(n)]
+
+    def _list_recursively(self, directory: str, *, dironly: bool) -> Iterator[str]:
+        for name, (is_dir, _) in self._list(directory).items():
+            if name.startswith(".") or (dironly and not is_dir):
+                continue
+            yield name
+            for child in self._list_recursively(
+                os.path.join(directory, name), dironly=dironly
+            ):
+                yield os.path.join(name, child)
+
+    def walk(self, relpath: str) -> Iterator[str]:
+        """Yield everything under relpath, like os.walk without followlinks."""
+        # Keep the paths normalized, as os.path.relpath would.
+        if relpath == os.curdir:
+            relpath = ""
+        for name, (is_dir, is_symlink) in self._list(relpath).items():
+            path = os.path.join(relpath, name)
+            yield path
+            if is_dir and not is_symlink:
+                yield from self.walk(path)
+
+    def resolve(self, relpath: str) -> str:
+        """Resolve the parents of relpath, see get_resolved_relative_path."""
+        dirname, name = os.path.split(relpath)
+        if name in (".", ".."):
+            resolved_dirname = os.path.realpath(os.path.join(self._srcdir, dirname))
+            return os.path.relpath(
+                os.path.join(resolved_dirname, name), self._abs_srcdir
+            )
+
+        if dirname not in self._resolved_dirs:
+            self._resolved_dirs[dirname] = os.path.relpath(
+                os.path.realpath(os.path.join(self._srcdir, dirname)), self._abs_srcdir
+            )
+        resolved_dirname = self._resolved_dirs[dirname]
+        if resolved_dirname == ".":
+            return name
+        return os.path.join(resolved_dirname, name)
+
+
+def get_migratable_filesets(
+    includes: List[str], excludes: List[str], srcdir: str
+) -> Tuple[Set[str], Set[str]]:
+    """Return the files and directories in srcdir selected by the filesets.
+
+    :param list includes: glob patterns or paths to include.
+    :param list excludes: glob patterns or paths to exclude.
+    :param str srcdir: directory the filesets are relative to.
+    :returns: the resolved files and directories, relative to srcdir.
+    """
+    matcher = FilesetMatcher(srcdir)
+
+    include_files: Set[str] = set()
+    include_dirs: List[str] = list()
+    for include in includes:
+        if "*" in include:
+            matches = {os.path.normpath(m) for m in matcher.glob(include)}
+            include_dirs.extend(m for m in matches if matcher.is_dir(m))
+            include_files.update(matches)
+        else:
+            include_files.add(os.path.normpath(include))
+            # Paths like 'a/../lib' only exist if their parents do.
+            if os.path.isdir(os.path.join(srcdir, include)):
+                include_dirs.append(os.path.normpath(include))
+
+    # Expand include_files, so that an exclude like '*/*.so' will still match
+    # files from an include like 'lib'
+    for include_dir in include_dirs:
+        include_files.update(matcher.walk(include_dir))
+
+    exclude_files: Set[str] = set()
+    for exclude in excludes:
+        exclude_files.update(os.path.normpath(m) for m in matcher.glob(exclude))
+    exclude_dirs = [x for x in exclude_files if matcher.is_dir(x)]
+
+    # Chop files, including whole trees if any dirs are mentioned.
+    snap_files = include_files - exclude_files
+    if exclude_dirs:
+        exclude_prefixes = tuple(d + "/" for d in exclude_dirs)
+        snap_files = {x for x in snap_files if not x.startswith(exclude_prefixes)}
+
+    # Separate dirs from files.
+    snap_dirs = {x for x in snap_files if matcher.is_real_dir(x)}
+    snap_files -= snap_dirs
+
+    resolved_snap_files = {matcher.resolve(x) for x in snap_files}
+
+    # Include (resolved) parent directories for each selected file, every
+    # parent of a directory already seen has been added too.
+    parent_dirs: Set[str] = set()
+    for snap_file in resolved_snap_files:
+        dirname = os.path.dirname(snap_file)
+        while dirname and dirname not in parent_dirs:
+            parent_dirs.add(dirname)
+            dirname = os.path.dirname(dirname)
+    snap_dirs |= parent_dirs
+
+    resolved_snap_dirs = {matcher.resolve(x) for x in snap_dirs}
+
+    return resolved_snap_files, resolved_snap_dirs
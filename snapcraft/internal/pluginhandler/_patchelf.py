@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import concurrent.futures
 import logging
 import os
 from typing import FrozenSet, List
@@ -23,7 +24,6 @@ from snapcraft.internal import elf
 from snapcraft.internal import errors
 from snapcraft.project import Project
 
-
 logger = logging.getLogger(__name__)
 
 
@@ -80,20 +80,44 @@ class PartPatcher:
 
         # Patching all files instead of a subset of them to ensure the
         # environment is consistent and the chain of dlopens that may
-        # happen remains sane.
-        for elf_file in self._elf_files:
-            try:
-                elf_patcher.patch(elf_file=elf_file)
-            except errors.PatcherError as patch_error:
-                logger.warning(
-                    "An attempt to patch {!r} so that it would work "
-                    "correctly in diverse environments was made and failed. "
-                    "To disable this behavior set "
-                    "`build-attributes: [no-patchelf]` for the part.".format(
-                        elf_file.path
+        # happen remains sane. Work out what each one needs first, to only
+        # run patchelf for those that actually need patching.
+        patchelf_args = {
+            elf_file: elf_patcher.get_patchelf_args(elf_file=elf_file)
+            for elf_file in self._elf_files
+        }
+        elf_files = [e for e in self._elf_files if patchelf_args[e]]
+        logger.debug(
+            "Patching {} of {} ELF files".format(len(elf_files), len(self._elf_files))
+        )
+        if not elf_files:
+            return
+
+        max_workers = min(len(elf_files), self._project.parallel_build_count)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(
+                    elf_patcher.patch,
+                    elf_file=elf_file,
+                    patchelf_args_list=patchelf_args[elf_file],
+                ): elf_file
+                for elf_file in elf_files
+            }
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    future.result()
+                except errors.PatcherError as patch_error:
+                    for pending_future in futures:
+                        pending_future.cancel()
+                    logger.warning(
+                        "An attempt to patch {!r} so that it would work "
+                        "correctly in diverse environments was made and failed. "
+                        "To disable this behavior set "
+                        "`build-attributes: [no-patchelf]` for the part.".format(
+                            futures[future].path
+                        )
                     )
-                )
-                raise patch_error
+                    raise patch_error
 
     def _verify_compat(self) -> None:
         if self._project._snap_meta.base is None:
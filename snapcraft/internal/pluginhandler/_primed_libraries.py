@@ -0,0 +1,56 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import os
+import re
+from typing import Iterable, Set
+
+_SONAME_PATTERN = re.compile(r"\.so(\.|$)")
+
+
+class PrimedLibraries:
+    """The libraries in the prime directory, as parts get primed.
+
+    The prime directory is only walked once, the libraries each part primes
+    are then added as it is primed. Libraries removed in the meantime are
+    found out about when getting the digest.
+    """
+
+    def __init__(self, prime_dir: str) -> None:
+        self._prime_dir = prime_dir
+        self._paths: Set[str] = set()
+        for root, directories, files in os.walk(prime_dir):
+            self.add(
+                os.path.relpath(os.path.join(root, file_name), prime_dir)
+                for file_name in files
+            )
+
+    def add(self, primed_files: Iterable[str]) -> None:
+        """Add the libraries among primed_files.
+
+        :param primed_files: paths of primed files, relative to prime.
+        """
+        self._paths.update(
+            f for f in primed_files if _SONAME_PATTERN.search(os.path.basename(f))
+        )
+
+    def get_digest(self) -> str:
+        """Get a digest of the paths of the libraries in prime."""
+        self._paths = {
+            p for p in self._paths if os.path.lexists(os.path.join(self._prime_dir, p))
+        }
+        return hashlib.sha256("\n".join(sorted(self._paths)).encode()).hexdigest()
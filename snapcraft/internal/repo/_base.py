@@ -25,7 +25,7 @@ import re
 import shutil
 import stat
 
-from typing import List, Optional, Set
+from typing import List, Optional, Sequence, Set
 
 from snapcraft import file_utils
 from snapcraft.internal import mangling, xattrs
@@ -34,6 +34,12 @@ from . import errors
 
 logger = logging.getLogger(__name__)
 
+# Scripts with the prefix of where they are unpacked written into them.
+_XML_TOOLS_CONFIG_PATHS = [
+    os.path.join("usr", "bin", "xml2-config"),
+    os.path.join("usr", "bin", "xslt-config"),
+]
+
 
 class BaseRepo:
     """Base implementation for a platform specific repo handler.
@@ -201,6 +207,27 @@ class BaseRepo:
         cls._fix_xml_tools(unpackdir)
         cls._fix_shebangs(unpackdir)
 
+    @classmethod
+    def normalize_unpacked(
+        cls, unpackdir: str, *, absolute_symlinks: Sequence[str]
+    ) -> None:
+        """Finish normalizing artifacts that were fixed up as they were unpacked.
+
+        Backends that strip suid bits and rewrite shebangs and pkg-config
+        files while unpacking call this instead of normalize, saving a walk
+        over the whole of unpackdir.
+
+        :param str unpackdir: directory where files where unpacked.
+        :param absolute_symlinks: paths of unpacked symlinks with absolute
+                                  targets, fixed now that all the artifacts
+                                  they may point to are in place.
+        """
+        cls._remove_useless_files(unpackdir)
+        for path in absolute_symlinks:
+            if os.path.islink(path) and os.path.isabs(os.readlink(path)):
+                cls._fix_symlink(path, unpackdir, os.path.dirname(path))
+        cls._fix_xml_tools(unpackdir)
+
     @classmethod
     def _mark_origin_stage_package(
         cls, sources_dir: str, stage_package: str
@@ -229,7 +256,7 @@ class BaseRepo:
             os.remove(sitecustomize_file)
 
     @classmethod
-    def _fix_artifacts(cls, unpackdir: str) -> None:
+    def _fix_artifacts(cls, unpackdir: str, *, fix_symlinks: bool = True) -> List[str]:
         """Perform various modifications to unpacked artifacts.
 
         Sometimes distro packages will contain absolute symlinks (e.g. if the
@@ -238,37 +265,38 @@ class BaseRepo:
 
         Some unpacked items will also contain suid binaries which we do not
         want in the resulting snap.
+
+        :param bool fix_symlinks: whether to fix absolute symlinks now or
+                                  leave them for normalize_unpacked.
+        :returns: the absolute symlinks that were found.
         """
+        absolute_symlinks: List[str] = list()
         for root, dirs, files in os.walk(unpackdir):
             # Symlinks to directories will be in dirs, while symlinks to
             # non-directories will be in files.
             for entry in itertools.chain(files, dirs):
                 path = os.path.join(root, entry)
                 if os.path.islink(path) and os.path.isabs(os.readlink(path)):
-                    cls._fix_symlink(path, unpackdir, root)
+                    absolute_symlinks.append(path)
+                    if fix_symlinks:
+                        cls._fix_symlink(path, unpackdir, root)
                 elif os.path.exists(path):
                     _fix_filemode(path)
 
                 if path.endswith(".pc") and not os.path.islink(path):
                     fix_pkg_config(unpackdir, path)
 
+        return absolute_symlinks
+
     @classmethod
     def _fix_xml_tools(cls, unpackdir: str) -> None:
-        xml2_config_path = os.path.join(unpackdir, "usr", "bin", "xml2-config")
-        with contextlib.suppress(FileNotFoundError):
-            file_utils.search_and_replace_contents(
-                xml2_config_path,
-                re.compile(r"prefix=/usr"),
-                "prefix={}/usr".format(unpackdir),
-            )
-
-        xslt_config_path = os.path.join(unpackdir, "usr", "bin", "xslt-config")
-        with contextlib.suppress(FileNotFoundError):
-            file_utils.search_and_replace_contents(
-                xslt_config_path,
-                re.compile(r"prefix=/usr"),
-                "prefix={}/usr".format(unpackdir),
-            )
+        for config_path in _XML_TOOLS_CONFIG_PATHS:
+            with contextlib.suppress(FileNotFoundError):
+                file_utils.search_and_replace_contents(
+                    os.path.join(unpackdir, config_path),
+                    re.compile(r"prefix=/usr"),
+                    "prefix={}/usr".format(unpackdir),
+                )
 
     @classmethod
     def _fix_symlink(cls, path: str, unpackdir: str, root: str) -> None:
@@ -333,6 +361,15 @@ def fix_pkg_config(
                 print(line, end="")
 
 
+def is_rewritten_when_unpacked(relative_path: str) -> bool:
+    """Return whether normalizing rewrites relative_path for where it is.
+
+    :param str relative_path: path of an unpacked file, relative to where
+                              the package is unpacked.
+    """
+    return relative_path.endswith(".pc") or relative_path in _XML_TOOLS_CONFIG_PATHS
+
+
 def _fix_filemode(path: str) -> None:
     mode = stat.S_IMODE(os.stat(path, follow_symlinks=False).st_mode)
     if mode & 0o4000 or mode & 0o2000:
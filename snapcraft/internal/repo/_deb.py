@@ -14,13 +14,16 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import concurrent.futures
 import fileinput
 import functools
 import io
+import itertools
 import logging
 import os
 import pathlib
 import re
+import stat
 import subprocess
 import sys
 import tempfile
@@ -31,12 +34,19 @@ from typing_extensions import Final
 from xdg import BaseDirectory
 
 from snapcraft import file_utils
-from snapcraft.internal import os_release
+from snapcraft.internal import cache, os_release
 from snapcraft.internal.indicators import is_dumb_terminal
 from snapcraft.project._project_options import ProjectOptions
 
 from . import apt_ppa, errors
 from ._base import BaseRepo, get_pkg_name_parts
+from ._deb_package import (
+    DebPackage,
+    DirectoryMode,
+    UnsupportedDebError,
+    apply_directory_modes,
+    link_unpacked_tree,
+)
 from .apt_cache import AptCache
 
 logger = logging.getLogger(__name__)
@@ -204,6 +214,49 @@ def _get_host_arch() -> str:
     return ProjectOptions().deb_arch
 
 
+def _get_unpack_cache(
+    install_path: pathlib.Path,
+) -> Optional["cache.UnpackedStagePackageCache"]:
+    unpack_cache = cache.UnpackedStagePackageCache()
+    os.makedirs(unpack_cache.unpacked_cache_root, exist_ok=True)
+
+    # The cache only pays off when its trees can be hard-linked from.
+    cache_device = os.stat(unpack_cache.unpacked_cache_root).st_dev
+    if cache_device != install_path.stat().st_dev:
+        logger.debug(
+            "Not using the unpacked stage-packages cache, "
+            "{!r} is on a different device.".format(str(install_path))
+        )
+        return None
+
+    return unpack_cache
+
+
+def _defer_directory_modes(
+    extract_dir: str, install_dir: str, directory_modes: List[DirectoryMode]
+) -> None:
+    """Add the modes of extract_dir's directories to directory_modes.
+
+    The extracted directories are left writable, so that copying the tree
+    into install_dir does not make shared directories read-only.
+    """
+    for root, directories, files in os.walk(extract_dir):
+        for directory in directories:
+            path = os.path.join(root, directory)
+            if os.path.islink(path):
+                continue
+            directory_stat = os.stat(path)
+            mode = stat.S_IMODE(directory_stat.st_mode)
+            directory_modes.append(
+                (
+                    os.path.join(install_dir, os.path.relpath(path, extract_dir)),
+                    mode,
+                    directory_stat.st_mtime,
+                )
+            )
+            os.chmod(path, mode | stat.S_IRWXU)
+
+
 def _get_dpkg_list_path(base: str) -> pathlib.Path:
     return pathlib.Path(f"/snap/{base}/current/usr/share/snappy/dpkg.list")
 
@@ -440,16 +493,105 @@ class Ubuntu(BaseRepo):
     def unpack_stage_packages(
         cls, *, stage_packages_path: pathlib.Path, install_path: pathlib.Path
     ) -> None:
-        for pkg_path in stage_packages_path.glob("*.deb"):
-            with tempfile.TemporaryDirectory(suffix="deb-extract") as extract_dir:
-                # Extract deb package.
-                cls._extract_deb(pkg_path, extract_dir)
-                # Mark source of files.
-                marked_name = cls._extract_deb_name_version(pkg_path)
-                cls._mark_origin_stage_package(extract_dir, marked_name)
-                # Stage files to install_dir.
-                file_utils.link_or_copy_tree(extract_dir, install_path.as_posix())
-        cls.normalize(str(install_path))
+        pkg_paths = sorted(stage_packages_path.glob("*.deb"))
+        if not pkg_paths:
+            cls.normalize(str(install_path))
+            return
+
+        install_path.mkdir(parents=True, exist_ok=True)
+        unpack_cache = _get_unpack_cache(install_path)
+        max_workers = min(len(pkg_paths), ProjectOptions().parallel_build_count)
+        # Packages share directories, their modes are only applied once
+        # nothing is being unpacked into them anymore.
+        directory_modes: List[DirectoryMode] = list()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            unpacked = pool.map(
+                functools.partial(
+                    cls._unpack_deb,
+                    install_path=install_path,
+                    unpack_cache=unpack_cache,
+                    directory_modes=directory_modes,
+                ),
+                pkg_paths,
+            )
+            absolute_symlinks = list(itertools.chain.from_iterable(unpacked))
+        apply_directory_modes(directory_modes)
+
+        if unpack_cache is not None:
+            unpack_cache.prune()
+
+        cls.normalize_unpacked(str(install_path), absolute_symlinks=absolute_symlinks)
+
+    @classmethod
+    def _unpack_deb(
+        cls,
+        pkg_path: pathlib.Path,
+        *,
+        install_path: pathlib.Path,
+        unpack_cache: Optional["cache.UnpackedStagePackageCache"],
+        directory_modes: List[DirectoryMode],
+    ) -> List[str]:
+        """Unpack pkg_path into install_path, returning absolute symlinks.
+
+        The modes of the directories unpacked are added to directory_modes.
+        """
+        deb_package = DebPackage(pkg_path)
+        try:
+            marked_name = deb_package.get_name_version()
+            if unpack_cache is None:
+                return deb_package.unpack(
+                    install_path, origin=marked_name, directory_modes=directory_modes
+                )
+
+            arch = deb_package.get_architecture()
+            # Only a key to the cache, apt verified the package as it fetched it.
+            digest = cache.get_file_digest(str(pkg_path), algorithm="sha256")
+            tree_path = unpack_cache.get(package=marked_name, arch=arch, digest=digest)
+            if tree_path is None:
+                tree_path = unpack_cache.add(
+                    package=marked_name,
+                    arch=arch,
+                    digest=digest,
+                    unpack=functools.partial(
+                        cls._unpack_deb_to_cache, deb_package, origin=marked_name
+                    ),
+                )
+            return link_unpacked_tree(
+                tree_path,
+                install_path,
+                file_modes=unpack_cache.get_file_modes(tree_path),
+                directory_modes=directory_modes,
+            )
+        except UnsupportedDebError as error:
+            logger.debug(f"Falling back to dpkg-deb for {str(pkg_path)!r}: {error}")
+
+        with tempfile.TemporaryDirectory(suffix="deb-extract") as extract_dir:
+            # Extract deb package.
+            cls._extract_deb(pkg_path, extract_dir)
+            # Mark source of files.
+            marked_name = cls._extract_deb_name_version(pkg_path)
+            cls._mark_origin_stage_package(extract_dir, marked_name)
+            # Normalize what was extracted as DebPackage.unpack would have.
+            absolute_symlinks = cls._fix_artifacts(extract_dir, fix_symlinks=False)
+            cls._fix_shebangs(extract_dir)
+            _defer_directory_modes(
+                extract_dir, install_path.as_posix(), directory_modes
+            )
+            # Stage files to install_dir.
+            file_utils.link_or_copy_tree(extract_dir, install_path.as_posix())
+
+        return [
+            os.path.join(install_path.as_posix(), os.path.relpath(p, extract_dir))
+            for p in absolute_symlinks
+        ]
+
+    @classmethod
+    def _unpack_deb_to_cache(
+        cls, deb_package: DebPackage, tree_path: str, *, origin: str
+    ) -> None:
+        deb_package.unpack(
+            pathlib.Path(tree_path), origin=origin, rewrite_pkg_config=False
+        )
 
     @classmethod
     def build_package_is_valid(cls, package_name) -> bool:
@@ -0,0 +1,369 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import contextlib
+import io
+import itertools
+import logging
+import os
+import pathlib
+import shutil
+import stat
+import tarfile
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from snapcraft import file_utils
+from snapcraft.internal import mangling, xattrs
+from . import errors
+from ._base import fix_pkg_config, is_rewritten_when_unpacked
+
+logger = logging.getLogger(__name__)
+
+_AR_MAGIC = b"!<arch>\n"
+_AR_HEADER_SIZE = 60
+# Compressions that tarfile can stream, anything else (e.g. zstd) needs to
+# go through dpkg-deb.
+_SUPPORTED_COMPRESSIONS = ("", ".gz", ".xz", ".bz2")
+
+# (path, mode, mtime) for a directory.
+DirectoryMode = Tuple[str, int, float]
+
+
+class UnsupportedDebError(Exception):
+    """Raised when a deb cannot be read in-process."""
+
+
+class _MemberReader(io.RawIOBase):
+    """Read at most size bytes from fileobj, starting at its current offset."""
+
+    def __init__(self, fileobj: BinaryIO, size: int) -> None:
+        self._fileobj = fileobj
+        self._remaining = size
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._fileobj.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+class DebPackage:
+    """In-process access to the contents of a .deb package.
+
+    A deb is an ar archive holding a control and a data tarball, reading it
+    directly avoids running dpkg-deb once to extract it and once more to
+    query its name and version.
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+        self._members: Dict[str, Tuple[int, int]] = dict()
+        self._control: Optional[Dict[str, str]] = None
+
+        with self.path.open("rb") as deb_file:
+            if deb_file.read(len(_AR_MAGIC)) != _AR_MAGIC:
+                raise errors.UnpackError(str(path))
+
+            while True:
+                header = deb_file.read(_AR_HEADER_SIZE)
+                if len(header) < _AR_HEADER_SIZE:
+                    break
+                if header[58:60] != b"`\n":
+                    raise errors.UnpackError(str(path))
+
+                name = header[0:16].decode().strip().rstrip("/")
+                size = int(header[48:58].decode().strip())
+                self._members[name] = (deb_file.tell(), size)
+                # Members are aligned to even offsets.
+                deb_file.seek(size + size % 2, os.SEEK_CUR)
+
+    @contextlib.contextmanager
+    def _open_tar(self, prefix: str) -> Iterator[tarfile.TarFile]:
+        names = [n for n in self._members if n.startswith(prefix)]
+        if not names:
+            raise errors.UnpackError(str(self.path))
+        if names[0][len(prefix) :] not in _SUPPORTED_COMPRESSIONS:
+            raise UnsupportedDebError(names[0])
+
+        offset, size = self._members[names[0]]
+        with self.path.open("rb") as deb_file:
+            deb_file.seek(offset)
+            try:
+                with tarfile.open(
+                    fileobj=_MemberReader(deb_file, size), mode="r|*"
+                ) as tar:
+                    yield tar
+            except tarfile.CompressionError as error:
+                raise UnsupportedDebError(names[0]) from error
+            except tarfile.TarError as error:
+                raise errors.UnpackError(str(self.path)) from error
+
+    def _get_control(self) -> Dict[str, str]:
+        if self._control is not None:
+            return self._control
+
+        control: Dict[str, str] = dict()
+        with self._open_tar("control.tar") as tar:
+            for member in tar:
+                if os.path.normpath(member.name) != "control":
+                    continue
+                control_file = tar.extractfile(member)
+                if control_file is None:
+                    break
+                for line in control_file.read().decode().splitlines():
+                    key, sep, value = line.partition(":")
+                    if sep and not key.startswith((" ", "\t")):
+                        control[key] = value.strip()
+                break
+
+        self._control = control
+        return control
+
+    def get_name_version(self) -> str:
+        """Return `<package-name>=<version>` as found in the control file.
+
+        :raises UnsupportedDebError: if the control cannot be read in-process.
+        """
+        control = self._get_control()
+        try:
+            return "{}={}".format(control["Package"], control["Version"])
+        except KeyError:
+            raise errors.UnpackError(str(self.path))
+
+    def get_architecture(self) -> str:
+        """Return the architecture as found in the control file.
+
+        :raises UnsupportedDebError: if the control cannot be read in-process.
+        """
+        try:
+            return self._get_control()["Architecture"]
+        except KeyError:
+            raise errors.UnpackError(str(self.path))
+
+    def unpack(
+        self,
+        install_path: pathlib.Path,
+        *,
+        origin: str,
+        rewrite_pkg_config: bool = True,
+        directory_modes: Optional[List[DirectoryMode]] = None,
+    ) -> List[str]:
+        """Unpack the data of this package straight into install_path.
+
+        Each file is marked as coming from origin as it is created, suid and
+        sgid bits are dropped, python shebangs are changed to use env and
+        pkg-config files are rewritten to point to install_path. Symlinks with
+        an absolute target cannot be fixed until every package is unpacked,
+        those are returned for the caller to fix.
+
+        :param install_path: directory to unpack into.
+        :param origin: the `<package-name>=<version>` to mark files with.
+        :param rewrite_pkg_config: whether to rewrite pkg-config files, unset
+                                   when install_path is not where the files
+                                   will finally be used from.
+        :param directory_modes: if given, the modes of the unpacked
+                                directories are added to it for the caller
+                                to apply, instead of being applied here.
+        :returns: the paths of the symlinks with absolute targets.
+        :raises UnsupportedDebError: if the data cannot be read in-process.
+        """
+        absolute_symlinks: List[str] = list()
+        unpacked_directory_modes: List[DirectoryMode] = list()
+        install_dir = install_path.as_posix()
+
+        with self._open_tar("data.tar") as tar:
+            for member in tar:
+                relpath = os.path.normpath(member.name)
+                if relpath == ".":
+                    continue
+                if relpath.startswith("..") or os.path.isabs(relpath):
+                    raise errors.UnpackError(str(self.path))
+
+                path = os.path.join(install_dir, relpath)
+                mode = _strip_suid(path, member.mode)
+
+                if member.isdir():
+                    os.makedirs(path, exist_ok=True)
+                    unpacked_directory_modes.append((path, mode, member.mtime))
+                    continue
+
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                if member.issym():
+                    _remove_existing(path)
+                    os.symlink(member.linkname, path)
+                    os.utime(path, (member.mtime, member.mtime), follow_symlinks=False)
+                    if os.path.isabs(member.linkname):
+                        absolute_symlinks.append(path)
+                elif member.islnk():
+                    _remove_existing(path)
+                    target = os.path.join(
+                        install_dir, os.path.normpath(member.linkname)
+                    )
+                    os.link(target, path)
+                elif member.isreg():
+                    _write_file(tar, member, path, mode=mode, origin=origin)
+                    if rewrite_pkg_config and path.endswith(".pc"):
+                        fix_pkg_config(install_dir, path)
+                else:
+                    logger.debug(f"Skipping special file {relpath!r} in {origin}")
+
+        if directory_modes is None:
+            apply_directory_modes(unpacked_directory_modes)
+        else:
+            directory_modes.extend(unpacked_directory_modes)
+
+        return absolute_symlinks
+
+
+def link_unpacked_tree(
+    tree_path: str,
+    install_path: pathlib.Path,
+    *,
+    file_modes: Optional[Dict[str, int]] = None,
+    directory_modes: Optional[List[DirectoryMode]] = None,
+) -> List[str]:
+    """Hard-link a tree unpacked with DebPackage.unpack into install_path.
+
+    Files that normalizing rewrites for install_path, and those that cannot
+    be linked, are copied instead and given their mode from file_modes.
+
+    :param tree_path: directory the package was unpacked into.
+    :param install_path: directory to link the package into.
+    :param file_modes: the modes to give copied files, by their path relative
+                       to tree_path, when different from those in tree_path.
+    :param directory_modes: if given, the modes of the linked directories are
+                            added to it for the caller to apply, instead of
+                            being applied here.
+    :returns: the paths of the symlinks with absolute targets.
+    """
+    absolute_symlinks: List[str] = list()
+    linked_directory_modes: List[DirectoryMode] = list()
+    install_dir = install_path.as_posix()
+
+    for root, directories, files in os.walk(tree_path):
+        destination_root = os.path.normpath(
+            os.path.join(install_dir, os.path.relpath(root, tree_path))
+        )
+        for entry in itertools.chain(directories, files):
+            source = os.path.join(root, entry)
+            path = os.path.join(destination_root, entry)
+            source_stat = os.lstat(source)
+
+            # Symlinks to directories are listed along with directories.
+            if stat.S_ISLNK(source_stat.st_mode):
+                _remove_existing(path)
+                link_target = os.readlink(source)
+                os.symlink(link_target, path)
+                os.utime(
+                    path,
+                    (source_stat.st_mtime, source_stat.st_mtime),
+                    follow_symlinks=False,
+                )
+                if os.path.isabs(link_target):
+                    absolute_symlinks.append(path)
+            elif stat.S_ISDIR(source_stat.st_mode):
+                os.makedirs(path, exist_ok=True)
+                linked_directory_modes.append(
+                    (path, stat.S_IMODE(source_stat.st_mode), source_stat.st_mtime)
+                )
+            else:
+                relative_path = os.path.relpath(source, tree_path)
+                # Never write through, or link to, a file already there.
+                _remove_existing(path)
+                if is_rewritten_when_unpacked(relative_path) or not _link(
+                    source, path
+                ):
+                    file_utils.copy(source, path)
+                    if file_modes is not None and relative_path in file_modes:
+                        os.chmod(path, file_modes[relative_path])
+                if path.endswith(".pc"):
+                    fix_pkg_config(install_dir, path)
+
+    if directory_modes is None:
+        apply_directory_modes(linked_directory_modes)
+    else:
+        directory_modes.extend(linked_directory_modes)
+
+    return absolute_symlinks
+
+
+def apply_directory_modes(directory_modes: Iterable[DirectoryMode]) -> None:
+    """Give directories their mode and modification time.
+
+    Like tar, apply these last so that restrictive modes do not get in the way
+    of writing into the directories, and so that writing into them does not
+    change their times after they have been set.
+
+    :param directory_modes: the directories with their mode and mtime.
+    """
+    for path, mode, mtime in directory_modes:
+        os.chmod(path, mode)
+        os.utime(path, (mtime, mtime))
+
+
+def _strip_suid(path: str, mode: int) -> int:
+    mode &= 0o7777
+    if mode & 0o4000 or mode & 0o2000:
+        logger.warning("Removing suid/guid from {}".format(path))
+        mode &= 0o1777
+    return mode
+
+
+def _link(source: str, path: str) -> bool:
+    try:
+        os.link(source, path)
+    except OSError:
+        return False
+    return True
+
+
+def _remove_existing(path: str) -> None:
+    if os.path.islink(path) or os.path.isfile(path):
+        os.unlink(path)
+
+
+def _write_file(
+    tar: tarfile.TarFile, member: tarfile.TarInfo, path: str, *, mode: int, origin: str
+) -> None:
+    source = tar.extractfile(member)
+    if source is None:
+        raise errors.UnpackError(path)
+
+    # Replace, and so never write through, any file or hard link already there.
+    with file_utils.replacing_file(
+        path, binary=True, copy_stat=False, check_writable=False
+    ) as destination:
+        head = source.read(2)
+        if head == b"#!":
+            head += source.readline()
+            with contextlib.suppress(UnicodeDecodeError):
+                head = mangling.rewrite_python_shebang(head.decode()).encode()
+        destination.write(head)
+        shutil.copyfileobj(source, destination, 2 ** 20)
+        destination.flush()
+        # Mark the source while the file is still writable.
+        xattrs.write_origin_stage_package(destination.name, origin)
+        os.chmod(destination.name, mode)
+        os.utime(destination.name, (member.mtime, member.mtime))
@@ -23,6 +23,7 @@ from contextlib import ContextDecorator
 from pathlib import Path
 from typing import Dict, List, Optional, Set, Tuple
 
+from snapcraft import file_utils
 from snapcraft.internal import common
 from snapcraft.internal.indicators import is_dumb_terminal
 from snapcraft.internal.repo import errors
@@ -159,15 +160,54 @@ class AptCache(ContextDecorator):
         return None
 
     def fetch_archives(self, download_path: Path) -> List[Tuple[str, str, Path]]:
-        """Fetches archives, list of (<package-name>, <package-version>, <dl-path>)."""
+        """Fetches archives, list of (<package-name>, <package-version>, <dl-path>).
+
+        Archives not already in download_path are queued into a single apt
+        acquire run, so they are downloaded in parallel with one progress
+        report.
+        """
+        acquire = apt.apt_pkg.Acquire(self.progress)
+        acquire_files = list()
         downloaded = list()
         for package in self.cache.get_changes():
-            try:
-                dl_path = package.candidate.fetch_binary(str(download_path))
-            except apt.package.FetchError as e:
-                raise errors.PackageFetchError(str(e))
+            candidate = package.candidate
+            dl_path = Path(download_path, os.path.basename(candidate.filename))
+
+            if _is_archive_fetched(dl_path, candidate):
+                logger.debug(f"Ignoring already fetched archive: {dl_path}")
+            else:
+                if not any(origin.trusted for origin in candidate.origins):
+                    raise errors.PackageFetchError(
+                        f"The item {str(dl_path)!r} could not be fetched: "
+                        "it is not from a trusted origin"
+                    )
+                acquire_files.append(
+                    apt.apt_pkg.AcquireFile(
+                        acquire,
+                        uri=candidate.uri,
+                        hash=f"SHA256:{candidate.sha256}",
+                        size=candidate.size,
+                        descr=f"{package.name} {candidate.version}",
+                        short_descr=package.name,
+                        destfile=str(dl_path),
+                    )
+                )
+
+            downloaded.append((package.name, candidate.version, dl_path))
+
+        if acquire_files:
+            if acquire.run() != acquire.RESULT_CONTINUE:
+                raise errors.PackageFetchError("the download was cancelled")
+
+        failed = [
+            f"The item {acquire_file.destfile!r} could not be fetched: "
+            f"{acquire_file.error_text}"
+            for acquire_file in acquire_files
+            if acquire_file.status != acquire_file.STAT_DONE
+        ]
+        if failed:
+            raise errors.PackageFetchError("\n".join(failed))
 
-            downloaded.append((package.name, package.candidate.version, Path(dl_path)))
         return downloaded
 
     def get_installed_packages(self) -> Dict[str, str]:
@@ -263,3 +303,10 @@ class AptCache(ContextDecorator):
             self.cache = apt.Cache(rootdir=str(self.stage_cache), memonly=True)
         except apt.cache.FetchFailedException as e:
             raise errors.CacheUpdateFailedError(str(e))
+
+
+def _is_archive_fetched(path: Path, candidate: apt.package.Version) -> bool:
+    if not path.exists() or path.stat().st_size != candidate.size:
+        return False
+
+    return file_utils.calculate_hash(str(path), algorithm="sha256") == candidate.sha256
@@ -80,6 +80,7 @@ import re
 import sys
 
 from . import errors
+from ._download_pool import prefetch  # noqa: F401
 
 if sys.platform == "linux":
     from ._bazaar import Bazaar  # noqa
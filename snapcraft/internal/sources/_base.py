@@ -13,21 +13,39 @@
 #
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import contextlib
+import logging
 import os
 import requests
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
+from typing import Optional, TextIO
 
 import snapcraft.internal.common
-from snapcraft.internal.cache import FileCache
+from snapcraft import file_utils
+from snapcraft.internal import downloader
+from snapcraft.internal.cache import FileCache, set_file_digest
+from snapcraft.internal.errors import SnapcraftCopyFileNotFoundError
 from snapcraft.internal.indicators import (
-    download_requests_stream,
+    CombinedDownloadProgress,
     download_urllib_source,
 )
 from ._checksum import split_checksum, verify_checksum
+from ._download_pool import get_session
 from . import errors
 
+logger = logging.getLogger(__name__)
+
+# Connections large sources are downloaded over.
+_DOWNLOAD_CONNECTIONS = 4
+
+# Where sources without a source-checksum are prefetched to.
+_prefetch_dir: Optional[tempfile.TemporaryDirectory] = None
+_prefetch_dir_lock = threading.Lock()
+
 
 class Base:
     def __init__(
@@ -52,6 +70,11 @@ class Base:
 
         self.command = command
         self._checked = False
+        # When set, the output of pulling is written here instead of going
+        # to the terminal.
+        self.log_file: Optional[TextIO] = None
+        self._prefetched_path: Optional[str] = None
+        self._prefetched_digest: Optional[str] = None
 
     def check(self, target: str):
         """Check if pulled sources have changed since target was created.
@@ -83,12 +106,17 @@ class Base:
         raise errors.SourceUpdateUnsupportedError(self)
 
     def _run(self, command, **kwargs):
+        if self.log_file is not None:
+            kwargs.setdefault("stdout", self.log_file)
+            kwargs.setdefault("stderr", subprocess.STDOUT)
         try:
             subprocess.check_call(command, **kwargs)
         except subprocess.CalledProcessError as e:
             raise errors.SnapcraftPullError(command, e.returncode)
 
     def _run_output(self, command, **kwargs):
+        if self.log_file is not None:
+            kwargs.setdefault("stderr", self.log_file)
         try:
             return (
                 subprocess.check_output(command, **kwargs)
@@ -114,8 +142,8 @@ class FileBase(Base):
             # We make this copy as the provisioning logic can delete
             # this file and we don't want that.
             try:
-                shutil.copy2(self.source, source_file)
-            except FileNotFoundError as exc:
+                file_utils.copy(self.source, source_file, follow_symlinks=True)
+            except SnapcraftCopyFileNotFoundError as exc:
                 raise errors.SnapcraftSourceNotFoundError(self.source) from exc
 
         # Verify before provisioning
@@ -138,26 +166,161 @@ class FileBase(Base):
             algorithm, hash = split_checksum(self.source_checksum)
             cache_file = file_cache.get(algorithm=algorithm, hash=hash)
             if cache_file:
-                # We make this copy as the provisioning logic can delete
-                # this file and we don't want that.
-                shutil.copy2(cache_file, self.file)
+                # Link out of the cache, which the provisioning logic deleting
+                # this file does not affect.
+                file_utils.link_or_copy(cache_file, self.file)
                 return self.file
 
-        # If not we download and store
+        # If not we download and store, replacing rather than appending to
+        # any earlier download, which may well be a link into the cache.
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.file)
+        if self._prefetched_path is not None:
+            # Downloaded ahead of time without a source-checksum to cache it by.
+            shutil.move(self._prefetched_path, self.file)
+            self._prefetched_path = None
+            return self.file
         if snapcraft.internal.common.get_url_scheme(self.source) == "ftp":
             download_urllib_source(self.source, self.file)
+            if self.source_checksum:
+                algorithm, hash = verify_checksum(self.source_checksum, self.file)
         else:
-            try:
-                request = requests.get(self.source, stream=True, allow_redirects=True)
-                request.raise_for_status()
-            except requests.exceptions.RequestException as e:
-                raise errors.SnapcraftRequestError(message=e)
-
-            download_requests_stream(request, self.file)
+            algorithm = hash = None
+            if self.source_checksum:
+                algorithm, hash = split_checksum(self.source_checksum)
+            digest = self._download_to(self.file, algorithm=algorithm, hash=hash)
+            if algorithm is not None:
+                # Caching then need not read the file again.
+                set_file_digest(self.file, digest, algorithm=algorithm)
 
-        # We verify the file if source_checksum is defined
-        # and we cache the file for future reuse.
+        # We cache the file for future reuse if source_checksum is defined.
         if self.source_checksum:
-            algorithm, digest = verify_checksum(self.source_checksum, self.file)
             file_cache.cache(filename=self.file, algorithm=algorithm, hash=hash)
         return self.file
+
+    def _download_to(
+        self,
+        destination: str,
+        *,
+        algorithm: Optional[str],
+        hash: Optional[str],
+        progress: Optional[CombinedDownloadProgress] = None,
+    ) -> Optional[str]:
+        # Verifying the download also tells if a leftover partial download
+        # was of something else, so only then resume it.
+        resumed = algorithm is not None and os.path.exists(
+            "{}.partial".format(destination)
+        )
+        digest = self._download_from(destination, algorithm, resumed, progress)
+        if resumed and digest != hash:
+            logger.debug(
+                "Downloading {!r} again, the download it continued from did "
+                "not match.".format(self.source)
+            )
+            digest = self._download_from(destination, algorithm, False, progress)
+        if hash is not None and digest != hash:
+            raise errors.DigestDoesNotMatchError(hash, digest)
+        return digest
+
+    def _download_from(
+        self,
+        destination: str,
+        algorithm: Optional[str],
+        resume: bool,
+        progress: Optional[CombinedDownloadProgress],
+    ) -> Optional[str]:
+        if progress is None and self.log_file is not None:
+            with CombinedDownloadProgress(
+                0, "Downloading {!r}".format(self.source), fd=self.log_file
+            ) as log_progress:
+                return self._download_from(
+                    destination, algorithm, resume, log_progress
+                )
+
+        try:
+            return downloader.download(
+                self.source,
+                destination,
+                session=get_session(),
+                algorithm=algorithm,
+                resume=resume,
+                connections=_DOWNLOAD_CONNECTIONS,
+                progress=progress,
+            )
+        except requests.exceptions.RequestException as e:
+            raise errors.SnapcraftRequestError(message=e)
+
+    def is_prefetchable(self) -> bool:
+        """Return True if the source can be downloaded ahead of pulling it."""
+        if snapcraft.internal.common.get_url_scheme(self.source) not in (
+            "http",
+            "https",
+        ):
+            return False
+        if self.source_checksum:
+            algorithm, hash = split_checksum(self.source_checksum)
+            return FileCache().get(algorithm=algorithm, hash=hash) is None
+        return True
+
+    def prefetch(self, progress: CombinedDownloadProgress) -> None:
+        """Download the source ahead of pulling it.
+
+        This runs in a thread of its own, next to other prefetches, and only
+        downloads. finish_prefetch then has to be called from the main thread.
+
+        :param progress: a CombinedDownloadProgress updated as it downloads.
+        """
+        if self.source_checksum:
+            # A stable path, for an interrupted prefetch to be continued.
+            algorithm, hash = split_checksum(self.source_checksum)
+            destination = os.path.join(
+                FileCache().cache_root, "prefetch", algorithm, hash
+            )
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+        else:
+            algorithm = hash = None
+            destination = os.path.join(
+                tempfile.mkdtemp(dir=_get_prefetch_dir()),
+                os.path.basename(self.source),
+            )
+
+        try:
+            digest = self._download_to(
+                destination, algorithm=algorithm, hash=hash, progress=progress
+            )
+        except errors.DigestDoesNotMatchError:
+            os.unlink(destination)
+            raise
+        self._prefetched_path = destination
+        self._prefetched_digest = digest
+
+    def finish_prefetch(self) -> None:
+        """Keep what prefetch downloaded for pulling the source later.
+
+        Sources with a source-checksum are moved into the file cache, others
+        are kept in a temporary directory for this process.
+        """
+        if self._prefetched_path is None or not self.source_checksum:
+            return
+
+        algorithm, hash = split_checksum(self.source_checksum)
+        prefetched_path = self._prefetched_path
+        self._prefetched_path = None
+        try:
+            # Caching then needs not read the file again.
+            set_file_digest(
+                prefetched_path, self._prefetched_digest, algorithm=algorithm
+            )
+            FileCache().cache(filename=prefetched_path, algorithm=algorithm, hash=hash)
+        finally:
+            os.unlink(prefetched_path)
+
+
+def _get_prefetch_dir() -> str:
+    # Removed again when the process exits.
+    global _prefetch_dir
+
+    with _prefetch_dir_lock:
+        if _prefetch_dir is None:
+            _prefetch_dir = tempfile.TemporaryDirectory(prefix="snapcraft-prefetch-")
+        return _prefetch_dir.name
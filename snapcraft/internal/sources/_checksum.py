@@ -45,6 +45,7 @@ def verify_checksum(source_checksum: str, checkfile: str) -> Tuple:
     """
     algorithm, digest = split_checksum(source_checksum)
 
+    # Read the contents, a digest looked up by file metadata is no proof.
     calculated_digest = calculate_hash(checkfile, algorithm=algorithm)
     if digest != calculated_digest:
         raise errors.DigestDoesNotMatchError(digest, calculated_digest)
@@ -0,0 +1,94 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from snapcraft.internal.indicators import CombinedDownloadProgress
+
+logger = logging.getLogger(__name__)
+
+# Downloads running at once, and connections kept open per host.
+_MAX_DOWNLOADS = 4
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Get the requests session shared by source downloads.
+
+    Reusing it keeps connections to the hosts sources are downloaded from
+    open, across parts and across the downloads running concurrently.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=_MAX_DOWNLOADS)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def prefetch(source_handlers: Sequence[Any]) -> None:
+    """Download the remote sources of source_handlers concurrently.
+
+    Sources with a source-checksum download into the file cache, others into
+    a temporary directory, where pulling them later finds them. Failures are
+    left for that pull to report.
+
+    :param source_handlers: the source handlers of the parts to be pulled.
+    """
+    handlers = [
+        h for h in source_handlers if hasattr(h, "prefetch") and h.is_prefetchable()
+    ]
+    if not handlers:
+        return
+
+    with ThreadPoolExecutor(max_workers=_MAX_DOWNLOADS) as executor:
+        # Ask for all the lengths first, the progress needs to know the total.
+        total_length = sum(executor.map(_get_length, handlers))
+        message = "Downloading {} sources".format(len(handlers))
+        with CombinedDownloadProgress(total_length, message) as progress:
+            futures = [executor.submit(h.prefetch, progress) for h in handlers]
+            # Only this thread records what was downloaded, in caches shared
+            # by the whole process.
+            for handler, future in zip(handlers, futures):
+                try:
+                    future.result()
+                    handler.finish_prefetch()
+                except Exception as e:
+                    logger.debug("Not prefetching {!r}: {}".format(handler.source, e))
+
+
+def _get_length(handler: Any) -> int:
+    try:
+        response = get_session().head(handler.source, allow_redirects=True)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        logger.debug("Length of {!r} unknown: {}".format(handler.source, e))
+        return 0
+    # Encoded bodies are longer once decoded than advertised.
+    if response.headers.get("Content-Encoding"):
+        return 0
+    return int(response.headers.get("Content-Length", "0"))
@@ -14,15 +14,21 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import distutils.util
 import os
 import re
+import shutil
 import subprocess
 import sys
 from typing import List
 
+from snapcraft.internal.cache import GitMirrorCache
 from . import errors
 from ._base import Base
 
+# Mirrors only keep branches and tags, leaving out the likes of pull requests.
+_MIRROR_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+
 
 class Git(Base):
     @classmethod
@@ -206,7 +212,171 @@ class Git(Base):
             **self._call_kwargs
         )
 
+    def _use_mirrors(self) -> bool:
+        # Local repositories, and shallow clones which would otherwise fetch
+        # the whole history into the mirror, are cloned from directly.
+        if os.path.exists(self.source) or self.source_depth:
+            return False
+        return distutils.util.strtobool(os.getenv("SNAPCRAFT_ENABLE_GIT_MIRRORS", "y"))
+
+    def _update_mirror(self, mirror_path: str, url: str) -> None:
+        if os.path.isdir(mirror_path):
+            self._run(
+                [self.command, "-C", mirror_path, "fetch", "--prune", "origin"]
+                + _MIRROR_REFSPECS,
+                **self._call_kwargs
+            )
+            return
+
+        # Cloned aside, so an interrupted clone is not taken for a mirror.
+        partial_path = "{}.partial".format(mirror_path)
+        shutil.rmtree(partial_path, ignore_errors=True)
+        self._run(
+            [self.command, "clone", "--bare", url, partial_path],
+            **self._call_kwargs
+        )
+        os.rename(partial_path, mirror_path)
+
+    def _clone_from_mirror(self):
+        with GitMirrorCache().lock(self.source) as mirror_path:
+            self._update_mirror(mirror_path, self.source)
+            if self.source_commit:
+                # The commit may not be reachable from any of the refs.
+                self._run(
+                    [
+                        self.command,
+                        "-C",
+                        mirror_path,
+                        "fetch",
+                        "origin",
+                        self.source_commit,
+                    ],
+                    **self._call_kwargs
+                )
+
+            command = [self.command, "clone"]
+            if self.source_tag or self.source_branch:
+                command.extend(["--branch", self.source_tag or self.source_branch])
+            self._run(command + [mirror_path, self.source_dir], **self._call_kwargs)
+
+            if self.source_commit:
+                self._fetch_origin_commit()
+                self._run(
+                    [
+                        self.command,
+                        "-C",
+                        self.source_dir,
+                        "checkout",
+                        self.source_commit,
+                    ],
+                    **self._call_kwargs
+                )
+
+        # Later pulls fetch from the repository itself.
+        self._run(
+            [
+                self.command,
+                "-C",
+                self.source_dir,
+                "remote",
+                "set-url",
+                "origin",
+                self.source,
+            ],
+            **self._call_kwargs
+        )
+        self._update_submodules_from_mirrors(self.source_dir)
+
+    def _update_submodules_from_mirrors(self, repo_dir: str) -> None:
+        if not os.path.exists(os.path.join(repo_dir, ".gitmodules")):
+            return
+
+        try:
+            submodule_urls = self._run_output(
+                [
+                    self.command,
+                    "-C",
+                    repo_dir,
+                    "config",
+                    "--file",
+                    ".gitmodules",
+                    "--get-regexp",
+                    r"^submodule\..*\.url$",
+                ]
+            )
+        except errors.SnapcraftPullError:
+            # There are none.
+            return
+        names = [
+            line.split()[0][len("submodule.") : -len(".url")]
+            for line in submodule_urls.splitlines()
+        ]
+
+        # Registers the urls, relative ones resolved against origin's.
+        self._run(
+            [self.command, "-C", repo_dir, "submodule", "init"], **self._call_kwargs
+        )
+        for name in names:
+            url_key = "submodule.{}.url".format(name)
+            url = self._run_output([self.command, "-C", repo_dir, "config", url_key])
+            path = self._run_output(
+                [
+                    self.command,
+                    "-C",
+                    repo_dir,
+                    "config",
+                    "--file",
+                    ".gitmodules",
+                    "submodule.{}.path".format(name),
+                ]
+            )
+            with GitMirrorCache().lock(url) as mirror_path:
+                self._update_mirror(mirror_path, url)
+                # Cloned from the mirror, which git only allows for
+                # submodules when told to, and then pointed back at url.
+                self._run(
+                    [self.command, "-C", repo_dir, "config", url_key, mirror_path],
+                    **self._call_kwargs
+                )
+                self._run(
+                    [
+                        self.command,
+                        "-c",
+                        "protocol.file.allow=always",
+                        "-C",
+                        repo_dir,
+                        "submodule",
+                        "update",
+                        "--force",
+                        "--",
+                        path,
+                    ],
+                    **self._call_kwargs
+                )
+            self._run(
+                [self.command, "-C", repo_dir, "config", url_key, url],
+                **self._call_kwargs
+            )
+            submodule_dir = os.path.join(repo_dir, path)
+            self._run(
+                [
+                    self.command,
+                    "-C",
+                    submodule_dir,
+                    "remote",
+                    "set-url",
+                    "origin",
+                    url,
+                ],
+                **self._call_kwargs
+            )
+            self._update_submodules_from_mirrors(submodule_dir)
+
     def _clone_new(self):
+        if self._use_mirrors():
+            self._clone_from_mirror()
+            return
+
         command = [self.command, "clone", "--recursive"]
         if self.source_tag or self.source_branch:
             command.extend(["--branch", self.source_tag or self.source_branch])
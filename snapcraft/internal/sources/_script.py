@@ -15,8 +15,10 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import shutil
 import stat
 
+from snapcraft import file_utils
 from ._base import FileBase
 
 
@@ -44,6 +46,13 @@ class Script(FileBase):
     def download(self, filepath: str = None) -> str:
         filepath = super().download(filepath=filepath)
         st = os.stat(self.file)
+        if st.st_nlink > 1:
+            # Linked from the file cache, whose entry must keep its mode.
+            with file_utils.replacing_file(
+                self.file, binary=True, check_writable=False
+            ) as partial_file:
+                with open(self.file, "rb") as f:
+                    shutil.copyfileobj(f, partial_file)
         os.chmod(self.file, st.st_mode | stat.S_IEXEC)
 
         return filepath
@@ -14,15 +14,61 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import bz2
+import collections
+import contextlib
+import functools
+import gzip
+import lzma
 import os
 import re
 import shutil
+import subprocess
 import tarfile
 import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import IO, Callable, Dict, Iterator, List, Optional
 
 from . import errors
 from ._base import FileBase
 
+_CHUNK_SIZE = 1024 * 1024
+# Threads writing files out.
+_WRITERS = 4
+# Files up to this size are written by the pool, bigger ones as they are
+# read. Together with the writes allowed in flight, this bounds the memory
+# used for contents read in but not yet written.
+_MAX_BUFFERED_FILE_SIZE = 1024 * 1024
+_MAX_PENDING_WRITES = 64
+
+_MAGIC_NUMBERS = [
+    (b"\x1f\x8b", "gz"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zst"),
+    # Legacy .lzma files have no magic number, this is how they start with the
+    # default properties and a dictionary size of at least 64KiB.
+    (b"\x5d\x00\x00", "lzma"),
+]
+
+# External decompressors by compression, in order of preference. They run
+# in a process of their own, and several threads where they can.
+_DECOMPRESSORS = {
+    "gz": [["pigz", "-dc"], ["gzip", "-dc"]],
+    "bz2": [["lbzip2", "-dc"], ["pbzip2", "-dc"], ["bzip2", "-dc"]],
+    "xz": [["xz", "-dc", "-T0"], ["xz", "-dc"]],
+    "zst": [["zstd", "-dc"]],
+    "lzma": [["xz", "-dc", "--format=lzma"]],
+}
+
+_PYTHON_DECOMPRESSORS = {
+    "gz": gzip.open,
+    "bz2": bz2.open,
+    "xz": lzma.open,
+    "lzma": functools.partial(lzma.open, format=lzma.FORMAT_ALONE),
+}
+
 
 class Tar(FileBase):
     def __init__(
@@ -73,47 +119,242 @@ class Tar(FileBase):
             os.remove(tarball)
 
     def _extract(self, tarball, dst):
-        with tarfile.open(tarball) as tar:
-
-            def filter_members(tar):
-                """Filters members and member names:
-                    - strips common prefix
-                    - bans dangerous names"""
-                members = tar.getmembers()
-                common = os.path.commonprefix([m.name for m in members])
-
-                # commonprefix() works a character at a time and will
-                # consider "d/ab" and "d/abc" to have common prefix "d/ab";
-                # check all members either start with common dir
-                for m in members:
-                    if not (
-                        m.name.startswith(common + "/")
-                        or m.isdir()
-                        and m.name == common
-                    ):
-                        # commonprefix() didn't return a dir name; go up one
-                        # level
-                        common = os.path.dirname(common)
-                        break
-
-                for m in members:
-                    if m.name == common:
-                        continue
-                    self._strip_prefix(common, m)
-                    # We mask all files to be writable to be able to easily
-                    # extract on top.
-                    m.mode = m.mode | 0o200
-                    yield m
-
-            tar.extractall(members=filter_members(tar), path=dst)
-
-    def _strip_prefix(self, common, member):
-        if member.name.startswith(common + "/"):
-            member.name = member.name[len(common + "/") :]
-        # strip leading '/', './' or '../' as many times as needed
-        member.name = re.sub(r"^(\.{0,2}/)*", r"", member.name)
-        # do the same for linkname if this is a hardlink
-        if member.islnk() and not member.issym():
-            if member.linkname.startswith(common + "/"):
-                member.linkname = member.linkname[len(common + "/") :]
-            member.linkname = re.sub(r"^(\.{0,2}/)*", r"", member.linkname)
+        # Members are extracted as they are read, to a directory within
+        # their destination. The common prefix is only known once all of
+        # them were read, at which point its contents are moved into place.
+        staging_dir = tempfile.mkdtemp(prefix=".snapcraft-tar-", dir=dst)
+        try:
+            with _open_decompressed(tarball) as stream:
+                with tarfile.open(fileobj=stream, mode="r|") as tar:
+                    common = _StreamingExtractor(tar, staging_dir).extract()
+            _merge_into(os.path.join(staging_dir, common), dst)
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+class _StreamingExtractor:
+    """Extract the members of a tarfile opened for streaming, in one pass.
+
+    The contents of small files are read in and written out by a pool of
+    threads, everything else is extracted as it comes.
+    """
+
+    def __init__(self, tar: tarfile.TarFile, dst: str) -> None:
+        self._tar = tar
+        self._dst = dst
+        # Writes in flight by the path written to, oldest first.
+        self._pending = collections.OrderedDict()  # type: Dict[str, Future]
+
+    def extract(self) -> str:
+        """Extract all members.
+
+        :returns: the prefix common to all members.
+        """
+        prefix = None  # type: Optional[List[str]]
+        directories = []  # type: List[tarfile.TarInfo]
+        with ThreadPoolExecutor(max_workers=_WRITERS) as executor:
+            for member in self._tar:
+                _ban_dangerous_names(member)
+                # Parts of the name a prefix common to all members can span.
+                parts = [p for p in member.name.split("/") if p not in ("", ".")]
+                if not member.isdir():
+                    parts = parts[:-1]
+                prefix = parts if prefix is None else _get_common(prefix, parts)
+
+                if member.isdir() and not parts:
+                    # The root of the tarball itself.
+                    continue
+                # We mask all files to be writable to be able to easily
+                # extract on top.
+                member.mode = member.mode | 0o200
+                self._extract_member(member, executor, directories)
+
+            for future in self._pending.values():
+                future.result()
+
+        # Like tarfile does, only set the attributes of directories once
+        # nothing else is to be written to them.
+        directories.sort(key=lambda d: d.name, reverse=True)
+        for directory in directories:
+            path = os.path.join(self._dst, directory.name)
+            self._tar.chown(directory, path, False)
+            self._tar.utime(directory, path)
+            self._tar.chmod(directory, path)
+
+        return "/".join(prefix or [])
+
+    def _extract_member(
+        self,
+        member: tarfile.TarInfo,
+        executor: ThreadPoolExecutor,
+        directories: List[tarfile.TarInfo],
+    ) -> None:
+        path = os.path.join(self._dst, member.name)
+        self._wait_for(path)
+        if member.islnk():
+            self._wait_for(os.path.join(self._dst, member.linkname))
+
+        if member.isreg() and member.size <= _MAX_BUFFERED_FILE_SIZE:
+            # The tarball can only be read in order, read the contents in
+            # now to leave writing them out to the pool.
+            data = self._tar.extractfile(member).read()
+            while len(self._pending) >= _MAX_PENDING_WRITES:
+                self._pending.popitem(last=False)[1].result()
+            self._pending[path] = executor.submit(self._write, member, data, path)
+        elif member.isdir():
+            directories.append(member)
+            self._tar.extract(member, path=self._dst, set_attrs=False)
+        else:
+            self._tar.extract(member, path=self._dst)
+
+    def _wait_for(self, path: str) -> None:
+        future = self._pending.pop(path, None)
+        if future is not None:
+            future.result()
+
+    def _write(self, member: tarfile.TarInfo, data: bytes, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        self._tar.chown(member, path, False)
+        self._tar.chmod(member, path)
+        self._tar.utime(member, path)
+
+
+def _ban_dangerous_names(member: tarfile.TarInfo) -> None:
+    # strip leading '/', './' or '../' as many times as needed
+    member.name = re.sub(r"^(\.{0,2}/)*", r"", member.name)
+    # do the same for linkname if this is a hardlink
+    if member.islnk() and not member.issym():
+        member.linkname = re.sub(r"^(\.{0,2}/)*", r"", member.linkname)
+
+
+def _get_common(a: List[str], b: List[str]) -> List[str]:
+    common = []
+    for part_a, part_b in zip(a, b):
+        if part_a != part_b:
+            break
+        common.append(part_a)
+    return common
+
+
+def _merge_into(src: str, dst: str) -> None:
+    """Move the contents of directory src into directory dst.
+
+    Directories found in both are merged, anything else in dst is replaced.
+    """
+    for name in os.listdir(src):
+        src_path = os.path.join(src, name)
+        dst_path = os.path.join(dst, name)
+        if _is_dir(src_path) and _is_dir(dst_path):
+            _merge_into(src_path, dst_path)
+            continue
+        if _is_dir(dst_path):
+            shutil.rmtree(dst_path)
+        elif os.path.lexists(dst_path):
+            os.unlink(dst_path)
+        os.rename(src_path, dst_path)
+
+
+def _is_dir(path: str) -> bool:
+    return os.path.isdir(path) and not os.path.islink(path)
+
+
+def _get_compression(tarball: str) -> Optional[str]:
+    with open(tarball, "rb") as f:
+        header = f.read(6)
+    for magic, compression in _MAGIC_NUMBERS:
+        if header.startswith(magic):
+            return compression
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _get_decompressor(compression: str) -> Optional[List[str]]:
+    for command in _DECOMPRESSORS.get(compression, []):
+        if shutil.which(command[0]) is None:
+            continue
+        # Older releases may not know about the options used.
+        try:
+            subprocess.check_call(
+                command + ["--version"],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except (OSError, subprocess.CalledProcessError):
+            continue
+        return command
+    return None
+
+
+@contextlib.contextmanager
+def _open_decompressed(tarball: str) -> Iterator[IO[bytes]]:
+    """Open tarball for reading, decompressing it alongside.
+
+    An external decompressor is used if there is one for the compression
+    of tarball, otherwise it is decompressed in a thread of its own.
+    """
+    compression = _get_compression(tarball)
+    if compression is None:
+        with open(tarball, "rb") as f:
+            yield f
+        return
+
+    command = _get_decompressor(compression)
+    if command is not None:
+        with _run_decompressor(command + [tarball]) as stream:
+            yield stream
+        return
+
+    opener = _PYTHON_DECOMPRESSORS.get(compression)
+    if opener is None:
+        # Leave it to tarfile to tell it is not a tarball it can read.
+        with open(tarball, "rb") as f:
+            yield f
+        return
+
+    with _run_in_thread(opener, tarball) as stream:
+        yield stream
+
+
+@contextlib.contextmanager
+def _run_decompressor(command: List[str]) -> Iterator[IO[bytes]]:
+    with subprocess.Popen(command, stdout=subprocess.PIPE) as proc:
+        try:
+            yield proc.stdout
+            # Whatever follows the end of the archive is left unread.
+            while proc.stdout.read(_CHUNK_SIZE):
+                pass
+        finally:
+            proc.stdout.close()
+    if proc.returncode != 0:
+        raise errors.SnapcraftPullError(command, proc.returncode)
+
+
+@contextlib.contextmanager
+def _run_in_thread(opener: Callable, tarball: str) -> Iterator[IO[bytes]]:
+    read_fd, write_fd = os.pipe()
+    exceptions = []  # type: List[Exception]
+
+    def decompress() -> None:
+        try:
+            with open(write_fd, "wb") as dst, opener(tarball, "rb") as src:
+                shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+        except BrokenPipeError:
+            # Reading stopped early, the reason is raised from there.
+            pass
+        except Exception as e:
+            exceptions.append(e)
+
+    thread = threading.Thread(target=decompress)
+    thread.start()
+    try:
+        with open(read_fd, "rb") as stream:
+            yield stream
+            while stream.read(_CHUNK_SIZE):
+                pass
+    finally:
+        thread.join()
+    if exceptions:
+        raise exceptions[0]
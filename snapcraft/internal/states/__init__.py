@@ -22,3 +22,5 @@ from snapcraft.internal.states._pull_state import PullState  # noqa
 from snapcraft.internal.states._stage_state import StageState  # noqa
 from snapcraft.internal.states._state import get_state  # noqa
 from snapcraft.internal.states._state import get_step_state_file  # noqa
+from snapcraft.internal.states._state import read_state_file  # noqa
+from snapcraft.internal.states._state import write_state_file  # noqa
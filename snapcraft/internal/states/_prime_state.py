@@ -30,6 +30,9 @@ class PrimeState(PartState):
         project=None,
         scriptlet_metadata=None,
         primed_stage_packages=None,
+        stage_file_stats=None,
+        elf_dependencies=None,
+        primed_sonames=None,
     ):
         super().__init__(part_properties, project)
 
@@ -43,6 +46,17 @@ class PrimeState(PartState):
         self.primed_stage_packages = primed_stage_packages
         if self.primed_stage_packages is None:
             self.primed_stage_packages = set()
+        # Used to only migrate and process the files that changed in stage
+        # when updating the prime step.
+        self.stage_file_stats = stage_file_stats
+        if self.stage_file_stats is None:
+            self.stage_file_stats = dict()
+        self.elf_dependencies = elf_dependencies
+        if self.elf_dependencies is None:
+            self.elf_dependencies = dict()
+        # Digest of the libraries primed once all parts were, see
+        # PluginHandler.mark_primed_sonames.
+        self.primed_sonames = primed_sonames
 
         if dependency_paths:
             self.dependency_paths = dependency_paths
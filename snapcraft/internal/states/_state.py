@@ -14,14 +14,48 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
+import contextlib
+import json
 import os
+from typing import Any, Dict, Optional
 
 from snapcraft import yaml_utils
-from snapcraft.internal import steps
+from snapcraft.internal import errors, steps
+
+# Version of the state file format, written in the header of every file.
+_STATE_FORMAT_VERSION = 1
+
+# Members encoded larger than this are only decoded when first accessed.
+_LAZY_MEMBER_SIZE = 4096
 
 
 class State(yaml_utils.SnapcraftYAMLObject):
+    def __getattr__(self, name):
+        # Only called for attributes that are not set, which includes the
+        # members of a loaded state that have not been decoded yet.
+        lazy_members = self.__dict__.get("_lazy_members")
+        if not lazy_members or name not in lazy_members:
+            raise AttributeError(
+                "{!r} object has no attribute {!r}".format(type(self).__name__, name)
+            )
+
+        value = _decode(json.loads(lazy_members.pop(name)))
+        setattr(self, name, value)
+        if not lazy_members:
+            del self.__dict__["_lazy_members"]
+        return value
+
+    def __getstate__(self):
+        self._load_lazy_members()
+        return self.__dict__.copy()
+
+    def _load_lazy_members(self) -> None:
+        for name in list(self.__dict__.get("_lazy_members", {})):
+            getattr(self, name)
+
     def __repr__(self):
+        self._load_lazy_members()
         items = sorted(self.__dict__.items())
         strings = (": ".join((key, repr(value))) for key, value in items)
         representation = ", ".join(strings)
@@ -30,6 +64,8 @@ class State(yaml_utils.SnapcraftYAMLObject):
 
     def __eq__(self, other):
         if type(other) is type(self):
+            self._load_lazy_members()
+            other._load_lazy_members()
             return self.__dict__ == other.__dict__
 
         return False
@@ -92,11 +128,168 @@ def get_state(state_dir: str, step: steps.Step):
     state = None
     state_file = get_step_state_file(state_dir, step)
     if os.path.isfile(state_file):
-        with open(state_file, "r") as f:
+        state = read_state_file(state_file)
+
+    return state
+
+
+def read_state_file(state_file: str) -> Any:
+    """Read a state written by write_state_file.
+
+    States in the YAML format used by earlier versions of snapcraft are
+    read as well, and rewritten in the current format keeping their
+    modification time, which records when their step ran.
+
+    :param str state_file: Path to the state file.
+    :return: The state, members larger than _LAZY_MEMBER_SIZE are only
+             decoded when they are first accessed.
+    :raises FileNotFoundError: If state_file does not exist.
+    :raises errors.UnsupportedStateFormatError: If state_file was written
+                                                by a newer snapcraft.
+    """
+    with open(state_file, "r") as f:
+        header = _read_header(f.readline())
+        if header is None:
+            f.seek(0)
             state = yaml_utils.load(f)
+            _migrate_state_file(state_file, state)
+            return state
+
+        if header["version"] != _STATE_FORMAT_VERSION:
+            raise errors.UnsupportedStateFormatError(
+                path=state_file, version=header["version"]
+            )
+
+        if header["tag"] is None:
+            return _decode(json.loads(f.readline()))
+
+        state_class = _get_yaml_object_classes()[header["tag"]]
+        state = state_class.__new__(state_class)
+        lazy_members: Dict[str, str] = dict()
+        for line in f:
+            name, encoded_value = line.rstrip("\n").split("\t", 1)
+            if len(encoded_value) > _LAZY_MEMBER_SIZE:
+                lazy_members[name] = encoded_value
+            else:
+                state.__dict__[name] = _decode(json.loads(encoded_value))
+        if lazy_members:
+            state.__dict__["_lazy_members"] = lazy_members
 
     return state
 
 
+def write_state_file(state_file: str, state: Any) -> None:
+    """Write state to state_file in the current state format.
+
+    The file starts with a JSON header holding the format version and the
+    YAML tag of the state class, followed by a line for each member made
+    of its name, a tab and its JSON encoded value.
+
+    :param str state_file: Path to the state file.
+    :param state: A State, or a plain value such as an empty dict.
+    """
+    with open(state_file, "w") as f:
+        if not isinstance(state, State):
+            f.write(_get_header(None))
+            f.write(json.dumps(_encode(state)) + "\n")
+            return
+
+        f.write(_get_header(state.yaml_tag))
+        # Members that were never accessed are written back as they are.
+        lazy_members = state.__dict__.get("_lazy_members", {})
+        for name, value in state.__dict__.items():
+            if name != "_lazy_members":
+                f.write("{}\t{}\n".format(name, json.dumps(_encode(value))))
+        for name, encoded_value in lazy_members.items():
+            f.write("{}\t{}\n".format(name, encoded_value))
+
+
+def _get_header(tag: Optional[str]) -> str:
+    return (
+        json.dumps({"snapcraft-state": {"version": _STATE_FORMAT_VERSION, "tag": tag}})
+        + "\n"
+    )
+
+
+def _read_header(line: str) -> Optional[Dict[str, Any]]:
+    if not line.startswith('{"snapcraft-state"'):
+        return None
+    return json.loads(line)["snapcraft-state"]
+
+
+def _migrate_state_file(state_file: str, state: Any) -> None:
+    # Keep the modification time, it is when the step ran.
+    state_stat = os.stat(state_file)
+    partial_state_file = state_file + ".partial"
+    try:
+        write_state_file(partial_state_file, state)
+        os.utime(
+            partial_state_file, ns=(state_stat.st_atime_ns, state_stat.st_mtime_ns)
+        )
+        os.replace(partial_state_file, state_file)
+    except OSError:
+        # Reading the YAML state again next time is fine.
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(partial_state_file)
+
+
+def _get_yaml_object_classes() -> Dict[str, type]:
+    classes: Dict[str, type] = dict()
+    pending = [yaml_utils.SnapcraftYAMLObject]
+    while pending:
+        yaml_object_class = pending.pop()
+        pending.extend(yaml_object_class.__subclasses__())
+        tag = getattr(yaml_object_class, "yaml_tag", None)
+        if tag:
+            classes[tag] = yaml_object_class
+    return classes
+
+
+def _encode(value: Any) -> Any:
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, tuple):
+        return {"!tuple": [_encode(v) for v in value]}
+    if isinstance(value, (set, frozenset)):
+        try:
+            items = sorted(value)
+        except TypeError:
+            items = list(value)
+        return {"!set": [_encode(v) for v in items]}
+    if isinstance(value, dict):
+        if all(isinstance(k, str) and not k.startswith("!") for k in value):
+            return {k: _encode(v) for k, v in value.items()}
+        return {"!dict": [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if isinstance(value, yaml_utils.SnapcraftYAMLObject):
+        if isinstance(value, State):
+            value._load_lazy_members()
+        return {"!object": value.yaml_tag, "members": _encode(vars(value))}
+    raise TypeError("cannot encode {!r} in a state file".format(value))
+
+
+def _decode(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if "!tuple" in value:
+        return tuple(_decode(v) for v in value["!tuple"])
+    if "!set" in value:
+        return {_decode(v) for v in value["!set"]}
+    if "!dict" in value:
+        return collections.OrderedDict(
+            (_decode(k), _decode(v)) for k, v in value["!dict"]
+        )
+    if "!object" in value:
+        yaml_object_class = _get_yaml_object_classes()[value["!object"]]
+        yaml_object = yaml_object_class.__new__(yaml_object_class)
+        yaml_object.__dict__.update(_decode(value["members"]))
+        return yaml_object
+    # Mappings load as OrderedDict, as they did from YAML.
+    return collections.OrderedDict((k, _decode(v)) for k, v in value.items())
+
+
 def get_step_state_file(state_dir: str, step: steps.Step) -> str:
     return os.path.join(state_dir, step.name)
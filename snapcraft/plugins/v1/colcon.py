@@ -581,12 +581,16 @@ class ColconPlugin(PluginV1):
                 '\\1\\2"{}"\\4'.format(installdir_pattern.sub(new_prefix, path))
             )
 
+        # All of these only match within a line, so files are streamed through
+        # rather than read whole.
+
         # Set the AMENT_CURRENT_PREFIX throughout to the in-snap prefix
         file_utils.replace_in_file(
             self.installdir,
             re.compile(r""),
             re.compile(r"(\${)(AMENT_CURRENT_PREFIX:=)(.*)(})"),
             _rewrite_prefix,
+            streaming=True,
         )
 
         # Set the COLCON_CURRENT_PREFIX (if it's in the installdir) to the in-snap
@@ -598,6 +602,7 @@ class ColconPlugin(PluginV1):
                 r"()(COLCON_CURRENT_PREFIX=)(['\"].*{}.*)()".format(self.installdir)
             ),
             _rewrite_prefix,
+            streaming=True,
         )
 
         # Set the _colcon_prefix_sh_COLCON_CURRENT_PREFIX throughout to the in-snap
@@ -607,6 +612,7 @@ class ColconPlugin(PluginV1):
             re.compile(r""),
             re.compile(r"()(_colcon_prefix_sh_COLCON_CURRENT_PREFIX=)(.*)()"),
             _rewrite_prefix,
+            streaming=True,
         )
 
         # Set the _colcon_package_sh_COLCON_CURRENT_PREFIX throughout to the in-snap
@@ -616,6 +622,7 @@ class ColconPlugin(PluginV1):
             re.compile(r""),
             re.compile(r"()(_colcon_package_sh_COLCON_CURRENT_PREFIX=)(.*)()"),
             _rewrite_prefix,
+            streaming=True,
         )
 
         # Set the _colcon_prefix_chain_sh_COLCON_CURRENT_PREFIX throughout to the in-snap
@@ -625,6 +632,7 @@ class ColconPlugin(PluginV1):
             re.compile(r""),
             re.compile(r"()(_colcon_prefix_chain_sh_COLCON_CURRENT_PREFIX=)(.*)()"),
             _rewrite_prefix,
+            streaming=True,
         )
 
         # Set the _colcon_python_executable throughout to use the in-snap python
@@ -633,6 +641,7 @@ class ColconPlugin(PluginV1):
             re.compile(r""),
             re.compile(r"()(_colcon_python_executable=)(.*)()"),
             _rewrite_prefix,
+            streaming=True,
         )
 
     def _build_colcon_packages(self):
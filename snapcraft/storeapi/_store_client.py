@@ -14,18 +14,17 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import logging
 import os
 import urllib.parse
-from time import sleep
 from typing import Any, Dict, Iterable, List, Optional, TextIO, Union
 
 import pymacaroons
-import requests
 
 from snapcraft import config
-from snapcraft.internal.indicators import download_requests_stream
+from snapcraft.internal import cache, downloader
 
-from . import _upload, errors, logger
+from . import _upload, errors
 from ._sca_client import SCAClient
 from ._snap_index_client import SnapIndexClient
 from ._snap_v2_client import SnapV2Client
@@ -34,6 +33,11 @@ from ._up_down_client import UpDownClient
 from .constants import DEFAULT_SERIES
 from .v2 import channel_map, releases
 
+logger = logging.getLogger(__name__)
+
+# Connections snaps are downloaded over.
+_DOWNLOAD_CONNECTIONS = 4
+
 
 class StoreClient:
     """High-level client for the V2.0 API SCA resources."""
@@ -273,51 +277,38 @@ class StoreClient:
         except errors.StoreDownloadError:
             self._download_snap(channel_mapping.download, download_path)
 
-        channel_mapping.download.verify(download_path)
         return channel_mapping.download.sha3_384
 
     def _download_snap(self, download_details, download_path):
-        # we only resume when redirected to our CDN since we use internap's
-        # special sauce.
-        total_read = 0
-        probe_url = requests.head(download_details.url)
-        if probe_url.is_redirect and "internap" in probe_url.headers["Location"]:
-            download_url = probe_url.headers["Location"]
-            resume_possible = True
-        else:
-            download_url = download_details.url
-            resume_possible = False
-
-        # HttpAdapter cannot help here as this is a stream.
-        # LP: #1617765
-        not_downloaded = True
-        retry_count = 5
-        while not_downloaded and retry_count:
-            headers = {}
-            if resume_possible and os.path.exists(download_path):
-                total_read = os.path.getsize(download_path)
-                headers["Range"] = "bytes={}-".format(total_read)
-            request = self.cpi.get(download_url, headers=headers, stream=True)
-            request.raise_for_status()
-            redirections = [h.headers["Location"] for h in request.history]
-            if redirections:
-                logger.debug(
-                    "Redirections for {!r}: {}".format(
-                        download_url, ", ".join(redirections)
-                    )
-                )
-            try:
-                download_requests_stream(request, download_path, total_read=total_read)
-                not_downloaded = False
-            except requests.exceptions.ChunkedEncodingError as e:
-                logger.debug(
-                    "Error while downloading: {!r}. "
-                    "Retries left to download: {!r}.".format(e, retry_count)
-                )
-                retry_count -= 1
-                if not retry_count:
-                    raise e
-                sleep(1)
+        # Snaps are verified once downloaded, so a partial download left by
+        # an earlier run can be safely resumed, and started over if it was
+        # of another revision.
+        resumed = os.path.exists("{}.partial".format(download_path))
+        digest = self._download_snap_from(download_details, download_path, resumed)
+        if resumed and digest != download_details.sha3_384:
+            logger.debug(
+                "Downloading {!r} again, the download it continued from did "
+                "not match.".format(download_path)
+            )
+            digest = self._download_snap_from(download_details, download_path, False)
+        # Caching the snap then needs not read it again.
+        cache.set_file_digest(download_path, digest, algorithm="sha3_384")
+        if digest != download_details.sha3_384:
+            raise errors.SHAMismatchError(
+                path=download_path,
+                expected=download_details.sha3_384,
+                calculated=digest,
+            )
+
+    def _download_snap_from(self, download_details, download_path, resume):
+        return downloader.download(
+            download_details.url,
+            download_path,
+            session=self.cpi,
+            algorithm="sha3_384",
+            resume=resume,
+            connections=_DOWNLOAD_CONNECTIONS,
+        )
 
     def push_assertion(self, snap_id, assertion, endpoint, force=False):
         return self.sca.push_assertion(snap_id, assertion, endpoint, force)
@@ -85,6 +85,8 @@ class SnapDownloadDetails:
         if not os.path.exists(path):
             raise errors.DownloadNotFoundError(path=path)
 
+        # Whatever is at path may have been written by anything, a digest
+        # looked up by its stat is no proof of its contents.
         calculated_hash = calculate_hash(path, algorithm="sha3_384")
         if self.sha3_384 != calculated_hash:
             raise errors.SHAMismatchError(
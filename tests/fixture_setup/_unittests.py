@@ -27,7 +27,7 @@ from unittest import mock
 import fixtures
 
 import snapcraft
-from snapcraft.internal import elf
+from snapcraft.internal import cache, elf
 from snapcraft.plugins._plugin_finder import get_plugin_for_base
 from tests.file_utils import get_snapcraft_path
 
@@ -121,6 +121,24 @@ class FakePlugin(fixtures.Fixture):
         return plugin_class
 
 
+# What the dynamic linker would resolve for each fake ELF file, libraries
+# not found on disk resolve to their soname.
+_FAKE_RESOLVED_LIBRARIES = {
+    "default": {"foo.so.1": "/lib/foo.so.1", "bar.so.2": "/usr/lib/bar.so.2"},
+    "fake_elf-with-core-libs": {
+        "foo.so.1": "/lib/foo.so.1",
+        "bar.so.2": "/usr/lib/bar.so.2",
+        "barsnap.so.2": "{CORE_PATH}/barsnap.so.2",
+    },
+    "fake_elf-with-missing-libs": {
+        "foo.so.1": "/lib/foo.so.1",
+        "missing.so.2": "missing.so.2",
+        "barsnap.so.2": "{CORE_PATH}/barsnap.so.2",
+    },
+    "fake_elf-with-host-libraries": {"moo.so.2": "/usr/lib/moo.so.2"},
+}
+
+
 def _fake_elffile_extract_attributes(self):
     name = os.path.basename(self.path)
 
@@ -129,7 +147,6 @@ def _fake_elffile_extract_attributes(self):
 
     if name in [
         "fake_elf-2.26",
-        "fake_elf-bad-ldd",
         "fake_elf-with-core-libs",
         "fake_elf-with-missing-libs",
         "fake_elf-bad-patchelf",
@@ -260,19 +277,12 @@ class FakeElf(fixtures.Fixture):
         self.useFixture(fixtures.EnvironmentVariable("PATH", new_path))
 
         # Copy strip
-        for f in ["strip", "execstack"]:
+        for f in ["strip"]:
             shutil.copy(
                 os.path.join(binaries_path, f), os.path.join(new_binaries_path, f)
             )
             os.chmod(os.path.join(new_binaries_path, f), 0o755)
 
-        # Some values in ldd need to be set with core_path
-        with open(os.path.join(binaries_path, "ldd")) as rf:
-            with open(os.path.join(new_binaries_path, "ldd"), "w") as wf:
-                for line in rf.readlines():
-                    wf.write(line.replace("{CORE_PATH}", self.core_base_path))
-        os.chmod(os.path.join(new_binaries_path, "ldd"), 0o755)
-
         # Some values in ldd need to be set with core_path
         self.patchelf_path = os.path.join(new_binaries_path, "patchelf")
         with open(os.path.join(binaries_path, "patchelf")) as rf:
@@ -289,6 +299,29 @@ class FakeElf(fixtures.Fixture):
         patcher.start()
         self.addCleanup(patcher.stop)
 
+        # The fake attributes go by file name, which the cache knows nothing
+        # about.
+        patcher = mock.patch.object(cache.ElfAttributeCache, "get", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Some resolved libraries need to be set with core_path
+        def fake_resolve(resolver, elf_file):
+            libraries = _FAKE_RESOLVED_LIBRARIES.get(
+                os.path.basename(elf_file.path), _FAKE_RESOLVED_LIBRARIES["default"]
+            )
+            resolved = dict()
+            for soname, soname_path in libraries.items():
+                soname_path = soname_path.replace("{CORE_PATH}", self.core_base_path)
+                resolved[soname] = (
+                    soname_path if os.path.exists(soname_path) else soname
+                )
+            return resolved
+
+        patcher = mock.patch.object(elf.LibraryResolver, "resolve", fake_resolve)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
         self._elf_files = {
             "fake_elf-2.26": elf.ElfFile(
                 path=os.path.join(self.root_path, "fake_elf-2.26")
@@ -308,9 +341,6 @@ class FakeElf(fixtures.Fixture):
             "fake_elf-with-host-libraries": elf.ElfFile(
                 path=os.path.join(self.root_path, "fake_elf-with-host-libraries")
             ),
-            "fake_elf-bad-ldd": elf.ElfFile(
-                path=os.path.join(self.root_path, "fake_elf-bad-ldd")
-            ),
             "fake_elf-bad-patchelf": elf.ElfFile(
                 path=os.path.join(self.root_path, "fake_elf-bad-patchelf")
             ),
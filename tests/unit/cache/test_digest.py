@@ -0,0 +1,143 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import os
+from unittest import mock
+
+import pytest
+
+from snapcraft.internal import cache
+from snapcraft.internal.cache import _digest
+
+
+@pytest.fixture()
+def file_path(tmp_path):
+    path = tmp_path / "file"
+    path.write_bytes(b"contents")
+    return path.as_posix()
+
+
+@pytest.fixture()
+def digest_cache(xdg_dirs):
+    """Return a FileDigestCache instance."""
+    return cache.FileDigestCache(project_name="test-project")
+
+
+def test_get(digest_cache, file_path):
+    assert digest_cache.get(file_path) == hashlib.sha256(b"contents").hexdigest()
+
+
+def test_get_missing_file(digest_cache, tmp_path):
+    with pytest.raises(OSError):
+        digest_cache.get((tmp_path / "missing").as_posix())
+
+
+def test_changed_file_is_hashed_again(digest_cache, file_path):
+    digest_cache.get(file_path)
+    with open(file_path, "ab") as f:
+        f.write(b"more")
+
+    assert digest_cache.get(file_path) == hashlib.sha256(b"contentsmore").hexdigest()
+
+
+
+
+def test_get_with_algorithm(digest_cache, file_path):
+    assert (
+        digest_cache.get(file_path, algorithm="sha3_384")
+        == hashlib.sha3_384(b"contents").hexdigest()
+    )
+    assert digest_cache.get(file_path) == hashlib.sha256(b"contents").hexdigest()
+
+
+def test_set(digest_cache, file_path):
+    digest_cache.set(file_path, "digest")
+
+    with mock.patch("snapcraft.file_utils.calculate_hash") as hash_mock:
+        assert digest_cache.get(file_path) == "digest"
+
+    hash_mock.assert_not_called()
+
+
+def test_set_changed_file_is_hashed_again(digest_cache, file_path):
+    digest_cache.set(file_path, "digest")
+    with open(file_path, "ab") as f:
+        f.write(b"more")
+
+    assert digest_cache.get(file_path) == hashlib.sha256(b"contentsmore").hexdigest()
+
+
+def test_lookup(digest_cache, file_path):
+    with mock.patch("snapcraft.file_utils.calculate_hash") as hash_mock:
+        assert digest_cache.lookup(file_path) is None
+
+    hash_mock.assert_not_called()
+    digest_cache.get(file_path)
+    assert digest_cache.lookup(file_path) == hashlib.sha256(b"contents").hexdigest()
+
+
+def test_get_many(digest_cache, file_path, tmp_path):
+    other_path = tmp_path / "other"
+    other_path.write_bytes(b"other")
+    digest_cache.get(file_path)
+
+    with mock.patch(
+        "snapcraft.file_utils.calculate_hash", return_value="digest"
+    ) as hash_mock:
+        digests = digest_cache.get_many([other_path.as_posix(), file_path])
+
+    assert digests == ["digest", hashlib.sha256(b"contents").hexdigest()]
+    hash_mock.assert_called_once_with(other_path.as_posix(), algorithm="sha256")
+
+
+def test_get_file_digest_shared(xdg_dirs, file_path):
+    assert (
+        cache.get_file_digest(file_path, algorithm="sha3_384")
+        == hashlib.sha3_384(b"contents").hexdigest()
+    )
+
+    with mock.patch("snapcraft.file_utils.calculate_hash") as hash_mock:
+        cache.get_file_digest_cache().get(file_path, algorithm="sha3_384")
+
+    hash_mock.assert_not_called()
+
+
+def test_set_file_digest_shared(xdg_dirs, file_path):
+    cache.set_file_digest(file_path, "digest", algorithm="sha3_384")
+
+    with mock.patch("snapcraft.file_utils.calculate_hash") as hash_mock:
+        assert cache.get_file_digest(file_path, algorithm="sha3_384") == "digest"
+
+    hash_mock.assert_not_called()
+
+
+def test_shared_caches_saved_once(xdg_dirs, file_path):
+    cache.set_file_digest(file_path, "digest", algorithm="sha3_384")
+    project_cache = cache.get_file_digest_cache(project_name="test-project")
+    project_cache.set(file_path, "project-digest")
+
+    assert cache.get_file_digest_cache(project_name="test-project") is project_cache
+    # Nothing is written out until the process exits.
+    assert not os.path.exists(project_cache.cache_path)
+
+    _digest._save_shared_caches()
+
+    assert cache.FileDigestCache().lookup(file_path, algorithm="sha3_384") == "digest"
+    assert (
+        cache.FileDigestCache(project_name="test-project").lookup(file_path)
+        == "project-digest"
+    )
@@ -0,0 +1,99 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import shutil
+from unittest import mock
+
+import pytest
+
+from snapcraft.internal import cache
+
+
+@pytest.fixture()
+def elf_path(tmp_path):
+    """Return a file standing in for an ELF file."""
+    path = tmp_path / "elf"
+    path.write_bytes(b"\x7fELF contents")
+    return path.as_posix()
+
+
+@pytest.fixture()
+def attribute_cache(xdg_dirs):
+    """Return an ElfAttributeCache instance."""
+    return cache.ElfAttributeCache(project_name="test-project")
+
+
+def test_get_nothing_cached(attribute_cache, elf_path):
+    assert attribute_cache.get(elf_path) is None
+
+
+def test_add_and_get(attribute_cache, elf_path):
+    attribute_cache.add(elf_path, dict(soname="libfoo.so.1"))
+
+    assert attribute_cache.get(elf_path) == dict(soname="libfoo.so.1")
+
+
+def test_get_missing_file(attribute_cache, tmp_path):
+    assert attribute_cache.get((tmp_path / "missing").as_posix()) is None
+
+
+def test_lookup(attribute_cache, elf_path, tmp_path):
+    attribute_cache.add(elf_path, dict(soname="libfoo.so.1"))
+    copy_path = (tmp_path / "copy").as_posix()
+    shutil.copy(elf_path, copy_path)
+
+    with mock.patch("snapcraft.file_utils.calculate_hash") as hash_mock:
+        assert attribute_cache.lookup(elf_path) == dict(soname="libfoo.so.1")
+        # Copies are only found by reading them.
+        assert attribute_cache.lookup(copy_path) is None
+
+    hash_mock.assert_not_called()
+
+
+def test_add_with_digest(attribute_cache, elf_path):
+    with mock.patch("snapcraft.file_utils.calculate_hash") as hash_mock:
+        attribute_cache.add(elf_path, dict(soname="libfoo.so.1"), digest="digest")
+        assert attribute_cache.get(elf_path) == dict(soname="libfoo.so.1")
+
+    hash_mock.assert_not_called()
+
+
+def test_copies_found_by_content(attribute_cache, elf_path, tmp_path):
+    attribute_cache.add(elf_path, dict(soname="libfoo.so.1"))
+    copy_path = (tmp_path / "copy").as_posix()
+    shutil.copy(elf_path, copy_path)
+
+    assert attribute_cache.get(copy_path) == dict(soname="libfoo.so.1")
+
+
+def test_changed_file_is_a_miss(attribute_cache, elf_path):
+    attribute_cache.add(elf_path, dict(soname="libfoo.so.1"))
+    with open(elf_path, "ab") as elf_file:
+        elf_file.write(b"more")
+
+    assert attribute_cache.get(elf_path) is None
+
+
+def test_save_keeps_digests(attribute_cache, elf_path):
+    attribute_cache.add(elf_path, dict(soname="libfoo.so.1"))
+    attribute_cache.save()
+
+    new_cache = cache.ElfAttributeCache(project_name="test-project")
+    with mock.patch("snapcraft.file_utils.calculate_hash") as hash_mock:
+        assert new_cache.get(elf_path) == dict(soname="libfoo.so.1")
+
+    # Unchanged files are found without reading them.
+    hash_mock.assert_not_called()
@@ -15,7 +15,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
-import shutil
+import stat
 
 from snapcraft.file_utils import calculate_hash
 
@@ -65,10 +65,69 @@ class TestFileCache:
         def fake_copy(*args, **kwargs):
             raise OSError()
 
-        monkeypatch.setattr(shutil, "copyfile", fake_copy)
+        monkeypatch.setattr(os, "link", fake_copy)
+        monkeypatch.setattr(
+            "snapcraft.internal.cache._file.copy_file_contents", fake_copy
+        )
 
         cached_file = file_cache.cache(
             filename=random_data_file, algorithm=algo, hash=calculated_hash
         )
 
         assert cached_file is None
+
+
+def test_cache_hard_links_keeping_mode(random_data_file, file_cache):
+    calculated_hash = calculate_hash(random_data_file, algorithm="sha256")
+    os.chmod(random_data_file, 0o644)
+
+    cached_file = file_cache.cache(
+        filename=random_data_file, algorithm="sha256", hash=calculated_hash
+    )
+
+    assert os.path.samefile(cached_file, random_data_file)
+    assert stat.S_IMODE(os.stat(random_data_file).st_mode) == 0o644
+    assert os.listdir(os.path.dirname(cached_file)) == [calculated_hash]
+
+
+def test_cache_copies_if_link_fails(monkeypatch, random_data_file, file_cache):
+    calculated_hash = calculate_hash(random_data_file, algorithm="sha256")
+
+    def fake_link(*args, **kwargs):
+        raise OSError()
+
+    monkeypatch.setattr(os, "link", fake_link)
+
+    cached_file = file_cache.cache(
+        filename=random_data_file, algorithm="sha256", hash=calculated_hash
+    )
+
+    assert not os.path.samefile(cached_file, random_data_file)
+    assert calculate_hash(cached_file, algorithm="sha256") == calculated_hash
+    assert not os.stat(cached_file).st_mode & (stat.S_IWUSR | stat.S_IWGRP)
+
+
+def test_get_modified_entry(random_data_file, file_cache):
+    calculated_hash = calculate_hash(random_data_file, algorithm="sha256")
+    cached_file = file_cache.cache(
+        filename=random_data_file, algorithm="sha256", hash=calculated_hash
+    )
+    os.chmod(cached_file, 0o644)
+    with open(cached_file, "a") as f:
+        f.write("modified")
+
+    assert file_cache.get(algorithm="sha256", hash=calculated_hash) is None
+    assert not os.path.exists(cached_file)
+
+
+def test_get_entry_modified_keeping_stat(random_data_file, file_cache):
+    calculated_hash = calculate_hash(random_data_file, algorithm="sha256")
+    cached_file = file_cache.cache(
+        filename=random_data_file, algorithm="sha256", hash=calculated_hash
+    )
+    file_stat = os.stat(cached_file)
+    with open(random_data_file, "r+b") as f:
+        f.write(b"modified")
+    os.utime(cached_file, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns))
+
+    assert file_cache.get(algorithm="sha256", hash=calculated_hash) is None
@@ -0,0 +1,106 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+
+import pytest
+
+from snapcraft.internal import cache
+
+_DAY = 24 * 60 * 60
+
+
+def _make_file(path, size, age_in_days):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"0" * size)
+    used = time.time() - age_in_days * _DAY
+    os.utime(path, (used, used))
+
+
+@pytest.fixture()
+def cache_manager(xdg_dirs):
+    """Return a CacheManager with an entry in each namespace."""
+    cache_manager = cache.CacheManager()
+    root = cache_manager.cache_root
+    _make_file(os.path.join(root, "files", "sha256", "1"), 100, 10)
+    _make_file(
+        os.path.join(root, "stage-packages", "apt", "digest", "var", "archive"), 200, 40
+    )
+    _make_file(
+        os.path.join(
+            root, "stage-packages", "unpacked", "amd64", "foo=1", "manifest.json"
+        ),
+        300,
+        1,
+    )
+    _make_file(os.path.join(root, "projects", "project", "file-digests.json"), 400, 20)
+    return cache_manager
+
+
+def test_get_usage(cache_manager):
+    assert cache_manager.get_usage() == {
+        "files": (1, 100),
+        "prefetch": (0, 0),
+        "stage-packages": (2, 500),
+        "projects": (1, 400),
+        "git-mirrors": (0, 0),
+    }
+
+
+def test_git_mirror_entry(cache_manager):
+    mirror_path = cache.GitMirrorCache().get_mirror_path("https://host/repo.git")
+    _make_file(os.path.join(mirror_path, "HEAD"), 50, 5)
+
+    entries = [e for e in cache_manager.get_entries() if e.namespace == "git-mirrors"]
+
+    assert [(e.path, e.size) for e in entries] == [(os.path.dirname(mirror_path), 50)]
+
+
+def test_get_entries_least_recently_used_first(cache_manager):
+    assert [e.size for e in cache_manager.get_entries()] == [200, 400, 100, 300]
+
+
+def test_prune_max_age(cache_manager):
+    pruned = cache_manager.prune(max_age=15 * _DAY)
+
+    assert [e.size for e in pruned] == [200, 400]
+    assert not os.path.exists(pruned[0].path)
+    assert not os.path.exists(pruned[1].path)
+    assert [e.size for e in cache_manager.get_entries()] == [100, 300]
+
+
+def test_prune_max_size(cache_manager):
+    pruned = cache_manager.prune(max_size=350)
+
+    assert [e.namespace for e in pruned] == ["stage-packages", "projects", "files"]
+    assert [e.size for e in cache_manager.get_entries()] == [300]
+
+
+def test_prune_nothing(cache_manager):
+    assert cache_manager.prune(max_size=1000, max_age=100 * _DAY) == []
+    assert len(cache_manager.get_entries()) == 4
+
+
+def test_prune_read_only_entry(cache_manager):
+    entry_path = os.path.join(cache_manager.cache_root, "projects", "project")
+    os.chmod(entry_path, 0o555)
+
+    pruned = cache_manager.prune(max_age=15 * _DAY)
+
+    assert [e.path for e in pruned][-1] == entry_path
+    assert not os.path.exists(entry_path)
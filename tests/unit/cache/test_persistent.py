@@ -0,0 +1,138 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+from unittest import mock
+
+import pytest
+
+from snapcraft.internal.cache._persistent import PersistentCache
+
+
+class _TestCache(PersistentCache):
+    cache_version = 2
+
+    def __init__(self):
+        super().__init__(relative_path=os.path.join("test", "test.json"))
+
+    def get(self, key):
+        return self._get_entry(key)
+
+    def set(self, key, value):
+        self._set_entry(key, value)
+
+
+@pytest.fixture()
+def cache_path(xdg_dirs):
+    return _TestCache().cache_path
+
+
+def test_get_missing(cache_path):
+    assert _TestCache().get("key") is None
+
+
+def test_saved_and_loaded(cache_path):
+    test_cache = _TestCache()
+    test_cache.set("key", dict(value=1))
+    test_cache.save()
+
+    assert _TestCache().get("key") == dict(value=1)
+    assert os.listdir(os.path.dirname(cache_path)) == ["test.json"]
+
+
+def test_save_merges_entries_saved_since(cache_path):
+    test_cache = _TestCache()
+    other_cache = _TestCache()
+    test_cache.set("key", "value")
+    other_cache.set("other-key", "other-value")
+    other_cache.save()
+    test_cache.save()
+
+    new_cache = _TestCache()
+    assert new_cache.get("key") == "value"
+    assert new_cache.get("other-key") == "other-value"
+
+
+def test_get_does_not_save_recently_used_entries(cache_path):
+    test_cache = _TestCache()
+    test_cache.set("key", "value")
+    test_cache.save()
+
+    new_cache = _TestCache()
+    with mock.patch("time.time", return_value=time.time() + 60 * 60):
+        assert new_cache.get("key") == "value"
+    with mock.patch("os.replace") as replace_mock:
+        new_cache.save()
+
+    replace_mock.assert_not_called()
+
+
+def test_get_saves_entries_used_a_while_ago(cache_path):
+    test_cache = _TestCache()
+    test_cache.set("key", "value")
+    test_cache.save()
+
+    later = time.time() + 2 * 24 * 60 * 60
+    new_cache = _TestCache()
+    with mock.patch("time.time", return_value=later):
+        assert new_cache.get("key") == "value"
+        new_cache.save()
+
+    assert _TestCache()._entries["key"] == ("value", later)
+
+
+def test_save_drops_unused_entries(cache_path):
+    test_cache = _TestCache()
+    test_cache.set("key", "value")
+
+    with mock.patch("time.time", return_value=time.time() + 60 * 24 * 60 * 60):
+        test_cache.set("other-key", "other-value")
+        test_cache.save()
+
+    new_cache = _TestCache()
+    assert new_cache.get("key") is None
+    assert new_cache.get("other-key") == "other-value"
+
+
+@pytest.mark.parametrize(
+    "contents",
+    [
+        "not json",
+        '{"version": 1, "entries": {"key": ["value", 0]}}',
+        '{"version": 2, "entries": []}',
+        '{"version": 2, "entries": {"key": "value"}}',
+    ],
+)
+def test_malformed_cache_is_ignored(cache_path, contents):
+    os.makedirs(os.path.dirname(cache_path))
+    with open(cache_path, "w") as cache_file:
+        cache_file.write(contents)
+
+    assert _TestCache().get("key") is None
+
+
+def test_failing_to_save_is_not_fatal(cache_path):
+    # The cache directory cannot be created below a file.
+    os.makedirs(os.path.dirname(os.path.dirname(cache_path)))
+    with open(os.path.dirname(cache_path), "w"):
+        pass
+    test_cache = _TestCache()
+    test_cache.set("key", "value")
+
+    test_cache.save()
+
+    assert test_cache.get("key") == "value"
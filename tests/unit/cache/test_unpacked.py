@@ -0,0 +1,176 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import stat
+from unittest import mock
+
+import pytest
+
+from snapcraft.internal import cache
+
+
+def _unpack_file(size):
+    def unpack(tree_path):
+        os.makedirs(os.path.join(tree_path, "usr", "lib"))
+        with open(os.path.join(tree_path, "usr", "lib", "foo"), "wb") as f:
+            f.write(b"x" * size)
+        os.chmod(os.path.join(tree_path, "usr", "lib", "foo"), 0o644)
+
+    return unpack
+
+
+@pytest.fixture()
+def unpacked_cache(xdg_dirs):
+    """Return an UnpackedStagePackageCache instance."""
+    return cache.UnpackedStagePackageCache(max_size=100)
+
+
+def test_get_nothing_cached(unpacked_cache):
+    assert unpacked_cache.get(package="foo=1.0", arch="amd64", digest="1234") is None
+
+
+def test_add_and_get(unpacked_cache):
+    tree_path = unpacked_cache.add(
+        package="foo=1.0", arch="amd64", digest="1234", unpack=_unpack_file(10)
+    )
+
+    assert os.path.isfile(os.path.join(tree_path, "usr", "lib", "foo"))
+    assert (
+        unpacked_cache.get(package="foo=1.0", arch="amd64", digest="1234") == tree_path
+    )
+    assert unpacked_cache.get(package="foo=1.0", arch="arm64", digest="1234") is None
+    assert unpacked_cache.get(package="foo=1.1", arch="amd64", digest="1234") is None
+
+
+def test_get_stale_digest(unpacked_cache):
+    unpacked_cache.add(
+        package="foo=1.0", arch="amd64", digest="1234", unpack=_unpack_file(10)
+    )
+
+    assert unpacked_cache.get(package="foo=1.0", arch="amd64", digest="5678") is None
+
+
+def test_add_replaces_stale_entry(unpacked_cache):
+    unpacked_cache.add(
+        package="foo=1.0", arch="amd64", digest="1234", unpack=_unpack_file(10)
+    )
+    tree_path = unpacked_cache.add(
+        package="foo=1.0", arch="amd64", digest="5678", unpack=_unpack_file(20)
+    )
+
+    assert os.path.getsize(os.path.join(tree_path, "usr", "lib", "foo")) == 20
+    assert unpacked_cache.get(package="foo=1.0", arch="amd64", digest="1234") is None
+
+
+def test_add_failure_leaves_nothing_behind(unpacked_cache):
+    def unpack(tree_path):
+        _unpack_file(10)(tree_path)
+        raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError):
+        unpacked_cache.add(
+            package="foo=1.0", arch="amd64", digest="1234", unpack=unpack
+        )
+
+    assert os.listdir(os.path.join(unpacked_cache.unpacked_cache_root, "amd64")) == []
+
+
+def test_prune_least_recently_used(xdg_dirs, unpacked_cache):
+    for package, last_used in (("foo=1.0", 1000), ("bar=1.0", 3000), ("baz=1.0", 2000)):
+        unpacked_cache.add(
+            package=package, arch="amd64", digest="1234", unpack=_unpack_file(40)
+        )
+        os.utime(
+            os.path.join(
+                unpacked_cache.unpacked_cache_root, "amd64", package, "manifest.json"
+            ),
+            (last_used, last_used),
+        )
+
+    pruned = cache.UnpackedStagePackageCache(max_size=100).prune()
+
+    assert pruned == [
+        os.path.join(unpacked_cache.unpacked_cache_root, "amd64", "foo=1.0")
+    ]
+    assert sorted(
+        os.listdir(os.path.join(unpacked_cache.unpacked_cache_root, "amd64"))
+    ) == ["bar=1.0", "baz=1.0"]
+
+
+def test_prune_keeps_entries_in_use(unpacked_cache):
+    for package in ("foo=1.0", "bar=1.0", "baz=1.0"):
+        unpacked_cache.add(
+            package=package, arch="amd64", digest="1234", unpack=_unpack_file(40)
+        )
+
+    assert unpacked_cache.prune() == []
+
+
+def test_add_makes_files_read_only(unpacked_cache):
+    tree_path = unpacked_cache.add(
+        package="foo=1.0", arch="amd64", digest="1234", unpack=_unpack_file(10)
+    )
+
+    file_path = os.path.join(tree_path, "usr", "lib", "foo")
+    assert stat.S_IMODE(os.stat(file_path).st_mode) & 0o222 == 0
+    assert unpacked_cache.get_file_modes(tree_path) == {
+        os.path.join("usr", "lib", "foo"): 0o644
+    }
+
+
+def test_get_modified_entry(unpacked_cache):
+    tree_path = unpacked_cache.add(
+        package="foo=1.0", arch="amd64", digest="1234", unpack=_unpack_file(10)
+    )
+    # What root writing through a hard link would do.
+    file_path = os.path.join(tree_path, "usr", "lib", "foo")
+    os.chmod(file_path, 0o644)
+    with open(file_path, "r+b") as f:
+        f.write(b"y")
+
+    assert unpacked_cache.get(package="foo=1.0", arch="amd64", digest="1234") is None
+    assert not os.path.exists(os.path.dirname(tree_path))
+
+
+def test_get_does_not_read_files(unpacked_cache):
+    tree_path = unpacked_cache.add(
+        package="foo=1.0", arch="amd64", digest="1234", unpack=_unpack_file(10)
+    )
+    file_path = os.path.join(tree_path, "usr", "lib", "foo")
+
+    with mock.patch("builtins.open", wraps=open) as open_mock:
+        assert (
+            unpacked_cache.get(package="foo=1.0", arch="amd64", digest="1234")
+            == tree_path
+        )
+
+    assert file_path not in [c[0][0] for c in open_mock.call_args_list]
+
+
+def test_get_replaced_file(unpacked_cache):
+    tree_path = unpacked_cache.add(
+        package="foo=1.0", arch="amd64", digest="1234", unpack=_unpack_file(10)
+    )
+    file_path = os.path.join(tree_path, "usr", "lib", "foo")
+    file_stat = os.stat(file_path)
+    os.rename(file_path, file_path + ".old")
+    with open(file_path, "wb") as f:
+        f.write(b"y" * 10)
+    os.chmod(file_path, 0o444)
+    os.utime(file_path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns))
+
+    assert unpacked_cache.get(package="foo=1.0", arch="amd64", digest="1234") is None
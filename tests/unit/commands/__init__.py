@@ -99,6 +99,9 @@ class LifecycleCommandsBaseTestCase(CommandBaseTestCase):
         super().setUp()
 
         self.useFixture(fixtures.EnvironmentVariable("SNAPCRAFT_BUILD_ENVIRONMENT"))
+        # Provider options are applied to the environment on the host.
+        self.useFixture(fixtures.EnvironmentVariable("SNAPCRAFT_PARALLEL_PARTS"))
+        self.useFixture(fixtures.EnvironmentVariable("SNAPCRAFT_EXPLAIN"))
 
         self.fake_lifecycle_clean = fixtures.MockPatch(
             "snapcraft.internal.lifecycle.clean"
@@ -0,0 +1,82 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from unittest import mock
+
+from testtools.matchers import Contains, Equals
+
+from snapcraft.internal import cache
+from . import CommandBaseTestCase
+
+
+class CacheCommandTestCase(CommandBaseTestCase):
+    def setUp(self):
+        super().setUp()
+
+        patcher = mock.patch.object(
+            cache.CacheManager,
+            "get_usage",
+            return_value={
+                "files": (2, 2048),
+                "stage-packages": (1, 3 * 1024 ** 2),
+                "projects": (0, 0),
+            },
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_report(self):
+        result = self.run_command(["cache"])
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.assertThat(result.output, Contains("files"))
+        self.assertThat(result.output, Contains("2.0 KiB"))
+        self.assertThat(result.output, Contains("3.0 MiB"))
+
+    @mock.patch.object(cache.CacheManager, "prune", return_value=[])
+    def test_prune(self, prune_mock):
+        result = self.run_command(
+            ["cache", "--prune", "--max-size", "10G", "--max-age", "30"]
+        )
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.assertThat(result.output, Contains("Pruned 0 entries, freeing 0 B."))
+        prune_mock.assert_called_once_with(
+            max_size=10 * 1024 ** 3, max_age=30 * 24 * 60 * 60
+        )
+
+    @mock.patch.object(cache.CacheManager, "prune", return_value=[])
+    def test_prune_limits_from_environment(self, prune_mock):
+        result = self.run_command(
+            ["cache", "--prune"], env={"SNAPCRAFT_CACHE_MAX_SIZE": "512M"}
+        )
+
+        self.assertThat(result.exit_code, Equals(0))
+        prune_mock.assert_called_once_with(max_size=512 * 1024 ** 2, max_age=None)
+
+    def test_prune_without_limits(self):
+        result = self.run_command(["cache", "--prune"])
+
+        self.assertThat(result.exit_code, Equals(2))
+        self.assertThat(
+            result.output, Contains("--prune requires --max-size or --max-age.")
+        )
+
+    def test_invalid_size(self):
+        result = self.run_command(["cache", "--prune", "--max-size", "ten"])
+
+        self.assertThat(result.exit_code, Equals(2))
+        self.assertThat(result.output, Contains("expected a size such as 500M"))
@@ -87,7 +87,7 @@ class TestPullBuildStagePrimeCommand(LifecycleCommandsBaseTestCase):
         self.assertThat(result.exit_code, Equals(0))
         self.fake_get_provider_for.mock.assert_not_called()
         self.fake_lifecycle_execute.mock.assert_called_once_with(
-            step, mock.ANY, tuple()
+            step, mock.ANY, tuple(), parallel_parts=1, explain=False
         )
 
     def run_test_with_parts_specified_using_destructive_mode(self, step):
@@ -98,7 +98,29 @@ class TestPullBuildStagePrimeCommand(LifecycleCommandsBaseTestCase):
         self.assertThat(result.exit_code, Equals(0))
         self.fake_get_provider_for.mock.assert_not_called()
         self.fake_lifecycle_execute.mock.assert_called_once_with(
-            step, mock.ANY, tuple(["part0", "part1", "part2"])
+            step,
+            mock.ANY,
+            tuple(["part0", "part1", "part2"]),
+            parallel_parts=1,
+            explain=False,
+        )
+
+    def run_test_with_parallel_parts_using_destructive_mode(self, step):
+        result = self.run_command(
+            [step.name, "--destructive-mode", "--parallel-parts", "4"]
+        )
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.fake_lifecycle_execute.mock.assert_called_once_with(
+            step, mock.ANY, tuple(), parallel_parts=4, explain=False
+        )
+
+    def run_test_with_explain_using_destructive_mode(self, step):
+        result = self.run_command([step.name, "--destructive-mode", "--explain"])
+
+        self.assertThat(result.exit_code, Equals(0))
+        self.fake_lifecycle_execute.mock.assert_called_once_with(
+            step, mock.ANY, tuple(), parallel_parts=1, explain=True
         )
 
     def test_pull_defaults(self):
@@ -125,6 +147,9 @@ class TestPullBuildStagePrimeCommand(LifecycleCommandsBaseTestCase):
     def test_pull_with_parts_specified_using_destructive_mode(self):
         self.run_test_with_parts_specified_using_destructive_mode(step=steps.PULL)
 
+    def test_pull_with_parallel_parts_using_destructive_mode(self):
+        self.run_test_with_parallel_parts_using_destructive_mode(step=steps.PULL)
+
     def test_build_defaults(self):
         self.run_test_using_defaults(step=steps.BUILD)
 
@@ -149,6 +174,12 @@ class TestPullBuildStagePrimeCommand(LifecycleCommandsBaseTestCase):
     def test_build_with_parts_specified_using_destructive_mode(self):
         self.run_test_with_parts_specified_using_destructive_mode(step=steps.BUILD)
 
+    def test_build_with_parallel_parts_using_destructive_mode(self):
+        self.run_test_with_parallel_parts_using_destructive_mode(step=steps.BUILD)
+
+    def test_build_with_explain_using_destructive_mode(self):
+        self.run_test_with_explain_using_destructive_mode(step=steps.BUILD)
+
     def test_stage_defaults(self):
         self.run_test_using_defaults(step=steps.STAGE)
 
@@ -90,7 +90,7 @@ class TestSnap(LifecycleCommandsBaseTestCase):
         self.assertThat(result.exit_code, Equals(0))
         self.fake_get_provider_for.mock.assert_not_called()
         self.fake_lifecycle_execute.mock.assert_called_once_with(
-            steps.PRIME, mock.ANY, tuple()
+            steps.PRIME, mock.ANY, tuple(), parallel_parts=1, explain=False
         )
         self.fake_pack.mock.assert_called_once_with(
             os.path.join(self.path, "prime"), compression=None, output=None
@@ -104,7 +104,7 @@ class TestSnap(LifecycleCommandsBaseTestCase):
         self.assertThat(result.exit_code, Equals(0))
         self.fake_get_provider_for.mock.assert_not_called()
         self.fake_lifecycle_execute.mock.assert_called_once_with(
-            steps.PRIME, mock.ANY, tuple()
+            steps.PRIME, mock.ANY, tuple(), parallel_parts=1, explain=False
         )
         self.fake_pack.mock.assert_called_once_with(
             os.path.join(self.path, "prime"), compression=None, output="foo.snap"
@@ -116,7 +116,7 @@ class TestSnap(LifecycleCommandsBaseTestCase):
         self.assertThat(result.exit_code, Equals(0))
         self.fake_get_provider_for.mock.assert_not_called()
         self.fake_lifecycle_execute.mock.assert_called_once_with(
-            steps.PRIME, mock.ANY, tuple()
+            steps.PRIME, mock.ANY, tuple(), parallel_parts=1, explain=False
         )
         self.fake_pack.mock.assert_called_once_with(
             os.path.join(self.path, "prime"), compression=None, output="/tmp"
@@ -26,7 +26,7 @@ import xdg
 def pytest_generate_tests(metafunc):
     idlist = []
     argvalues = []
-    if metafunc.cls is None:
+    if metafunc.cls is None or not hasattr(metafunc.cls, "scenarios"):
         return
 
     for scenario in metafunc.cls.scenarios:
@@ -85,6 +85,29 @@ class ExecutionTestCase(LifecycleTestBase):
             Contains("'part2' has dependencies that need to be staged: part1"),
         )
 
+    @mock.patch("snapcraft.repo.snaps.install_snaps")
+    def test_explain(self, mock_install_build_snaps):
+        project_config = self.make_snapcraft_project(
+            textwrap.dedent(
+                """\
+                parts:
+                  part1:
+                    plugin: nil
+                """
+            )
+        )
+        lifecycle.execute(steps.PULL, project_config)
+
+        lifecycle.execute(steps.BUILD, project_config, explain=True)
+
+        self.assertThat(self.fake_logger.output, Contains("Status time (ms)"))
+        self.assertThat(
+            self.fake_logger.output, Contains("part1   pull    skip      up to date")
+        )
+        self.assertThat(
+            self.fake_logger.output, Contains("part1   build   run       has not run")
+        )
+
     @mock.patch("snapcraft.repo.snaps.install_snaps")
     def test_no_exception_when_dependency_is_required_but_already_staged(
         self, mock_install_build_snaps
@@ -342,6 +365,33 @@ class ExecutionTestCase(LifecycleTestBase):
             os.path.join(steps.PRIME.name, "snap", ".snapcraft"), Not(DirExists())
         )
 
+    def test_prime_records_libraries_primed_by_all_parts(self):
+        project_config = self.make_snapcraft_project(
+            textwrap.dedent(
+                """\
+                parts:
+                  part1:
+                    plugin: nil
+                    override-build: |
+                      mkdir -p $SNAPCRAFT_PART_INSTALL/lib
+                      touch $SNAPCRAFT_PART_INSTALL/lib/libone.so.1
+                  part2:
+                    plugin: nil
+                    override-build: |
+                      mkdir -p $SNAPCRAFT_PART_INSTALL/lib
+                      touch $SNAPCRAFT_PART_INSTALL/lib/libtwo.so.1
+                """
+            )
+        )
+
+        lifecycle.execute(steps.PRIME, project_config)
+
+        primed_sonames = pluginhandler.PrimedLibraries("prime").get_digest()
+        for part in project_config.parts.all_parts:
+            self.assertThat(
+                part.get_state(steps.PRIME).primed_sonames, Equals(primed_sonames)
+            )
+
     def test_non_prime_and_no_version(self):
         snapcraft_yaml = fixture_setup.SnapcraftYaml(self.path, version=None)
         snapcraft_yaml.data["adopt-info"] = "test-part"
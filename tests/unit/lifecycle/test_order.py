@@ -1487,9 +1487,9 @@ class DirtyOutdatedTestBase(OrderTestBase):
 
         original_clean = pluginhandler.PluginHandler.clean
 
-        def _fake_clean(self, staged_state, primed_state, step):
+        def _fake_clean(self, staged_state, primed_state, step, **kwargs):
             nonlocal dirty_parts
-            original_clean(self, staged_state, primed_state, step)
+            original_clean(self, staged_state, primed_state, step, **kwargs)
             with contextlib.suppress(ValueError):
                 dirty_parts.remove(dict(part=self.name, step=step))
 
@@ -0,0 +1,137 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+
+import pytest
+
+from snapcraft.internal.lifecycle._scheduler import PartScheduler
+
+
+class FakePart:
+    def __init__(self, name, concurrent=True):
+        self.name = name
+        self.concurrent = concurrent
+
+
+def _make_scheduler(parts, after=None, max_workers=4):
+    if after is None:
+        after = dict()
+
+    by_name = {p.name: p for p in parts}
+
+    def get_dependencies(part_name):
+        return {by_name[n] for n in after.get(part_name, [])}
+
+    return PartScheduler(
+        parts=parts,
+        get_dependencies=get_dependencies,
+        is_concurrent=lambda p: p.concurrent,
+        max_workers=max_workers,
+    )
+
+
+def test_independent_parts_run_concurrently():
+    parts = [FakePart("part1"), FakePart("part2"), FakePart("part3")]
+    barrier = threading.Barrier(len(parts), timeout=10)
+    ran = []
+
+    def func(part):
+        # Only passes if all parts are running at the same time.
+        barrier.wait()
+        ran.append(part.name)
+
+    _make_scheduler(parts).run(func)
+
+    assert sorted(ran) == ["part1", "part2", "part3"]
+
+
+def test_dependencies_complete_first():
+    parts = [FakePart("part1"), FakePart("part2"), FakePart("part3")]
+    after = {"part2": ["part1"], "part3": ["part2"]}
+    ran = []
+
+    _make_scheduler(parts, after).run(lambda p: ran.append(p.name))
+
+    assert ran == ["part1", "part2", "part3"]
+
+
+def test_dependencies_outside_of_parts_are_ignored():
+    parts = [FakePart("part2")]
+    after = {"part2": ["part1"]}
+    by_name = {"part1": FakePart("part1"), "part2": parts[0]}
+    ran = []
+
+    PartScheduler(
+        parts=parts,
+        get_dependencies=lambda n: {by_name[d] for d in after.get(n, [])},
+        is_concurrent=lambda p: True,
+        max_workers=2,
+    ).run(lambda p: ran.append(p.name))
+
+    assert ran == ["part2"]
+
+
+def test_exclusive_parts_run_alone():
+    parts = [FakePart("part1"), FakePart("part2", concurrent=False), FakePart("part3")]
+    lock = threading.Lock()
+    in_flight = set()
+    overlaps = []
+
+    def func(part):
+        with lock:
+            in_flight.add(part.name)
+            if "part2" in in_flight and len(in_flight) > 1:
+                overlaps.append(set(in_flight))
+        with lock:
+            in_flight.remove(part.name)
+
+    _make_scheduler(parts).run(func)
+
+    assert overlaps == []
+
+
+def test_max_workers_is_respected():
+    parts = [FakePart("part{}".format(i)) for i in range(8)]
+    lock = threading.Lock()
+    counts = {"current": 0, "max": 0}
+
+    def func(part):
+        with lock:
+            counts["current"] += 1
+            counts["max"] = max(counts["max"], counts["current"])
+        with lock:
+            counts["current"] -= 1
+
+    _make_scheduler(parts, max_workers=2).run(func)
+
+    assert counts["max"] <= 2
+
+
+def test_failure_stops_scheduling():
+    parts = [FakePart("part1"), FakePart("part2"), FakePart("part3")]
+    after = {"part2": ["part1"], "part3": ["part2"]}
+    ran = []
+
+    def func(part):
+        ran.append(part.name)
+        if part.name == "part1":
+            raise RuntimeError("failed")
+
+    with pytest.raises(RuntimeError):
+        _make_scheduler(parts, after).run(func)
+
+    assert ran == ["part1"]
@@ -16,8 +16,11 @@
 
 import os
 import textwrap
+from unittest import mock
 
-from snapcraft.internal import lifecycle, states, steps
+from testtools.matchers import Equals, GreaterThan
+
+from snapcraft.internal import errors, lifecycle, states, steps
 from snapcraft.internal.lifecycle._status_cache import StatusCache
 
 from . import LifecycleTestBase
@@ -115,3 +118,50 @@ class StatusCacheTestCase(LifecycleTestBase):
         # Now clear that step from the cache, and it should be up-to-date
         self.cache.clear_step(main_part, steps.PULL)
         self.assertTrue(self.cache.get_outdated_report(main_part, steps.PULL))
+
+    def test_step_timestamp(self):
+        main_part = self.project_config.parts.get_part("main")
+        self.assertRaises(
+            errors.StepHasNotRunError, self.cache.step_timestamp, main_part, steps.PULL
+        )
+
+        lifecycle.execute(steps.PULL, self.project_config, part_names=["main"])
+
+        # Should still have cached that the step has not run
+        self.assertRaises(
+            errors.StepHasNotRunError, self.cache.step_timestamp, main_part, steps.PULL
+        )
+
+        # Now clear that step from the cache, and the state is read again
+        self.cache.clear_step(main_part, steps.PULL)
+        pull_state_file = states.get_step_state_file(
+            main_part.plugin.statedir, steps.PULL
+        )
+        self.assertThat(
+            self.cache.step_timestamp(main_part, steps.PULL),
+            Equals(os.stat(pull_state_file).st_mtime),
+        )
+
+    def test_state_read_once_per_part(self):
+        lifecycle.execute(steps.PULL, self.project_config, part_names=["main"])
+        main_part = self.project_config.parts.get_part("main")
+        dependent_part = self.project_config.parts.get_part("dependent")
+
+        with mock.patch(
+            "snapcraft.internal.lifecycle._status_cache._get_step_timestamps",
+            return_value={steps.PULL: 1.0},
+        ) as get_step_timestamps_mock:
+            for step in steps.STEPS:
+                self.cache.should_step_run(dependent_part, step)
+                self.cache.should_step_run(main_part, step)
+                self.cache.step_timestamp(main_part, steps.PULL)
+
+        get_step_timestamps_mock.assert_called_once_with(main_part)
+
+    def test_get_cost(self):
+        main_part = self.project_config.parts.get_part("main")
+        self.assertThat(self.cache.get_cost(main_part), Equals(0))
+
+        self.cache.should_step_run(main_part, steps.PULL)
+
+        self.assertThat(self.cache.get_cost(main_part), GreaterThan(0))
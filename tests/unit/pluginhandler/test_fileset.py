@@ -0,0 +1,107 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import glob
+import os
+
+import pytest
+
+from snapcraft.internal.pluginhandler._fileset import (
+    FilesetMatcher,
+    get_migratable_filesets,
+)
+
+
+@pytest.fixture
+def install_dir(tmp_work_path):
+    os.makedirs("install/usr/lib/x86_64-linux-gnu")
+    os.makedirs("install/usr/share/doc")
+    os.makedirs("install/real")
+    for path in (
+        "install/.hidden",
+        "install/usr/lib/libfoo.so",
+        "install/usr/lib/x86_64-linux-gnu/libbar.so",
+        "install/usr/lib/x86_64-linux-gnu/.libbar.so.hmac",
+        "install/usr/share/doc/README",
+        "install/real/file",
+    ):
+        open(path, "w").close()
+    os.symlink("real", "install/link")
+    os.symlink("../../real/file", "install/usr/lib/file-link")
+
+    return "install"
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [
+        "*",
+        "**",
+        "**/*.so",
+        "usr/*/*.so",
+        "usr/lib/**",
+        "*/lib/*",
+        "link/*",
+        ".*",
+        "usr/lib/x86_64-linux-gnu/.*",
+        "usr/share",
+        "does-not-exist",
+    ],
+)
+def test_glob_matches_iglob(install_dir, pattern):
+    expected = {
+        os.path.relpath(p, install_dir)
+        for p in glob.iglob(os.path.join(install_dir, pattern), recursive=True)
+    }
+
+    matches = {os.path.normpath(p) for p in FilesetMatcher(install_dir).glob(pattern)}
+
+    assert matches == expected
+
+
+def test_walk_matches_os_walk(install_dir):
+    expected = set()
+    for root, dirs, files in os.walk(install_dir):
+        expected |= {os.path.relpath(os.path.join(root, d), install_dir) for d in dirs}
+        expected |= {os.path.relpath(os.path.join(root, f), install_dir) for f in files}
+
+    assert set(FilesetMatcher(install_dir).walk(".")) == expected
+
+
+def test_resolve_parents_only(install_dir):
+    matcher = FilesetMatcher(install_dir)
+
+    assert matcher.resolve("link/file") == "real/file"
+    assert matcher.resolve("link") == "link"
+    assert matcher.resolve("usr/lib/file-link") == "usr/lib/file-link"
+
+
+def test_migratable_filesets_exclude_from_included_dir(install_dir):
+    files, dirs = get_migratable_filesets(["usr"], ["*/*/*.so", "usr/share"], "install")
+
+    assert files == {
+        "usr/lib/file-link",
+        "usr/lib/x86_64-linux-gnu/libbar.so",
+        "usr/lib/x86_64-linux-gnu/.libbar.so.hmac",
+    }
+    assert dirs == {"usr", "usr/lib", "usr/lib/x86_64-linux-gnu"}
+
+
+def test_migratable_filesets_through_symlinked_dir(install_dir):
+    files, dirs = get_migratable_filesets(["link/*"], [], "install")
+
+    assert files == {"real/file"}
+    assert dirs == {"real"}
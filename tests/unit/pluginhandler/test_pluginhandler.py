@@ -183,6 +183,34 @@ class PluginTestCase(unit.TestCase):
                 "Expected staging to allow overwriting of already-staged files",
             )
 
+    def test_migrate_files_leaves_same_hard_links_alone(self):
+        os.makedirs("install/dir")
+        open("install/dir/foo", "w").close()
+        files, dirs = pluginhandler._migratable_filesets(["*"], "install")
+        pluginhandler._migrate_files(files, dirs, "install", "stage")
+
+        with patch("os.remove") as remove_mock, patch("os.link") as link_mock, patch(
+            "snapcraft.file_utils.create_similar_directory"
+        ) as create_mock:
+            pluginhandler._migrate_files(files, dirs, "install", "stage")
+
+        remove_mock.assert_not_called()
+        link_mock.assert_not_called()
+        create_mock.assert_not_called()
+        self.assertThat(
+            os.stat("stage/dir/foo").st_ino, Equals(os.stat("install/dir/foo").st_ino)
+        )
+
+    def test_migrate_files_updates_existing_directory_mode(self):
+        os.makedirs("install/dir")
+        os.makedirs("stage/dir")
+        os.chmod("install/dir", 0o700)
+        files, dirs = pluginhandler._migratable_filesets(["*"], "install")
+
+        pluginhandler._migrate_files(files, dirs, "install", "stage")
+
+        self.assertThat(stat.S_IMODE(os.stat("stage/dir").st_mode), Equals(0o700))
+
     def test_migrate_files_supports_no_follow_symlinks(self):
         os.makedirs("install")
         os.makedirs("stage")
@@ -1392,6 +1420,45 @@ class CollisionTestCase(unit.TestCase):
         self.assertThat(raised.part_name, Equals("part4"))
         self.assertThat(raised.file_paths, Equals("    file.pc"))
 
+    def test_collisions_between_many_parts(self):
+        raised = self.assertRaises(
+            errors.SnapcraftPartConflictsError,
+            pluginhandler.check_for_collisions,
+            [self.part1, self.part2, self.part3, self.part4],
+        )
+
+        self.assertThat(
+            str(raised),
+            Contains(
+                "Parts 'part2' and 'part3':\n"
+                "    1\n"
+                "    a/2\n"
+                "Parts 'part1' and 'part4':\n"
+                "    file.pc\n"
+                "Parts 'part2' and 'part4':\n"
+                "    file.pc\n"
+            ),
+        )
+
+    def test_no_collisions_hard_links_not_read(self):
+        part7 = self.load_part("part7")
+        part7.part_install_dir = "install7"
+        os.makedirs(part7.part_install_dir)
+        with open(os.path.join(part7.part_install_dir, "1"), "w") as f:
+            f.write("1")
+        part8 = self.load_part("part8")
+        part8.part_install_dir = "install8"
+        os.makedirs(part8.part_install_dir)
+        os.link(
+            os.path.join(part7.part_install_dir, "1"),
+            os.path.join(part8.part_install_dir, "1"),
+        )
+
+        with patch("snapcraft.file_utils.calculate_hash") as hash_mock:
+            pluginhandler.check_for_collisions([part7, part8])
+
+        hash_mock.assert_not_called()
+
     def test_collision_with_part_not_built(self):
         part_built = self.load_part(
             "part_built", part_properties={"stage": ["collision"]}
@@ -0,0 +1,54 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from snapcraft.internal.pluginhandler import PrimedLibraries
+
+
+def _touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+
+
+def test_same_libraries_same_digest(tmp_path):
+    _touch(tmp_path / "lib" / "libfoo.so.1")
+    _touch(tmp_path / "bin" / "foo")
+    digest = PrimedLibraries(str(tmp_path)).get_digest()
+
+    _touch(tmp_path / "bin" / "bar")
+
+    assert PrimedLibraries(str(tmp_path)).get_digest() == digest
+
+
+def test_added_libraries(tmp_path):
+    primed_libraries = PrimedLibraries(str(tmp_path))
+    digest = primed_libraries.get_digest()
+
+    _touch(tmp_path / "lib" / "libfoo.so")
+    primed_libraries.add(["lib/libfoo.so", "lib/foo.so.d/README"])
+
+    assert primed_libraries.get_digest() != digest
+    assert primed_libraries.get_digest() == PrimedLibraries(str(tmp_path)).get_digest()
+
+
+def test_removed_libraries(tmp_path):
+    _touch(tmp_path / "lib" / "libfoo.so.1")
+    primed_libraries = PrimedLibraries(str(tmp_path))
+    digest = primed_libraries.get_digest()
+
+    (tmp_path / "lib" / "libfoo.so.1").unlink()
+
+    assert primed_libraries.get_digest() != digest
+    assert primed_libraries.get_digest() == PrimedLibraries(str(tmp_path)).get_digest()
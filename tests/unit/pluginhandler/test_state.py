@@ -15,14 +15,15 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import shutil
 from collections import OrderedDict
-from unittest.mock import call, patch
+from unittest.mock import ANY, call, patch
 
 import fixtures
-from testtools.matchers import Contains, Equals
+from testtools.matchers import Contains, Equals, FileContains
 
 from snapcraft import extractors, plugins
-from snapcraft.internal import elf, errors, states, steps
+from snapcraft.internal import elf, errors, pluginhandler, states, steps
 from tests import fixture_setup, unit
 
 
@@ -655,7 +656,10 @@ class StateTestCase(StateBaseTestCase):
         self.assertThat(self.handler.latest_step(), Equals(steps.PRIME))
         self.assertRaises(errors.NoNextStepError, self.handler.next_step)
         self.get_elf_files_mock.assert_called_once_with(
-            self.handler._project.prime_dir, {"bin/1", "bin/2"}
+            self.handler._project.prime_dir,
+            {"bin/1", "bin/2"},
+            max_workers=self.handler._project.parallel_build_count,
+            attribute_cache=ANY,
         )
         self.assertFalse(mock_copy.called)
 
@@ -735,7 +739,10 @@ class StateTestCase(StateBaseTestCase):
         # bin/2 shouldn't be in this list as it was already primed by another
         # part.
         self.get_elf_files_mock.assert_called_once_with(
-            self.handler._project.prime_dir, {"bin/1"}
+            self.handler._project.prime_dir,
+            {"bin/1"},
+            max_workers=self.handler._project.parallel_build_count,
+            attribute_cache=ANY,
         )
         self.assertFalse(mock_copy.called)
 
@@ -797,7 +804,10 @@ class StateTestCase(StateBaseTestCase):
         self.assertThat(self.handler.latest_step(), Equals(steps.PRIME))
         self.assertRaises(errors.NoNextStepError, self.handler.next_step)
         self.get_elf_files_mock.assert_called_once_with(
-            self.handler._project.prime_dir, {"bin/1", "bin/2"}
+            self.handler._project.prime_dir,
+            {"bin/1", "bin/2"},
+            max_workers=self.handler._project.parallel_build_count,
+            attribute_cache=ANY,
         )
         mock_migrate_files.assert_has_calls(
             [
@@ -868,7 +878,10 @@ class StateTestCase(StateBaseTestCase):
         self.assertThat(self.handler.latest_step(), Equals(steps.PRIME))
         self.assertRaises(errors.NoNextStepError, self.handler.next_step)
         self.get_elf_files_mock.assert_called_once_with(
-            self.handler._project.prime_dir, {"bin/file"}
+            self.handler._project.prime_dir,
+            {"bin/file"},
+            max_workers=self.handler._project.parallel_build_count,
+            attribute_cache=ANY,
         )
         # Verify that only the part's files were migrated-- not the system
         # dependency.
@@ -917,7 +930,10 @@ class StateTestCase(StateBaseTestCase):
         self.assertThat(self.handler.latest_step(), Equals(steps.PRIME))
         self.assertRaises(errors.NoNextStepError, self.handler.next_step)
         self.get_elf_files_mock.assert_called_once_with(
-            self.handler._project.prime_dir, {"bin/1", "foo/bar/baz"}
+            self.handler._project.prime_dir,
+            {"bin/1", "foo/bar/baz"},
+            max_workers=self.handler._project.parallel_build_count,
+            attribute_cache=ANY,
         )
         mock_migrate_files.assert_called_once_with(
             {"bin/1", "foo/bar/baz"},
@@ -950,7 +966,10 @@ class StateTestCase(StateBaseTestCase):
         self.assertThat(self.handler.latest_step(), Equals(steps.PRIME))
         self.assertRaises(errors.NoNextStepError, self.handler.next_step)
         self.get_elf_files_mock.assert_called_once_with(
-            self.handler._project.prime_dir, {"bin/1"}
+            self.handler._project.prime_dir,
+            {"bin/1"},
+            max_workers=self.handler._project.parallel_build_count,
+            attribute_cache=ANY,
         )
         self.assertFalse(mock_copy.called)
 
@@ -1070,6 +1089,151 @@ class StateTestCase(StateBaseTestCase):
 
         self.assertThat(raised.step, Equals(steps.PRIME))
 
+    def test_prime_updates_kept_primed_files(self):
+        bindir = os.path.join(self.handler.part_install_dir, "bin")
+        os.makedirs(bindir)
+        for name in ("1", "2", "3"):
+            open(os.path.join(bindir, name), "w").close()
+
+        self.handler.mark_done(steps.BUILD)
+        self.handler.stage()
+        self.handler.prime()
+
+        # Stand in for patching, which replaces the primed file.
+        primed_path = os.path.join(self.prime_dir, "bin", "1")
+        os.remove(primed_path)
+        with open(primed_path, "w") as primed_file:
+            primed_file.write("patched")
+
+        self.handler.clean({}, {}, steps.STAGE, keep_primed=True)
+
+        self.assertTrue(self.handler.is_clean(steps.PRIME))
+        self.assertThat(primed_path, FileContains("patched"))
+
+        os.remove(os.path.join(bindir, "2"))
+        with open(os.path.join(bindir, "2"), "w") as installed_file:
+            installed_file.write("changed")
+        os.remove(os.path.join(bindir, "3"))
+
+        self.handler.stage()
+        self.handler.prime()
+
+        self.assertThat(primed_path, FileContains("patched"))
+        self.assertThat(
+            os.path.join(self.prime_dir, "bin", "2"), FileContains("changed")
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.prime_dir, "bin", "3")))
+        self.assertThat(
+            self.handler.get_state(steps.PRIME).files, Equals({"bin/1", "bin/2"})
+        )
+
+    def test_clean_prime_kept_primed_files(self):
+        bindir = os.path.join(self.handler.part_install_dir, "bin")
+        os.makedirs(bindir)
+        open(os.path.join(bindir, "1"), "w").close()
+
+        self.handler.mark_done(steps.BUILD)
+        self.handler.stage()
+        self.handler.prime()
+        self.handler.clean({}, {}, steps.STAGE, keep_primed=True)
+
+        self.handler.clean_prime({})
+
+        self.assertFalse(os.path.exists(os.path.join(self.prime_dir, "bin")))
+
+    def test_prime_keeps_primed_files_of_rebuilt_part(self):
+        bindir = os.path.join(self.handler.part_install_dir, "bin")
+        os.makedirs(bindir)
+        open(os.path.join(bindir, "1"), "w").close()
+
+        self.handler.mark_done(steps.BUILD)
+        self.handler.stage()
+        self.handler.prime()
+
+        primed_path = os.path.join(self.prime_dir, "bin", "1")
+        os.remove(primed_path)
+        with open(primed_path, "w") as primed_file:
+            primed_file.write("patched")
+
+        self.handler.clean({}, {}, steps.STAGE, keep_primed=True)
+
+        # Rebuilding the part puts the same file at a new inode.
+        installed_path = os.path.join(bindir, "1")
+        shutil.copy2(installed_path, installed_path + ".new")
+        os.replace(installed_path + ".new", installed_path)
+
+        self.handler.stage()
+        self.handler.prime()
+
+        self.assertThat(primed_path, FileContains("patched"))
+
+    @patch("snapcraft.internal.elf.ElfFile._extract_attributes")
+    @patch("snapcraft.internal.elf.ElfFile.load_dependencies", return_value=set())
+    def test_prime_resolves_kept_elf_files_if_primed_libraries_change(
+        self, mock_load_dependencies, mock_extract_attributes
+    ):
+        bindir = os.path.join(self.handler.part_install_dir, "bin")
+        os.makedirs(bindir)
+        open(os.path.join(bindir, "1"), "w").close()
+        open(os.path.join(bindir, "2"), "w").close()
+
+        def get_elf_files(root_path, file_list, **kwargs):
+            if "bin/1" not in file_list:
+                return frozenset()
+            return frozenset([elf.ElfFile(path=os.path.join(root_path, "bin", "1"))])
+
+        self.get_elf_files_mock.side_effect = get_elf_files
+
+        def prime():
+            # As the lifecycle does for every run.
+            self.handler.primed_libraries = pluginhandler.PrimedLibraries(
+                self.prime_dir
+            )
+            self.handler.prime()
+            self.handler.mark_primed_sonames(
+                self.handler.primed_libraries.get_digest()
+            )
+
+        self.handler.mark_done(steps.BUILD)
+        self.handler.stage()
+        prime()
+
+        self.handler.clean({}, {}, steps.STAGE, keep_primed=True)
+        self.handler.stage()
+        prime()
+
+        self.assertThat(
+            self.get_elf_files_mock.call_args,
+            Equals(
+                call(
+                    self.prime_dir,
+                    set(),
+                    max_workers=self.handler._project.parallel_build_count,
+                    attribute_cache=ANY,
+                )
+            ),
+        )
+
+        # Another part primes a library.
+        os.makedirs(os.path.join(self.prime_dir, "lib"))
+        open(os.path.join(self.prime_dir, "lib", "libfoo.so.1"), "w").close()
+
+        self.handler.clean({}, {}, steps.STAGE, keep_primed=True)
+        self.handler.stage()
+        prime()
+
+        self.assertThat(
+            self.get_elf_files_mock.call_args,
+            Equals(
+                call(
+                    self.prime_dir,
+                    {"bin/1", "bin/2"},
+                    max_workers=self.handler._project.parallel_build_count,
+                    attribute_cache=ANY,
+                )
+            ),
+        )
+
 
 class TestStateFileMigration:
     scenarios = [(step.name, dict(step=step)) for step in steps.STEPS]
@@ -23,6 +23,7 @@ from unittest.mock import call
 import fixtures
 from testtools.matchers import Equals
 
+from snapcraft.internal.repo import errors
 from snapcraft.internal.repo.apt_cache import AptCache
 from tests import unit
 
@@ -175,6 +176,113 @@ class TestMockedApt(unit.TestCase):
         )
 
 
+class TestMockedFetchArchives(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.fake_apt = self.useFixture(
+            fixtures.MockPatch("snapcraft.internal.repo.apt_cache.apt")
+        ).mock
+        self.fake_acquire = self.fake_apt.apt_pkg.Acquire.return_value
+        self.fake_acquire.run.return_value = self.fake_acquire.RESULT_CONTINUE
+
+        def make_acquire_file(acquire, **kwargs):
+            acquire_file = mock.Mock(destfile=kwargs["destfile"])
+            acquire_file.status = acquire_file.STAT_DONE
+            return acquire_file
+
+        self.fake_apt.apt_pkg.AcquireFile.side_effect = make_acquire_file
+
+        self.download_path = Path(self.path, "debs")
+        self.download_path.mkdir()
+
+    def _make_package(self, name, *, sha256="1234", size=10):
+        package = mock.Mock()
+        package.name = name
+        package.candidate.version = "1.0"
+        package.candidate.filename = f"pool/main/{name}_1.0_amd64.deb"
+        package.candidate.uri = f"http://archive/pool/main/{name}_1.0_amd64.deb"
+        package.candidate.sha256 = sha256
+        package.candidate.size = size
+        package.candidate.origins = [mock.Mock(trusted=True)]
+        return package
+
+    def _fetch_archives(self, packages):
+        stage_cache = Path(self.path, "cache")
+        stage_cache.mkdir(exist_ok=True)
+
+        with AptCache(stage_cache=stage_cache) as apt_cache:
+            apt_cache.cache.get_changes.return_value = packages
+            return apt_cache.fetch_archives(self.download_path)
+
+    def test_fetch_archives_uses_single_acquire(self):
+        downloaded = self._fetch_archives(
+            [self._make_package("foo"), self._make_package("bar")]
+        )
+
+        self.assertThat(
+            downloaded,
+            Equals(
+                [
+                    ("foo", "1.0", self.download_path / "foo_1.0_amd64.deb"),
+                    ("bar", "1.0", self.download_path / "bar_1.0_amd64.deb"),
+                ]
+            ),
+        )
+        self.fake_apt.apt_pkg.Acquire.assert_called_once_with(mock.ANY)
+        self.fake_acquire.run.assert_called_once_with()
+        self.assertThat(self.fake_apt.apt_pkg.AcquireFile.call_count, Equals(2))
+        self.fake_apt.apt_pkg.AcquireFile.assert_any_call(
+            self.fake_acquire,
+            uri="http://archive/pool/main/foo_1.0_amd64.deb",
+            hash="SHA256:1234",
+            size=10,
+            descr="foo 1.0",
+            short_descr="foo",
+            destfile=str(self.download_path / "foo_1.0_amd64.deb"),
+        )
+
+    def test_fetch_archives_skips_fetched(self):
+        deb_path = self.download_path / "foo_1.0_amd64.deb"
+        deb_path.write_bytes(b"0123456789")
+        sha256 = "84d89877f0d4041efb6bf91a16f0248f2fd573e6af05c19f96bedb9f882f7882"
+
+        downloaded = self._fetch_archives(
+            [self._make_package("foo", sha256=sha256, size=10)]
+        )
+
+        self.assertThat(downloaded, Equals([("foo", "1.0", deb_path)]))
+        self.fake_apt.apt_pkg.AcquireFile.assert_not_called()
+        self.fake_acquire.run.assert_not_called()
+
+    def test_fetch_archives_refetches_mismatch(self):
+        deb_path = self.download_path / "foo_1.0_amd64.deb"
+        deb_path.write_bytes(b"0123456789")
+
+        self._fetch_archives([self._make_package("foo", size=10)])
+
+        self.assertThat(self.fake_apt.apt_pkg.AcquireFile.call_count, Equals(1))
+
+    def test_fetch_archives_failure(self):
+        def make_failed_acquire_file(acquire, **kwargs):
+            return mock.Mock(destfile=kwargs["destfile"], error_text="404 Not Found")
+
+        self.fake_apt.apt_pkg.AcquireFile.side_effect = make_failed_acquire_file
+
+        self.assertRaises(
+            errors.PackageFetchError,
+            self._fetch_archives,
+            [self._make_package("foo")],
+        )
+
+    def test_fetch_archives_untrusted(self):
+        package = self._make_package("foo")
+        package.candidate.origins = [mock.Mock(trusted=False)]
+
+        self.assertRaises(errors.PackageFetchError, self._fetch_archives, [package])
+        self.fake_acquire.run.assert_not_called()
+
+
 class TestAptReadonlyHostCache(unit.TestCase):
     def test_host_is_package_valid(self):
         with AptCache() as apt_cache:
@@ -0,0 +1,351 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import os
+import stat
+import tarfile
+import textwrap
+from unittest import mock
+
+import pytest
+
+from snapcraft.internal import repo
+from snapcraft.internal.repo import errors
+from snapcraft.internal.repo._deb_package import (
+    DebPackage,
+    UnsupportedDebError,
+    link_unpacked_tree,
+)
+
+
+def _make_tar(entries, compression="xz"):
+    tar_bytes = io.BytesIO()
+    with tarfile.open(fileobj=tar_bytes, mode=f"w:{compression}") as tar:
+        for name, kwargs in entries:
+            info = tarfile.TarInfo(name)
+            data = kwargs.pop("data", None)
+            for key, value in kwargs.items():
+                setattr(info, key, value)
+            if data is not None:
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+            else:
+                tar.addfile(info)
+    return tar_bytes.getvalue()
+
+
+def _make_deb(path, data_entries, *, data_name="data.tar.xz", data=None):
+    control = textwrap.dedent(
+        """\
+        Package: foo
+        Version: 1.0-1
+        Architecture: amd64
+        Description: foo
+         Package: not-foo
+        """
+    ).encode()
+    members = [
+        ("debian-binary", b"2.0\n"),
+        ("control.tar.xz", _make_tar([("./control", dict(data=control))])),
+        (data_name, data if data is not None else _make_tar(data_entries)),
+    ]
+
+    with open(path, "wb") as deb_file:
+        deb_file.write(b"!<arch>\n")
+        for name, content in members:
+            header = "{:<16}{:<12}{:<6}{:<6}{:<8}{:<10}`\n".format(
+                name, 0, 0, 0, 100644, len(content)
+            )
+            deb_file.write(header.encode())
+            deb_file.write(content)
+            if len(content) % 2:
+                deb_file.write(b"\n")
+
+    return path
+
+
+@pytest.fixture(autouse=True)
+def mock_write_origin():
+    with mock.patch(
+        "snapcraft.internal.xattrs.write_origin_stage_package"
+    ) as write_origin:
+        yield write_origin
+
+
+def test_get_name_version(tmp_path):
+    deb_path = _make_deb(tmp_path / "foo.deb", [])
+
+    assert DebPackage(deb_path).get_name_version() == "foo=1.0-1"
+
+
+def test_get_architecture(tmp_path):
+    deb_path = _make_deb(tmp_path / "foo.deb", [])
+
+    assert DebPackage(deb_path).get_architecture() == "amd64"
+
+
+def test_not_a_deb(tmp_path):
+    deb_path = tmp_path / "foo.deb"
+    deb_path.write_bytes(b"not a deb")
+
+    with pytest.raises(errors.UnpackError):
+        DebPackage(deb_path)
+
+
+def test_unpack(tmp_path, mock_write_origin):
+    deb_path = _make_deb(
+        tmp_path / "foo.deb",
+        [
+            ("./", dict(type=tarfile.DIRTYPE, mode=0o755)),
+            ("./usr/bin", dict(type=tarfile.DIRTYPE, mode=0o755)),
+            ("./usr/bin/foo", dict(data=b"foo", mode=0o755, mtime=1000)),
+            ("./usr/bin/suid", dict(data=b"suid", mode=0o4755)),
+            ("./usr/bin/bar", dict(type=tarfile.LNKTYPE, linkname="./usr/bin/foo")),
+            ("./usr/bin/rel", dict(type=tarfile.SYMTYPE, linkname="foo")),
+            ("./usr/bin/abs", dict(type=tarfile.SYMTYPE, linkname="/usr/bin/foo")),
+            ("./usr/lib/foo.pc", dict(data=b"prefix=/usr\n", mode=0o644)),
+        ],
+    )
+    install_path = tmp_path / "install"
+
+    absolute_symlinks = DebPackage(deb_path).unpack(install_path, origin="foo=1.0-1")
+
+    assert absolute_symlinks == [str(install_path / "usr/bin/abs")]
+    foo_path = install_path / "usr/bin/foo"
+    assert foo_path.read_bytes() == b"foo"
+    assert foo_path.stat().st_mtime == 1000
+    assert os.stat(foo_path).st_mode & 0o7777 == 0o755
+    assert (install_path / "usr/bin/suid").stat().st_mode & 0o7777 == 0o755
+    assert (install_path / "usr/bin/bar").stat().st_ino == foo_path.stat().st_ino
+    assert os.readlink(install_path / "usr/bin/rel") == "foo"
+    assert os.readlink(install_path / "usr/bin/abs") == "/usr/bin/foo"
+    assert (install_path / "usr/lib/foo.pc").read_text() == "prefix={}/usr\n".format(
+        install_path
+    )
+    mock_write_origin.assert_any_call(mock.ANY, "foo=1.0-1")
+    assert mock_write_origin.call_count == 3
+
+
+def test_unpack_replaces_existing_hard_link(tmp_path):
+    deb_path = _make_deb(tmp_path / "foo.deb", [("./foo", dict(data=b"new"))])
+    install_path = tmp_path / "install"
+    install_path.mkdir()
+    original_path = tmp_path / "original"
+    original_path.write_bytes(b"original")
+    os.link(original_path, install_path / "foo")
+
+    DebPackage(deb_path).unpack(install_path, origin="foo=1.0-1")
+
+    assert (install_path / "foo").read_bytes() == b"new"
+    assert original_path.read_bytes() == b"original"
+
+
+def test_unpack_rejects_escaping_paths(tmp_path):
+    deb_path = _make_deb(tmp_path / "foo.deb", [("../foo", dict(data=b"foo"))])
+
+    with pytest.raises(errors.UnpackError):
+        DebPackage(deb_path).unpack(tmp_path / "install", origin="foo=1.0-1")
+
+    assert not (tmp_path / "foo").exists()
+
+
+def test_unpack_unsupported_compression(tmp_path):
+    deb_path = _make_deb(
+        tmp_path / "foo.deb", [], data_name="data.tar.zst", data=b"zstd"
+    )
+
+    with pytest.raises(UnsupportedDebError):
+        DebPackage(deb_path).unpack(tmp_path / "install", origin="foo=1.0-1")
+
+
+def test_unpack_rewrites_shebangs(tmp_path):
+    deb_path = _make_deb(
+        tmp_path / "foo.deb",
+        [
+            ("./usr/bin/foo", dict(data=b"#!/usr/bin/python3\nfoo\n", mode=0o755)),
+            ("./usr/bin/bar", dict(data=b"#!/bin/sh\nbar\n", mode=0o755)),
+        ],
+    )
+    install_path = tmp_path / "install"
+
+    DebPackage(deb_path).unpack(install_path, origin="foo=1.0-1")
+
+    assert (install_path / "usr/bin/foo").read_bytes() == (
+        b"#!/usr/bin/env python3\nfoo\n"
+    )
+    assert (install_path / "usr/bin/bar").read_bytes() == b"#!/bin/sh\nbar\n"
+
+
+def test_unpack_leaves_directory_modes_to_caller(tmp_path):
+    deb_path = _make_deb(
+        tmp_path / "foo.deb",
+        [("./usr/lib", dict(type=tarfile.DIRTYPE, mode=0o555, mtime=1000))],
+    )
+    install_path = tmp_path / "install"
+    directory_modes = list()
+
+    DebPackage(deb_path).unpack(
+        install_path, origin="foo=1.0-1", directory_modes=directory_modes
+    )
+
+    lib_path = str(install_path / "usr/lib")
+    assert directory_modes == [(lib_path, 0o555, 1000)]
+    assert stat.S_IMODE(os.stat(lib_path).st_mode) != 0o555
+
+
+def test_link_unpacked_tree(tmp_path):
+    deb_path = _make_deb(
+        tmp_path / "foo.deb",
+        [
+            ("./usr/bin/foo", dict(data=b"foo", mode=0o755)),
+            ("./usr/bin/abs", dict(type=tarfile.SYMTYPE, linkname="/usr/bin/foo")),
+            ("./usr/lib/foo.pc", dict(data=b"prefix=/usr\n", mode=0o644)),
+        ],
+    )
+    tree_path = tmp_path / "tree"
+    DebPackage(deb_path).unpack(tree_path, origin="foo=1.0-1", rewrite_pkg_config=False)
+    install_path = tmp_path / "install"
+
+    absolute_symlinks = link_unpacked_tree(str(tree_path), install_path)
+
+    assert absolute_symlinks == [str(install_path / "usr/bin/abs")]
+    foo_path = install_path / "usr/bin/foo"
+    assert foo_path.stat().st_ino == (tree_path / "usr/bin/foo").stat().st_ino
+    assert os.readlink(install_path / "usr/bin/abs") == "/usr/bin/foo"
+    assert (install_path / "usr/lib/foo.pc").read_text() == "prefix={}/usr\n".format(
+        install_path
+    )
+    assert (tree_path / "usr/lib/foo.pc").read_text() == "prefix=/usr\n"
+
+
+def test_link_unpacked_tree_copies_rewritten_files(tmp_path):
+    deb_path = _make_deb(
+        tmp_path / "foo.deb",
+        [
+            ("./usr/bin/foo", dict(data=b"foo", mode=0o755)),
+            ("./usr/bin/xml2-config", dict(data=b"prefix=/usr\n", mode=0o755)),
+        ],
+    )
+    tree_path = tmp_path / "tree"
+    DebPackage(deb_path).unpack(tree_path, origin="foo=1.0-1")
+    for name in ("foo", "xml2-config"):
+        (tree_path / "usr/bin" / name).chmod(0o555)
+    install_path = tmp_path / "install"
+
+    link_unpacked_tree(
+        str(tree_path),
+        install_path,
+        file_modes={"usr/bin/foo": 0o755, "usr/bin/xml2-config": 0o755},
+    )
+
+    foo_path = install_path / "usr/bin/foo"
+    assert foo_path.stat().st_ino == (tree_path / "usr/bin/foo").stat().st_ino
+    assert stat.S_IMODE(foo_path.stat().st_mode) == 0o555
+    config_path = install_path / "usr/bin/xml2-config"
+    config_stat = config_path.stat()
+    assert config_stat.st_ino != (tree_path / "usr/bin/xml2-config").stat().st_ino
+    assert stat.S_IMODE(config_stat.st_mode) == 0o755
+
+
+def test_link_unpacked_tree_copies_unlinkable_files(tmp_path):
+    deb_path = _make_deb(
+        tmp_path / "foo.deb", [("./usr/bin/foo", dict(data=b"foo", mode=0o755))]
+    )
+    tree_path = tmp_path / "tree"
+    DebPackage(deb_path).unpack(tree_path, origin="foo=1.0-1")
+    (tree_path / "usr/bin/foo").chmod(0o555)
+    install_path = tmp_path / "install"
+
+    with mock.patch("os.link", side_effect=PermissionError()):
+        link_unpacked_tree(
+            str(tree_path), install_path, file_modes={"usr/bin/foo": 0o755}
+        )
+
+    foo_path = install_path / "usr/bin/foo"
+    assert foo_path.read_bytes() == b"foo"
+    assert stat.S_IMODE(foo_path.stat().st_mode) == 0o755
+
+
+def test_unpack_stage_packages(xdg_dirs, tmp_path):
+    stage_packages_path = tmp_path / "stage_packages"
+    stage_packages_path.mkdir()
+    _make_deb(
+        stage_packages_path / "foo.deb",
+        [("./usr/bin/abs", dict(type=tarfile.SYMTYPE, linkname="/usr/lib/bar"))],
+    )
+    _make_deb(stage_packages_path / "bar.deb", [("./usr/lib/bar", dict(data=b"bar"))])
+    install_path = tmp_path / "install"
+
+    with mock.patch.object(repo.Ubuntu, "get_package_libraries", return_value=set()):
+        repo.Ubuntu.unpack_stage_packages(
+            stage_packages_path=stage_packages_path, install_path=install_path
+        )
+
+    assert (install_path / "usr/lib/bar").read_bytes() == b"bar"
+    assert os.readlink(install_path / "usr/bin/abs") == "../lib/bar"
+
+
+def test_unpack_stage_packages_from_cache(xdg_dirs, tmp_path):
+    stage_packages_path = tmp_path / "stage_packages"
+    stage_packages_path.mkdir()
+    _make_deb(
+        stage_packages_path / "foo.deb",
+        [
+            ("./usr/lib/foo", dict(data=b"foo", mode=0o444)),
+            ("./usr/lib/bar", dict(data=b"bar", mode=0o644)),
+        ],
+    )
+
+    with mock.patch.object(repo.Ubuntu, "get_package_libraries", return_value=set()):
+        for install_path in (tmp_path / "install1", tmp_path / "install2"):
+            repo.Ubuntu.unpack_stage_packages(
+                stage_packages_path=stage_packages_path, install_path=install_path
+            )
+
+    for name in ("foo", "bar"):
+        file_stat = (tmp_path / "install1/usr/lib" / name).stat()
+        assert file_stat.st_ino == (tmp_path / "install2/usr/lib" / name).stat().st_ino
+        assert file_stat.st_nlink == 3
+        assert stat.S_IMODE(file_stat.st_mode) == 0o444
+
+
+def test_unpack_stage_packages_applies_directory_modes_last(xdg_dirs, tmp_path):
+    stage_packages_path = tmp_path / "stage_packages"
+    stage_packages_path.mkdir()
+    for name in ("foo", "bar"):
+        _make_deb(
+            stage_packages_path / f"{name}.deb",
+            [
+                ("./usr/lib", dict(type=tarfile.DIRTYPE, mode=0o555, mtime=1000)),
+                (f"./usr/lib/{name}", dict(data=name.encode())),
+            ],
+        )
+    install_path = tmp_path / "install"
+
+    with mock.patch.object(
+        repo.Ubuntu, "get_package_libraries", return_value=set()
+    ), mock.patch(
+        "snapcraft.internal.repo._deb.apply_directory_modes"
+    ) as apply_directory_modes:
+        repo.Ubuntu.unpack_stage_packages(
+            stage_packages_path=stage_packages_path, install_path=install_path
+        )
+
+    # Applied once, for the directories of both packages.
+    apply_directory_modes.assert_called_once_with(mock.ANY)
+    directory_modes = apply_directory_modes.call_args[0][0]
+    assert directory_modes.count((str(install_path / "usr/lib"), 0o555, 1000)) == 2
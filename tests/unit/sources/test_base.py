@@ -14,12 +14,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import hashlib
 import os
+import threading
 from unittest import mock
 
 import requests
-from testtools.matchers import Contains, Equals
+from testtools.matchers import Contains, Equals, Not
 
+from snapcraft.internal import sources
 from snapcraft.internal.sources import _base, errors
 from tests import unit
 
@@ -41,19 +44,20 @@ class TestFileBase(unit.TestCase):
             file_src.source_dir, src="dir", clean_target=False
         )
 
-    @mock.patch("shutil.copy2")
-    def test_pull_copy(self, mock_shutil_copy2):
+    @mock.patch("snapcraft.file_utils.copy")
+    def test_pull_copy(self, mock_copy):
         file_src = self.get_mock_file_base("snapcraft.yaml", "dir")
         file_src.pull()
 
         expected = os.path.join(file_src.source_dir, "snapcraft.yaml")
-        mock_shutil_copy2.assert_called_once_with(file_src.source, expected)
+        mock_copy.assert_called_once_with(
+            file_src.source, expected, follow_symlinks=True
+        )
         file_src.provision.assert_called_once_with(
             file_src.source_dir, src=expected, clean_target=False
         )
 
-    @mock.patch("shutil.copy2", side_effect=FileNotFoundError())
-    def test_pull_copy_source_does_not_exist(self, mock_shutil_copy2):
+    def test_pull_copy_source_does_not_exist(self):
         file_src = self.get_mock_file_base("does-not-exist.tar.gz", ".")
 
         raised = self.assertRaises(errors.SnapcraftSourceNotFoundError, file_src.pull)
@@ -62,10 +66,9 @@ class TestFileBase(unit.TestCase):
             str(raised), Contains("Failed to pull source: 'does-not-exist.tar.gz'")
         )
 
-    @mock.patch("snapcraft.internal.sources._base.requests")
-    @mock.patch("snapcraft.internal.sources._base.download_requests_stream")
+    @mock.patch("snapcraft.internal.downloader.download")
     @mock.patch("snapcraft.internal.sources._base.download_urllib_source")
-    def test_download_file_destination(self, dus, drs, req):
+    def test_download_file_destination(self, dus, dl):
         file_src = self.get_mock_file_base("http://snapcraft.io/snapcraft.yaml", "dir")
         self.assertFalse(hasattr(file_src, "file"))
 
@@ -79,8 +82,10 @@ class TestFileBase(unit.TestCase):
         )
 
     @mock.patch("snapcraft.internal.common.get_url_scheme", return_value=False)
-    @mock.patch("requests.get", side_effect=requests.exceptions.ConnectionError("foo"))
-    def test_download_error(self, mock_get, mock_gus):
+    @mock.patch("snapcraft.internal.downloader.sleep")
+    @mock.patch("snapcraft.internal.sources._base.get_session")
+    def test_download_error(self, mock_get_session, mock_sleep, mock_gus):
+        mock_get_session().get.side_effect = requests.exceptions.ConnectionError("foo")
         base = self.get_mock_file_base("", "")
         base.source_checksum = False
 
@@ -88,21 +93,84 @@ class TestFileBase(unit.TestCase):
 
         self.assertThat(str(raised), Contains("Network request error"))
 
-    @mock.patch("snapcraft.internal.sources._base.download_requests_stream")
-    @mock.patch("snapcraft.internal.sources._base.requests")
-    def test_download_http(self, mock_requests, mock_download):
+    @mock.patch("snapcraft.internal.downloader.download")
+    @mock.patch("snapcraft.internal.sources._base.get_session")
+    def test_download_http(self, mock_get_session, mock_download):
         file_src = self.get_mock_file_base("http://snapcraft.io/snapcraft.yaml", "dir")
 
-        mock_request = mock.Mock()
-        mock_requests.get.return_value = mock_request
-
         file_src.pull()
 
-        mock_requests.get.assert_called_once_with(
-            file_src.source, stream=True, allow_redirects=True
+        mock_download.assert_called_once_with(
+            file_src.source,
+            file_src.file,
+            session=mock_get_session(),
+            algorithm=None,
+            resume=False,
+            connections=4,
+            progress=None,
+        )
+
+    @mock.patch("snapcraft.internal.sources._base.set_file_digest")
+    @mock.patch("snapcraft.internal.sources._base.FileCache")
+    @mock.patch("snapcraft.internal.downloader.download", return_value="1234")
+    @mock.patch("snapcraft.internal.sources._base.get_session")
+    def test_download_http_with_checksum(
+        self, mock_get_session, mock_download, mock_file_cache, mock_set_file_digest
+    ):
+        mock_file_cache().get.return_value = None
+        file_src = self.get_mock_file_base("http://snapcraft.io/snapcraft.yaml", "dir")
+        file_src.source_checksum = "md5/1234"
+
+        file_src.download()
+
+        mock_download.assert_called_once_with(
+            file_src.source,
+            file_src.file,
+            session=mock_get_session(),
+            algorithm="md5",
+            resume=False,
+            connections=4,
+            progress=None,
+        )
+        mock_set_file_digest.assert_called_once_with(
+            file_src.file, "1234", algorithm="md5"
+        )
+        mock_file_cache().cache.assert_called_once_with(
+            filename=file_src.file, algorithm="md5", hash="1234"
+        )
+
+    @mock.patch("snapcraft.internal.sources._base.set_file_digest")
+    @mock.patch("snapcraft.internal.downloader.download", return_value="4321")
+    @mock.patch("snapcraft.internal.sources._base.get_session")
+    def test_download_http_checksum_mismatch(self, mock_get_session, mock_download, _):
+        file_src = self.get_mock_file_base("http://snapcraft.io/snapcraft.yaml", "dir")
+        file_src.source_checksum = "md5/1234"
+
+        self.assertRaises(errors.DigestDoesNotMatchError, file_src.download)
+
+    @mock.patch("snapcraft.internal.sources._base.set_file_digest")
+    @mock.patch("snapcraft.internal.sources._base.FileCache")
+    @mock.patch("snapcraft.internal.downloader.download", side_effect=["4321", "1234"])
+    @mock.patch("snapcraft.internal.sources._base.get_session")
+    def test_download_http_resumed_checksum_mismatch(
+        self, mock_get_session, mock_download, mock_file_cache, mock_set_file_digest
+    ):
+        mock_file_cache().get.return_value = None
+        file_src = self.get_mock_file_base("http://snapcraft.io/snapcraft.yaml", "dir")
+        file_src.source_checksum = "md5/1234"
+        os.makedirs("dir")
+        open(os.path.join("dir", "snapcraft.yaml.partial"), "w").close()
+
+        file_src.download()
+
+        # What it continued from was of something else, so it starts over.
+        self.assertThat(
+            [c[1]["resume"] for c in mock_download.call_args_list],
+            Equals([True, False]),
+        )
+        mock_set_file_digest.assert_called_once_with(
+            file_src.file, "1234", algorithm="md5"
         )
-        mock_request.raise_for_status.assert_called_once_with()
-        mock_download.assert_called_once_with(mock_request, file_src.file)
 
     @mock.patch("snapcraft.internal.sources._base.download_urllib_source")
     def test_download_ftp(self, mock_download):
@@ -121,3 +189,137 @@ class TestFileBase(unit.TestCase):
         self.assertThat(mock_urlretrieve.call_count, Equals(1))
         self.assertThat(mock_urlretrieve.call_args[0][0], Equals(file_src.source))
         self.assertThat(mock_urlretrieve.call_args[0][1], Equals(file_src.file))
+
+
+class TestFileBasePrefetch(unit.FakeFileHTTPServerBasedTestCase):
+    def setUp(self):
+        super().setUp()
+
+        os.makedirs("src")
+        self.source = "http://{}:{}/file".format(*self.server.server_address)
+        self.digest = hashlib.sha256(b"Test fake file").hexdigest()
+
+    def get_file_base(self, source, checksum=None):
+        file_src = _base.FileBase(source, "src", source_checksum=checksum)
+        setattr(file_src, "provision", mock.Mock())
+        return file_src
+
+    def test_prefetch_then_pull_from_cache(self):
+        file_src = self.get_file_base(self.source)
+
+        sources.prefetch([file_src])
+
+        with mock.patch("snapcraft.internal.sources._base.get_session") as gs:
+            file_src.pull()
+        gs.assert_not_called()
+        with open(os.path.join("src", "file"), "rb") as f:
+            self.assertThat(f.read(), Equals(b"Test fake file"))
+
+    def test_prefetch_several(self):
+        file_srcs = [
+            _base.FileBase(self.source + str(i), "src{}".format(i)) for i in range(3)
+        ]
+
+        sources.prefetch(file_srcs)
+
+        for file_src in file_srcs:
+            with open(file_src._prefetched_path, "rb") as f:
+                self.assertThat(f.read(), Equals(b"Test fake file"))
+
+    def test_prefetch_without_checksum_not_cached(self):
+        file_src = self.get_file_base(self.source)
+
+        sources.prefetch([file_src])
+
+        # Nothing would ever look it up in the cache.
+        cache_root = _base.FileCache().cache_root
+        self.assertFalse(os.path.exists(os.path.join(cache_root, "files")))
+        self.assertFalse(file_src._prefetched_path.startswith(cache_root))
+
+    def test_prefetch_checksum_mismatch(self):
+        file_src = self.get_file_base(self.source, checksum="sha256/1234")
+
+        sources.prefetch([file_src])
+
+        self.assertIsNone(file_src._prefetched_path)
+        cache_root = _base.FileCache().cache_root
+        self.assertThat(os.listdir(cache_root), Not(Contains("files")))
+        prefetch_dir = os.path.join(cache_root, "prefetch", "sha256")
+        self.assertThat(os.listdir(prefetch_dir), Equals([]))
+
+    def test_prefetch_not_found(self):
+        file_src = self.get_file_base(self.source + "/404-not-found")
+
+        sources.prefetch([file_src])
+
+        self.assertIsNone(file_src._prefetched_path)
+
+    def test_prefetch_with_checksum_not_read_again(self):
+        file_src = self.get_file_base(self.source, checksum="sha256/" + self.digest)
+
+        with mock.patch("snapcraft.file_utils.calculate_hash") as hash_mock:
+            sources.prefetch([file_src])
+
+        hash_mock.assert_not_called()
+        self.assertIsNone(file_src._prefetched_path)
+        cache_file = _base.FileCache().get(algorithm="sha256", hash=self.digest)
+        self.assertIsNotNone(cache_file)
+
+    def test_prefetch_records_digests_in_main_thread(self):
+        file_src = self.get_file_base(self.source, checksum="sha256/" + self.digest)
+        threads = []
+
+        with mock.patch(
+            "snapcraft.internal.sources._base.set_file_digest",
+            side_effect=lambda *args, **kwargs: threads.append(
+                threading.current_thread()
+            ),
+        ):
+            sources.prefetch([file_src])
+
+        self.assertThat(threads, Equals([threading.main_thread()]))
+
+    def test_pull_with_checksum_not_read_again(self):
+        file_src = self.get_file_base(self.source, checksum="sha256/" + self.digest)
+
+        with mock.patch("snapcraft.file_utils.calculate_hash") as hash_mock:
+            file_src.pull()
+
+        hash_mock.assert_not_called()
+        cache_file = _base.FileCache().get(algorithm="sha256", hash=self.digest)
+        self.assertIsNotNone(cache_file)
+
+    def test_pull_with_log_file(self):
+        file_src = self.get_file_base(self.source)
+
+        with open("pull.log", "w") as log_file, mock.patch(
+            "snapcraft.internal.sources._base.CombinedDownloadProgress"
+        ) as progress_mock:
+            file_src.log_file = log_file
+            file_src.pull()
+
+        progress_mock.assert_called_once_with(0, mock.ANY, fd=log_file)
+
+    def test_is_prefetchable(self):
+        self.assertTrue(self.get_file_base(self.source).is_prefetchable())
+        self.assertFalse(self.get_file_base("ftp://host/file").is_prefetchable())
+        self.assertFalse(self.get_file_base("file.tar.gz").is_prefetchable())
+
+    def test_is_prefetchable_cached(self):
+        checksum = "sha256/" + self.digest
+        file_src = self.get_file_base(self.source, checksum=checksum)
+        file_src.pull()
+
+        self.assertFalse(file_src.is_prefetchable())
+
+
+class TestBase(unit.TestCase):
+    def test_run_with_log_file(self):
+        source = _base.Base("source", "src")
+
+        with open("pull.log", "w") as log_file:
+            source.log_file = log_file
+            source._run(["sh", "-c", "echo out; echo err >&2"])
+
+        with open("pull.log") as log_file:
+            self.assertThat(log_file.read(), Equals("out\nerr\n"))
@@ -22,7 +22,7 @@ from unittest import mock
 import fixtures
 from testtools.matchers import Equals
 
-from snapcraft.internal import sources
+from snapcraft.internal import cache, sources
 from snapcraft.internal.sources import errors
 from tests import unit
 from tests.subprocess_utils import call, call_with_output
@@ -37,6 +37,9 @@ class TestGit(unit.sources.SourceTestCase):  # type: ignore
     def setUp(self):
 
         super().setUp()
+        self.useFixture(
+            fixtures.EnvironmentVariable("SNAPCRAFT_ENABLE_GIT_MIRRORS", "n")
+        )
         patcher = mock.patch("snapcraft.sources.Git._get_source_details")
         self.mock_get_source_details = patcher.start()
         self.mock_get_source_details.return_value = ""
@@ -635,6 +638,132 @@ class TestGitConflicts(GitBaseTestCase):
         )
 
 
+class TestGitMirrors(GitBaseTestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.repo = os.path.abspath("repo.git")
+        self.source = "file://{}".format(self.repo)
+        self.upstream_tree = os.path.abspath("upstream")
+        call(["git", "init", "--bare", self.repo])
+        self.clone_repo(self.repo, self.upstream_tree)
+        self.add_file("file", "1", "first")
+        call(["git", "tag", "first"])
+        call(["git", "push", "--tags", self.repo, "HEAD:master"])
+        os.chdir(self.path)
+
+    def get_origin_url(self, working_tree):
+        return call_with_output(
+            ["git", "-C", working_tree, "remote", "get-url", "origin"]
+        )
+
+    def test_pull_from_mirror(self):
+        git = sources.Git(self.source, "src", silent=True)
+
+        git.pull()
+
+        self.check_file_contents(os.path.join("src", "file"), "1")
+        mirror_path = cache.GitMirrorCache().get_mirror_path(self.source)
+        self.assertTrue(os.path.isdir(mirror_path))
+        self.assertThat(self.get_origin_url("src"), Equals(self.source))
+
+    def test_mirror_updated(self):
+        sources.Git(self.source, "src", silent=True).pull()
+        os.chdir(self.upstream_tree)
+        self.add_file("file", "2", "second")
+        call(["git", "push", self.repo, "HEAD:master"])
+        os.chdir(self.path)
+
+        sources.Git(self.source, "src-two", silent=True).pull()
+
+        self.check_file_contents(os.path.join("src-two", "file"), "2")
+
+    def test_pull_tag_with_depth(self):
+        os.chdir(self.upstream_tree)
+        self.add_file("file", "2", "second")
+        call(["git", "push", self.repo, "HEAD:master"])
+        os.chdir(self.path)
+        git = sources.Git(
+            self.source, "src", source_tag="first", source_depth=1, silent=True
+        )
+
+        git.pull()
+
+        self.check_file_contents(os.path.join("src", "file"), "1")
+        self.assertThat(
+            call_with_output(["git", "-C", "src", "rev-list", "--count", "HEAD"]),
+            Equals("1"),
+        )
+        self.assertThat(self.get_origin_url("src"), Equals(self.source))
+        # The whole history would have to be fetched into a mirror.
+        self.assertFalse(os.path.exists(cache.GitMirrorCache().mirror_cache))
+
+    def test_mirror_only_has_branches_and_tags(self):
+        call(["git", "-C", self.repo, "update-ref", "refs/pull/1/head", "master"])
+        sources.Git(self.source, "src", silent=True).pull()
+        call(["git", "-C", self.repo, "update-ref", "refs/pull/2/head", "master"])
+        sources.Git(self.source, "src-two", silent=True).pull()
+
+        mirror_path = cache.GitMirrorCache().get_mirror_path(self.source)
+        self.assertThat(
+            call_with_output(
+                ["git", "-C", mirror_path, "for-each-ref", "--format=%(refname)"]
+            ).split(),
+            Equals(["refs/heads/master", "refs/tags/first"]),
+        )
+
+    def test_pull_commit(self):
+        commit = call_with_output(
+            ["git", "-C", self.upstream_tree, "rev-parse", "HEAD"]
+        )
+        os.chdir(self.upstream_tree)
+        self.add_file("file", "2", "second")
+        call(["git", "push", self.repo, "HEAD:master"])
+        os.chdir(self.path)
+
+        sources.Git(self.source, "src", source_commit=commit, silent=True).pull()
+
+        self.check_file_contents(os.path.join("src", "file"), "1")
+
+    def test_pull_submodules_from_mirrors(self):
+        sub_repo = os.path.abspath("sub.git")
+        sub_source = "file://{}".format(sub_repo)
+        call(["git", "init", "--bare", sub_repo])
+        self.clone_repo(sub_repo, os.path.abspath("sub-upstream"))
+        self.add_file("sub-file", "sub", "sub")
+        call(["git", "push", sub_repo, "HEAD:master"])
+        os.chdir(self.upstream_tree)
+        call(
+            [
+                "git",
+                "-c",
+                "protocol.file.allow=always",
+                "submodule",
+                "add",
+                sub_source,
+                "sub",
+            ]
+        )
+        call(["git", "commit", "-am", "added submodule"])
+        call(["git", "push", self.repo, "HEAD:master"])
+        os.chdir(self.path)
+
+        sources.Git(self.source, "src", silent=True).pull()
+
+        self.check_file_contents(os.path.join("src", "sub", "sub-file"), "sub")
+        mirror_path = cache.GitMirrorCache().get_mirror_path(sub_source)
+        self.assertTrue(os.path.isdir(mirror_path))
+        self.assertThat(
+            self.get_origin_url(os.path.join("src", "sub")), Equals(sub_source)
+        )
+
+    def test_local_repository_not_mirrored(self):
+        sources.Git(self.repo, "src", silent=True).pull()
+
+        self.check_file_contents(os.path.join("src", "file"), "1")
+        self.assertFalse(os.path.exists(cache.GitMirrorCache().mirror_cache))
+
+
 class GitDetailsTestCase(GitBaseTestCase):
     def setUp(self):
         def _add_and_commit_file(filename, content=None, message=None):
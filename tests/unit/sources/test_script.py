@@ -15,9 +15,10 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import stat
 from unittest import mock
 
-from testtools.matchers import FileExists
+from testtools.matchers import Equals, FileExists
 
 from snapcraft.internal.sources import Script
 from tests import unit
@@ -38,3 +39,14 @@ class TestScript(unit.TestCase):
         self.source.download()
         self.assertThat(self.source.file, FileExists())
         self.assertThat(self.source.file, unit.IsExecutable())
+
+    @mock.patch("snapcraft.internal.sources._script.FileBase.download")
+    def test_download_leaves_linked_file_alone(self, mock_download):
+        os.chmod(self.source.file, 0o444)
+        os.link(self.source.file, "cached-file")
+
+        self.source.download()
+
+        self.assertThat(self.source.file, unit.IsExecutable())
+        self.assertFalse(os.path.samefile(self.source.file, "cached-file"))
+        self.assertThat(stat.S_IMODE(os.stat("cached-file").st_mode), Equals(0o444))
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import lzma
 import os
 import tarfile
 from unittest import mock
@@ -22,6 +23,7 @@ import requests
 from testtools.matchers import Equals
 
 from snapcraft.internal import sources
+from snapcraft.internal.sources import _tar
 from tests import unit
 
 
@@ -148,3 +150,132 @@ class TestTar(unit.FakeFileHTTPServerBasedTestCase):
 
     def test_has_source_handler_entry(self):
         self.assertTrue(sources._source_handler["tar"] is sources.Tar)
+
+    def _make_tarball(self, path, mode="w", names=("test_prefix/test.txt",)):
+        for name in names:
+            file_path = os.path.join("src", name)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "w") as f:
+                f.write(name)
+            os.utime(file_path, (1000, 1000))
+        with tarfile.open(path, mode) as tar:
+            for name in sorted({n.split("/")[0] for n in names}):
+                tar.add(os.path.join("src", name), arcname=name)
+
+    def test_extract_compressed(self):
+        os.mkdir("dst")
+        for mode in ("w:gz", "w:bz2", "w:xz"):
+            for decompressor in (_tar._get_decompressor, lambda c: None):
+                tarball = os.path.join("dst", "test.tar")
+                self._make_tarball(tarball, mode)
+
+                with mock.patch(
+                    "snapcraft.internal.sources._tar._get_decompressor",
+                    side_effect=decompressor,
+                ):
+                    sources.Tar(tarball, "dst").provision("dst")
+
+                self.assertThat(os.listdir("dst"), Equals(["test.txt"]))
+                with open(os.path.join("dst", "test.txt")) as f:
+                    self.assertThat(f.read(), Equals("test_prefix/test.txt"))
+
+    def test_extract_lzma_alone(self):
+        os.mkdir("dst")
+        self._make_tarball("test.tar")
+        tarball = os.path.join("dst", "test.tar.lzma")
+        with open("test.tar", "rb") as src, lzma.open(
+            tarball, "wb", format=lzma.FORMAT_ALONE
+        ) as dst:
+            dst.write(src.read())
+
+        for decompressor in (_tar._get_decompressor, lambda c: None):
+            with mock.patch(
+                "snapcraft.internal.sources._tar._get_decompressor",
+                side_effect=decompressor,
+            ):
+                sources.Tar(tarball, "dst").provision("dst", keep_tarball=True)
+
+            self.assertThat(
+                sorted(os.listdir("dst")), Equals(["test.tar.lzma", "test.txt"])
+            )
+            with open(os.path.join("dst", "test.txt")) as f:
+                self.assertThat(f.read(), Equals("test_prefix/test.txt"))
+
+    def test_extract_corrupt(self):
+        os.mkdir("dst")
+        tarball = os.path.join("dst", "test.tar")
+        self._make_tarball(tarball, "w:xz")
+        with open(tarball, "r+b") as f:
+            f.truncate(os.path.getsize(tarball) // 2)
+
+        for decompressor in (_tar._get_decompressor, lambda c: None):
+            with mock.patch(
+                "snapcraft.internal.sources._tar._get_decompressor",
+                side_effect=decompressor,
+            ):
+                self.assertRaises(
+                    Exception,
+                    sources.Tar(tarball, "dst").provision,
+                    "dst",
+                    clean_target=False,
+                    keep_tarball=True,
+                )
+
+            self.assertThat(os.listdir("dst"), Equals(["test.tar"]))
+
+    def test_extract_without_common_prefix(self):
+        self._make_tarball(
+            "test.tar", names=("test_prefix/test.txt", "other_prefix/test.txt")
+        )
+        os.mkdir("dst")
+
+        sources.Tar("test.tar", "dst").provision("dst", src="test.tar")
+
+        self.assertThat(
+            sorted(os.listdir("dst")), Equals(["other_prefix", "test_prefix"])
+        )
+
+    @mock.patch("snapcraft.internal.sources._tar._MAX_BUFFERED_FILE_SIZE", new=4)
+    def test_extract_keeps_attributes(self):
+        os.makedirs(os.path.join("src", "test_prefix", "a"))
+        with open(os.path.join("src", "test_prefix", "test.txt"), "w") as f:
+            f.write("big enough to not be buffered")
+        open(os.path.join("src", "test_prefix", "a", "b.txt"), "w").close()
+        os.chmod(os.path.join("src", "test_prefix", "test.txt"), 0o555)
+        os.utime(os.path.join("src", "test_prefix", "test.txt"), (1000, 1000))
+        os.utime(os.path.join("src", "test_prefix", "a", "b.txt"), (1000, 1000))
+        os.utime(os.path.join("src", "test_prefix", "a"), (2000, 2000))
+        with tarfile.open("test.tar", "w") as tar:
+            tar.add(os.path.join("src", "test_prefix"), arcname="test_prefix")
+        os.mkdir("dst")
+
+        sources.Tar("test.tar", "dst").provision("dst", src="test.tar")
+
+        test_stat = os.stat(os.path.join("dst", "test.txt"))
+        # Extracted files are made writable.
+        self.assertThat(test_stat.st_mode & 0o777, Equals(0o755))
+        self.assertThat(test_stat.st_mtime, Equals(1000))
+        self.assertThat(
+            os.stat(os.path.join("dst", "a", "b.txt")).st_mtime, Equals(1000)
+        )
+        self.assertThat(os.stat(os.path.join("dst", "a")).st_mtime, Equals(2000))
+
+    def test_extract_on_top(self):
+        os.makedirs(os.path.join("dst", "a"))
+        open(os.path.join("dst", "a", "existing.txt"), "w").close()
+        open(os.path.join("dst", "test.txt"), "w").close()
+        self._make_tarball(
+            "test.tar", names=("test_prefix/test.txt", "test_prefix/a/b.txt")
+        )
+
+        sources.Tar("test.tar", "dst").provision(
+            "dst", clean_target=False, src="test.tar"
+        )
+
+        self.assertThat(sorted(os.listdir("dst")), Equals(["a", "test.txt"]))
+        self.assertThat(
+            sorted(os.listdir(os.path.join("dst", "a"))),
+            Equals(["b.txt", "existing.txt"]),
+        )
+        with open(os.path.join("dst", "test.txt")) as f:
+            self.assertThat(f.read(), Equals("test_prefix/test.txt"))
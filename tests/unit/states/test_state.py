@@ -14,6 +14,13 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+
+import pytest
+
+from snapcraft import yaml_utils
+from snapcraft.extractors import ExtractedMetadata
+from snapcraft.internal import errors, states
 from snapcraft.internal.states._state import PartState
 
 
@@ -62,3 +69,80 @@ class TestState:
         differing_properties = state.diff_project_options_of_interest(_TestProject(new))
 
         assert differing_properties == {"foo"}
+
+
+@pytest.fixture
+def prime_state():
+    return states.PrimeState(
+        files={"file{}".format(i) for i in range(1000)},
+        directories={"dir"},
+        dependency_paths={"lib"},
+        part_properties={"prime": ["*"]},
+        project=None,
+        scriptlet_metadata=ExtractedMetadata(version="1.0"),
+        stage_file_stats={"file0": "3:4"},
+    )
+
+
+def test_write_and_read_state_file(tmp_path, prime_state):
+    state_file = str(tmp_path / "prime")
+
+    states.write_state_file(state_file, prime_state)
+
+    with open(state_file) as f:
+        assert f.readline() == (
+            '{"snapcraft-state": {"version": 1, "tag": "!PrimeState"}}\n'
+        )
+    assert states.read_state_file(state_file) == prime_state
+
+
+def test_read_state_file_large_members_are_lazy(tmp_path, prime_state):
+    state_file = str(tmp_path / "prime")
+    states.write_state_file(state_file, prime_state)
+
+    state = states.read_state_file(state_file)
+
+    assert "files" not in state.__dict__
+    assert state.directories == {"dir"}
+    assert state.files == prime_state.files
+    assert "_lazy_members" not in state.__dict__
+
+
+def test_write_state_file_keeps_lazy_members(tmp_path, prime_state):
+    state_file = str(tmp_path / "prime")
+    states.write_state_file(state_file, prime_state)
+
+    states.write_state_file(state_file, states.read_state_file(state_file))
+
+    assert states.read_state_file(state_file) == prime_state
+
+
+def test_write_and_read_empty_state(tmp_path):
+    state_file = str(tmp_path / "pull")
+
+    states.write_state_file(state_file, {})
+
+    assert states.read_state_file(state_file) == {}
+
+
+def test_read_yaml_state_file_migrates(tmp_path, prime_state):
+    state_file = str(tmp_path / "prime")
+    with open(state_file, "w") as f:
+        f.write(yaml_utils.dump(prime_state))
+    os.utime(state_file, (1000, 2000))
+
+    assert states.read_state_file(state_file) == prime_state
+
+    with open(state_file) as f:
+        assert f.readline().startswith('{"snapcraft-state"')
+    assert os.stat(state_file).st_mtime == 2000
+    assert states.read_state_file(state_file) == prime_state
+
+
+def test_read_state_file_unsupported_version(tmp_path):
+    state_file = str(tmp_path / "pull")
+    with open(state_file, "w") as f:
+        f.write('{"snapcraft-state": {"version": 2, "tag": null}}\n{}\n')
+
+    with pytest.raises(errors.UnsupportedStateFormatError):
+        states.read_state_file(state_file)
@@ -27,6 +27,7 @@ from testtools.matchers import Contains, Equals, FileExists, Is, IsInstance, Not
 
 import tests
 from snapcraft import config, storeapi
+from snapcraft.internal import downloader
 from snapcraft.storeapi import errors
 from snapcraft.storeapi.v2 import channel_map, releases
 from tests import fixture_setup, unit
@@ -267,6 +268,41 @@ class DownloadTestCase(StoreTestCase):
         # If these are equal it means a second download did not happen.
         self.assertThat(second_stat.st_ctime, Equals(first_stat.st_ctime))
 
+    def test_download_snap_not_read_again(self):
+        self.client.login("dummy", "test correct password")
+        download_path = os.path.join(self.path, "test-snap.snap")
+
+        with mock.patch("snapcraft.storeapi.info.calculate_hash") as hash_mock:
+            self.client.download(
+                "test-snap", risk="stable", download_path=download_path
+            )
+
+        hash_mock.assert_not_called()
+
+    def test_download_restarts_stale_partial_download(self):
+        self.client.login("dummy", "test correct password")
+        download_path = os.path.join(self.path, "test-snap.snap")
+        with open(download_path + ".partial", "wb") as partial_file:
+            partial_file.write(b"another revision")
+        download = downloader.download
+        resumes = []
+
+        def fake_download(*args, **kwargs):
+            resumes.append(kwargs["resume"])
+            if len(resumes) == 1:
+                return "digest of another revision"
+            return download(*args, **kwargs)
+
+        with mock.patch(
+            "snapcraft.internal.downloader.download", side_effect=fake_download
+        ):
+            self.client.download(
+                "test-snap", risk="stable", download_path=download_path
+            )
+
+        self.assertThat(resumes, Equals([True, False]))
+        self.assertThat(download_path, FileExists())
+
     def test_download_on_sha_mismatch(self):
         fake_logger = fixtures.FakeLogger(level=logging.INFO)
         self.useFixture(fake_logger)
@@ -0,0 +1,201 @@
+# -*- Mode:Python; indent-tabs-mode:nil; tab-width:4 -*-
+#
+# Copyright (C) 2020 Canonical Ltd
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 3 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import http.server
+import io
+import re
+import threading
+from unittest import mock
+
+import pytest
+import requests
+
+from snapcraft.internal import downloader
+
+_DATA = bytes(range(256)) * 64
+
+
+class _RangeRequestHandler(http.server.BaseHTTPRequestHandler):
+    accept_ranges = True
+    ranges = []  # type: list
+
+    def do_GET(self):
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match and self.accept_ranges:
+            start = int(match.group(1))
+            end = int(match.group(2) or len(_DATA) - 1)
+            self.ranges.append((start, end))
+            if start >= len(_DATA):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", "bytes {}-{}/{}".format(start, end, len(_DATA))
+            )
+        else:
+            start, end = 0, len(_DATA) - 1
+            self.send_response(200)
+        if self.accept_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        self.wfile.write(_DATA[start : end + 1])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def url(monkeypatch):
+    monkeypatch.setenv("no_proxy", "localhost,127.0.0.1")
+    monkeypatch.setattr(_RangeRequestHandler, "accept_ranges", True)
+    monkeypatch.setattr(_RangeRequestHandler, "ranges", [])
+    server = http.server.HTTPServer(("127.0.0.1", 0), _RangeRequestHandler)
+    server_thread = threading.Thread(target=server.serve_forever)
+    server_thread.start()
+    yield "http://{}:{}/file".format(*server.server_address)
+    server.shutdown()
+    server.server_close()
+    server_thread.join()
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(downloader, "sleep", lambda seconds: None)
+
+
+def test_download(tmp_work_path, url):
+    digest = downloader.download(url, "file", algorithm="sha256")
+
+    assert open("file", "rb").read() == _DATA
+    assert digest == hashlib.sha256(_DATA).hexdigest()
+    assert not (tmp_work_path / "file.partial").exists()
+    assert _RangeRequestHandler.ranges == []
+
+
+def test_download_without_algorithm(tmp_work_path, url):
+    assert downloader.download(url, "file") is None
+
+
+def test_download_resume(tmp_work_path, url):
+    (tmp_work_path / "file.partial").write_bytes(_DATA[:1000])
+
+    digest = downloader.download(url, "file", algorithm="sha256", resume=True)
+
+    assert open("file", "rb").read() == _DATA
+    assert digest == hashlib.sha256(_DATA).hexdigest()
+    assert _RangeRequestHandler.ranges == [(1000, len(_DATA) - 1)]
+
+
+def test_download_resume_complete(tmp_work_path, url):
+    (tmp_work_path / "file.partial").write_bytes(_DATA)
+
+    downloader.download(url, "file", resume=True)
+
+    assert open("file", "rb").read() == _DATA
+
+
+def test_download_resume_ranges_not_accepted(tmp_work_path, url, monkeypatch):
+    monkeypatch.setattr(_RangeRequestHandler, "accept_ranges", False)
+    (tmp_work_path / "file.partial").write_bytes(b"stale")
+
+    digest = downloader.download(url, "file", algorithm="sha256", resume=True)
+
+    assert open("file", "rb").read() == _DATA
+    assert digest == hashlib.sha256(_DATA).hexdigest()
+
+
+def test_download_partial_ignored_without_resume(tmp_work_path, url):
+    (tmp_work_path / "file.partial").write_bytes(b"stale")
+
+    downloader.download(url, "file")
+
+    assert open("file", "rb").read() == _DATA
+    assert _RangeRequestHandler.ranges == []
+
+
+def test_download_in_parallel(tmp_work_path, url, monkeypatch):
+    monkeypatch.setattr(downloader, "_MIN_RANGE_SIZE", 1024)
+
+    digest = downloader.download(url, "file", algorithm="sha256", connections=4)
+
+    assert open("file", "rb").read() == _DATA
+    assert digest == hashlib.sha256(_DATA).hexdigest()
+    assert sorted(_RangeRequestHandler.ranges) == [
+        (0, 4095),
+        (4096, 8191),
+        (8192, 12287),
+        (12288, 16383),
+    ]
+
+
+def test_download_in_parallel_too_small(tmp_work_path, url):
+    downloader.download(url, "file", connections=4)
+
+    assert _RangeRequestHandler.ranges == []
+
+
+def test_download_retry_resumes(tmp_work_path, url):
+    session = requests.Session()
+    original_get = session.get
+
+    def failing_get(*args, **kwargs):
+        response = original_get(*args, **kwargs)
+        if failing_get.failed:
+            return response
+        failing_get.failed = True
+        # Fail after the first chunk made it to disk.
+        chunks = response.iter_content(1000)
+
+        def iter_content(chunk_size):
+            yield next(chunks)
+            raise requests.exceptions.ChunkedEncodingError("broken")
+
+        response.iter_content = iter_content
+        return response
+
+    failing_get.failed = False
+
+    with mock.patch.object(session, "get", side_effect=failing_get):
+        digest = downloader.download(url, "file", session=session, algorithm="md5")
+
+    assert open("file", "rb").read() == _DATA
+    assert digest == hashlib.md5(_DATA).hexdigest()
+    assert _RangeRequestHandler.ranges == [(1000, len(_DATA) - 1)]
+
+
+def test_download_retries_exhausted(tmp_work_path):
+    session = mock.Mock()
+    session.get.side_effect = requests.exceptions.ConnectionError("broken")
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        downloader.download("http://host/file", "file", session=session)
+
+    assert session.get.call_count == 5
+
+
+def test_download_http_error(tmp_work_path):
+    with pytest.raises(requests.exceptions.HTTPError):
+        downloader.download("http://host/file", "file", session=mock.Mock(get=_404))
+
+
+def _404(*args, **kwargs):
+    response = requests.Response()
+    response.status_code = 404
+    response.raw = io.BytesIO()
+    return response
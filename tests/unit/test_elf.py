@@ -14,19 +14,20 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import logging
+import concurrent.futures
 import os
-import subprocess
+import shutil
+import struct
 import sys
 import tempfile
 from unittest import mock
 
 import fixtures
 import pytest
-from testtools.matchers import Contains, EndsWith, Equals, NotEquals, StartsWith
+from testtools.matchers import EndsWith, Equals, NotEquals, StartsWith
 
-from snapcraft import ProjectOptions
-from snapcraft.internal import elf, errors
+from snapcraft import ProjectOptions, file_utils
+from snapcraft.internal import cache, elf, errors
 from tests import fixture_setup, unit
 
 
@@ -231,24 +232,6 @@ class TestGetLibraries(TestElfBase):
             ),
         )
 
-    def test_get_libraries_ldd_failure_logs_warning(self):
-        self.fake_logger = fixtures.FakeLogger(level=logging.WARNING)
-        self.useFixture(self.fake_logger)
-
-        elf_file = self.fake_elf["fake_elf-bad-ldd"]
-        libs = elf_file.load_dependencies(
-            root_path=self.fake_elf.root_path,
-            core_base_path=self.fake_elf.core_base_path,
-            arch_triplet=self.arch_triplet,
-            content_dirs=self.content_dirs,
-        )
-
-        self.assertThat(libs, Equals(set()))
-        self.assertThat(
-            self.fake_logger.output,
-            Contains("Unable to determine library dependencies for"),
-        )
-
     def test_existing_host_library_searched_for(self):
         elf_file = self.fake_elf["fake_elf-with-host-libraries"]
 
@@ -357,6 +340,150 @@ class TestGetElfFiles(TestElfBase):
         elf_files = elf.get_elf_files(self.fake_elf.root_path, {"fifo"})
         self.assertThat(elf_files, Equals(set()))
 
+    def test_parallel(self):
+        file_list = set()
+        for i in range(elf._PARALLEL_SCAN_MIN_FILES):
+            file_path = os.path.join("dir{}".format(i), "fake_elf-2.23")
+            os.makedirs(
+                os.path.join(self.fake_elf.root_path, os.path.dirname(file_path))
+            )
+            with open(os.path.join(self.fake_elf.root_path, file_path), "wb") as f:
+                f.write(b"\x7fELF")
+            file_list.add(file_path)
+
+        # Threads stand in for processes, which would not see the fake ELF
+        # attributes.
+        with mock.patch(
+            "concurrent.futures.ProcessPoolExecutor",
+            concurrent.futures.ThreadPoolExecutor,
+        ):
+            elf_files = elf.get_elf_files(
+                self.fake_elf.root_path, file_list, max_workers=4
+            )
+
+        self.assertThat(
+            {os.path.relpath(e.path, self.fake_elf.root_path) for e in elf_files},
+            Equals(file_list),
+        )
+
+
+def _write_elf_headers(path, program_headers, *, elf_class=2, byte_order="<"):
+    """Write ELF and program headers, the latter as (p_type, p_flags) tuples."""
+    if elf_class == 2:
+        header_format, program_header_size, p_flags_offset = "16sHHIQQQIHHHHHH", 56, 4
+    else:
+        header_format, program_header_size, p_flags_offset = "16sHHIIIIIHHHHHH", 32, 24
+    e_ident = b"\x7fELF" + bytes([elf_class, 1 if byte_order == "<" else 2, 1])
+    header_size = struct.calcsize(byte_order + header_format)
+    header = struct.pack(
+        byte_order + header_format,
+        e_ident.ljust(16, b"\x00"),
+        3,
+        62,
+        1,
+        0,
+        header_size,
+        0,
+        0,
+        header_size,
+        program_header_size,
+        len(program_headers),
+        0,
+        0,
+        0,
+    )
+    with open(path, "wb") as f:
+        f.write(header)
+        for p_type, p_flags in program_headers:
+            program_header = bytearray(program_header_size)
+            struct.pack_into(byte_order + "I", program_header, 0, p_type)
+            struct.pack_into(byte_order + "I", program_header, p_flags_offset, p_flags)
+            f.write(program_header)
+
+
+def _read_program_header_flags(path, *, elf_class=2, byte_order="<"):
+    with open(path, "rb") as f:
+        program_headers = elf._ProgramHeaders.read(f)
+    p_flags_offset = 4 if elf_class == 2 else 24
+    return [
+        struct.unpack_from(
+            byte_order + "I", program_headers.data, offset + p_flags_offset
+        )[0]
+        for offset, _ in program_headers.iter_types()
+    ]
+
+
+class TestIsDynamicallyLinked:
+
+    scenarios = (
+        ("64 bit", dict(elf_class=2, byte_order="<")),
+        ("32 bit", dict(elf_class=1, byte_order="<")),
+        ("big endian", dict(elf_class=2, byte_order=">")),
+    )
+
+    def test_dynamic_segment(self, tmp_path, elf_class, byte_order):
+        path = str(tmp_path / "elf")
+        # PT_PHDR, PT_INTERP, PT_DYNAMIC
+        _write_elf_headers(
+            path, [(6, 4), (3, 4), (2, 6)], elf_class=elf_class, byte_order=byte_order
+        )
+
+        assert elf._is_dynamically_linked(path) is True
+
+    def test_no_dynamic_segment(self, tmp_path, elf_class, byte_order):
+        path = str(tmp_path / "elf")
+        # PT_LOAD, PT_GNU_STACK
+        _write_elf_headers(
+            path, [(1, 5), (0x6474E551, 6)], elf_class=elf_class, byte_order=byte_order
+        )
+
+        assert elf._is_dynamically_linked(path) is False
+
+    def test_no_program_headers(self, tmp_path, elf_class, byte_order):
+        path = str(tmp_path / "elf")
+        _write_elf_headers(path, [], elf_class=elf_class, byte_order=byte_order)
+
+        assert elf._is_dynamically_linked(path) is False
+
+    def test_truncated_headers_are_parsed(self, tmp_path, elf_class, byte_order):
+        path = str(tmp_path / "elf")
+        with open(path, "wb") as f:
+            f.write(b"\x7fELF")
+
+        assert elf._is_dynamically_linked(path) is True
+
+
+class TestClearExecstack:
+
+    scenarios = TestIsDynamicallyLinked.scenarios
+
+    def _get_elf_file(self, path):
+        with mock.patch.object(elf.ElfFile, "_extract_attributes"):
+            return elf.ElfFile(path=path)
+
+    def test_clear_execstack(self, tmp_path, elf_class, byte_order):
+        path = str(tmp_path / "elf")
+        # PT_LOAD, PT_GNU_STACK
+        _write_elf_headers(
+            path, [(1, 5), (0x6474E551, 7)], elf_class=elf_class, byte_order=byte_order
+        )
+        elf_file = self._get_elf_file(path)
+        elf_file.execstack_set = True
+
+        assert elf_file.clear_execstack() is True
+
+        assert elf_file.execstack_set is False
+        assert _read_program_header_flags(
+            path, elf_class=elf_class, byte_order=byte_order
+        ) == [5, 6]
+
+    def test_clear_execstack_unreadable_headers(self, tmp_path, elf_class, byte_order):
+        path = str(tmp_path / "elf")
+        with open(path, "wb") as f:
+            f.write(b"\x7fELF")
+
+        assert self._get_elf_file(path).clear_execstack() is False
+
 
 class TestGetRequiredGLIBC(TestElfBase):
     def setUp(self):
@@ -421,6 +548,27 @@ class TestPatcher(TestElfBase):
         elf_patcher = elf.Patcher(dynamic_linker="/lib/fake-ld", root_path="/fake")
         elf_patcher.patch(elf_file=elf_file)
 
+    def test_get_patchelf_args(self):
+        elf_file = self.fake_elf["fake_elf-2.23"]
+        elf_patcher = elf.Patcher(dynamic_linker="/lib/fake-ld", root_path="/fake")
+
+        self.assertThat(
+            elf_patcher.get_patchelf_args(elf_file=elf_file),
+            Equals([["--set-interpreter", "/lib/fake-ld"]]),
+        )
+
+    def test_patch_skips_files_already_patched(self):
+        elf_file = self.fake_elf["fake_elf-2.23"]
+        elf_patcher = elf.Patcher(
+            dynamic_linker="/lib64/ld-linux-x86-64.so.2", root_path="/fake"
+        )
+
+        with mock.patch("subprocess.check_call") as check_call_mock:
+            elf_patcher.patch(elf_file=elf_file)
+
+        self.assertThat(elf_patcher.get_patchelf_args(elf_file=elf_file), Equals([]))
+        check_call_mock.assert_not_called()
+
 
 class TestPatcherErrors(TestElfBase):
     def test_patch_fails_raises_patcherror_exception(self):
@@ -461,10 +609,99 @@ class TestSonameCache(unit.TestCase):
 
         self.soname_cache.reset_except_root("/keep/me")
 
-        self.assertFalse((self.arch, "soname.so") in self.soname_cache)
+        self.assertTrue((self.arch, "soname.so") in self.soname_cache)
         self.assertFalse((self.arch, "notfound.so") in self.soname_cache)
         self.assertTrue((self.arch, "soname2.so") in self.soname_cache)
 
+    def test_reset_except_root_drops_sonames_now_in_root(self):
+        root_path = os.path.join(self.path, "root")
+        os.makedirs(os.path.join(root_path, "lib"))
+        self.soname_cache[self.arch, "soname.so"] = "/fake/path/soname.so"
+        self.soname_cache[self.arch, "soname2.so"] = "/fake/path/soname2.so"
+        open(os.path.join(root_path, "lib", "soname.so"), "w").close()
+
+        self.soname_cache.reset_except_root(root_path)
+
+        self.assertFalse((self.arch, "soname.so") in self.soname_cache)
+        self.assertTrue((self.arch, "soname2.so") in self.soname_cache)
+
+    def test_get_soname_index_refreshes_once_per_reset(self):
+        root_path = os.path.join(self.path, "root")
+        os.makedirs(os.path.join(root_path, "lib"))
+        soname_index = self.soname_cache.get_soname_index(root_path)
+        self.assertThat(soname_index.get_paths("soname.so"), Equals([]))
+
+        soname_path = os.path.join(root_path, "lib", "soname.so")
+        open(soname_path, "w").close()
+        soname_index = self.soname_cache.get_soname_index(root_path)
+        self.assertThat(soname_index.get_paths("soname.so"), Equals([]))
+
+        self.soname_cache.reset_except_root(self.path)
+        soname_index = self.soname_cache.get_soname_index(root_path)
+        self.assertThat(soname_index.get_paths("soname.so"), Equals([soname_path]))
+
+
+class TestSonameIndex(unit.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.root_path = os.path.join(self.path, "root")
+        for directory in ("lib", "usr/lib", "usr/lib/x86_64-linux-gnu"):
+            os.makedirs(os.path.join(self.root_path, directory))
+            open(os.path.join(self.root_path, directory, "libfoo.so.1"), "w").close()
+        os.symlink("usr/lib", os.path.join(self.root_path, "lib64"))
+
+    def test_paths_in_walk_order(self):
+        soname_index = elf.SonameIndex(self.root_path)
+        soname_index.refresh()
+
+        walk_paths = [
+            os.path.join(root, "libfoo.so.1")
+            for root, directories, files in os.walk(self.root_path)
+            if "libfoo.so.1" in files
+        ]
+        self.assertThat(soname_index.get_paths("libfoo.so.1"), Equals(walk_paths))
+        self.assertThat(len(walk_paths), Equals(3))
+        self.assertThat(soname_index.get_paths("lib64"), Equals([]))
+
+    def test_refresh_only_lists_changed_directories(self):
+        soname_index = elf.SonameIndex(self.root_path)
+        soname_index.refresh()
+        new_path = os.path.join(self.root_path, "usr", "lib", "libbar.so.1")
+        open(new_path, "w").close()
+
+        with mock.patch(
+            "snapcraft.internal.elf._list_directory", wraps=elf._list_directory
+        ) as list_directory_mock:
+            soname_index.refresh()
+
+        list_directory_mock.assert_called_once_with(
+            os.path.join(self.root_path, "usr/lib"), mock.ANY
+        )
+        self.assertThat(soname_index.get_paths("libbar.so.1"), Equals([new_path]))
+
+    def test_persisted_index_is_reused(self):
+        cache_path = os.path.join(self.path, "index.json")
+        elf.SonameIndex(self.root_path, cache_path=cache_path).refresh()
+
+        soname_index = elf.SonameIndex(self.root_path, cache_path=cache_path)
+        with mock.patch(
+            "snapcraft.internal.elf._list_directory", wraps=elf._list_directory
+        ) as list_directory_mock:
+            soname_index.refresh()
+
+        list_directory_mock.assert_not_called()
+        self.assertThat(len(soname_index.get_paths("libfoo.so.1")), Equals(3))
+
+    def test_failing_to_save_is_not_fatal(self):
+        # The cache directory cannot be created under a file.
+        cache_path = os.path.join(self.path, "file", "index.json")
+        open(os.path.join(self.path, "file"), "w").close()
+
+        soname_index = elf.SonameIndex(self.root_path, cache_path=cache_path)
+        soname_index.refresh()
+
+        self.assertThat(len(soname_index.get_paths("libfoo.so.1")), Equals(3))
+
 
 class TestSonameCacheErrors:
 
@@ -542,76 +779,220 @@ class HandleGlibcTestCase(unit.TestCase):
         )
 
 
-class TestLddParsing:
-    scenarios = [
-        (
-            "ubuntu 20.04 basic",
-            dict(
-                ldd_output="""
-\tlinux-vdso.so.1 (0x00007ffcae3e6000)
-\tlibc.so.6 => /lib/x86_64-linux-gnu/libc.so.6 (0x00007f33eebeb000)
-\t/lib64/ld-linux-x86-64.so.2 (0x00007f33eedf2000)
-""",
-                expected={"libc.so.6": "/lib/x86_64-linux-gnu/libc.so.6"},
-            ),
-        ),
-        (
-            "ubuntu 18.04 lspci w/o libpci",
-            dict(
-                ldd_output="""
-\tlinux-vdso.so.1 (0x00007fffeddd1000)
-\tlibpci.so.3 => not found
-\tlibkmod.so.2 => /lib/x86_64-linux-gnu/libkmod.so.2 (0x00007fe500619000)
-\tlibc.so.6 => /lib/x86_64-linux-gnu/libc.so.6 (0x00007fe500228000)
-\t/lib64/ld-linux-x86-64.so.2 (0x00007fe500a44000)
-""",
-                expected={
-                    "libc.so.6": "/lib/x86_64-linux-gnu/libc.so.6",
-                    "libkmod.so.2": "/lib/x86_64-linux-gnu/libkmod.so.2",
-                    "libpci.so.3": "libpci.so.3",
-                },
-            ),
-        ),
-        (
-            "ubuntu 16.04 basic",
-            dict(
-                ldd_output="""
-\tlinux-vdso.so.1 =>  (0x00007ffd71d64000)
-\tlibc.so.6 => /lib/x86_64-linux-gnu/libc.so.6 (0x00007fda33a16000)
-\t/lib64/ld-linux-x86-64.so.2 (0x00007fda33de0000)
-    """,
-                expected={"libc.so.6": "/lib/x86_64-linux-gnu/libc.so.6"},
-            ),
-        ),
-        (
-            "ubuntu 16.04 lspci w/o libpci",
-            dict(
-                ldd_output="""
-\tlinux-vdso.so.1 =>  (0x00007fff305b3000)
-\tlibpci.so.3 => not found
-\tlibkmod.so.2 => /lib/x86_64-linux-gnu/libkmod.so.2 (0x00007faef225c000)
-\tlibc.so.6 => /lib/x86_64-linux-gnu/libc.so.6 (0x00007faef1e92000)
-\t/lib64/ld-linux-x86-64.so.2 (0x00007faef2473000)
-    """,
-                expected={
-                    "libc.so.6": "/lib/x86_64-linux-gnu/libc.so.6",
-                    "libkmod.so.2": "/lib/x86_64-linux-gnu/libkmod.so.2",
-                    "libpci.so.3": "libpci.so.3",
-                },
-            ),
-        ),
-    ]
+class TestLibraryResolver:
+    @pytest.fixture(autouse=True)
+    def fake_elf_attributes(self, monkeypatch):
+        """Describe ELF files through self.elf_attributes, keyed by name."""
+        self.elf_attributes = dict()
+
+        def fake_extract_attributes(elf_file):
+            name = os.path.basename(elf_file.path)
+            attributes = dict(
+                arch=("ELFCLASS64", "ELFDATA2LSB", "EM_X86_64"),
+                interp="",
+                needed=[],
+            )
+            attributes.update(self.elf_attributes.get(name, dict()))
+
+            elf_file.arch = attributes["arch"]
+            elf_file.interp = attributes["interp"]
+            elf_file.soname = attributes.get("soname", name)
+            elf_file.needed = {
+                n: elf.NeededLibrary(name=n) for n in attributes["needed"]
+            }
+            elf_file.rpath = attributes.get("rpath", [])
+            elf_file.runpath = attributes.get("runpath", [])
+
+        monkeypatch.setattr(elf.ElfFile, "_extract_attributes", fake_extract_attributes)
+        monkeypatch.setattr(elf, "_get_host_library_paths", lambda arch_triplet: ())
+
+    @pytest.fixture()
+    def root_path(self, tmp_path):
+        (tmp_path / "root" / "usr" / "lib").mkdir(parents=True)
+        return tmp_path / "root"
+
+    def _make_elf(self, path, **attributes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"\x7fELF")
+        self.elf_attributes[path.name] = attributes
+        return path
+
+    def _resolve(self, root_path, path):
+        resolver = elf.LibraryResolver(
+            root_path=str(root_path),
+            core_base_path=None,
+            content_dirs=set(),
+            arch_triplet="x86_64-linux-gnu",
+        )
+        return resolver.resolve(elf.ElfFile(path=str(path)))
+
+    def test_resolves_indirect_dependencies(self, root_path):
+        lib_path = root_path / "usr" / "lib"
+        self._make_elf(lib_path / "libfoo.so.1", needed=["libbar.so.2"])
+        self._make_elf(lib_path / "libbar.so.2", needed=["libfoo.so.1"])
+        binary = self._make_elf(
+            root_path / "bin" / "foo",
+            interp="/lib64/ld-linux-x86-64.so.2",
+            needed=["libfoo.so.1", "ld-linux-x86-64.so.2"],
+        )
+
+        assert self._resolve(root_path, binary) == {
+            "libfoo.so.1": str(lib_path / "libfoo.so.1"),
+            "libbar.so.2": str(lib_path / "libbar.so.2"),
+        }
+
+    def test_libraries_named_like_the_dynamic_linker_are_resolved(self, root_path):
+        lib_path = root_path / "usr" / "lib"
+        self._make_elf(lib_path / "ldfoo.so.1")
+        library = self._make_elf(
+            lib_path / "libfoo.so.1", needed=["ld-linux-x86-64.so.2", "ldfoo.so.1"]
+        )
+
+        assert self._resolve(root_path, library) == {
+            "ldfoo.so.1": str(lib_path / "ldfoo.so.1")
+        }
+
+    def test_not_found(self, root_path):
+        binary = self._make_elf(root_path / "bin" / "foo", needed=["libmissing.so.1"])
+
+        assert self._resolve(root_path, binary) == {
+            "libmissing.so.1": "libmissing.so.1"
+        }
 
-    def test_scenario(self, ldd_output, expected, monkeypatch):
-        def fake_abspath(path):
-            return path
+    def test_other_architectures_are_skipped(self, root_path):
+        self._make_elf(
+            root_path / "usr" / "lib" / "libfoo.so.1",
+            arch=("ELFCLASS32", "ELFDATA2LSB", "EM_ARM"),
+        )
+        binary = self._make_elf(root_path / "bin" / "foo", needed=["libfoo.so.1"])
+
+        assert self._resolve(root_path, binary) == {"libfoo.so.1": "libfoo.so.1"}
+
+    def test_rpath_is_searched_first(self, root_path):
+        self._make_elf(root_path / "usr" / "lib" / "libfoo.so.1")
+        self._make_elf(root_path / "opt" / "lib" / "libfoo.so.1")
+        binary = self._make_elf(
+            root_path / "opt" / "bin" / "foo",
+            needed=["libfoo.so.1"],
+            rpath=["$ORIGIN/../lib"],
+        )
+
+        assert self._resolve(root_path, binary) == {
+            "libfoo.so.1": str(root_path / "opt" / "lib" / "libfoo.so.1")
+        }
+
+    def test_rpath_of_loaders_is_searched(self, root_path):
+        self._make_elf(
+            root_path / "usr" / "lib" / "libfoo.so.1", needed=["libbar.so.2"]
+        )
+        self._make_elf(root_path / "opt" / "lib" / "libbar.so.2")
+        binary = self._make_elf(
+            root_path / "opt" / "bin" / "foo",
+            needed=["libfoo.so.1"],
+            rpath=["${ORIGIN}/../lib"],
+        )
+
+        assert self._resolve(root_path, binary)["libbar.so.2"] == str(
+            root_path / "opt" / "lib" / "libbar.so.2"
+        )
+
+    def test_runpath_is_searched_last(self, root_path):
+        self._make_elf(root_path / "usr" / "lib" / "libfoo.so.1")
+        self._make_elf(root_path / "opt" / "lib" / "libfoo.so.1")
+        self._make_elf(root_path / "opt" / "lib" / "libbar.so.2")
+        binary = self._make_elf(
+            root_path / "opt" / "bin" / "foo",
+            needed=["libfoo.so.1", "libbar.so.2"],
+            rpath=["$ORIGIN/../lib"],
+            runpath=["$ORIGIN/../lib"],
+        )
 
-        monkeypatch.setattr(os.path, "exists", lambda f: True)
-        monkeypatch.setattr(os.path, "abspath", fake_abspath)
+        assert self._resolve(root_path, binary) == {
+            "libfoo.so.1": str(root_path / "usr" / "lib" / "libfoo.so.1"),
+            "libbar.so.2": str(root_path / "opt" / "lib" / "libbar.so.2"),
+        }
+
+    def test_host_libraries_are_searched_last(self, root_path, tmp_path, monkeypatch):
+        host_path = tmp_path / "host" / "lib"
+        self._make_elf(root_path / "usr" / "lib" / "libfoo.so.1")
+        self._make_elf(host_path / "libfoo.so.1")
+        self._make_elf(host_path / "libbar.so.2")
+        binary = self._make_elf(
+            root_path / "bin" / "foo", needed=["libfoo.so.1", "libbar.so.2"]
+        )
         monkeypatch.setattr(
-            subprocess, "check_output", lambda *args, **kwargs: ldd_output.encode()
+            elf, "_get_host_library_paths", lambda arch_triplet: (str(host_path),)
         )
 
-        libraries = elf.ldd(path="/bin/foo", ld_library_paths=[])
+        assert self._resolve(root_path, binary) == {
+            "libfoo.so.1": str(root_path / "usr" / "lib" / "libfoo.so.1"),
+            "libbar.so.2": str(host_path / "libbar.so.2"),
+        }
+
+
+def test_read_ld_so_conf_with_includes(tmp_path):
+    (tmp_path / "ld.so.conf.d").mkdir()
+    (tmp_path / "ld.so.conf.d" / "b.conf").write_text("/b\n")
+    (tmp_path / "ld.so.conf.d" / "a.conf").write_text("# comment\n/a1:/a2\n")
+    (tmp_path / "ld.so.conf").write_text("/first\ninclude ld.so.conf.d/*.conf\n")
+
+    assert elf._read_ld_so_conf(str(tmp_path / "ld.so.conf")) == [
+        "/first",
+        "/a1",
+        "/a2",
+        "/b",
+    ]
+
 
-        assert libraries == expected
+def test_elf_file_attribute_cache(xdg_dirs):
+    attribute_cache = cache.ElfAttributeCache(project_name="test-project")
+    elf_file = elf.ElfFile(path=sys.executable, attribute_cache=attribute_cache)
+    attribute_cache.save()
+
+    attribute_cache = cache.ElfAttributeCache(project_name="test-project")
+    with mock.patch.object(elf.ElfFile, "_extract_attributes") as extract_mock:
+        cached_elf_file = elf.ElfFile(
+            path=sys.executable, attribute_cache=attribute_cache
+        )
+
+    extract_mock.assert_not_called()
+    assert cached_elf_file.get_attributes() == elf_file.get_attributes()
+    assert cached_elf_file.get_required_glibc() == elf_file.get_required_glibc()
+
+
+def test_elf_file_attribute_cache_version_mismatch(xdg_dirs):
+    attribute_cache = cache.ElfAttributeCache(project_name="test-project")
+    attribute_cache.add(sys.executable, dict(version=0))
+
+    elf_file = elf.ElfFile(path=sys.executable, attribute_cache=attribute_cache)
+
+    assert elf_file.arch is not None
+    assert attribute_cache.get(sys.executable) == elf_file.get_attributes()
+
+
+def test_get_elf_files_attribute_cache(xdg_dirs, tmp_path):
+    shutil.copy(sys.executable, tmp_path / "python")
+    path = (tmp_path / "python").as_posix()
+    attribute_cache = cache.ElfAttributeCache(project_name="test-project")
+
+    with mock.patch(
+        "snapcraft.file_utils.calculate_hash", wraps=file_utils.calculate_hash
+    ) as hash_mock:
+        elf_files = elf.get_elf_files(
+            tmp_path.as_posix(), {"python"}, attribute_cache=attribute_cache
+        )
+
+    # Files are read once, while extracting their attributes.
+    hash_mock.assert_called_once_with(path, algorithm="sha256")
+
+    with mock.patch("snapcraft.file_utils.calculate_hash") as hash_mock:
+        with mock.patch.object(elf.ElfFile, "_extract_attributes") as extract_mock:
+            cached_elf_files = elf.get_elf_files(
+                tmp_path.as_posix(), {"python"}, attribute_cache=attribute_cache
+            )
+
+    hash_mock.assert_not_called()
+    extract_mock.assert_not_called()
+    assert [elf_file.get_attributes() for elf_file in cached_elf_files] == [
+        elf_file.get_attributes() for elf_file in elf_files
+    ]
@@ -126,6 +126,37 @@ class TestErrorFormatting:
                 ),
             },
         ),
+        (
+            "SnapcraftPartConflictsError",
+            {
+                "exception_class": errors.SnapcraftPartConflictsError,
+                "kwargs": {
+                    "conflicts": [
+                        ("test-other-part", "test-part", ("test-file1",)),
+                        ("test-part", "test-third-part", ("test-file2",)),
+                    ]
+                },
+                "expected_message": (
+                    "Failed to stage: "
+                    "The following parts have files in common, but with "
+                    "different contents:\n"
+                    "Parts 'test-other-part' and 'test-part':\n"
+                    "    test-file1\n"
+                    "Parts 'test-part' and 'test-third-part':\n"
+                    "    test-file2\n"
+                    "\n"
+                    "Snapcraft offers some capabilities to solve this by use of "
+                    "the following keywords:\n"
+                    "    - `filesets`\n"
+                    "    - `stage`\n"
+                    "    - `snap`\n"
+                    "    - `organize`\n"
+                    "\n"
+                    "To learn more about these part keywords, run "
+                    "`snapcraft help plugins`."
+                ),
+            },
+        ),
         (
             "InvalidWikiEntryError",
             {
@@ -14,16 +14,19 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import errno
 import os
 import pathlib
 import re
 import shutil
+import stat
 import subprocess
+import sys
 from unittest import mock
 
 import pytest
 import testtools
-from testtools.matchers import Equals
+from testtools.matchers import Equals, Not
 
 from snapcraft import file_utils
 from snapcraft.internal import common, errors
@@ -73,6 +76,104 @@ class TestReplaceInFile:
             assert f.read() == expected
 
 
+def test_replace_in_file_does_not_write_through_hard_links(tmp_work_path):
+    (tmp_work_path / "bin").mkdir()
+    (tmp_work_path / "original").write_text("#!/foo/bar/baz/python")
+    os.link(tmp_work_path / "original", tmp_work_path / "bin" / "2to3")
+
+    file_utils.replace_in_file(
+        "bin", re.compile(r""), re.compile(r"#!.*python"), r"#!/usr/bin/env python"
+    )
+
+    assert (tmp_work_path / "bin" / "2to3").read_text() == "#!/usr/bin/env python"
+    assert (tmp_work_path / "original").read_text() == "#!/foo/bar/baz/python"
+
+
+def test_replace_in_file_skips_binary_files(tmp_work_path):
+    (tmp_work_path / "bin").mkdir()
+    (tmp_work_path / "bin" / "lib.so").write_bytes(b"#!/foo/python\0\x7fELF")
+
+    file_utils.replace_in_file(
+        "bin", re.compile(r""), re.compile(r"#!.*python"), r"#!/usr/bin/env python"
+    )
+
+    assert (tmp_work_path / "bin" / "lib.so").read_bytes() == b"#!/foo/python\0\x7fELF"
+
+
+def test_replace_in_file_streaming(tmp_work_path):
+    (tmp_work_path / "bin").mkdir()
+    (tmp_work_path / "bin" / "script").write_bytes(
+        b"#!/bin/sh\r\nfoo=/usr/bin/python\nbar=/usr/bin/python\n"
+    )
+
+    file_utils.replace_in_file(
+        "bin",
+        re.compile(r""),
+        re.compile(r"^(\w+)=/usr/bin/python"),
+        r"\1=python",
+        streaming=True,
+    )
+
+    # Every line is matched on its own, and line endings are kept as they were.
+    assert (tmp_work_path / "bin" / "script").read_bytes() == (
+        b"#!/bin/sh\r\nfoo=python\nbar=python\n"
+    )
+
+
+def test_replace_in_file_streaming_unchanged(tmp_work_path):
+    (tmp_work_path / "bin").mkdir()
+    (tmp_work_path / "bin" / "script").write_text("#!/bin/sh\n")
+    os.utime(tmp_work_path / "bin" / "script", ns=(0, 0))
+
+    file_utils.replace_in_file(
+        "bin",
+        re.compile(r""),
+        re.compile(r"/usr/bin/python"),
+        r"python",
+        streaming=True,
+    )
+
+    assert os.stat(tmp_work_path / "bin" / "script").st_mtime_ns == 0
+    assert os.listdir(tmp_work_path / "bin") == ["script"]
+
+
+def test_replacing_file(tmp_work_path):
+    (tmp_work_path / "file").write_text("old")
+    os.chmod(tmp_work_path / "file", 0o755)
+    os.link(tmp_work_path / "file", tmp_work_path / "link")
+
+    with file_utils.replacing_file("file") as f:
+        f.write("new")
+
+    assert (tmp_work_path / "file").read_text() == "new"
+    assert stat.S_IMODE(os.stat(tmp_work_path / "file").st_mode) == 0o755
+    assert (tmp_work_path / "link").read_text() == "old"
+    assert sorted(os.listdir(tmp_work_path)) == ["file", "link"]
+
+
+def test_replacing_file_removed_on_error(tmp_work_path):
+    (tmp_work_path / "file").write_text("old")
+
+    with pytest.raises(ValueError):
+        with file_utils.replacing_file("file") as f:
+            f.write("new")
+            raise ValueError()
+
+    assert (tmp_work_path / "file").read_text() == "old"
+    assert os.listdir(tmp_work_path) == ["file"]
+
+
+def test_replacing_read_only_file(tmp_work_path):
+    (tmp_work_path / "file").write_text("old")
+
+    with mock.patch("os.access", return_value=False):
+        with pytest.raises(PermissionError):
+            with file_utils.replacing_file("file"):
+                pass
+
+    assert os.listdir(tmp_work_path) == ["file"]
+
+
 class TestLinkOrCopyTree(unit.TestCase):
     def setUp(self):
         super().setUp()
@@ -135,6 +236,71 @@ class TestLinkOrCopyTree(unit.TestCase):
         # Verify that the symlink remains a symlink
         self.assertThat(os.path.join("qux", "bar-link"), unit.LinkExists("bar"))
 
+    def test_link_files_are_hard_links(self):
+        file_utils.link_or_copy_tree("foo", "qux")
+
+        self.assertThat(
+            os.stat(os.path.join("qux", "bar", "3")).st_ino,
+            Equals(os.stat(os.path.join("foo", "bar", "3")).st_ino),
+        )
+
+    def test_link_directory_metadata_set_after_contents(self):
+        os.utime(os.path.join("foo", "bar"), (1000, 1000))
+        os.chmod(os.path.join("foo", "bar", "baz"), 0o555)
+        self.addCleanup(os.chmod, os.path.join("foo", "bar", "baz"), 0o755)
+        self.addCleanup(os.chmod, os.path.join("qux", "bar", "baz"), 0o755)
+
+        file_utils.link_or_copy_tree("foo", "qux")
+
+        self.assertThat(os.stat(os.path.join("qux", "bar")).st_mtime, Equals(1000))
+        self.assertThat(
+            stat.S_IMODE(os.stat(os.path.join("qux", "bar", "baz")).st_mode),
+            Equals(0o555),
+        )
+        self.assertTrue(os.path.isfile(os.path.join("qux", "bar", "baz", "4")))
+
+    def test_link_ignore(self):
+        file_utils.link_or_copy_tree(
+            "foo", "qux", ignore=lambda root, names: ["bar"] if root == "foo" else []
+        )
+
+        self.assertTrue(os.path.isfile(os.path.join("qux", "2")))
+        self.assertFalse(os.path.exists(os.path.join("qux", "bar")))
+
+    def test_link_into_subdirectory_of_source(self):
+        file_utils.link_or_copy_tree("foo", os.path.join("foo", "bar", "qux"))
+
+        self.assertTrue(os.path.isfile(os.path.join("foo", "bar", "qux", "2")))
+        self.assertFalse(
+            os.path.exists(os.path.join("foo", "bar", "qux", "bar", "qux"))
+        )
+
+    def test_copy_function(self):
+        file_utils.link_or_copy_tree("foo", "qux", copy_function=file_utils.copy)
+
+        self.assertThat(
+            os.stat(os.path.join("qux", "bar", "3")).st_ino,
+            Not(Equals(os.stat(os.path.join("foo", "bar", "3")).st_ino)),
+        )
+
+    @mock.patch("os.link")
+    def test_cross_device_copies_without_linking(self, mock_link):
+        real_stat = os.stat
+
+        def fake_stat(path, **kwargs):
+            path_stat = real_stat(path, **kwargs)
+            if path == "qux":
+                return os.stat_result(
+                    path_stat[:2] + (path_stat.st_dev + 1,) + path_stat[3:]
+                )
+            return path_stat
+
+        with mock.patch("os.stat", side_effect=fake_stat):
+            file_utils.link_or_copy_tree("foo", "qux")
+
+        mock_link.assert_not_called()
+        self.assertTrue(os.path.isfile(os.path.join("qux", "bar", "baz", "4")))
+
 
 class TestLinkOrCopy(unit.TestCase):
     def setUp(self):
@@ -162,6 +328,77 @@ class TestLinkOrCopy(unit.TestCase):
         self.assertTrue(os.path.isfile("foo2/bar/baz/4"))
 
 
+class TestCopy:
+    def test_copy(self, tmp_work_path):
+        (tmp_work_path / "source").write_text("contents")
+        os.chmod("source", 0o700)
+
+        file_utils.copy("source", "destination")
+
+        assert (tmp_work_path / "destination").read_text() == "contents"
+        assert stat.S_IMODE(os.stat("destination").st_mode) == 0o700
+
+    def test_copy_file_range_unsupported(self, tmp_work_path, monkeypatch):
+        (tmp_work_path / "source").write_text("contents")
+
+        def copy_file_range(*args):
+            raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+        monkeypatch.setattr(os, "copy_file_range", copy_file_range, raising=False)
+
+        file_utils.copy("source", "destination")
+
+        assert (tmp_work_path / "destination").read_text() == "contents"
+
+    def test_copy_symlink(self, tmp_work_path):
+        os.symlink("source", "link")
+
+        file_utils.copy("link", "destination")
+
+        assert os.readlink("destination") == "source"
+
+    @pytest.mark.skipif(sys.platform != "linux", reason="FICLONE is Linux only")
+    def test_copy_reflink(self, tmp_work_path, monkeypatch):
+        (tmp_work_path / "source").write_text("contents")
+        fake_ioctl = mock.Mock(return_value=0)
+        monkeypatch.setattr(file_utils.fcntl, "ioctl", fake_ioctl)
+        statistics = file_utils.CopyStatistics()
+
+        file_utils.copy("source", "destination", statistics=statistics)
+
+        fake_ioctl.assert_called_once_with(mock.ANY, 0x40049409, mock.ANY)
+        assert statistics.files == {"reflink": 1}
+        assert statistics.bytes == {"reflink": 8}
+
+    @pytest.mark.skipif(sys.platform != "linux", reason="FICLONE is Linux only")
+    def test_copy_reflink_unsupported(self, tmp_work_path, monkeypatch):
+        (tmp_work_path / "source").write_text("contents")
+
+        def ioctl(*args):
+            raise OSError(errno.EOPNOTSUPP, os.strerror(errno.EOPNOTSUPP))
+
+        monkeypatch.setattr(file_utils.fcntl, "ioctl", ioctl)
+        statistics = file_utils.CopyStatistics()
+
+        file_utils.copy("source", "destination", statistics=statistics)
+
+        assert (tmp_work_path / "destination").read_text() == "contents"
+        assert sum(statistics.files.values()) == 1
+        assert "reflink" not in statistics.files
+
+    def test_copy_statistics(self):
+        statistics = file_utils.CopyStatistics()
+        assert str(statistics) == "no files copied"
+
+        statistics.record("reflink", 10)
+        statistics.record("reflink", 20)
+        statistics.record("copy", 5)
+
+        assert str(statistics) == (
+            "1 files (5 bytes) with copy, 2 files (30 bytes) with reflink"
+        )
+
+
 class RequiresCommandSuccessTestCase(unit.TestCase):
     @mock.patch("subprocess.check_call")
     def test_requires_command_works(self, mock_check_call):
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import io
 import os
 from unittest.mock import patch
 
@@ -78,6 +79,34 @@ class TestProgressBarInitialization:
         assert (type(progressbar.AnimatedMarker()) in pb_widgets_types) is not is_dumb
 
 
+class TestCombinedDownloadProgress:
+    def test_update(self, monkeypatch):
+        monkeypatch.setattr(indicators, "is_dumb_terminal", lambda: False)
+
+        with indicators.CombinedDownloadProgress(10, "message") as progress:
+            progress.update(4)
+            assert progress._progress_bar.currval == 4
+            # Downloads not advertising their length may exceed the total.
+            progress.update(8)
+            assert progress._progress_bar.currval == 10
+
+    def test_update_dumb_terminal(self, monkeypatch):
+        monkeypatch.setattr(indicators, "is_dumb_terminal", lambda: True)
+
+        with indicators.CombinedDownloadProgress(10, "message") as progress:
+            progress.update(4)
+            assert progress._progress_bar.currval == 0
+
+
+    def test_fd(self):
+        fd = io.StringIO()
+
+        with indicators.CombinedDownloadProgress(10, "message", fd=fd):
+            pass
+
+        assert "message" in fd.getvalue()
+
+
 class IndicatorsDownloadTests(unit.FakeFileHTTPServerBasedTestCase):
     def setUp(self):
         super().setUp()
@@ -14,12 +14,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import logging
 import os
 import textwrap
+from unittest import mock
 
-from testtools.matchers import FileContains, FileExists, Not
+import fixtures
+from testtools.matchers import Contains, Equals, FileContains
 
-from snapcraft.internal import mangling
+from snapcraft.internal import elf, mangling
 from tests import fixture_setup, unit
 
 
@@ -153,6 +156,50 @@ class ManglingPythonShebangTestCase(unit.TestCase):
             ),
         )
 
+    def test_only_first_line_rewritten(self):
+        file_path = _create_file(
+            "file", "#!/usr/bin/python3 -Es\n#!/usr/bin/python3\nprint()\n"
+        )
+        mangling.rewrite_python_shebangs(os.path.dirname(file_path))
+        self.assertThat(
+            file_path,
+            FileContains(
+                textwrap.dedent(
+                    """\
+            #!/bin/sh
+            ''''exec python3 -Es -- "$0" "$@" # '''
+            #!/usr/bin/python3
+            print()
+        """
+                )
+            ),
+        )
+
+    def test_no_shebang_no_rewrite(self):
+        file_path = _create_file("file", "\n#!/usr/bin/python3\n")
+        mangling.rewrite_python_shebangs(os.path.dirname(file_path))
+        self.assertThat(file_path, FileContains("\n#!/usr/bin/python3\n"))
+
+    def test_binary_no_rewrite(self):
+        os.makedirs("test-dir")
+        file_path = os.path.join("test-dir", "file")
+        with open(file_path, "wb") as f:
+            f.write(b"#!\xff\xfe/usr/bin/python3\n\x7fELF")
+
+        mangling.rewrite_python_shebangs(os.path.dirname(file_path))
+
+        with open(file_path, "rb") as f:
+            self.assertThat(f.read(), Equals(b"#!\xff\xfe/usr/bin/python3\n\x7fELF"))
+
+    def test_hard_link_not_written_through(self):
+        file_path = _create_file("file", "#!/usr/bin/python3\n")
+        os.link(file_path, "original")
+
+        mangling.rewrite_python_shebangs(os.path.dirname(file_path))
+
+        self.assertThat(file_path, FileContains("#!/usr/bin/env python3\n"))
+        self.assertThat("original", FileContains("#!/usr/bin/python3\n"))
+
 
 class TestClearExecstack(unit.TestCase):
     def setUp(self):
@@ -164,20 +211,28 @@ class TestClearExecstack(unit.TestCase):
     def test_execstack_clears(self):
         elf_files = [self.fake_elf["fake_elf-with-execstack"]]
 
-        mangling.clear_execstack(elf_files=elf_files)
+        with mock.patch.object(
+            elf.ElfFile, "clear_execstack", return_value=True
+        ) as clear_execstack_mock:
+            mangling.clear_execstack(elf_files=elf_files)
 
-        self.assertThat("{}.execstack".format(elf_files[0].path), FileExists())
+        clear_execstack_mock.assert_called_once_with()
 
     def test_bad_execstack_does_not_blow_up(self):
+        fake_logger = self.useFixture(fixtures.FakeLogger(level=logging.WARNING))
         elf_files = [self.fake_elf["fake_elf-with-bad-execstack"]]
 
         mangling.clear_execstack(elf_files=elf_files)
 
-        self.assertThat("{}.execstack".format(elf_files[0].path), Not(FileExists()))
+        self.assertThat(
+            fake_logger.output,
+            Contains("Failed to clear execstack for {!r}".format(elf_files[0].path)),
+        )
 
     def test_no_execstack_does_nothing(self):
         elf_files = [self.fake_elf["fake_elf-2.23"]]
 
-        mangling.clear_execstack(elf_files=elf_files)
+        with mock.patch.object(elf.ElfFile, "clear_execstack") as clear_execstack_mock:
+            mangling.clear_execstack(elf_files=elf_files)
 
-        self.assertThat("{}.execstack".format(elf_files[0].path), Not(FileExists()))
+        clear_execstack_mock.assert_not_called()